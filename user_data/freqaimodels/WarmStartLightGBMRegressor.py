@@ -0,0 +1,27 @@
+"""
+WarmStartLightGBMRegressor - LightGBMRegressor boost tiếp từ model trước
+=======================================================================
+Retrain = tối đa freqai.warm_start.max_added_trees trees mới trên cửa sổ mới
+(init_model = model trước của pair, dùng lại feature/label pipelines đã fit của model đó),
+full rebuild mỗi full_rebuild_every lần.
+Chi tiết: user_data/strategies/indicators/warm_start.py
+
+Usage:
+    freqtrade trade --config user_data/configs/config-lightgbm.json \\
+        --strategy FreqAIStrategy --freqaimodel WarmStartLightGBMRegressor
+
+Author: AI Trading System
+"""
+
+import sys
+from pathlib import Path
+
+from freqtrade.freqai.prediction_models.LightGBMRegressor import LightGBMRegressor
+
+# Add strategies directory to path to import local modules
+sys.path.append(str(Path(__file__).resolve().parent.parent / "strategies"))
+from indicators.warm_start import WarmStartMixin
+
+
+class WarmStartLightGBMRegressor(WarmStartMixin, LightGBMRegressor):
+    """LightGBMRegressor + warm start (init_model) có giới hạn trees và full rebuild định kỳ"""
@@ -0,0 +1,27 @@
+"""
+WarmStartXGBoostRegressor - XGBoostRegressor boost tiếp từ model trước
+====================================================================
+Retrain = tối đa freqai.warm_start.max_added_trees trees mới trên cửa sổ mới
+(xgb_model = model trước của pair, dùng lại feature/label pipelines đã fit của model đó),
+full rebuild mỗi full_rebuild_every lần.
+Chi tiết: user_data/strategies/indicators/warm_start.py
+
+Usage:
+    freqtrade trade --config user_data/config.json \\
+        --strategy FreqAIStrategy --freqaimodel WarmStartXGBoostRegressor
+
+Author: AI Trading System
+"""
+
+import sys
+from pathlib import Path
+
+from freqtrade.freqai.prediction_models.XGBoostRegressor import XGBoostRegressor
+
+# Add strategies directory to path to import local modules
+sys.path.append(str(Path(__file__).resolve().parent.parent / "strategies"))
+from indicators.warm_start import WarmStartMixin
+
+
+class WarmStartXGBoostRegressor(WarmStartMixin, XGBoostRegressor):
+    """XGBoostRegressor + warm start (xgb_model) có giới hạn trees và full rebuild định kỳ"""
@@ -8,18 +8,36 @@ import numpy as np
 import pandas as pd
 from pandas import DataFrame
 from freqtrade.strategy import IStrategy, IntParameter, DecimalParameter, CategoricalParameter
+from freqtrade.exchange import timeframe_to_seconds
 import logging
 from pandas import DataFrame
 import pandas_ta as pta  # pandas_ta for advanced indicators
 import talib.abstract as ta  # talib for basic indicators (required by FreqAI)
 import sys
 from pathlib import Path
+from contextlib import nullcontext
 
 # Add strategies directory to path to import local modules
 sys.path.append(str(Path(__file__).parent))
 from indicators.smc_indicators import SMCIndicators
 from indicators.data_enhancement import DataEnhancement  # Phase 2 Features
 from indicators.feature_engineering import FeatureEngineering  # Phase 3: Proper ML Features
+from indicators.incremental_features import IncrementalFeatureEngine  # Live: O(1) per-candle features
+from indicators.incremental_patterns import IncrementalPatternDetector  # Live: swing / chart patterns theo từng nến
+from indicators.indicator_cache import IndicatorCache  # Shared ADX/ATR/BBANDS/rolling primitives per frame
+from indicators.feature_store import FeatureStore  # On-disk feature cache (backtest/hyperopt/train)
+from indicators.labeling import Labeling  # Vectorized target labels
+from indicators.event_sampling import EventSampling  # CUSUM filter: train trên event rows
+from indicators.kernels import Kernels  # Numba / NumPy backend cho sequential kernels
+from indicators.dtype_policy import DtypePolicy  # float32 / int8 / category cho feature matrix
+from indicators.feature_pruning import FeaturePruning  # Importance allowlist: skip nhóm feature không dùng
+from indicators.feature_dag import FeatureDAG  # Thread pool cho các nhóm feature độc lập
+from indicators.parallel_features import FeatureJob, ParallelFeatures  # Process pool cho expand_basic (pair × timeframe)
+from indicators.feature_profiler import FeatureProfiler  # Opt-in timing / CPU / memory của từng nhóm feature
+from indicators.fear_greed import FearGreedProvider  # F&G lịch sử daily, refresh nền, file local
+from indicators.candle_rows import CandleRows  # O(1) nến theo thời gian cho custom_stoploss / custom_stake_amount
+from indicators.funding_features import FundingFeatures  # Funding rate / mark premium thật từ file 8h local
+from indicators.signal_matrix import SignalMatrix, SignalMatrixCache, apply_signal  # Hyperopt: precomputed entry/exit components
 from indicators.chart_patterns import ChartPatterns  # Phase 3: Chart Pattern Recognition
 from indicators.wave_indicators import WaveIndicators  # Phase 3: Elliott Wave Lite (Fibonacci + AO)
 
@@ -122,6 +140,23 @@ class FreqAIStrategy(IStrategy):
         
         return final_leverage
     
+    # Cột mà các callbacks đọc theo nến (custom_stoploss / custom_stake_amount)
+    CALLBACK_COLUMNS = ('atr', '&s-up_or_down_mean')
+    _candle_rows: Optional[CandleRows] = None
+
+    def _candle_rows_for(self, pair: str, dataframe: Optional[DataFrame] = None) -> CandleRows:
+        """
+        Accessor O(1) theo timestamp thay cho get_analyzed_dataframe + iloc[-1].squeeze().
+        Refresh ở populate_exit_trend (dataframe); pair chưa có → dựng từ analyzed dataframe.
+        """
+        if self._candle_rows is None:
+            self._candle_rows = CandleRows(self.CALLBACK_COLUMNS, timeframe_to_seconds(self.timeframe))
+        if dataframe is None and not self._candle_rows.has(pair):
+            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
+        if dataframe is not None:
+            self._candle_rows.update(pair, dataframe)
+        return self._candle_rows
+
     def custom_stoploss(self, pair: str, trade: 'Trade', current_time: datetime,
                         current_rate: float, current_profit: float, **kwargs) -> float:
         
@@ -135,11 +170,8 @@ class FreqAIStrategy(IStrategy):
         # 2. Initial Stoploss (ATR or Fixed)
         # If not yet profitable enough to trail, use ATR Logic
         
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-        last_candle = dataframe.iloc[-1].squeeze()
-        
-        # Get ATR from last candle
-        atr = last_candle.get('atr', 0)
+        # Get ATR from last closed candle at current_time
+        atr = self._candle_rows_for(pair).get(pair, 'atr', current_time, 0)
         
         # Get current leverage of the trade (default 1x if not available)
         current_leverage = getattr(trade, 'leverage', 1.0) or 1.0
@@ -173,11 +205,8 @@ class FreqAIStrategy(IStrategy):
         - Medium confidence (0.6-0.8): 100% of base stake (50 USDT)
         - High confidence (>0.8): 120% of base stake (60 USDT)
         """
-        dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-        last_candle = dataframe.iloc[-1].squeeze()
-        
-        # Get AI confidence score (prediction mean)
-        ai_confidence = last_candle.get('&s-up_or_down_mean', 0.5)
+        # Get AI confidence score (prediction mean) of the signal candle
+        ai_confidence = self._candle_rows_for(pair).get(pair, '&s-up_or_down_mean', current_time, 0.5)
         
         # Scale stake based on confidence
         if ai_confidence > 0.8:
@@ -208,6 +237,134 @@ class FreqAIStrategy(IStrategy):
     # Market +63.68%, shorts caused -4.73% loss
     can_short = True
 
+    def bot_start(self, **kwargs) -> None:
+        """
+        Kernel backend cho các vòng lặp tuần tự (candle streak, OB ffill, swings, trend scanning).
+        feature_flags.numba_kernels = false → luôn dùng NumPy (vd: debug / so sánh tốc độ).
+        
+        Dtype policy của features: feature_flags.compact_dtypes.
+        Số threads cho feature DAG: feature_flags.feature_dag_threads.
+        Số processes tính trước expand_basic: feature_flags.parallel_features.
+        Profiling từng nhóm feature: feature_flags.feature_profiling.
+        Fear & Greed: tải / cập nhật lịch sử 1 lần ở đây (blocking), sau đó chỉ refresh nền.
+        """
+        feature_flags = self.config.get('freqai', {}).get('feature_flags', {})
+        Kernels.set_backend('auto' if feature_flags.get('numba_kernels', True) else 'numpy')
+        
+        # Dtype cho cột `%-` do các modules sinh ra (feature_flags.compact_dtypes)
+        DtypePolicy.set_policy(DtypePolicy.from_flags(feature_flags))
+        
+        # Nhóm _add_* độc lập của FeatureEngineering chạy song song (TA-Lib / NumPy nhả GIL)
+        FeatureDAG.set_workers(FeatureDAG.from_flags(feature_flags))
+        
+        # expand_basic của (pair | corr pairs) × include_timeframes tính trước trên process pool
+        workers = ParallelFeatures.from_flags(feature_flags)
+        if self._parallel_features is not None:
+            self._parallel_features.shutdown()
+        self._parallel_features = ParallelFeatures(self.config, workers=workers) if workers else None
+        
+        # Wall / CPU / bytes của mọi _add_* / _calc_* / add_all_* → user_data/logs/feature_profile.jsonl
+        self._feature_profiler = FeatureProfiler.from_flags(feature_flags)
+        
+        # feature_flags.fear_greed_offline: chỉ dùng user_data/data/fear_greed.csv (không gọi API)
+        if feature_flags.get('data_enhancement', True):
+            provider = FearGreedProvider.configure(offline=feature_flags.get('fear_greed_offline', False))
+            if provider.is_stale():
+                provider.refresh(blocking=True)
+
+    # Process pool + kết quả tính trước (feature_flags.parallel_features, không dùng cho live/dry_run)
+    _parallel_features: Optional[ParallelFeatures] = None
+
+    def _precompute_features(self, metadata: dict) -> None:
+        """
+        Fan-out expand_basic của pair + corr pairs × include_timeframes ra process pool
+        trước freqai.start. expand_basic lấy lại qua take() (OHLCV phải khớp).
+        
+        Corr pairs (BTC) được giữ lại cho các pair sau → chỉ tính 1 lần.
+        """
+        if (self._parallel_features is None or not self.dp
+                or self.dp.runmode.value in ('live', 'dry_run')):
+            return
+        feature_parameters = self.config.get('freqai', {}).get('feature_parameters', {})
+        corr_pairs = feature_parameters.get('include_corr_pairlist', [])
+        pairs = [metadata['pair']] + [p for p in corr_pairs if p != metadata['pair']]
+        jobs = []
+        for timeframe in feature_parameters.get('include_timeframes', [self.timeframe]):
+            for pair in pairs:
+                dataframe = self.dp.get_pair_dataframe(pair, timeframe)
+                if dataframe is not None and len(dataframe):
+                    jobs.append(FeatureJob(pair, timeframe, dataframe))
+        self._parallel_features.precompute(jobs, keep_pairs=corr_pairs)
+
+    # Incremental feature state (live/dry_run, feature_flags.incremental_features)
+    _incremental_engine: Optional[IncrementalFeatureEngine] = None
+    _incremental_patterns: Optional[IncrementalPatternDetector] = None
+
+    # Primitive cache của frame đang xử lý (feature_flags.indicator_cache)
+    _indicator_cache: Optional[IndicatorCache] = None
+
+    def _indicator_scope(self, dataframe: DataFrame):
+        """
+        Context dùng chung primitives (ADX/ATR/BBANDS/rolling...) cho mọi module
+        tính trên cùng frame OHLCV: expand_all (mỗi period) → expand_basic → regime.
+        
+        Chỉ giữ 1 cache (frame gần nhất) → RAM không tăng theo số pair/timeframe.
+        """
+        if not self.config.get('freqai', {}).get('feature_flags', {}).get('indicator_cache', False):
+            return nullcontext()
+        
+        cache = self._indicator_cache
+        if cache is None or not cache.matches(dataframe):
+            if cache is not None:
+                logger.debug(f"Indicator cache released: {cache.stats()}")
+            cache = IndicatorCache(dataframe)
+            self._indicator_cache = cache
+        return cache.activate()
+
+    # On-disk feature cache (feature_flags.feature_store, không dùng cho live/dry_run)
+    _feature_store: Optional[FeatureStore] = None
+
+    def _feature_store_scope(self, metadata: dict):
+        """
+        Context đọc/ghi FeatureStore cho FeatureEngineering, SMC, Wave, ChartPatterns.
+        
+        Live/dry_run: mỗi nến mới đổi data hash → luôn miss + ghi đĩa → tắt.
+        """
+        feature_flags = self.config.get('freqai', {}).get('feature_flags', {})
+        if (not feature_flags.get('feature_store', False)
+                or (self.dp and self.dp.runmode.value in ('live', 'dry_run'))):
+            return nullcontext()
+        
+        if self._feature_store is None:
+            self._feature_store = FeatureStore()
+        return self._feature_store.activate(
+            metadata.get('pair', ''), metadata.get('tf', self.timeframe), self.config
+        )
+
+    # Profiler từng nhóm feature (feature_flags.feature_profiling)
+    _feature_profiler: Optional[FeatureProfiler] = None
+
+    def _profile_scope(self, metadata: dict):
+        """Context đo các nhóm feature của (pair, tf) - nullcontext nếu tắt (không overhead)"""
+        if self._feature_profiler is None:
+            return nullcontext()
+        return self._feature_profiler.activate(metadata.get('pair', ''), metadata.get('tf', self.timeframe))
+
+    def _signal_matrix(self, dataframe: DataFrame, metadata: dict) -> Optional[SignalMatrix]:
+        """
+        SignalMatrix cho populate_entry_trend / populate_exit_trend (feature_flags.signal_matrix).
+        
+        Chỉ backtest/hyperopt: frame giữ nguyên qua các epoch → dựng 1 lần, mỗi epoch chỉ
+        áp lại thresholds. Live/dry_run (frame đổi mỗi nến) hoặc thiếu prediction → None.
+        """
+        flags = self.config.get('freqai', {}).get('feature_flags', {})
+        if (not flags.get('signal_matrix', False)
+                or not self.config['freqai']['enabled']
+                or '&-price_change_pct' not in dataframe.columns
+                or (self.dp and self.dp.runmode.value in ('live', 'dry_run'))):
+            return None
+        return SignalMatrixCache.get(metadata.get('pair', ''), dataframe, flags)
+
     def detect_market_regime(self, dataframe: DataFrame) -> DataFrame:
         """
         Classify market regime: TREND, SIDEWAY, or VOLATILE
@@ -219,11 +376,11 @@ class FreqAIStrategy(IStrategy):
         """
         # Ensure ADX is calculated (using talib - uppercase function names)
         if 'adx' not in dataframe.columns:
-            dataframe['adx'] = ta.ADX(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+            dataframe['adx'] = IndicatorCache.talib(dataframe, 'ADX', 'high', 'low', 'close', timeperiod=14)
         
         # Ensure ATR is calculated
         if 'atr' not in dataframe.columns:
-            dataframe['atr'] = ta.ATR(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+            dataframe['atr'] = IndicatorCache.talib(dataframe, 'ATR', 'high', 'low', 'close', timeperiod=14)
         
         dataframe['atr_pct'] = dataframe['atr'] / dataframe['close']
         
@@ -237,7 +394,8 @@ class FreqAIStrategy(IStrategy):
             (dataframe['adx'] < 20) & (dataframe['bb_width'] < 0.02),  # Sideway/consolidation
         ]
         choices = ['TREND', 'SIDEWAY']
-        dataframe['market_regime'] = np.select(conditions, choices, default='VOLATILE')
+        # Dtype policy 'compact' → category (int8 codes), so sánh == 'TREND' vẫn như cũ
+        dataframe['market_regime'] = DtypePolicy.regime(np.select(conditions, choices, default='VOLATILE'))
         
         return dataframe
 
@@ -250,17 +408,24 @@ class FreqAIStrategy(IStrategy):
         """
         # Calculate Bollinger Bands for market_regime detection (needed before detect_market_regime)
         # ta.BBANDS returns tuple: (upperband, middleband, lowerband)
-        bb_upper, bb_middle, bb_lower = ta.BBANDS(dataframe['close'], timeperiod=20, nbdevup=2.0, nbdevdn=2.0)
+        with self._indicator_scope(dataframe):
+            bb_upper, bb_middle, bb_lower = IndicatorCache.talib(
+                dataframe, 'BBANDS', 'close', timeperiod=20, nbdevup=2.0, nbdevdn=2.0
+            )
         dataframe['bb_upperband'] = bb_upper
         dataframe['bb_lowerband'] = bb_lower
         dataframe['bb_middleband'] = bb_middle
         
+        # feature_flags.parallel_features: expand_basic của mọi (pair, tf) tính song song trước
+        self._precompute_features(metadata)
+        
         # This is THE critical line that triggers FreqAI training!
         # It calls feature_engineering_* methods and trains/predicts
         dataframe = self.freqai.start(dataframe, metadata, self)
         
         # Add market_regime for entry/exit decisions (after FreqAI processing)
-        dataframe = self.detect_market_regime(dataframe)
+        with self._indicator_scope(dataframe):
+            dataframe = self.detect_market_regime(dataframe)
         
         return dataframe
 
@@ -283,37 +448,49 @@ class FreqAIStrategy(IStrategy):
         - Wave Indicators → Fibonacci levels cần nhìn từ HTF
         """
         
-        # ==== Chart Pattern Recognition (5m only) ====
-        # Nhận dạng các mô hình giá: Double Top/Bottom, Head & Shoulders, Wedge, Triangle, Flag
-        # Mang tính chất cục bộ - không cần expand cho multi-TF
-        # Can be disabled via feature_flags.chart_patterns
-        if self.config.get('freqai', {}).get('feature_flags', {}).get('chart_patterns', True):
-            dataframe = ChartPatterns.add_all_patterns(dataframe)
+        with self._indicator_scope(dataframe), self._feature_store_scope(metadata), \
+                self._profile_scope(metadata):
+            # ==== Chart Pattern Recognition (5m only) ====
+            # Nhận dạng các mô hình giá: Double Top/Bottom, Head & Shoulders, Wedge, Triangle, Flag
+            # Mang tính chất cục bộ - không cần expand cho multi-TF
+            # Can be disabled via feature_flags.chart_patterns
+            # Live/dry_run + feature_flags.incremental_features: swing / pattern state theo pair,
+            # mỗi nến chỉ xác nhận swing mới + patterns nó hoàn tất (fallback batch khi có gap)
+            feature_flags = self.config.get('freqai', {}).get('feature_flags', {})
+            if feature_flags.get('chart_patterns', True):
+                full_history = feature_flags.get('chart_patterns_full_history', False)
+                if (feature_flags.get('incremental_features', False)
+                        and self.dp and self.dp.runmode.value in ('live', 'dry_run')):
+                    if self._incremental_patterns is None:
+                        self._incremental_patterns = IncrementalPatternDetector()
+                    dataframe = self._incremental_patterns.add_all_patterns(dataframe, metadata, full_history)
+                else:
+                    dataframe = ChartPatterns.add_all_patterns(dataframe, full_history=full_history)
         
-        # ==== Data Enhancement (5m only) ====
-        # Fear & Greed Index, Volume Imbalance, Funding Proxy
-        # API-based features, không cần đa khung
-        # Can be disabled via feature_flags.data_enhancement
-        if self.config.get('freqai', {}).get('feature_flags', {}).get('data_enhancement', True):
-            dataframe = DataEnhancement.add_all_features(dataframe, period=period)
+            # ==== Data Enhancement (5m only) ====
+            # Fear & Greed Index, Volume Imbalance, Funding Proxy
+            # API-based features, không cần đa khung
+            # Can be disabled via feature_flags.data_enhancement
+            if self.config.get('freqai', {}).get('feature_flags', {}).get('data_enhancement', True):
+                dataframe = DataEnhancement.add_all_features(dataframe, period=period)
 
-        # ==== Legacy indicators (cho Market Regime) ====
-        # Using talib (uppercase function names)
-        dataframe['mfi'] = ta.MFI(dataframe['high'], dataframe['low'], dataframe['close'], dataframe['volume'], timeperiod=14)
-        dataframe['adx'] = ta.ADX(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
-        dataframe['rsi'] = ta.RSI(dataframe['close'], timeperiod=14)
-        
-        # Bollinger Bands (cần cho market regime detection)
-        dataframe['bb_upperband'], dataframe['bb_middleband'], dataframe['bb_lowerband'] = ta.BBANDS(
-            dataframe['close'], timeperiod=20, nbdevup=2.0, nbdevdn=2.0
-        )
+            # ==== Legacy indicators (cho Market Regime) ====
+            # Using talib (uppercase function names)
+            dataframe['mfi'] = IndicatorCache.talib(dataframe, 'MFI', 'high', 'low', 'close', 'volume', timeperiod=14)
+            dataframe['adx'] = IndicatorCache.talib(dataframe, 'ADX', 'high', 'low', 'close', timeperiod=14)
+            dataframe['rsi'] = IndicatorCache.talib(dataframe, 'RSI', 'close', timeperiod=14)
+        
+            # Bollinger Bands (cần cho market regime detection)
+            dataframe['bb_upperband'], dataframe['bb_middleband'], dataframe['bb_lowerband'] = IndicatorCache.talib(
+                dataframe, 'BBANDS', 'close', timeperiod=20, nbdevup=2.0, nbdevdn=2.0
+            )
         
-        dataframe["bb_width"] = (
-            dataframe["bb_upperband"] - dataframe["bb_lowerband"]
-        ) / dataframe["bb_middleband"]
+            dataframe["bb_width"] = (
+                dataframe["bb_upperband"] - dataframe["bb_lowerband"]
+            ) / dataframe["bb_middleband"]
         
-        # ==== Market Regime Detection (cuối cùng) ====
-        dataframe = self.detect_market_regime(dataframe)
+            # ==== Market Regime Detection (cuối cùng) ====
+            dataframe = self.detect_market_regime(dataframe)
 
         return dataframe
 
@@ -344,25 +521,51 @@ class FreqAIStrategy(IStrategy):
         VÀ xuất hiện mẫu nến đảo chiều ở khung 5m (từ expand_all)
         → Vào lệnh Mua"
         """
-        # ==== CORE FEATURE ENGINEERING ====
-        # Tất cả features sẽ được expand cho 5m, 15m, 1h, 4h
-        # Pass config to enable feature_flags checks (e.g., vsa_indicators)
-        dataframe = FeatureEngineering.add_all_features(dataframe, config=self.config)
-        
-        # ==== SMC INDICATORS (Multi-TF) ====
-        # Order Blocks, FVG, Structure Direction, Liquidity Zones
-        # Order Block ở 4H có giá trị gấp 10 lần ở 5m
-        # Can be disabled via feature_flags.smc_indicators
-        if self.config.get('freqai', {}).get('feature_flags', {}).get('smc_indicators', True):
-            dataframe = SMCIndicators.add_all_indicators(dataframe)
-        
-        # ==== WAVE INDICATORS (Multi-TF) ====
-        # Fibonacci Retracement/Extension, Awesome Oscillator, Wave Structure
-        # Fibo levels từ swing 4H là key levels cho toàn bộ price action
-        # Can be disabled via feature_flags.wave_indicators
-        if self.config.get('freqai', {}).get('feature_flags', {}).get('wave_indicators', True):
-            dataframe = WaveIndicators.add_all_features(dataframe)
+        # feature_flags.parallel_features: đã tính trước trên process pool (cùng OHLCV) → dùng lại
+        if self._parallel_features is not None:
+            precomputed = self._parallel_features.take(dataframe, metadata.get('pair', ''), metadata.get('tf', self.timeframe))
+            if precomputed is not None:
+                return precomputed
+        
+        # feature_flags.feature_pruning: allowlist của identifier (models/<identifier>/feature_allowlist.json)
+        # → bỏ qua nhóm _add_* / _calc_* mà model không dùng, cả train lẫn live
+        with self._indicator_scope(dataframe), self._feature_store_scope(metadata), \
+                FeaturePruning.scope(self.config), self._profile_scope(metadata):
+            # ==== CORE FEATURE ENGINEERING ====
+            # Tất cả features sẽ được expand cho 5m, 15m, 1h, 4h
+            # Pass config to enable feature_flags checks (e.g., vsa_indicators)
+            # Live/dry_run + feature_flags.incremental_features: chỉ tính nến mới từ state
+            # (O(1) mỗi nến), tự fallback batch khi có gap / nến bị sửa
+            feature_flags = self.config.get('freqai', {}).get('feature_flags', {})
+            if (feature_flags.get('incremental_features', False)
+                    and self.dp and self.dp.runmode.value in ('live', 'dry_run')):
+                if self._incremental_engine is None:
+                    self._incremental_engine = IncrementalFeatureEngine()
+                dataframe = self._incremental_engine.add_all_features(dataframe, metadata, config=self.config)
+            else:
+                dataframe = FeatureEngineering.add_all_features(dataframe, config=self.config)
         
+            # ==== SMC INDICATORS (Multi-TF) ====
+            # Order Blocks, FVG, Structure Direction, Liquidity Zones
+            # Order Block ở 4H có giá trị gấp 10 lần ở 5m
+            # Can be disabled via feature_flags.smc_indicators
+            if self.config.get('freqai', {}).get('feature_flags', {}).get('smc_indicators', True):
+                dataframe = SMCIndicators.add_all_indicators(dataframe)
+        
+            # ==== WAVE INDICATORS (Multi-TF) ====
+            # Fibonacci Retracement/Extension, Awesome Oscillator, Wave Structure
+            # Fibo levels từ swing 4H là key levels cho toàn bộ price action
+            # Can be disabled via feature_flags.wave_indicators
+            if self.config.get('freqai', {}).get('feature_flags', {}).get('wave_indicators', True):
+                dataframe = WaveIndicators.add_all_features(dataframe)
+        
+            # ==== FUNDING / MARK (Multi-TF) ====
+            # Funding rate + mark premium thật từ file 8h local (asof theo thời điểm đóng nến)
+            # Opt-in via feature_flags.funding_features (proxy trong DataEnhancement vẫn giữ)
+            if self.config.get('freqai', {}).get('feature_flags', {}).get('funding_features', False):
+                dataframe = FundingFeatures.add_all_features(
+                    dataframe, metadata.get('pair', ''), metadata.get('tf', self.timeframe), self.config)
+
         return dataframe
 
     def feature_engineering_standard(self, dataframe: DataFrame, metadata: dict, **kwargs) -> DataFrame:
@@ -380,38 +583,59 @@ class FreqAIStrategy(IStrategy):
         Required function to set the targets for the model.
         All targets must be prepended with `&` to be recognized by the FreqAI internals.
         
-        Two labeling methods (MUTUALLY EXCLUSIVE):
+        Three labeling methods (MUTUALLY EXCLUSIVE):
         1. regression_labels: % price change in next 20 candles
         2. trend_scanning: t-statistics based trend detection (statistically significant trends)
+           + trend_scanning_horizons: scan nhiều horizons, giữ horizon có |t| lớn nhất
+        3. triple_barrier_labels: profit (stake) lúc thoát theo barrier chạm đầu tiên, long + short
+           (custom_stoploss ATR + trailing, minimal_roi, vertical = label_period_candles)
+        
+        cusum_sampling: chỉ giữ label ở nến CUSUM event (áp dụng cho cả 3 methods)
         """
         # Get flags
         flags = self.config.get('freqai', {}).get('feature_flags', {})
         use_trend_scanning = flags.get('trend_scanning', False)
         use_regression = flags.get('regression_labels', True)
+        use_triple_barrier = flags.get('triple_barrier_labels', False)
         
         # Validate: they are mutually exclusive
-        if use_trend_scanning and use_regression:
+        methods = [name for name, enabled in (('trend_scanning', use_trend_scanning),
+                                              ('regression_labels', use_regression),
+                                              ('triple_barrier_labels', use_triple_barrier)) if enabled]
+        if len(methods) > 1:
             raise ValueError(
-                "CONFLICT: 'trend_scanning' và 'regression_labels' không thể cùng True! "
-                "Hãy chọn 1 trong 2 trong config.json → freqai.feature_flags"
+                f"CONFLICT: {', '.join(repr(m) for m in methods)} không thể cùng True! "
+                "Hãy chọn 1 trong 3 trong config.json → freqai.feature_flags"
             )
         
-        if not use_trend_scanning and not use_regression:
+        if not methods:
             raise ValueError(
-                "ERROR: Phải enable ít nhất 1 trong 'trend_scanning' hoặc 'regression_labels'! "
+                "ERROR: Phải enable 1 trong 'trend_scanning', 'regression_labels' hoặc 'triple_barrier_labels'! "
                 "Không có labeling method nào được chọn."
             )
         
-        if use_trend_scanning:
+        if use_triple_barrier:
+            # Triple Barrier: cùng stoploss / trailing / ROI với lệnh thật
+            logger.info("Using Triple Barrier labeling method")
+            horizon = self.config.get('freqai', {}).get('feature_parameters', {}).get('label_period_candles', 20)
+            dataframe = self._triple_barrier_labels(dataframe, horizon=horizon)
+        elif use_trend_scanning:
             # Trend Scanning: Use rolling linear regression with t-statistics
             # to detect statistically significant trends
             logger.info("Using Trend Scanning labeling method")
-            dataframe = self._trend_scanning_labels(dataframe, window=20, t_threshold=2.0)
+            dataframe = self._trend_scanning_labels(
+                dataframe, window=20, t_threshold=2.0, horizons=Labeling.horizons_from_flags(flags)
+            )
         else:
             # Regression: Simple % price change prediction
             logger.info("Using Regression labeling method")
             dataframe = self._regression_labels(dataframe, horizon=20)
         
+        # CUSUM event sampling: label NaN ngoài events → FreqAI train trên ít rows hơn
+        multiplier = EventSampling.multiplier_from_flags(flags)
+        if multiplier is not None:
+            dataframe = EventSampling.apply(dataframe, multiplier, pair=metadata.get('pair', ''))
+        
         return dataframe
     
     def _regression_labels(self, dataframe: DataFrame, horizon: int = 20) -> DataFrame:
@@ -420,7 +644,55 @@ class FreqAIStrategy(IStrategy):
         dataframe["&-price_change_pct"] = (future_close - dataframe["close"]) / dataframe["close"]
         return dataframe
     
-    def _trend_scanning_labels(self, dataframe: DataFrame, window: int = 20, t_threshold: float = 2.0) -> DataFrame:
+    def _triple_barrier_labels(self, dataframe: DataFrame, horizon: int = 20) -> DataFrame:
+        """
+        Triple-barrier labels khớp với cách lệnh thật được đóng, cho cả long và short:
+        - Stop: custom_stoploss (atr_multiplier × ATR so với giá hiện tại, freqtrade kéo theo
+          giá tốt nhất) + trailing p_trail_start / p_trail_offset
+        - Chốt lời: min(2 × stop, minimal_roi theo thời gian trade)
+        - Dọc: `horizon` nến
+        
+        Labels là PROFIT CỦA STAKE (% giá × leverage) - cùng thang với buy/sell_pred_threshold
+        (stop ∈ [-5%, -1%], chốt lời ≤ 6% với mặc định) thay vì % giá (chỉ ±1.5% ở 4x).
+        
+        Returns (NaN ở `horizon` nến cuối → FreqAI bỏ):
+        - &-price_change_pct: profit của lệnh LONG vào tại nến này
+        - &-short_profit_pct: profit của lệnh SHORT vào tại nến này (can_short)
+        """
+        # ATR của custom_stoploss (cột 'atr' chỉ có sau freqai.start)
+        atr = IndicatorCache.talib(dataframe, 'ATR', 'high', 'low', 'close', timeperiod=14)
+        leverage = min(self.max_risk_per_trade / abs(self.stoploss), 20.0)
+        
+        sides = (('long', '&-price_change_pct'), ('short', '&-short_profit_pct'))
+        for side, column in sides if self.can_short else sides[:1]:
+            returns, _, _ = Labeling.triple_barrier(
+                dataframe['high'].values, dataframe['low'].values, dataframe['close'].values, np.asarray(atr),
+                horizon=horizon,
+                atr_multiplier=self.atr_multiplier.value,
+                stoploss=self.stoploss,
+                max_risk=self.max_risk_per_trade,
+                leverage=leverage,
+                minimal_roi=self.minimal_roi,
+                timeframe_minutes=timeframe_to_seconds(self.timeframe) // 60,
+                trail_start=self.p_trail_start.value,
+                trail_offset=self.p_trail_offset.value,
+                side=side,
+            )
+            dataframe[column] = returns * leverage
+        return dataframe
+    
+    @staticmethod
+    def _short_prediction(dataframe: DataFrame, prediction_col: str) -> pd.Series:
+        """
+        Prediction cho các điều kiện SHORT theo quy ước dấu của prediction_col (âm = short có lợi):
+        -&-short_profit_pct khi có target short riêng (triple barrier), ngược lại prediction_col.
+        """
+        if '&-short_profit_pct' in dataframe.columns:
+            return -dataframe['&-short_profit_pct']
+        return dataframe[prediction_col]
+    
+    def _trend_scanning_labels(self, dataframe: DataFrame, window: int = 20, t_threshold: float = 2.0,
+                               horizons: Optional[tuple] = None) -> DataFrame:
         """
         Trend Scanning labeling using t-statistics.
         
@@ -433,45 +705,23 @@ class FreqAIStrategy(IStrategy):
         Returns:
         - &-price_change_pct: Expected % change (slope * window)
         - Also creates internal &-trend_direction for classification if needed
+        - horizons: trend_horizon = horizon có |t| lớn nhất (window = horizon đó),
+          cột chẩn đoán không có `&` → FreqAI không train thêm regressor cho nó
         """
-        import numpy as np
-        from scipy import stats
-        
-        close_prices = dataframe['close'].values
-        n = len(close_prices)
-        
-        # Initialize arrays
-        trend_slopes = np.zeros(n)
-        trend_t_stats = np.zeros(n)
-        
-        x = np.arange(window)
+        if horizons:
+            # Mọi horizon trong 1 pass từ prefix sums dùng chung (O(n·k))
+            trend_slopes, trend_t_stats, trend_horizons = Labeling.trend_scanning_multi(
+                dataframe['close'].values, horizons=horizons, t_threshold=t_threshold
+            )
+            dataframe["&-price_change_pct"] = trend_slopes
+            dataframe["&-trend_t_stat"] = trend_t_stats
+            dataframe["trend_horizon"] = trend_horizons.astype(float)
+            return dataframe
         
-        for i in range(n - window):
-            y = close_prices[i:i + window]
-            
-            # Linear regression: y = slope * x + intercept
-            slope, intercept, r_value, p_value, std_err = stats.linregress(x, y)
-            
-            # Calculate t-statistic for slope
-            if std_err > 0:
-                t_stat = slope / std_err
-            else:
-                t_stat = 0
-            
-            # Expected % price change = slope * window / current_price
-            current_price = close_prices[i]
-            if current_price > 0:
-                expected_pct_change = (slope * window) / current_price
-            else:
-                expected_pct_change = 0
-            
-            # Apply t-threshold filter: only significant trends
-            if abs(t_stat) >= t_threshold:
-                trend_slopes[i] = expected_pct_change
-            else:
-                trend_slopes[i] = 0  # Not significant = no clear trend
-            
-            trend_t_stats[i] = t_stat
+        # Vectorized closed-form OLS (cùng kết quả với loop scipy.stats.linregress)
+        trend_slopes, trend_t_stats = Labeling.trend_scanning(
+            dataframe['close'].values, window=window, t_threshold=t_threshold
+        )
         
         # Assign to dataframe
         dataframe["&-price_change_pct"] = trend_slopes
@@ -496,7 +746,7 @@ class FreqAIStrategy(IStrategy):
         8. Structure Direction > 0 (Higher Highs)
         
         SHORT CONDITIONS:
-        1. AI Prediction < -threshold 
+        1. AI Prediction < -threshold (triple barrier: &-short_profit_pct > threshold)
         2. Market Regime = TREND
         3. Trend Confluence < 0.5 (bearish alignment)
         4. Momentum Confluence < 0.6 (bearish momentum)
@@ -505,6 +755,16 @@ class FreqAIStrategy(IStrategy):
         7. RSI > 75 (overbought)
         8. Structure Direction < 0 (Lower Lows)
         """
+        # Hyperopt fast path: components tính sẵn, chỉ áp lại thresholds
+        signal_matrix = self._signal_matrix(dataframe, metadata)
+        if signal_matrix is not None:
+            enter_long, enter_short = signal_matrix.entry_masks(
+                self.buy_pred_threshold.value, self.entry_score_threshold.value, self.buy_adx_threshold.value
+            )
+            apply_signal(dataframe, enter_long, 'enter_long')
+            apply_signal(dataframe, enter_short, 'enter_short')
+            return dataframe
+        
         # Debug logging
         logger.info(f"Columns available: {len(dataframe.columns)} columns")
         
@@ -582,7 +842,8 @@ class FreqAIStrategy(IStrategy):
                 use_trend_filter = flags.get('trend_filter', True)
                 
                 # 1. AI Prediction (30% weight) - REQUIRED BASE
-                ai_negative = (dataframe[prediction_col] < -self.buy_pred_threshold.value).astype(float)
+                short_prediction = self._short_prediction(dataframe, prediction_col)
+                ai_negative = (short_prediction < -self.buy_pred_threshold.value).astype(float)
                 
                 # 2. HTF Order Block - Bear (25% weight)
                 htf_ob_bear = np.zeros(len(dataframe))
@@ -665,6 +926,20 @@ class FreqAIStrategy(IStrategy):
         5. RSI oversold (< buy_rsi_low)
         6. SMC: Price at Order Block support / Bullish FVG
         """
+        # Analyzed dataframe mới (atr, predictions đã có) → refresh accessor của callbacks
+        self._candle_rows_for(metadata['pair'], dataframe)
+        
+        # Hyperopt fast path: components tính sẵn, chỉ áp lại thresholds
+        signal_matrix = self._signal_matrix(dataframe, metadata)
+        if signal_matrix is not None:
+            exit_long, exit_short = signal_matrix.exit_masks(
+                self.sell_pred_threshold.value, self.buy_pred_threshold.value,
+                self.sell_rsi_threshold.value, self.buy_rsi_low.value
+            )
+            apply_signal(dataframe, exit_long, 'exit_long')
+            apply_signal(dataframe, exit_short, 'exit_short')
+            return dataframe
+        
         if self.config['freqai']['enabled']:
             # Regression target column (predicts % price change)
             prediction_col = '&-price_change_pct'
@@ -730,7 +1005,7 @@ class FreqAIStrategy(IStrategy):
                 
                 # AI prediction bullish
                 short_exit_prediction = (
-                    (dataframe[prediction_col] > self.buy_pred_threshold.value) &
+                    (self._short_prediction(dataframe, prediction_col) > self.buy_pred_threshold.value) &
                     (dataframe['volume'] > 0)
                 )
                 
@@ -63,7 +63,7 @@ AVAILABLE_FEATURES: Dict[str, Dict[str, Any]] = {
         "category": "labeling",
         "added_in": "v1.0",
         "default": True,
-        "conflicts_with": ["trend_scanning"]
+        "conflicts_with": ["trend_scanning", "triple_barrier_labels"]
     },
     "trend_scanning": {
         "name": "Trend Scanning Labeling",
@@ -71,7 +71,31 @@ AVAILABLE_FEATURES: Dict[str, Dict[str, Any]] = {
         "category": "labeling",
         "added_in": "v1.1",
         "default": False,
-        "conflicts_with": ["regression_labels"]
+        "conflicts_with": ["regression_labels", "triple_barrier_labels"]
+    },
+    "triple_barrier_labels": {
+        "name": "Triple Barrier Labeling",
+        "description": "Targets = profit của stake lúc thoát theo barrier chạm đầu tiên cho long (&-price_change_pct) và short (&-short_profit_pct): stop ATR của custom_stoploss bám giá tốt nhất + trailing, minimal_roi, vertical = label_period_candles (first passage vectorized trên sliding windows)",
+        "category": "labeling",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": ["regression_labels", "trend_scanning"]
+    },
+    "trend_scanning_horizons": {
+        "name": "Multi-horizon Trend Scanning",
+        "description": "Với trend_scanning: scan nhiều horizons (true = 10/15/20/30/40/60 hoặc list) trong 1 pass prefix sums O(n·k), giữ horizon có |t| lớn nhất → &-price_change_pct, &-trend_t_stat (+ cột chẩn đoán trend_horizon, không phải target)",
+        "category": "labeling",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "cusum_sampling": {
+        "name": "CUSUM Event Sampling",
+        "description": "Training chỉ dùng nến event của symmetric CUSUM trên log returns (ngưỡng = multiplier × %-atr_pct), label NaN ở nến khác → FreqAI bỏ. true = 1.0, số = multiplier",
+        "category": "labeling",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
     },
     
     # ==================== ENTRY FILTERS ====================
@@ -125,6 +149,112 @@ AVAILABLE_FEATURES: Dict[str, Dict[str, Any]] = {
         "default": False,
         "conflicts_with": []
     },
+    
+    # ==================== PERFORMANCE ====================
+    "incremental_features": {
+        "name": "Incremental Feature Engine",
+        "description": "Live/dry_run: giữ state EMA/Wilder/OBV + ring buffers theo (pair, tf), chỉ tính nến mới (O(1) mỗi nến). Chart patterns: chuỗi swing + patterns đang sống theo pair, mỗi nến chỉ kiểm tra patterns mà swing mới hoàn tất",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "indicator_cache": {
+        "name": "Shared Indicator Cache",
+        "description": "ADX/ATR/BBANDS/rolling max-min/volume SMA tính 1 lần mỗi frame, dùng chung giữa FeatureEngineering, SMC, Wave, VSA và strategy (kết quả y hệt). Tắt mặc định: benchmark không thấy lợi (0.97x @5k rows, 1.06x @50k rows, make parity-indicator-cache)",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "feature_store": {
+        "name": "On-disk Feature Store",
+        "description": "Backtest/hyperopt/train: đọc features (FE, SMC, Wave, Chart Patterns) từ user_data/feature_store nếu pair/tf/data/flags/code không đổi",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "chart_patterns_full_history": {
+        "name": "Full-history Swing Patterns",
+        "description": "Double top/bottom + H&S đánh dấu trên toàn bộ lịch sử (không chỉ 100 nến cuối), O(n), không lookahead. Cần retrain model",
+        "category": "ml_optimization",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "numba_kernels": {
+        "name": "Numba Kernels",
+        "description": "Candle streak, OB forward-fill, swing extrema, trend scanning chạy bằng Numba JIT nếu đã cài (fallback NumPy), output giống hệt",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": True,
+        "conflicts_with": []
+    },
+    "compact_dtypes": {
+        "name": "Compact Feature Dtypes",
+        "description": "true = cột `%-` float32: training frame FreqAI (3 TF × 2 pairs × 3 shifted) ~1.38 GB thay vì ~2.75 GB. \"compact\" (int8 cho flags, market_regime category) chỉ gọn hơn ở khối `%-` gốc, training frame lại ~1.56 GB vì shift upcast int8 → float64",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "feature_pruning": {
+        "name": "Importance-Driven Feature Pruning",
+        "description": "Dùng models/<identifier>/feature_allowlist.json (build từ feature importances của model đã train) để bỏ qua các nhóm _add_*/_calc_* không dùng tới, cả train lẫn live",
+        "category": "ml_optimization",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "feature_dag_threads": {
+        "name": "Feature DAG Thread Pool",
+        "description": "FeatureEngineering.add_all_features chạy các nhóm _add_* độc lập song song trên thread pool, tôn trọng dependencies (regime ← ATR%, confluence ← EMA/ADX/RSI/volume). true = min(4, CPU) threads hoặc số threads; cùng columns, cùng thứ tự",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "parallel_features": {
+        "name": "Parallel Feature Precompute",
+        "description": "Backtest/train: expand_basic của pair + corr pairs × include_timeframes tính trước trên process pool (spawn, bounded in-flight jobs), FreqAI lấy lại kết quả theo đúng OHLCV. true = CPU - 1 processes hoặc số processes",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "feature_profiling": {
+        "name": "Feature Group Profiling",
+        "description": "Đo wall / CPU time + số cột (và bytes qua tracemalloc khi = \"memory\") của mọi _add_*/_calc_* và add_all_* theo pair/timeframe, ghi định kỳ ra user_data/logs/feature_profile.jsonl. Tắt → gần như không overhead",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "fear_greed_offline": {
+        "name": "Offline Fear & Greed",
+        "description": "Chỉ đọc lịch sử Fear & Greed từ user_data/data/fear_greed.csv (make fear-greed-update), không gọi API alternative.me - backtest/train tái lập được",
+        "category": "data",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "funding_features": {
+        "name": "Funding & Mark Features",
+        "description": "expand_basic: %-funding_rate, %-funding_zscore, %-mark_premium từ <PAIR>-8h-funding_rate/mark.feather local (memory-mapped 1 lần/process, asof bằng searchsorted theo thời điểm đóng nến). Thiếu file → 0",
+        "category": "data",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
+    "signal_matrix": {
+        "name": "Precomputed Signal Matrix",
+        "description": "Backtest/hyperopt: entry/exit components tính 1 lần/frame, mỗi epoch chỉ áp lại thresholds (cùng signals với code gốc)",
+        "category": "performance",
+        "added_in": "v2.1",
+        "default": False,
+        "conflicts_with": []
+    },
 }
 
 # ============================================================
@@ -0,0 +1,341 @@
+"""
+Indicator Benchmark - Micro-benchmark các modules indicators trên OHLCV giả lập
+=============================================================================
+Đo thời gian từng method của FeatureEngineering, SMCIndicators, WaveIndicators,
+VSAIndicators, ChartPatterns, DataEnhancement ở nhiều kích thước (10k / 100k / 1M nến):
+- public: add_* (+ detect_* của ChartPatterns)
+- private: các nhóm _add_* / _calc_* (gọi riêng với dict features đã có sẵn
+  outputs của các nhóm khác → nhóm đọc cross-group như confluence chạy đúng đường)
+
+OHLCV giả lập có seed + các regime trend / volatility điều khiển được
+(mặc định: bull → range → bear → volatile, mỗi regime `segment` nến).
+
+Kết quả lưu JSON (best / median ms mỗi case, commit, versions) để so sánh giữa
+các commit: `--compare <baseline.json>` → exit 1 nếu case nào chậm hơn `--threshold`.
+
+Usage:
+    python -m indicators.benchmark                                   # 10k/100k/1M, mọi module
+    python -m indicators.benchmark --sizes 10000 100000 --modules smc wave
+    python -m indicators.benchmark --filter 'detect_|_calc_order'    # regex trên tên case
+    python -m indicators.benchmark --compare ../benchmarks/indicators-<commit>.json --threshold 0.15
+
+Author: AI Trading System
+"""
+
+import inspect
+import json
+import logging
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_OUTPUT_DIR = STRATEGIES_DIR.parent / "benchmarks"
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+
+# Số lần đo mỗi case theo kích thước (lấy best + median)
+REPEATS = {10_000: 5, 100_000: 3, 1_000_000: 1}
+
+# Chậm hơn baseline > threshold VÀ > MIN_DELTA_MS → regression (bỏ qua nhiễu của case < 1ms)
+DEFAULT_THRESHOLD = 0.15
+MIN_DELTA_MS = 1.0
+
+
+class Regime(NamedTuple):
+    """Drift (log-return trung bình / nến) + volatility (độ lệch chuẩn log-return)"""
+    name: str
+    drift: float
+    volatility: float
+
+
+DEFAULT_REGIMES = (
+    Regime('bull', 3e-4, 0.002),
+    Regime('range', 0.0, 0.001),
+    Regime('bear', -3e-4, 0.002),
+    Regime('volatile', 0.0, 0.006),
+)
+
+
+# ============================================================
+# SYNTHETIC OHLCV
+# ============================================================
+
+def synthetic_ohlcv(rows: int, seed: int = 42, regimes: Sequence[Regime] = DEFAULT_REGIMES,
+                    segment: int = 2000, freq: str = '5min', start_price: float = 40000.0) -> DataFrame:
+    """
+    OHLCV 5m giả lập: các regime lặp lại theo vòng, mỗi regime `segment` nến.
+
+    Volume tăng theo volatility của regime (nến biến động mạnh → volume lớn) để
+    các indicators volume (VSA, MFI, OBV) gặp đủ trường hợp.
+    """
+    rng = np.random.default_rng(seed)
+    regime_index = (np.arange(rows) // max(segment, 1)) % len(regimes)
+    drift = np.array([r.drift for r in regimes])[regime_index]
+    volatility = np.array([r.volatility for r in regimes])[regime_index]
+
+    close = start_price * np.exp(np.cumsum(drift + volatility * rng.standard_normal(rows)))
+    open_ = np.empty(rows)
+    open_[0] = start_price
+    open_[1:] = close[:-1] * (1 + rng.normal(0, volatility[1:] * 0.1))
+    wick = np.abs(rng.normal(0, volatility, (2, rows)))
+    base_volume = rng.lognormal(mean=6.0, sigma=0.5, size=rows)
+    return DataFrame({
+        'date': pd.date_range(start='2024-01-01', periods=rows, freq=freq, tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + wick[0]),
+        'low': np.minimum(open_, close) * (1 - wick[1]),
+        'close': close,
+        'volume': base_volume * (volatility / volatility.min()),
+    })
+
+
+# ============================================================
+# CASES
+# ============================================================
+
+class BenchCase(NamedTuple):
+    """1 method cần đo. `call(frame, features)` - features chỉ dùng cho nhóm private"""
+    name: str
+    module: str
+    call: Callable[[DataFrame, dict], object]
+    private: bool
+
+
+def _modules() -> Dict[str, Tuple[type, Callable[[DataFrame], DataFrame]]]:
+    """key CLI → (class, pipeline đầy đủ dùng để dựng features cho nhóm private)"""
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.data_enhancement import DataEnhancement
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.smc_indicators import SMCIndicators
+    from indicators.vsa_indicators import VSAIndicators
+    from indicators.wave_indicators import WaveIndicators
+
+    return {
+        'feature_engineering': (FeatureEngineering, FeatureEngineering.add_all_features),
+        'smc': (SMCIndicators, SMCIndicators.add_all_indicators),
+        'wave': (WaveIndicators, WaveIndicators.add_all_features),
+        'vsa': (VSAIndicators, VSAIndicators.add_all_indicators),
+        'chart_patterns': (ChartPatterns, ChartPatterns.add_all_patterns),
+        'data_enhancement': (DataEnhancement, DataEnhancement.add_all_features),
+    }
+
+
+def _is_benchmarked(name: str, cls: type) -> bool:
+    if name.startswith(('add_', '_add_', '_calc_')):
+        return True
+    return cls.__name__ == 'ChartPatterns' and name.startswith('detect_')
+
+
+def discover_cases(modules: Optional[Sequence[str]] = None) -> List[BenchCase]:
+    """Mọi add_* / detect_* / _add_* / _calc_* của các modules (thứ tự khai báo)"""
+    cases = []
+    for key, (cls, _) in _modules().items():
+        if modules and key not in modules:
+            continue
+        for name, member in vars(cls).items():
+            if not isinstance(member, staticmethod) or not _is_benchmarked(name, cls):
+                continue
+            func = getattr(cls, name)
+            params = list(inspect.signature(func).parameters)
+            private = 'features' in params
+            cases.append(BenchCase(f"{cls.__name__}.{name}", key, _binder(func, params), private))
+    return cases
+
+
+def _binder(func: Callable, params: List[str]) -> Callable[[DataFrame, dict], object]:
+    """Gọi func với frame (tham số đầu), features, prefix=''; các tham số khác dùng default"""
+    def call(frame: DataFrame, features: dict):
+        kwargs = {}
+        if 'features' in params:
+            kwargs['features'] = features
+        if 'prefix' in params:
+            kwargs['prefix'] = ""
+        return func(frame, **kwargs)
+    return call
+
+
+# ============================================================
+# RUN
+# ============================================================
+
+def _prepare() -> None:
+    """Không gọi API / không cache giữa các lần đo"""
+    from indicators.fear_greed import FearGreedProvider
+    from indicators.feature_dag import FeatureDAG
+
+    # Fear & Greed: chỉ đọc file local (không có → neutral), không request mạng trong lúc đo
+    FearGreedProvider.configure(offline=True)
+    FeatureDAG.set_workers(0)
+
+
+def _base_features(pipeline: Callable[[DataFrame], DataFrame], frame: DataFrame) -> dict:
+    """Cột mới của pipeline đầy đủ → dict features cho nhóm private đọc cross-group"""
+    result = pipeline(frame.copy())
+    return {c: result[c] for c in result.columns if c not in frame.columns}
+
+
+def _time_case(case: BenchCase, frame: DataFrame, features: dict, repeats: int) -> List[float]:
+    timings = []
+    for _ in range(repeats):
+        df = frame.copy()           # add_* ghi in-place → frame mới mỗi lần (không tính giờ)
+        local = dict(features)
+        started = time.perf_counter()
+        case.call(df, local)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def run(sizes: Sequence[int] = DEFAULT_SIZES, modules: Optional[Sequence[str]] = None,
+        pattern: Optional[str] = None, seed: int = 42, repeats: Optional[int] = None) -> dict:
+    """Đo mọi case ở mọi kích thước → dict kết quả (xem save())"""
+    _prepare()
+    cases = discover_cases(modules)
+    if pattern:
+        cases = [c for c in cases if re.search(pattern, c.name)]
+    pipelines = _modules()
+    results: Dict[str, Dict[str, dict]] = {}
+
+    for rows in sizes:
+        frame = synthetic_ohlcv(rows, seed=seed)
+        n = repeats or REPEATS.get(rows, 1)
+        print(f"\n── {rows:,} candles (best of {n}) " + "─" * 30)
+        base: Dict[str, dict] = {}
+        for case in cases:
+            if case.private and case.module not in base:
+                base[case.module] = _base_features(pipelines[case.module][1], frame)
+            try:
+                timings = _time_case(case, frame, base.get(case.module, {}), n)
+            except Exception as e:  # 1 case lỗi không dừng cả suite
+                print(f"  {case.name:<52} ERROR {type(e).__name__}: {e}")
+                results.setdefault(case.name, {})[str(rows)] = {'error': f"{type(e).__name__}: {e}"}
+                continue
+            entry = {'best_ms': min(timings), 'median_ms': statistics.median(timings), 'repeats': n}
+            results.setdefault(case.name, {})[str(rows)] = entry
+            print(f"  {case.name:<52} {entry['best_ms']:10.2f} ms  ({entry['best_ms'] * 1000 / rows:7.2f} µs/candle)")
+
+    return {'meta': _meta(sizes, seed), 'results': results}
+
+
+def _meta(sizes: Sequence[int], seed: int) -> dict:
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.kernels import Kernels
+
+    return {
+        'commit': _git_commit(),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'sizes': list(sizes),
+        'seed': seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'machine': f"{platform.machine()} {platform.processor() or ''}".strip(),
+        'kernels': Kernels.backend(),
+        'dtype_policy': DtypePolicy.policy(),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=STRATEGIES_DIR,
+                                capture_output=True, text=True, timeout=10).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--', 'indicators'], cwd=STRATEGIES_DIR,
+                               capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+    return f"{commit}-dirty" if commit and dirty else (commit or 'unknown')
+
+
+def save(report: dict, path: Optional[Path] = None) -> Path:
+    """Mặc định: user_data/benchmarks/indicators-<commit>.json"""
+    path = path or DEFAULT_OUTPUT_DIR / f"indicators-{report['meta']['commit']}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2))
+    return path
+
+
+# ============================================================
+# COMPARE
+# ============================================================
+
+def compare(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> List[dict]:
+    """
+    So sánh best_ms từng (case, size) có ở cả 2 report.
+
+    Returns:
+        Các dòng {'case', 'rows', 'baseline_ms', 'current_ms', 'change', 'regression'}
+    """
+    rows = []
+    for name, by_size in current['results'].items():
+        for size, entry in by_size.items():
+            old = baseline['results'].get(name, {}).get(size)
+            if not old or 'best_ms' not in old or 'best_ms' not in entry:
+                continue
+            change = entry['best_ms'] / old['best_ms'] - 1 if old['best_ms'] > 0 else 0.0
+            rows.append({
+                'case': name, 'rows': int(size),
+                'baseline_ms': old['best_ms'], 'current_ms': entry['best_ms'], 'change': change,
+                'regression': change > threshold and entry['best_ms'] - old['best_ms'] > MIN_DELTA_MS,
+            })
+    return rows
+
+
+def print_comparison(rows: List[dict], baseline_meta: dict, current_meta: dict, threshold: float) -> int:
+    """In bảng so sánh, trả về số regressions"""
+    print(f"\n📊 {baseline_meta.get('commit', '?')} → {current_meta.get('commit', '?')} "
+          f"(regression: > +{threshold:.0%} and > {MIN_DELTA_MS:g} ms)")
+    for row in sorted(rows, key=lambda r: (r['case'], r['rows'])):
+        flag = "  ❌ REGRESSION" if row['regression'] else ("  ✅" if row['change'] < -threshold else "")
+        print(f"  {row['case']:<52} {row['rows']:>9,} {row['baseline_ms']:10.2f} → "
+              f"{row['current_ms']:10.2f} ms ({row['change']:+6.1%}){flag}")
+    regressions = sum(r['regression'] for r in rows)
+    print(f"\n{'❌' if regressions else '✅'} {regressions} regressions in {len(rows)} comparable cases")
+    return regressions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Indicator micro-benchmarks on synthetic OHLCV")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="Candle counts")
+    parser.add_argument("--modules", nargs="+", choices=sorted(_modules()), help="Modules (default: all)")
+    parser.add_argument("--filter", help="Regex on case name (e.g. 'detect_|_calc_order')")
+    parser.add_argument("--repeats", type=int, help="Override repeats per size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", type=Path, help="JSON path (default: user_data/benchmarks/indicators-<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="Baseline JSON → exit 1 on regression")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Regression threshold (0.15 = +15%%)")
+    parser.add_argument("--list", action="store_true", help="List cases and exit")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+
+    if args.list:
+        for case in discover_cases(args.modules):
+            if not args.filter or re.search(args.filter, case.name):
+                print(f"  {case.module:<18} {'private' if case.private else 'public ':<8} {case.name}")
+        sys.exit(0)
+
+    print("=" * 60)
+    print("INDICATOR BENCHMARK")
+    print("=" * 60)
+    report = run(args.sizes, args.modules, args.filter, args.seed, args.repeats)
+    path = save(report, args.output)
+    print(f"\n💾 {path}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        rows = compare(baseline, report, args.threshold)
+        sys.exit(1 if print_comparison(rows, baseline.get('meta', {}), report['meta'], args.threshold) else 0)
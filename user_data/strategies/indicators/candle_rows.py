@@ -0,0 +1,173 @@
+"""
+Candle Rows - O(1) đọc 1 nến theo thời gian cho các callbacks
+=============================================================
+custom_stoploss / custom_stake_amount gọi get_analyzed_dataframe rồi
+`dataframe.iloc[-1].squeeze()` → dựng Series hàng trăm cột chỉ để đọc `atr`
+hoặc `&s-up_or_down_mean`, cho MỖI trade mở ở MỖI vòng lặp. Backtest còn đọc
+nến cuối cùng của frame thay vì nến tại current_time.
+
+CandleRows giữ theo pair:
+- dates (int64 ns, đã sort) + ma trận float64 CHỈ các cột cần
+- Refresh khi analyzed dataframe đổi (fingerprint: len + nến đầu/cuối + id)
+
+Lookup tại current_time → nến ĐÃ ĐÓNG gần nhất (date <= current_time - timeframe),
+giống nến cuối của analyzed dataframe trong live và không nhìn trước trong backtest:
+- Lưới đều: index = (t - start) // step → O(1)
+- Có gap: np.searchsorted → O(log n)
+
+Usage:
+    rows = CandleRows(('atr', '&s-up_or_down_mean'), timeframe_seconds=300)
+    rows.update(pair, dataframe)                         # populate_exit_trend
+    atr = rows.get(pair, 'atr', current_time, default=0)
+
+Author: AI Trading System
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+
+class PairRows(NamedTuple):
+    """Các cột cần của 1 pair, theo thứ tự nến"""
+    fingerprint: tuple
+    dates: np.ndarray     # int64 ns UTC (date = open time của nến)
+    values: np.ndarray    # float64 (n × len(columns))
+
+
+class CandleRows:
+    """Accessor O(1) theo timestamp trên NumPy arrays của vài cột"""
+
+    def __init__(self, columns: Iterable[str], timeframe_seconds: int):
+        self.columns = tuple(columns)
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self.step = int(timeframe_seconds) * 1_000_000_000
+        self._pairs: Dict[str, PairRows] = {}
+
+    # ============================================================
+    # REFRESH
+    # ============================================================
+
+    @staticmethod
+    def _fingerprint(dataframe: DataFrame) -> tuple:
+        if dataframe is None or dataframe.empty:
+            return (id(dataframe), 0)
+        dates = dataframe['date']
+        return (id(dataframe), len(dataframe), dates.iloc[0], dates.iloc[-1])
+
+    def update(self, pair: str, dataframe: DataFrame) -> None:
+        """Dựng lại arrays của pair nếu analyzed dataframe đã đổi"""
+        fingerprint = self._fingerprint(dataframe)
+        cached = self._pairs.get(pair)
+        if cached is not None and cached.fingerprint == fingerprint:
+            return
+        if dataframe is None or dataframe.empty:
+            self._pairs.pop(pair, None)
+            return
+
+        dates = pd.to_datetime(dataframe['date'], utc=True).dt.tz_convert(None)
+        values = np.full((len(dataframe), len(self.columns)), np.nan)
+        for i, name in enumerate(self.columns):
+            if name in dataframe.columns:
+                values[:, i] = pd.to_numeric(dataframe[name], errors='coerce').to_numpy(dtype='float64')
+        self._pairs[pair] = PairRows(
+            fingerprint=fingerprint,
+            dates=dates.to_numpy(dtype='datetime64[ns]').view('int64'),
+            values=values,
+        )
+
+    def has(self, pair: str) -> bool:
+        return pair in self._pairs
+
+    # ============================================================
+    # LOOKUP
+    # ============================================================
+
+    @staticmethod
+    def _to_ns(current_time: datetime) -> int:
+        if current_time.tzinfo is None:
+            current_time = current_time.replace(tzinfo=timezone.utc)
+        return int(current_time.timestamp() * 1_000_000) * 1000
+
+    def position(self, pair: str, current_time: datetime) -> int:
+        """Index nến đã đóng gần nhất tại current_time (-1 nếu không có)"""
+        rows = self._pairs.get(pair)
+        if rows is None or not len(rows.dates):
+            return -1
+        dates = rows.dates
+        target = self._to_ns(current_time) - self.step
+        if target < dates[0]:
+            return -1
+        i = min((target - dates[0]) // self.step, len(dates) - 1)
+        if dates[i] <= target and (i == len(dates) - 1 or dates[i + 1] > target):
+            return int(i)
+        # Gap trong dữ liệu → lưới không đều
+        return int(np.searchsorted(dates, target, side='right') - 1)
+
+    def get(self, pair: str, column: str, current_time: datetime, default: float = 0.0) -> float:
+        """Giá trị cột tại nến đã đóng gần nhất; default nếu thiếu cột / nến / NaN"""
+        i = self.position(pair, current_time)
+        if i < 0 or column not in self._index:
+            return default
+        value = self._pairs[pair].values[i, self._index[column]]
+        return default if np.isnan(value) else float(value)
+
+    def row(self, pair: str, current_time: datetime) -> Optional[Dict[str, float]]:
+        """Tất cả cột đã đăng ký tại nến đã đóng gần nhất (None nếu không có)"""
+        i = self.position(pair, current_time)
+        if i < 0:
+            return None
+        return dict(zip(self.columns, self._pairs[pair].values[i].tolist()))
+
+
+# ============================================================
+# TEST
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    n = 50_000
+    dates = pd.date_range('2024-01-01', periods=n, freq='5min', tz='UTC')
+    frame = DataFrame({'date': dates, 'atr': np.arange(n, dtype='float64'), 'close': 100.0})
+    frame = frame.drop(index=[100, 101, 102]).reset_index(drop=True)   # gap
+
+    rows = CandleRows(('atr', '&s-up_or_down_mean'), timeframe_seconds=300)
+    rows.update('BTC/USDT:USDT', frame)
+
+    # Nến đã đóng tại 00:12 là nến 00:05 (đóng lúc 00:10)
+    t = datetime(2024, 1, 1, 0, 12, tzinfo=timezone.utc)
+    assert rows.get('BTC/USDT:USDT', 'atr', t) == 1.0
+    # Ngay lúc đóng nến 00:10 → dùng được
+    assert rows.get('BTC/USDT:USDT', 'atr', datetime(2024, 1, 1, 0, 15, tzinfo=timezone.utc)) == 2.0
+    # Trước nến đầu tiên / cột không có → default
+    assert rows.get('BTC/USDT:USDT', 'atr', datetime(2024, 1, 1, 0, 3, tzinfo=timezone.utc), 0) == 0
+    assert rows.get('BTC/USDT:USDT', '&s-up_or_down_mean', t, 0.5) == 0.5
+    # Sau gap (nến 100-102 bị thiếu) → searchsorted
+    after_gap = dates[101].to_pydatetime()
+    assert rows.get('BTC/USDT:USDT', 'atr', after_gap) == 99.0
+    assert rows.get('BTC/USDT:USDT', 'atr', dates[-1].to_pydatetime()) == float(n - 2)
+
+    # Parity với iloc[-1] của frame cắt tới current_time
+    rng = np.random.default_rng(0)
+    for i in rng.integers(1, len(frame), 200):
+        now = frame['date'].iloc[i].to_pydatetime()
+        sliced = frame[frame['date'] <= frame['date'].iloc[i] - pd.Timedelta(minutes=5)]
+        expected = sliced.iloc[-1].squeeze()['atr'] if len(sliced) else 0
+        assert rows.get('BTC/USDT:USDT', 'atr', now) == expected
+
+    started = time.perf_counter()
+    for _ in range(10_000):
+        rows.get('BTC/USDT:USDT', 'atr', t)
+    per_call_accessor = (time.perf_counter() - started) / 10_000 * 1e6
+    wide = pd.concat([frame, DataFrame(np.zeros((len(frame), 300)), columns=[f'%-f{i}' for i in range(300)])], axis=1)
+    started = time.perf_counter()
+    for _ in range(200):
+        wide.iloc[-1].squeeze().get('atr', 0)
+    per_call_iloc = (time.perf_counter() - started) / 200 * 1e6
+    print(f"✅ CandleRows parity OK: {per_call_accessor:.1f} µs/lookup vs iloc[-1].squeeze() {per_call_iloc:.1f} µs (300 cols)")
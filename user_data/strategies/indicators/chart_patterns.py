@@ -22,13 +22,54 @@ Date: 2025-11-30
 import numpy as np
 import pandas as pd
 from pandas import DataFrame
-from typing import Tuple, Optional, List
+from typing import Tuple, Optional, List, NamedTuple
 import logging
 from scipy.signal import argrelextrema
 
+try:
+    from indicators.feature_store import FeatureStore
+    from indicators.kernels import Kernels
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .feature_store import FeatureStore
+    from .kernels import Kernels
+    from .dtype_policy import DtypePolicy
+    from .feature_profiler import FeatureProfiler
+
 logger = logging.getLogger(__name__)
 
 
+class SwingEvents(NamedTuple):
+    """
+    Swing points dạng arrays (tính 1 lần / frame, dùng chung cho các detectors).
+    
+    *_idx: vị trí (positional) của nến XÁC NHẬN swing = extrema + order → không lookahead
+    *_price: giá high/low tại extrema
+    """
+    high_idx: np.ndarray
+    high_price: np.ndarray
+    low_idx: np.ndarray
+    low_price: np.ndarray
+    
+    @classmethod
+    def from_columns(cls, dataframe: DataFrame) -> 'SwingEvents':
+        """Đọc lại từ cột swing_high / swing_low (output của find_swing_points)"""
+        swing_high = dataframe['swing_high'].to_numpy(dtype=float)
+        swing_low = dataframe['swing_low'].to_numpy(dtype=float)
+        high_idx = np.flatnonzero(swing_high > 0)
+        low_idx = np.flatnonzero(swing_low > 0)
+        return cls(high_idx, swing_high[high_idx], low_idx, swing_low[low_idx])
+    
+    def recent(self, n: int, lookback: int) -> 'SwingEvents':
+        """Swings trong `lookback` nến cuối, index tương đối so với đầu window (như tail(lookback))"""
+        start = max(n - lookback, 0)
+        high_mask = self.high_idx >= start
+        low_mask = self.low_idx >= start
+        return SwingEvents(self.high_idx[high_mask] - start, self.high_price[high_mask],
+                           self.low_idx[low_mask] - start, self.low_price[low_mask])
+
+
 class ChartPatterns:
     """
     Class chứa các methods nhận dạng Chart Patterns.
@@ -55,31 +96,47 @@ class ChartPatterns:
         Returns:
             DataFrame với swing_high và swing_low columns
         """
-        # Sử dụng scipy để tìm local extrema
-        # Note: Shift để tránh lookahead bias (chỉ xác nhận khi có đủ dữ liệu sau)
+        swings = ChartPatterns.swing_events(dataframe, order)
         
-        # Find local maxima (swing highs)
-        highs = dataframe['high'].values
-        swing_high_idx = argrelextrema(highs, np.greater_equal, order=order)[0]
+        # Single vectorized write (giá trị tại nến xác nhận = extrema + order)
+        n = len(dataframe)
+        swing_high = np.zeros(n)
+        swing_low = np.zeros(n)
+        swing_high[swings.high_idx] = swings.high_price
+        swing_low[swings.low_idx] = swings.low_price
+        dataframe['swing_high'] = swing_high
+        dataframe['swing_low'] = swing_low
         
-        # Find local minima (swing lows)
-        lows = dataframe['low'].values
-        swing_low_idx = argrelextrema(lows, np.less_equal, order=order)[0]
+        return dataframe
+    
+    @staticmethod
+    def swing_events(dataframe: DataFrame, order: int = 5) -> SwingEvents:
+        """
+        Tìm swing highs/lows → SwingEvents (arrays).
         
-        # Create columns
-        dataframe['swing_high'] = 0.0
-        dataframe['swing_low'] = 0.0
+        Local extrema như scipy argrelextrema (Kernels: Numba / NumPy), rồi shift 'order' nến
+        (chỉ xác nhận khi có đủ dữ liệu sau → tránh lookahead bias).
+        """
+        n = len(dataframe)
+        highs = dataframe['high'].to_numpy(dtype=float)
+        lows = dataframe['low'].to_numpy(dtype=float)
         
-        # Mark swing points (shifted by 'order' to avoid lookahead)
-        for idx in swing_high_idx:
-            if idx + order < len(dataframe):
-                dataframe.loc[dataframe.index[idx + order], 'swing_high'] = highs[idx]
+        high_idx = Kernels.swing_extrema(highs, order, is_high=True)
+        low_idx = Kernels.swing_extrema(lows, order, is_high=False)
         
-        for idx in swing_low_idx:
-            if idx + order < len(dataframe):
-                dataframe.loc[dataframe.index[idx + order], 'swing_low'] = lows[idx]
+        high_idx = high_idx[high_idx + order < n]
+        low_idx = low_idx[low_idx + order < n]
         
-        return dataframe
+        return SwingEvents(high_idx + order, highs[high_idx], low_idx + order, lows[low_idx])
+    
+    @staticmethod
+    def _resolve_swings(dataframe: DataFrame, swings: Optional[SwingEvents]) -> SwingEvents:
+        """SwingEvents truyền vào > cột swing_high/swing_low > tính mới"""
+        if swings is not None:
+            return swings
+        if 'swing_high' in dataframe.columns and 'swing_low' in dataframe.columns:
+            return SwingEvents.from_columns(dataframe)
+        return ChartPatterns.swing_events(dataframe)
     
     @staticmethod
     def get_recent_swings(dataframe: DataFrame, lookback: int = 100) -> Tuple[List, List]:
@@ -89,25 +146,115 @@ class ChartPatterns:
         Returns:
             Tuple of (swing_highs, swing_lows) as list of (index, price) tuples
         """
-        recent = dataframe.tail(lookback)
+        recent = SwingEvents.from_columns(dataframe).recent(len(dataframe), lookback)
+        swing_highs = list(zip(recent.high_idx.tolist(), recent.high_price.tolist()))
+        swing_lows = list(zip(recent.low_idx.tolist(), recent.low_price.tolist()))
+        return swing_highs, swing_lows
+    
+    @staticmethod
+    def _scan_swings(dataframe: DataFrame, swings: Optional[SwingEvents],
+                     lookback: Optional[int]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Swings cho pattern scan + offset để map index về vị trí tuyệt đối.
         
-        swing_highs = []
-        swing_lows = []
+        lookback=None → toàn bộ lịch sử (offset 0).
+        lookback=N → N nến cuối, index tương đối, offset = len - N (mapping legacy).
+        """
+        swings = ChartPatterns._resolve_swings(dataframe, swings)
+        if lookback is None:
+            return (*swings, 0)
+        n = len(dataframe)
+        return (*swings.recent(n, lookback), n - lookback)
+    
+    @staticmethod
+    def _segment_extreme(idx: np.ndarray, price: np.ndarray, left: np.ndarray, right: np.ndarray,
+                         reducer: np.ufunc) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        min/max của price với left < idx < right, cho TẤT CẢ cặp (left, right) trong 1 pass.
         
-        for i, (idx, row) in enumerate(recent.iterrows()):
-            if row['swing_high'] > 0:
-                swing_highs.append((i, row['swing_high']))
-            if row['swing_low'] > 0:
-                swing_lows.append((i, row['swing_low']))
+        searchsorted + ufunc.reduceat → O(S log S) với S = số swings.
         
-        return swing_highs, swing_lows
+        Returns:
+            (has_any, value) - value = NaN khi không có swing nào ở giữa
+        """
+        start = np.searchsorted(idx, left, side='right')
+        stop = np.searchsorted(idx, right, side='left')
+        has_any = start < stop
+        if len(price) == 0:
+            return has_any, np.full(len(left), np.nan)
+        
+        # Sentinel để reduceat chấp nhận stop == len(price); chỉ lấy segment [start, stop)
+        padded = np.append(price, np.nan)
+        values = reducer.reduceat(padded, np.column_stack([start, stop]).ravel())[::2]
+        return has_any, np.where(has_any, values, np.nan)
+    
+    @staticmethod
+    def _mark_patterns(dataframe: DataFrame, rows: np.ndarray, valid: np.ndarray,
+                       values: dict, neckline: Optional[dict] = None) -> None:
+        """Ghi các pattern hợp lệ vào columns (1 vectorized write mỗi column)"""
+        n = len(dataframe)
+        keep = valid & (rows >= 0) & (rows < n)
+        rows = rows[keep]
+        
+        for col, value in values.items():
+            column = dataframe[col].to_numpy(dtype=float, copy=True)
+            column[rows] = value[keep]
+            dataframe[col] = column
+        
+        # Neckline: giá tuyệt đối → tỷ lệ so với close tại nến đánh dấu
+        if neckline:
+            close = dataframe['close'].to_numpy(dtype=float)
+            for col, price in neckline.items():
+                column = dataframe[col].to_numpy(dtype=float, copy=True)
+                column[rows] = price[keep] / close[rows]
+                dataframe[col] = column
+    
+    @staticmethod
+    def rolling_trendlines(dataframe: DataFrame, lookback: int = 50) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Rolling OLS kernel cho Wedge / Triangle (1 pass vectorized).
+        
+        Với mỗi row i >= lookback, window = [i - lookback, i) (KHÔNG gồm nến i):
+        - high_slope: slope OLS của highs (như np.polyfit(x, highs, 1)[0])
+        - low_slope: slope OLS của lows
+        - mean_close: close trung bình của window (cumulative sums)
+        
+        Slope = Σ(x - x̄)·y / Σ(x - x̄)² → correlate với x đã center, tránh
+        cancellation của Σx·y theo index toàn cục (giá BTC ~ 1e5 × 1e5 nến).
+        
+        Returns:
+            (high_slope, low_slope, mean_close) - arrays dài len(dataframe), NaN cho i < lookback
+        """
+        n = len(dataframe)
+        high_slope = np.full(n, np.nan)
+        low_slope = np.full(n, np.nan)
+        mean_close = np.full(n, np.nan)
+        
+        if n <= lookback:
+            return high_slope, low_slope, mean_close
+        
+        x_centered = np.arange(lookback, dtype=float) - (lookback - 1) / 2
+        sxx = x_centered @ x_centered
+        
+        # Window k = [k, k + lookback) → gán cho row k + lookback (bỏ window cuối chứa nến hiện tại)
+        highs = dataframe['high'].to_numpy(dtype=float)
+        lows = dataframe['low'].to_numpy(dtype=float)
+        high_slope[lookback:] = np.correlate(highs, x_centered, mode='valid')[:-1] / sxx
+        low_slope[lookback:] = np.correlate(lows, x_centered, mode='valid')[:-1] / sxx
+        
+        csum = np.concatenate([[0.0], np.cumsum(dataframe['close'].to_numpy(dtype=float))])
+        mean_close[lookback:] = (csum[lookback:-1] - csum[:-lookback - 1]) / lookback
+        
+        return high_slope, low_slope, mean_close
     
     # ============================================================
     # 1. DOUBLE TOP / DOUBLE BOTTOM
     # ============================================================
     
     @staticmethod
-    def detect_double_top(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    def detect_double_top(dataframe: DataFrame, tolerance: float = 0.02,
+                          swings: Optional[SwingEvents] = None,
+                          lookback: Optional[int] = 100) -> DataFrame:
         """
         Phát hiện mô hình Double Top (Đỉnh đôi).
         
@@ -119,6 +266,8 @@ class ChartPatterns:
         Args:
             dataframe: OHLCV DataFrame với swing points
             tolerance: Phần trăm chênh lệch cho phép giữa 2 đỉnh
+            swings: SwingEvents dùng chung (None → đọc từ cột swing_high/swing_low)
+            lookback: Chỉ xét swings trong N nến cuối (legacy = 100), None = toàn bộ lịch sử
             
         Returns:
             DataFrame với double_top features
@@ -131,49 +280,35 @@ class ChartPatterns:
         if n < 50:
             return dataframe
         
-        # Duyệt qua các swing highs
-        swing_highs, swing_lows = ChartPatterns.get_recent_swings(dataframe)
-        
-        if len(swing_highs) < 2 or len(swing_lows) < 1:
+        high_idx, high_price, low_idx, low_price, offset = ChartPatterns._scan_swings(
+            dataframe, swings, lookback
+        )
+        if len(high_idx) < 2 or len(low_idx) < 1:
             return dataframe
         
-        # Tìm 2 đỉnh gần nhất và 1 đáy ở giữa
-        for i in range(1, len(swing_highs)):
-            peak1_idx, peak1_price = swing_highs[i-1]
-            peak2_idx, peak2_price = swing_highs[i]
-            
-            # 2 đỉnh phải gần bằng nhau
-            price_diff = abs(peak1_price - peak2_price) / peak1_price
-            if price_diff > tolerance:
-                continue
-            
-            # Tìm đáy giữa 2 đỉnh
-            middle_lows = [
-                (idx, price) for idx, price in swing_lows
-                if peak1_idx < idx < peak2_idx
-            ]
-            
-            if not middle_lows:
-                continue
-            
-            # Lấy đáy thấp nhất giữa 2 đỉnh (neckline)
-            neckline_idx, neckline_price = min(middle_lows, key=lambda x: x[1])
-            
-            # Tính confidence (dựa trên độ sâu của pattern)
-            pattern_depth = (peak1_price - neckline_price) / peak1_price
-            confidence = min(1.0, pattern_depth * 10)  # Scale 10% depth = 100% confidence
-            
-            # Mark pattern tại vị trí peak2
-            if peak2_idx < len(dataframe):
-                actual_idx = len(dataframe) - 100 + peak2_idx  # Convert relative to absolute
-                if 0 <= actual_idx < len(dataframe):
-                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_top')] = confidence
-                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_top_neckline')] = neckline_price / dataframe.iloc[actual_idx]['close']
+        # Mọi cặp 2 đỉnh liên tiếp: gần bằng nhau + có đáy ở giữa (neckline = đáy thấp nhất)
+        peak1_price, peak2_price = high_price[:-1], high_price[1:]
+        similar = ~(np.abs(peak1_price - peak2_price) / peak1_price > tolerance)
+        has_middle, neckline_price = ChartPatterns._segment_extreme(
+            low_idx, low_price, high_idx[:-1], high_idx[1:], np.minimum
+        )
+        
+        # Confidence theo độ sâu pattern: 10% depth = 100% confidence
+        confidence = np.minimum(1.0, (peak1_price - neckline_price) / peak1_price * 10)
+        
+        # Mark pattern tại nến xác nhận peak2
+        ChartPatterns._mark_patterns(
+            dataframe, high_idx[1:] + offset, similar & has_middle,
+            {'%-double_top': confidence},
+            neckline={'%-double_top_neckline': neckline_price}
+        )
         
         return dataframe
     
     @staticmethod
-    def detect_double_bottom(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    def detect_double_bottom(dataframe: DataFrame, tolerance: float = 0.02,
+                             swings: Optional[SwingEvents] = None,
+                             lookback: Optional[int] = 100) -> DataFrame:
         """
         Phát hiện mô hình Double Bottom (Đáy đôi).
         
@@ -189,37 +324,25 @@ class ChartPatterns:
         if n < 50:
             return dataframe
         
-        swing_highs, swing_lows = ChartPatterns.get_recent_swings(dataframe)
-        
-        if len(swing_lows) < 2 or len(swing_highs) < 1:
+        high_idx, high_price, low_idx, low_price, offset = ChartPatterns._scan_swings(
+            dataframe, swings, lookback
+        )
+        if len(low_idx) < 2 or len(high_idx) < 1:
             return dataframe
         
-        for i in range(1, len(swing_lows)):
-            bottom1_idx, bottom1_price = swing_lows[i-1]
-            bottom2_idx, bottom2_price = swing_lows[i]
-            
-            price_diff = abs(bottom1_price - bottom2_price) / bottom1_price
-            if price_diff > tolerance:
-                continue
-            
-            middle_highs = [
-                (idx, price) for idx, price in swing_highs
-                if bottom1_idx < idx < bottom2_idx
-            ]
-            
-            if not middle_highs:
-                continue
-            
-            neckline_idx, neckline_price = max(middle_highs, key=lambda x: x[1])
-            
-            pattern_depth = (neckline_price - bottom1_price) / bottom1_price
-            confidence = min(1.0, pattern_depth * 10)
-            
-            if bottom2_idx < len(dataframe):
-                actual_idx = len(dataframe) - 100 + bottom2_idx
-                if 0 <= actual_idx < len(dataframe):
-                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_bottom')] = confidence
-                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_bottom_neckline')] = neckline_price / dataframe.iloc[actual_idx]['close']
+        bottom1_price, bottom2_price = low_price[:-1], low_price[1:]
+        similar = ~(np.abs(bottom1_price - bottom2_price) / bottom1_price > tolerance)
+        has_middle, neckline_price = ChartPatterns._segment_extreme(
+            high_idx, high_price, low_idx[:-1], low_idx[1:], np.maximum
+        )
+        
+        confidence = np.minimum(1.0, (neckline_price - bottom1_price) / bottom1_price * 10)
+        
+        ChartPatterns._mark_patterns(
+            dataframe, low_idx[1:] + offset, similar & has_middle,
+            {'%-double_bottom': confidence},
+            neckline={'%-double_bottom_neckline': neckline_price}
+        )
         
         return dataframe
     
@@ -228,7 +351,9 @@ class ChartPatterns:
     # ============================================================
     
     @staticmethod
-    def detect_head_and_shoulders(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    def detect_head_and_shoulders(dataframe: DataFrame, tolerance: float = 0.02,
+                                  swings: Optional[SwingEvents] = None,
+                                  lookback: Optional[int] = 100) -> DataFrame:
         """
         Phát hiện mô hình Head and Shoulders (Vai Đầu Vai).
         
@@ -246,79 +371,54 @@ class ChartPatterns:
         if n < 100:
             return dataframe
         
-        swing_highs, swing_lows = ChartPatterns.get_recent_swings(dataframe)
-        
-        if len(swing_highs) < 3 or len(swing_lows) < 2:
+        high_idx, high_price, low_idx, low_price, offset = ChartPatterns._scan_swings(
+            dataframe, swings, lookback
+        )
+        if len(high_idx) < 3 or len(low_idx) < 2:
             return dataframe
         
-        # Tìm pattern: LS - H - RS
-        for i in range(2, len(swing_highs)):
-            ls_idx, ls_price = swing_highs[i-2]  # Left Shoulder
-            head_idx, head_price = swing_highs[i-1]  # Head
-            rs_idx, rs_price = swing_highs[i]  # Right Shoulder
-            
-            # Head phải cao hơn cả 2 shoulders
-            if not (head_price > ls_price and head_price > rs_price):
-                continue
-            
-            # 2 shoulders phải gần bằng nhau
-            shoulder_diff = abs(ls_price - rs_price) / ls_price
-            if shoulder_diff > tolerance:
-                continue
-            
-            # Tìm 2 đáy (neckline points)
-            left_lows = [(idx, price) for idx, price in swing_lows if ls_idx < idx < head_idx]
-            right_lows = [(idx, price) for idx, price in swing_lows if head_idx < idx < rs_idx]
-            
-            if not left_lows or not right_lows:
-                continue
-            
-            left_neckline = min(left_lows, key=lambda x: x[1])
-            right_neckline = min(right_lows, key=lambda x: x[1])
-            
-            # Neckline slope (có thể nghiêng)
-            neckline_avg = (left_neckline[1] + right_neckline[1]) / 2
-            
-            # Tính confidence
-            head_height = head_price - neckline_avg
-            pattern_quality = head_height / head_price
-            confidence = min(1.0, pattern_quality * 10)
-            
-            if rs_idx < len(dataframe):
-                actual_idx = len(dataframe) - 100 + rs_idx
-                if 0 <= actual_idx < len(dataframe):
-                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-head_shoulders')] = confidence
+        # Mọi bộ 3 đỉnh liên tiếp: LS - H - RS
+        ls_price, head_price, rs_price = high_price[:-2], high_price[1:-1], high_price[2:]
+        is_pattern = (
+            (head_price > ls_price) & (head_price > rs_price) &      # Head cao hơn 2 shoulders
+            ~(np.abs(ls_price - rs_price) / ls_price > tolerance)     # 2 shoulders gần bằng nhau
+        )
+        
+        # Neckline = trung bình 2 đáy thấp nhất (LS→H và H→RS)
+        has_left, left_neckline = ChartPatterns._segment_extreme(
+            low_idx, low_price, high_idx[:-2], high_idx[1:-1], np.minimum
+        )
+        has_right, right_neckline = ChartPatterns._segment_extreme(
+            low_idx, low_price, high_idx[1:-1], high_idx[2:], np.minimum
+        )
+        neckline_avg = (left_neckline + right_neckline) / 2
+        confidence = np.minimum(1.0, (head_price - neckline_avg) / head_price * 10)
+        
+        ChartPatterns._mark_patterns(
+            dataframe, high_idx[2:] + offset, is_pattern & has_left & has_right,
+            {'%-head_shoulders': confidence}
+        )
         
         # Inverse Head and Shoulders (Bullish)
-        if len(swing_lows) >= 3 and len(swing_highs) >= 2:
-            for i in range(2, len(swing_lows)):
-                ls_idx, ls_price = swing_lows[i-2]
-                head_idx, head_price = swing_lows[i-1]
-                rs_idx, rs_price = swing_lows[i]
-                
-                if not (head_price < ls_price and head_price < rs_price):
-                    continue
-                
-                shoulder_diff = abs(ls_price - rs_price) / ls_price
-                if shoulder_diff > tolerance:
-                    continue
-                
-                left_highs = [(idx, price) for idx, price in swing_highs if ls_idx < idx < head_idx]
-                right_highs = [(idx, price) for idx, price in swing_highs if head_idx < idx < rs_idx]
-                
-                if not left_highs or not right_highs:
-                    continue
-                
-                neckline_avg = (max(left_highs, key=lambda x: x[1])[1] + 
-                               max(right_highs, key=lambda x: x[1])[1]) / 2
-                
-                pattern_quality = (neckline_avg - head_price) / neckline_avg
-                confidence = min(1.0, pattern_quality * 10)
-                
-                if rs_idx < len(dataframe):
-                    actual_idx = len(dataframe) - 100 + rs_idx
-                    if 0 <= actual_idx < len(dataframe):
-                        dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-head_shoulders_inv')] = confidence
+        if len(low_idx) >= 3 and len(high_idx) >= 2:
+            ls_price, head_price, rs_price = low_price[:-2], low_price[1:-1], low_price[2:]
+            is_pattern = (
+                (head_price < ls_price) & (head_price < rs_price) &
+                ~(np.abs(ls_price - rs_price) / ls_price > tolerance)
+            )
+            has_left, left_neckline = ChartPatterns._segment_extreme(
+                high_idx, high_price, low_idx[:-2], low_idx[1:-1], np.maximum
+            )
+            has_right, right_neckline = ChartPatterns._segment_extreme(
+                high_idx, high_price, low_idx[1:-1], low_idx[2:], np.maximum
+            )
+            neckline_avg = (left_neckline + right_neckline) / 2
+            confidence = np.minimum(1.0, (neckline_avg - head_price) / neckline_avg * 10)
+            
+            ChartPatterns._mark_patterns(
+                dataframe, low_idx[2:] + offset, is_pattern & has_left & has_right,
+                {'%-head_shoulders_inv': confidence}
+            )
         
         return dataframe
     
@@ -327,14 +427,18 @@ class ChartPatterns:
     # ============================================================
     
     @staticmethod
-    def detect_wedge(dataframe: DataFrame, lookback: int = 50) -> DataFrame:
+    def detect_wedge(dataframe: DataFrame, lookback: int = 50,
+                     trendlines: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> DataFrame:
         """
         Phát hiện mô hình Wedge (Nêm).
         
         Rising Wedge: Higher highs + Higher lows, nhưng converging → Bearish
         Falling Wedge: Lower highs + Lower lows, nhưng converging → Bullish
         
-        Phương pháp: Dùng linear regression trên highs và lows
+        Phương pháp: Dùng linear regression trên highs và lows (rolling_trendlines)
+        
+        Args:
+            trendlines: Output của rolling_trendlines (tái sử dụng giữa wedge/triangle)
         """
         n = len(dataframe)
         dataframe['%-rising_wedge'] = 0.0
@@ -343,33 +447,25 @@ class ChartPatterns:
         if n < lookback + 10:
             return dataframe
         
-        for i in range(lookback, n):
-            window = dataframe.iloc[i-lookback:i]
-            
-            highs = window['high'].values
-            lows = window['low'].values
-            x = np.arange(lookback)
-            
-            # Linear regression cho highs và lows
-            high_slope = np.polyfit(x, highs, 1)[0]
-            low_slope = np.polyfit(x, lows, 1)[0]
-            
-            # Normalize slopes by price
-            avg_price = window['close'].mean()
-            high_slope_pct = high_slope / avg_price
-            low_slope_pct = low_slope / avg_price
-            
+        if trendlines is None:
+            trendlines = ChartPatterns.rolling_trendlines(dataframe, lookback)
+        high_slope, low_slope, mean_close = trendlines
+        
+        # Normalize slopes by price
+        high_slope_pct = high_slope / mean_close
+        low_slope_pct = low_slope / mean_close
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
             # Rising Wedge: Cả high và low đều tăng, low tăng nhanh hơn (converging)
-            if high_slope_pct > 0 and low_slope_pct > 0 and low_slope_pct > high_slope_pct:
-                convergence = (low_slope_pct - high_slope_pct) / high_slope_pct if high_slope_pct != 0 else 0
-                confidence = min(1.0, abs(convergence))
-                dataframe.iloc[i, dataframe.columns.get_loc('%-rising_wedge')] = confidence
+            rising = (high_slope_pct > 0) & (low_slope_pct > 0) & (low_slope_pct > high_slope_pct)
+            rising_conf = np.minimum(1.0, np.abs((low_slope_pct - high_slope_pct) / high_slope_pct))
             
             # Falling Wedge: Cả high và low đều giảm, high giảm nhanh hơn (converging)
-            if high_slope_pct < 0 and low_slope_pct < 0 and high_slope_pct < low_slope_pct:
-                convergence = (low_slope_pct - high_slope_pct) / low_slope_pct if low_slope_pct != 0 else 0
-                confidence = min(1.0, abs(convergence))
-                dataframe.iloc[i, dataframe.columns.get_loc('%-falling_wedge')] = confidence
+            falling = (high_slope_pct < 0) & (low_slope_pct < 0) & (high_slope_pct < low_slope_pct)
+            falling_conf = np.minimum(1.0, np.abs((low_slope_pct - high_slope_pct) / low_slope_pct))
+        
+        dataframe['%-rising_wedge'] = np.where(rising, rising_conf, 0.0)
+        dataframe['%-falling_wedge'] = np.where(falling, falling_conf, 0.0)
         
         return dataframe
     
@@ -378,13 +474,17 @@ class ChartPatterns:
     # ============================================================
     
     @staticmethod
-    def detect_triangle(dataframe: DataFrame, lookback: int = 50) -> DataFrame:
+    def detect_triangle(dataframe: DataFrame, lookback: int = 50,
+                        trendlines: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None) -> DataFrame:
         """
         Phát hiện mô hình Triangle (Tam giác).
         
         Ascending Triangle: Flat top (resistance) + Rising bottom → Bullish
         Descending Triangle: Falling top + Flat bottom (support) → Bearish
         Symmetrical Triangle: Converging equally → Breakout either way
+        
+        Args:
+            trendlines: Output của rolling_trendlines (tái sử dụng giữa wedge/triangle)
         """
         n = len(dataframe)
         dataframe['%-ascending_triangle'] = 0.0
@@ -394,37 +494,31 @@ class ChartPatterns:
         if n < lookback + 10:
             return dataframe
         
-        for i in range(lookback, n):
-            window = dataframe.iloc[i-lookback:i]
-            
-            highs = window['high'].values
-            lows = window['low'].values
-            x = np.arange(lookback)
-            
-            high_slope = np.polyfit(x, highs, 1)[0]
-            low_slope = np.polyfit(x, lows, 1)[0]
-            
-            avg_price = window['close'].mean()
-            high_slope_pct = high_slope / avg_price
-            low_slope_pct = low_slope / avg_price
-            
-            # Thresholds
-            flat_threshold = 0.0001  # Gần như ngang
-            slope_threshold = 0.0005  # Có độ dốc
-            
-            # Ascending Triangle: Flat high, rising low
-            if abs(high_slope_pct) < flat_threshold and low_slope_pct > slope_threshold:
-                dataframe.iloc[i, dataframe.columns.get_loc('%-ascending_triangle')] = min(1.0, low_slope_pct * 1000)
-            
-            # Descending Triangle: Falling high, flat low
-            if high_slope_pct < -slope_threshold and abs(low_slope_pct) < flat_threshold:
-                dataframe.iloc[i, dataframe.columns.get_loc('%-descending_triangle')] = min(1.0, abs(high_slope_pct) * 1000)
-            
-            # Symmetrical Triangle: Both converging towards center
-            if high_slope_pct < 0 and low_slope_pct > 0:
-                convergence = min(abs(high_slope_pct), abs(low_slope_pct)) / max(abs(high_slope_pct), abs(low_slope_pct))
-                if convergence > 0.5:  # Similar slopes
-                    dataframe.iloc[i, dataframe.columns.get_loc('%-symmetrical_triangle')] = convergence
+        if trendlines is None:
+            trendlines = ChartPatterns.rolling_trendlines(dataframe, lookback)
+        high_slope, low_slope, mean_close = trendlines
+        
+        high_slope_pct = high_slope / mean_close
+        low_slope_pct = low_slope / mean_close
+        
+        # Thresholds
+        flat_threshold = 0.0001  # Gần như ngang
+        slope_threshold = 0.0005  # Có độ dốc
+        
+        # Ascending Triangle: Flat high, rising low
+        ascending = (np.abs(high_slope_pct) < flat_threshold) & (low_slope_pct > slope_threshold)
+        dataframe['%-ascending_triangle'] = np.where(ascending, np.minimum(1.0, low_slope_pct * 1000), 0.0)
+        
+        # Descending Triangle: Falling high, flat low
+        descending = (high_slope_pct < -slope_threshold) & (np.abs(low_slope_pct) < flat_threshold)
+        dataframe['%-descending_triangle'] = np.where(descending, np.minimum(1.0, np.abs(high_slope_pct) * 1000), 0.0)
+        
+        # Symmetrical Triangle: Both converging towards center
+        with np.errstate(divide='ignore', invalid='ignore'):
+            abs_high, abs_low = np.abs(high_slope_pct), np.abs(low_slope_pct)
+            convergence = np.minimum(abs_high, abs_low) / np.maximum(abs_high, abs_low)
+        symmetrical = (high_slope_pct < 0) & (low_slope_pct > 0) & (convergence > 0.5)  # Similar slopes
+        dataframe['%-symmetrical_triangle'] = np.where(symmetrical, convergence, 0.0)
         
         return dataframe
     
@@ -441,6 +535,9 @@ class ChartPatterns:
         Bear Flag: Strong downward pole, then small upward/sideways channel
         
         Continuation patterns - expect trend to continue
+        
+        Tại row i: pole = [i - total, i - flag), flag = [i - flag, i) (KHÔNG gồm nến i).
+        Vectorized: shifted close + rolling max/min/mean trên flag window.
         """
         n = len(dataframe)
         dataframe['%-bull_flag'] = 0.0
@@ -450,35 +547,35 @@ class ChartPatterns:
         if n < total_lookback + 10:
             return dataframe
         
-        for i in range(total_lookback, n):
-            # Pole section
-            pole_start = i - total_lookback
-            pole_end = i - flag_lookback
-            pole = dataframe.iloc[pole_start:pole_end]
-            
-            # Flag section
-            flag = dataframe.iloc[pole_end:i]
-            
-            # Pole movement
-            pole_move = (pole['close'].iloc[-1] - pole['close'].iloc[0]) / pole['close'].iloc[0]
-            
-            # Flag movement
-            flag_move = (flag['close'].iloc[-1] - flag['close'].iloc[0]) / flag['close'].iloc[0]
-            flag_range = (flag['high'].max() - flag['low'].min()) / flag['close'].mean()
-            
-            # Bull Flag: Strong up pole, small pullback
-            if pole_move > 0.03:  # Pole up > 3%
-                if flag_move < 0 and abs(flag_move) < pole_move * 0.5:  # Pullback < 50% of pole
-                    if flag_range < pole_move * 0.3:  # Flag tight
-                        confidence = min(1.0, pole_move * 10)
-                        dataframe.iloc[i, dataframe.columns.get_loc('%-bull_flag')] = confidence
-            
-            # Bear Flag: Strong down pole, small rally
-            if pole_move < -0.03:  # Pole down > 3%
-                if flag_move > 0 and flag_move < abs(pole_move) * 0.5:
-                    if flag_range < abs(pole_move) * 0.3:
-                        confidence = min(1.0, abs(pole_move) * 10)
-                        dataframe.iloc[i, dataframe.columns.get_loc('%-bear_flag')] = confidence
+        close = dataframe['close']
+        
+        # Pole movement: close cuối pole vs close đầu pole
+        pole_first = close.shift(total_lookback)
+        pole_move = (close.shift(flag_lookback + 1) - pole_first) / pole_first
+        
+        # Flag movement + range (rolling window kết thúc tại i - 1)
+        flag_first = close.shift(flag_lookback)
+        flag_move = (close.shift(1) - flag_first) / flag_first
+        flag_high = dataframe['high'].rolling(flag_lookback).max().shift(1)
+        flag_low = dataframe['low'].rolling(flag_lookback).min().shift(1)
+        flag_mean = close.rolling(flag_lookback).mean().shift(1)
+        flag_range = (flag_high - flag_low) / flag_mean
+        
+        # Bull Flag: Strong up pole (> 3%), pullback < 50% of pole, flag tight
+        bull = (
+            (pole_move > 0.03) &
+            (flag_move < 0) & (flag_move.abs() < pole_move * 0.5) &
+            (flag_range < pole_move * 0.3)
+        )
+        dataframe['%-bull_flag'] = np.where(bull, np.minimum(1.0, pole_move * 10), 0.0)
+        
+        # Bear Flag: Strong down pole (> 3%), small rally, flag tight
+        bear = (
+            (pole_move < -0.03) &
+            (flag_move > 0) & (flag_move < pole_move.abs() * 0.5) &
+            (flag_range < pole_move.abs() * 0.3)
+        )
+        dataframe['%-bear_flag'] = np.where(bear, np.minimum(1.0, pole_move.abs() * 10), 0.0)
         
         return dataframe
     
@@ -487,7 +584,9 @@ class ChartPatterns:
     # ============================================================
     
     @staticmethod
-    def add_all_patterns(dataframe: DataFrame) -> DataFrame:
+    @FeatureProfiler.profiled
+    @FeatureStore.materialized('chart_patterns')
+    def add_all_patterns(dataframe: DataFrame, full_history: bool = False) -> DataFrame:
         """
         Add ALL chart pattern features to dataframe.
         
@@ -501,21 +600,27 @@ class ChartPatterns:
         
         Args:
             dataframe: OHLCV DataFrame
+            full_history: True → double top/bottom + H&S đánh dấu trên TOÀN BỘ lịch sử
+                (mỗi nến xác nhận pattern, không lookahead). False → chỉ 100 nến cuối (legacy).
             
         Returns:
             DataFrame với tất cả pattern features
         """
         logger.info("Adding Chart Pattern features...")
+        swing_lookback = None if full_history else 100
+        columns_before = set(dataframe.columns)
         
-        # Step 1: Find swing points
+        # Step 1: Find swing points (1 lần, dùng chung cho các detectors)
         dataframe = ChartPatterns.find_swing_points(dataframe)
+        swings = SwingEvents.from_columns(dataframe)
         
         # Step 2: Detect patterns
-        dataframe = ChartPatterns.detect_double_top(dataframe)
-        dataframe = ChartPatterns.detect_double_bottom(dataframe)
-        dataframe = ChartPatterns.detect_head_and_shoulders(dataframe)
-        dataframe = ChartPatterns.detect_wedge(dataframe)
-        dataframe = ChartPatterns.detect_triangle(dataframe)
+        dataframe = ChartPatterns.detect_double_top(dataframe, swings=swings, lookback=swing_lookback)
+        dataframe = ChartPatterns.detect_double_bottom(dataframe, swings=swings, lookback=swing_lookback)
+        dataframe = ChartPatterns.detect_head_and_shoulders(dataframe, swings=swings, lookback=swing_lookback)
+        trendlines = ChartPatterns.rolling_trendlines(dataframe)
+        dataframe = ChartPatterns.detect_wedge(dataframe, trendlines=trendlines)
+        dataframe = ChartPatterns.detect_triangle(dataframe, trendlines=trendlines)
         dataframe = ChartPatterns.detect_flag(dataframe)
         
         # Step 3: Summarize patterns into scores
@@ -527,7 +632,7 @@ class ChartPatterns:
         
         logger.info(f"Added {len(pattern_cols)} chart pattern features")
         
-        return dataframe
+        return DtypePolicy.apply(dataframe, [c for c in dataframe.columns if c not in columns_before])
     
     # ============================================================
     # PATTERN SUMMARIZATION - Meta-features
@@ -599,6 +704,347 @@ class ChartPatterns:
         return dataframe
 
 
+# ============================================================
+# LEGACY REFERENCE - per-row loops gốc, chỉ dùng cho parity test
+# ============================================================
+
+def _legacy_find_swing_points(dataframe: DataFrame, order: int = 5) -> DataFrame:
+    highs = dataframe['high'].values
+    swing_high_idx = argrelextrema(highs, np.greater_equal, order=order)[0]
+
+    lows = dataframe['low'].values
+    swing_low_idx = argrelextrema(lows, np.less_equal, order=order)[0]
+
+    dataframe['swing_high'] = 0.0
+    dataframe['swing_low'] = 0.0
+
+    for idx in swing_high_idx:
+        if idx + order < len(dataframe):
+            dataframe.loc[dataframe.index[idx + order], 'swing_high'] = highs[idx]
+
+    for idx in swing_low_idx:
+        if idx + order < len(dataframe):
+            dataframe.loc[dataframe.index[idx + order], 'swing_low'] = lows[idx]
+
+    return dataframe
+
+
+def _legacy_get_recent_swings(dataframe: DataFrame, lookback: int = 100) -> Tuple[List, List]:
+    recent = dataframe.tail(lookback)
+
+    swing_highs = []
+    swing_lows = []
+
+    for i, (idx, row) in enumerate(recent.iterrows()):
+        if row['swing_high'] > 0:
+            swing_highs.append((i, row['swing_high']))
+        if row['swing_low'] > 0:
+            swing_lows.append((i, row['swing_low']))
+
+    return swing_highs, swing_lows
+
+
+def _legacy_detect_double_top(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    n = len(dataframe)
+    dataframe['%-double_top'] = 0.0
+    dataframe['%-double_top_neckline'] = 0.0
+
+    if n < 50:
+        return dataframe
+
+    swing_highs, swing_lows = _legacy_get_recent_swings(dataframe)
+
+    if len(swing_highs) < 2 or len(swing_lows) < 1:
+        return dataframe
+
+    for i in range(1, len(swing_highs)):
+        peak1_idx, peak1_price = swing_highs[i-1]
+        peak2_idx, peak2_price = swing_highs[i]
+
+        price_diff = abs(peak1_price - peak2_price) / peak1_price
+        if price_diff > tolerance:
+            continue
+
+        middle_lows = [
+            (idx, price) for idx, price in swing_lows
+            if peak1_idx < idx < peak2_idx
+        ]
+
+        if not middle_lows:
+            continue
+
+        neckline_idx, neckline_price = min(middle_lows, key=lambda x: x[1])
+
+        pattern_depth = (peak1_price - neckline_price) / peak1_price
+        confidence = min(1.0, pattern_depth * 10)  # Scale 10% depth = 100% confidence
+
+        if peak2_idx < len(dataframe):
+            actual_idx = len(dataframe) - 100 + peak2_idx  # Convert relative to absolute
+            if 0 <= actual_idx < len(dataframe):
+                dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_top')] = confidence
+                dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_top_neckline')] = neckline_price / dataframe.iloc[actual_idx]['close']
+
+    return dataframe
+
+
+def _legacy_detect_double_bottom(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    n = len(dataframe)
+    dataframe['%-double_bottom'] = 0.0
+    dataframe['%-double_bottom_neckline'] = 0.0
+
+    if n < 50:
+        return dataframe
+
+    swing_highs, swing_lows = _legacy_get_recent_swings(dataframe)
+
+    if len(swing_lows) < 2 or len(swing_highs) < 1:
+        return dataframe
+
+    for i in range(1, len(swing_lows)):
+        bottom1_idx, bottom1_price = swing_lows[i-1]
+        bottom2_idx, bottom2_price = swing_lows[i]
+
+        price_diff = abs(bottom1_price - bottom2_price) / bottom1_price
+        if price_diff > tolerance:
+            continue
+
+        middle_highs = [
+            (idx, price) for idx, price in swing_highs
+            if bottom1_idx < idx < bottom2_idx
+        ]
+
+        if not middle_highs:
+            continue
+
+        neckline_idx, neckline_price = max(middle_highs, key=lambda x: x[1])
+
+        pattern_depth = (neckline_price - bottom1_price) / bottom1_price
+        confidence = min(1.0, pattern_depth * 10)
+
+        if bottom2_idx < len(dataframe):
+            actual_idx = len(dataframe) - 100 + bottom2_idx
+            if 0 <= actual_idx < len(dataframe):
+                dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_bottom')] = confidence
+                dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-double_bottom_neckline')] = neckline_price / dataframe.iloc[actual_idx]['close']
+
+    return dataframe
+
+
+def _legacy_detect_head_and_shoulders(dataframe: DataFrame, tolerance: float = 0.02) -> DataFrame:
+    n = len(dataframe)
+    dataframe['%-head_shoulders'] = 0.0
+    dataframe['%-head_shoulders_inv'] = 0.0  # Inverse (bullish)
+
+    if n < 100:
+        return dataframe
+
+    swing_highs, swing_lows = _legacy_get_recent_swings(dataframe)
+
+    if len(swing_highs) < 3 or len(swing_lows) < 2:
+        return dataframe
+
+    for i in range(2, len(swing_highs)):
+        ls_idx, ls_price = swing_highs[i-2]  # Left Shoulder
+        head_idx, head_price = swing_highs[i-1]  # Head
+        rs_idx, rs_price = swing_highs[i]  # Right Shoulder
+
+        if not (head_price > ls_price and head_price > rs_price):
+            continue
+
+        shoulder_diff = abs(ls_price - rs_price) / ls_price
+        if shoulder_diff > tolerance:
+            continue
+
+        left_lows = [(idx, price) for idx, price in swing_lows if ls_idx < idx < head_idx]
+        right_lows = [(idx, price) for idx, price in swing_lows if head_idx < idx < rs_idx]
+
+        if not left_lows or not right_lows:
+            continue
+
+        left_neckline = min(left_lows, key=lambda x: x[1])
+        right_neckline = min(right_lows, key=lambda x: x[1])
+
+        neckline_avg = (left_neckline[1] + right_neckline[1]) / 2
+
+        head_height = head_price - neckline_avg
+        pattern_quality = head_height / head_price
+        confidence = min(1.0, pattern_quality * 10)
+
+        if rs_idx < len(dataframe):
+            actual_idx = len(dataframe) - 100 + rs_idx
+            if 0 <= actual_idx < len(dataframe):
+                dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-head_shoulders')] = confidence
+
+    if len(swing_lows) >= 3 and len(swing_highs) >= 2:
+        for i in range(2, len(swing_lows)):
+            ls_idx, ls_price = swing_lows[i-2]
+            head_idx, head_price = swing_lows[i-1]
+            rs_idx, rs_price = swing_lows[i]
+
+            if not (head_price < ls_price and head_price < rs_price):
+                continue
+
+            shoulder_diff = abs(ls_price - rs_price) / ls_price
+            if shoulder_diff > tolerance:
+                continue
+
+            left_highs = [(idx, price) for idx, price in swing_highs if ls_idx < idx < head_idx]
+            right_highs = [(idx, price) for idx, price in swing_highs if head_idx < idx < rs_idx]
+
+            if not left_highs or not right_highs:
+                continue
+
+            neckline_avg = (max(left_highs, key=lambda x: x[1])[1] +
+                           max(right_highs, key=lambda x: x[1])[1]) / 2
+
+            pattern_quality = (neckline_avg - head_price) / neckline_avg
+            confidence = min(1.0, pattern_quality * 10)
+
+            if rs_idx < len(dataframe):
+                actual_idx = len(dataframe) - 100 + rs_idx
+                if 0 <= actual_idx < len(dataframe):
+                    dataframe.iloc[actual_idx, dataframe.columns.get_loc('%-head_shoulders_inv')] = confidence
+
+    return dataframe
+
+
+def _legacy_trendline_slopes(dataframe: DataFrame, i: int, lookback: int) -> Tuple[float, float]:
+    """np.polyfit trên window [i - lookback, i) như detect_wedge / detect_triangle cũ"""
+    window = dataframe.iloc[i-lookback:i]
+    x = np.arange(lookback)
+    avg_price = window['close'].mean()
+    high_slope = np.polyfit(x, window['high'].values, 1)[0]
+    low_slope = np.polyfit(x, window['low'].values, 1)[0]
+    return high_slope / avg_price, low_slope / avg_price
+
+
+def _legacy_detect_wedge(dataframe: DataFrame, lookback: int = 50) -> DataFrame:
+    n = len(dataframe)
+    rising = np.zeros(n)
+    falling = np.zeros(n)
+    if n >= lookback + 10:
+        for i in range(lookback, n):
+            high_slope_pct, low_slope_pct = _legacy_trendline_slopes(dataframe, i, lookback)
+            if high_slope_pct > 0 and low_slope_pct > 0 and low_slope_pct > high_slope_pct:
+                rising[i] = min(1.0, abs((low_slope_pct - high_slope_pct) / high_slope_pct))
+            if high_slope_pct < 0 and low_slope_pct < 0 and high_slope_pct < low_slope_pct:
+                falling[i] = min(1.0, abs((low_slope_pct - high_slope_pct) / low_slope_pct))
+    return DataFrame({'%-rising_wedge': rising, '%-falling_wedge': falling}, index=dataframe.index)
+
+
+def _legacy_detect_triangle(dataframe: DataFrame, lookback: int = 50) -> DataFrame:
+    n = len(dataframe)
+    ascending = np.zeros(n)
+    descending = np.zeros(n)
+    symmetrical = np.zeros(n)
+    if n >= lookback + 10:
+        for i in range(lookback, n):
+            high_slope_pct, low_slope_pct = _legacy_trendline_slopes(dataframe, i, lookback)
+            if abs(high_slope_pct) < 0.0001 and low_slope_pct > 0.0005:
+                ascending[i] = min(1.0, low_slope_pct * 1000)
+            if high_slope_pct < -0.0005 and abs(low_slope_pct) < 0.0001:
+                descending[i] = min(1.0, abs(high_slope_pct) * 1000)
+            if high_slope_pct < 0 and low_slope_pct > 0:
+                convergence = min(abs(high_slope_pct), abs(low_slope_pct)) / max(abs(high_slope_pct), abs(low_slope_pct))
+                if convergence > 0.5:
+                    symmetrical[i] = convergence
+    return DataFrame({'%-ascending_triangle': ascending, '%-descending_triangle': descending,
+                      '%-symmetrical_triangle': symmetrical}, index=dataframe.index)
+
+
+def _legacy_detect_flag(dataframe: DataFrame, pole_lookback: int = 20, flag_lookback: int = 15) -> DataFrame:
+    n = len(dataframe)
+    bull = np.zeros(n)
+    bear = np.zeros(n)
+    total_lookback = pole_lookback + flag_lookback
+    if n >= total_lookback + 10:
+        for i in range(total_lookback, n):
+            pole = dataframe.iloc[i - total_lookback:i - flag_lookback]
+            flag = dataframe.iloc[i - flag_lookback:i]
+            pole_move = (pole['close'].iloc[-1] - pole['close'].iloc[0]) / pole['close'].iloc[0]
+            flag_move = (flag['close'].iloc[-1] - flag['close'].iloc[0]) / flag['close'].iloc[0]
+            flag_range = (flag['high'].max() - flag['low'].min()) / flag['close'].mean()
+            if pole_move > 0.03 and flag_move < 0 and abs(flag_move) < pole_move * 0.5 \
+                    and flag_range < pole_move * 0.3:
+                bull[i] = min(1.0, pole_move * 10)
+            if pole_move < -0.03 and 0 < flag_move < abs(pole_move) * 0.5 \
+                    and flag_range < abs(pole_move) * 0.3:
+                bear[i] = min(1.0, abs(pole_move) * 10)
+    return DataFrame({'%-bull_flag': bull, '%-bear_flag': bear}, index=dataframe.index)
+
+
+def _parity_check(sample_data: DataFrame) -> None:
+    """So sánh vectorized detectors với legacy loops (rtol=1e-9) + timing"""
+    import time
+    
+    checks = [
+        ('swing points', ChartPatterns.find_swing_points, _legacy_find_swing_points),
+        ('double top', lambda df: ChartPatterns.detect_double_top(ChartPatterns.find_swing_points(df)),
+         lambda df: _legacy_detect_double_top(_legacy_find_swing_points(df))),
+        ('double bottom', lambda df: ChartPatterns.detect_double_bottom(ChartPatterns.find_swing_points(df)),
+         lambda df: _legacy_detect_double_bottom(_legacy_find_swing_points(df))),
+        ('head & shoulders', lambda df: ChartPatterns.detect_head_and_shoulders(ChartPatterns.find_swing_points(df)),
+         lambda df: _legacy_detect_head_and_shoulders(_legacy_find_swing_points(df))),
+        ('wedge', ChartPatterns.detect_wedge, _legacy_detect_wedge),
+        ('triangle', ChartPatterns.detect_triangle, _legacy_detect_triangle),
+        ('flag', ChartPatterns.detect_flag, _legacy_detect_flag),
+        ('flag (pole=10, flag=5)', lambda df: ChartPatterns.detect_flag(df, 10, 5),
+         lambda df: _legacy_detect_flag(df, 10, 5)),
+    ]
+    for name, vectorized, legacy in checks:
+        start = time.perf_counter()
+        expected = legacy(sample_data.copy())
+        legacy_ms = (time.perf_counter() - start) * 1000
+        
+        start = time.perf_counter()
+        actual = vectorized(sample_data.copy())
+        vectorized_ms = (time.perf_counter() - start) * 1000
+        
+        for col in [c for c in expected.columns if c not in sample_data.columns]:
+            assert np.allclose(actual[col].values, expected[col].values, rtol=1e-9, atol=1e-12), \
+                f"{col} mismatch vs legacy loop"
+        print(f"  ✅ {name}: legacy {legacy_ms:.0f} ms → vectorized {vectorized_ms:.1f} ms "
+              f"({len(sample_data)} rows)")
+
+
+
+def _full_history_check(sample_data: DataFrame) -> None:
+    """
+    lookback=None:
+    - Prefix invariance: chạy trên df[:m] cho kết quả y hệt m rows đầu (không lookahead)
+    - Mọi detection legacy (100 nến cuối) cũng có trong full-history với cùng giá trị
+    """
+    import time
+    
+    detectors = [
+        ('double top', ChartPatterns.detect_double_top, ['%-double_top', '%-double_top_neckline']),
+        ('double bottom', ChartPatterns.detect_double_bottom, ['%-double_bottom', '%-double_bottom_neckline']),
+        ('head & shoulders', ChartPatterns.detect_head_and_shoulders, ['%-head_shoulders', '%-head_shoulders_inv']),
+    ]
+    n = len(sample_data)
+    base = ChartPatterns.find_swing_points(sample_data.copy())
+    
+    for name, detect, cols in detectors:
+        start = time.perf_counter()
+        full = detect(base.copy(), lookback=None)
+        full_ms = (time.perf_counter() - start) * 1000
+        
+        for m in (n // 3, n // 2, n - 7):
+            prefix = detect(ChartPatterns.find_swing_points(sample_data.iloc[:m].copy()), lookback=None)
+            for col in cols:
+                assert np.array_equal(prefix[col].values, full[col].values[:m]), \
+                    f"{col}: lookahead (prefix {m} rows differs)"
+        
+        legacy = detect(base.copy())
+        for col in cols:
+            marked = legacy[col].values != 0
+            assert np.allclose(full[col].values[marked], legacy[col].values[marked], rtol=1e-9), \
+                f"{col}: legacy detection missing from full history"
+        
+        print(f"  ✅ {name}: {int((full[cols[0]].values > 0).sum())} detections over {n:,} rows "
+              f"(legacy window: {int((legacy[cols[0]].values > 0).sum())}) | {full_ms:.1f} ms")
+
+
 # ============================================================
 # TEST
 # ============================================================
@@ -671,3 +1117,45 @@ if __name__ == "__main__":
         if len(detections) > 0:
             print(f"\n{col}:")
             print(detections.to_string())
+    
+    # Parity: vectorized vs legacy per-row loops
+    print("\n" + "="*60)
+    print("PARITY vs LEGACY LOOPS")
+    print("="*60)
+    _parity_check(sample_data)
+    _parity_check(sample_data.iloc[:80].copy())  # n < 100
+    
+    # Random walk dài hơn (nhiều wedge/triangle hơn)
+    n_long = 5000
+    long_price = 40000 * np.exp(np.cumsum(np.random.normal(0, 0.004, n_long)))
+    long_data = pd.DataFrame({
+        'date': pd.date_range(start='2025-01-01', periods=n_long, freq='5min'),
+        'open': long_price * (1 + np.random.uniform(-0.001, 0.001, n_long)),
+        'high': long_price * (1 + np.random.uniform(0, 0.003, n_long)),
+        'low': long_price * (1 - np.random.uniform(0, 0.003, n_long)),
+        'close': long_price,
+        'volume': np.random.uniform(100, 1000, n_long)
+    })
+    _parity_check(long_data)
+    
+    # Full history: không lookahead + chi phí tuyến tính theo số nến
+    print("\n" + "="*60)
+    print("FULL HISTORY (lookback=None)")
+    print("="*60)
+    _full_history_check(long_data)
+    
+    n_huge = 500_000  # ~4.75 năm nến 5m
+    huge_price = 40000 * np.exp(np.cumsum(np.random.normal(0, 0.004, n_huge)))
+    huge_data = pd.DataFrame({
+        'open': huge_price,
+        'high': huge_price * (1 + np.random.uniform(0, 0.003, n_huge)),
+        'low': huge_price * (1 - np.random.uniform(0, 0.003, n_huge)),
+        'close': huge_price,
+        'volume': np.random.uniform(100, 1000, n_huge)
+    })
+    import time
+    start = time.perf_counter()
+    huge_data = ChartPatterns.add_all_patterns(huge_data, full_history=True)
+    print(f"  add_all_patterns(full_history=True): {n_huge:,} rows in {time.perf_counter() - start:.2f}s")
+    for col in ['%-double_top', '%-double_bottom', '%-head_shoulders', '%-head_shoulders_inv']:
+        print(f"    {col}: {int((huge_data[col] > 0).sum()):,} detections")
@@ -3,20 +3,27 @@ Data Enhancement Module - Phase 2 Features
 ==========================================
 This module provides additional data features for the AI Trading Strategy:
 - Funding Rate (from Binance Futures)
-- Fear & Greed Index (from alternative.me API)
+- Fear & Greed Index (alternative.me, lịch sử daily - xem fear_greed.py)
 - Volume-based indicators
 
 Author: AI Trading System
 Date: 2025-11-30
 """
 
-import requests
 import numpy as np
 import pandas as pd
-from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import logging
 
+try:
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_profiler import FeatureProfiler
+    from indicators.fear_greed import FearGreedProvider
+except ImportError:
+    from .dtype_policy import DtypePolicy
+    from .feature_profiler import FeatureProfiler
+    from .fear_greed import FearGreedProvider
+
 logger = logging.getLogger(__name__)
 
 
@@ -25,23 +32,19 @@ class DataEnhancement:
     Class containing data enhancement methods for trading strategy.
     """
     
-    # Cache for Fear & Greed Index (update once per day)
-    _fg_cache: Dict[str, Any] = {
-        'value': None,
-        'classification': None,
-        'timestamp': None
-    }
-    
     @staticmethod
     def get_fear_greed_index() -> Dict[str, Any]:
         """
-        Fetch Fear & Greed Index from alternative.me API.
+        Fear & Greed Index mới nhất (alternative.me) từ FearGreedProvider.
+        
+        Không chờ mạng: dữ liệu đọc từ user_data/data/fear_greed.csv, provider tự
+        refresh trong thread nền khi chưa có giá trị hôm nay.
         
         Returns:
             dict: {
                 'value': int (0-100),
                 'classification': str ('Extreme Fear', 'Fear', 'Neutral', 'Greed', 'Extreme Greed'),
-                'timestamp': datetime
+                'timestamp': datetime (ngày của giá trị, None nếu chưa có dữ liệu)
             }
         
         Example:
@@ -51,47 +54,16 @@ class DataEnhancement:
             - Greed (56-75): Market is greedy
             - Extreme Greed (76-100): Market is extremely greedy, potential correction
         """
-        # Check cache (valid for 1 hour)
-        if DataEnhancement._fg_cache['timestamp']:
-            cache_age = datetime.now() - DataEnhancement._fg_cache['timestamp']
-            if cache_age < timedelta(hours=1):
-                return DataEnhancement._fg_cache
-        
-        try:
-            url = "https://api.alternative.me/fng/"
-            response = requests.get(url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            if data and 'data' in data and len(data['data']) > 0:
-                fg_data = data['data'][0]
-                result = {
-                    'value': int(fg_data['value']),
-                    'classification': fg_data['value_classification'],
-                    'timestamp': datetime.now()
-                }
-                
-                # Update cache
-                DataEnhancement._fg_cache = result
-                logger.info(f"Fear & Greed Index: {result['value']} ({result['classification']})")
-                
-                return result
-                
-        except Exception as e:
-            logger.warning(f"Failed to fetch Fear & Greed Index: {e}")
-        
-        # Return default if API fails
-        return {
-            'value': 50,  # Neutral
-            'classification': 'Neutral',
-            'timestamp': datetime.now()
-        }
+        return FearGreedProvider.default().latest()
     
     @staticmethod
     def add_fear_greed_features(dataframe: pd.DataFrame) -> pd.DataFrame:
         """
         Add Fear & Greed Index features to dataframe.
         
+        Mỗi nến nhận giá trị F&G của ngày đã công bố gần nhất (asof join theo
+        cột date) → backtest/train thấy đúng lịch sử, không phải giá trị hôm nay.
+        
         Features added:
         - %-fear_greed_value: Raw F&G value (0-100)
         - %-fear_greed_normalized: Normalized to [-1, 1] range
@@ -104,8 +76,11 @@ class DataEnhancement:
         Returns:
             DataFrame with F&G features added
         """
-        fg_data = DataEnhancement.get_fear_greed_index()
-        fg_value = fg_data['value']
+        provider = FearGreedProvider.default()
+        if 'date' in dataframe.columns:
+            fg_value = provider.features(dataframe['date'])
+        else:
+            fg_value = pd.Series(provider.latest()['value'], index=dataframe.index)
         
         # Add features
         dataframe['%-fear_greed_value'] = fg_value
@@ -114,8 +89,8 @@ class DataEnhancement:
         dataframe['%-fear_greed_normalized'] = (fg_value - 50) / 50
         
         # Binary flags
-        dataframe['%-is_extreme_fear'] = 1 if fg_value < 20 else 0
-        dataframe['%-is_extreme_greed'] = 1 if fg_value > 80 else 0
+        dataframe['%-is_extreme_fear'] = (fg_value < 20).astype(int)
+        dataframe['%-is_extreme_greed'] = (fg_value > 80).astype(int)
         
         return dataframe
     
@@ -212,6 +187,7 @@ class DataEnhancement:
         return dataframe
     
     @staticmethod
+    @FeatureProfiler.profiled
     def add_all_features(dataframe: pd.DataFrame, period: int = 20) -> pd.DataFrame:
         """
         Add all Phase 2 data enhancement features.
@@ -223,11 +199,12 @@ class DataEnhancement:
         Returns:
             DataFrame with all Phase 2 features added
         """
+        columns_before = set(dataframe.columns)
         dataframe = DataEnhancement.add_fear_greed_features(dataframe)
         dataframe = DataEnhancement.add_volume_imbalance(dataframe, period)
         dataframe = DataEnhancement.add_funding_rate_proxy(dataframe, period)
         
-        return dataframe
+        return DtypePolicy.apply(dataframe, [c for c in dataframe.columns if c not in columns_before])
 
 
 # Test function
@@ -0,0 +1,297 @@
+"""
+Dtype Policy - Kiểu dữ liệu gọn cho feature matrix của FreqAI
+=============================================================
+Mọi cột `%-` mặc định là float64, kể cả ~40 binary flags (%-fvg_bull,
+%-wyckoff_spring, %-moon_is_new, %-vsa_no_supply, %-is_discount_zone...).
+FreqAI nhân cột theo timeframes × corr pairs × shifted candles → RAM training lớn.
+
+Policies (feature_flags.compact_dtypes):
+- 'float64' (false, mặc định): giữ nguyên như cũ
+- 'float32' (true): mọi cột `%-` số → float32
+- 'compact' (chỉ khi ghi rõ "compact"): cột trong INT8_COLUMNS (flags, counts, direction -
+  nguyên trong [-128, 127] và không NaN theo công thức) → int8; còn lại → float32.
+  market_regime → category (int8 codes)
+
+Dtype quyết định TĨNH theo tên cột + policy, không theo giá trị của frame → cùng schema
+giữa timeframes, training / predict và các nến live liên tiếp.
+
+Chỉ áp cho cột `%-` (giá trị đã chuẩn hoá) - cột giá thô (swing_high, bb_*...) giữ float64.
+
+⚠️ include_shifted_candles: shift() chèn NaN → cột int8 bị pandas upcast lên float64
+   ở bản shifted → training frame của FreqAI với 'compact' LỚN HƠN 'float32'
+   (memory report: ~1.57 GB vs ~1.40 GB). Vì vậy true = 'float32'.
+
+Usage:
+    DtypePolicy.set_policy(DtypePolicy.from_flags(feature_flags))
+    features_df = DtypePolicy.apply(features_df)       # trước pd.concat
+    dataframe = DtypePolicy.apply(dataframe, new_cols) # module ghi in-place
+
+Author: AI Trading System
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('float64', 'float32', 'compact')
+
+# Cột nguyên trong [-128, 127], không NaN theo công thức (so sánh / np.where / sign, sau
+# ffill().fillna(0)) → int8 với policy 'compact'. Thêm flag mới → thêm vào đây.
+INT8_COLUMNS = frozenset({
+    # FeatureEngineering
+    '%-candle_direction', '%-is_new_high', '%-is_new_low', '%-volatility_regime',
+    # SMCIndicators
+    '%-fvg_bull', '%-fvg_bear', '%-fvg_bull_count_20', '%-fvg_bear_count_20', '%-fvg_net_count',
+    '%-bos_bull', '%-bos_bear', '%-choch_bull', '%-choch_bear', '%-trend_state',
+    '%-moon_is_new', '%-moon_is_full', '%-order_block_bull', '%-order_block_bear',
+    '%-testing_bull_ob', '%-testing_bear_ob', '%-wyckoff_spring', '%-wyckoff_spring_confirmed',
+    '%-wyckoff_upthrust', '%-wyckoff_upthrust_confirmed', '%-is_premium_zone', '%-is_discount_zone',
+    '%-is_equilibrium', '%-liquidity_swept_above', '%-liquidity_swept_below', '%-at_optimal_fib',
+    '%-ob_fib_bull_confluence', '%-ob_fib_bear_confluence', '%-structure_change_bull',
+    '%-structure_change_bear', '%-structure_change_signal',
+    # VSAIndicators
+    '%-vsa_anomaly', '%-vsa_selling_climax', '%-vsa_buying_climax', '%-vsa_absorption',
+    '%-vsa_bullish_absorption', '%-vsa_bearish_absorption', '%-vsa_no_demand', '%-vsa_no_supply',
+    '%-vsa_stopping_volume',
+    # WaveIndicators
+    '%-fib_zone', '%-fib_near_236', '%-fib_near_382', '%-fib_near_500', '%-fib_near_618',
+    '%-fib_near_786', '%-wave_ao_above_zero', '%-wave_ao_cross', '%-wave_ao_peak',
+    '%-wave_bearish_div', '%-wave_bullish_div', '%-wave_exhaustion_up', '%-wave_exhaustion_down',
+    '%-wave_uptrend', '%-wave_downtrend', '%-wave_break_high', '%-wave_break_low',
+    # ChartPatterns (các pattern khác là confidence liên tục)
+    '%-has_pattern',
+    # DataEnhancement
+    '%-is_extreme_fear', '%-is_extreme_greed', '%-is_overheated', '%-is_oversold',
+})
+
+# Thứ tự codes của market_regime khi dạng category
+REGIMES = ['TREND', 'SIDEWAY', 'VOLATILE']
+
+
+class DtypePolicy:
+    """Chuyển dtype các cột feature theo policy hiện hành (set 1 lần khi bot start)"""
+
+    _policy = 'float64'
+
+    @staticmethod
+    def from_flags(feature_flags: dict) -> str:
+        """feature_flags.compact_dtypes: true → 'float32', false → 'float64', hoặc tên policy ("compact")"""
+        value = feature_flags.get('compact_dtypes', False)
+        if isinstance(value, str):
+            return value
+        return 'float32' if value else 'float64'
+
+    @staticmethod
+    def set_policy(name: str) -> str:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown dtype policy '{name}' (expected one of {POLICIES})")
+        if name != DtypePolicy._policy:
+            logger.info(f"Feature dtype policy: {name}")
+        DtypePolicy._policy = name
+        return name
+
+    @staticmethod
+    def policy() -> str:
+        return DtypePolicy._policy
+
+    # ============================================================
+    # CONVERSION
+    # ============================================================
+
+    @staticmethod
+    def fits_int8(values: np.ndarray) -> bool:
+        """Giá trị nguyên trong [-128, 127], không NaN → int8 lossless"""
+        if values.size == 0 or np.isnan(values).any() or values.min() < -128 or values.max() > 127:
+            return False
+        return bool(np.all(values == np.round(values)))
+
+    @staticmethod
+    def target_dtypes(dataframe: DataFrame, columns: Optional[Iterable[str]] = None,
+                      policy: Optional[str] = None) -> Dict[str, str]:
+        """
+        {cột: dtype mới} cho các cột `%-` số cần đổi - chỉ theo tên cột + policy.
+
+        Raises:
+            ValueError: cột INT8_COLUMNS có NaN / giá trị lẻ / ngoài [-128, 127] (công thức đổi
+                        → bỏ cột khỏi INT8_COLUMNS), thay vì đổi dtype theo dữ liệu
+        """
+        policy = policy or DtypePolicy._policy
+        if policy == 'float64':
+            return {}
+        columns = dataframe.columns if columns is None else columns
+        mapping = {}
+        for col in columns:
+            if not str(col).startswith('%-'):
+                continue
+            series = dataframe[col]
+            if not (pd.api.types.is_float_dtype(series.dtype) or pd.api.types.is_integer_dtype(series.dtype)):
+                continue
+            target = 'int8' if policy == 'compact' and col in INT8_COLUMNS else 'float32'
+            if series.dtype == target:
+                continue
+            if target == 'int8' and not DtypePolicy.fits_int8(series.to_numpy(dtype=float)):
+                raise ValueError(f"{col} is listed in INT8_COLUMNS but has NaN / non-integer / "
+                                 f"out-of-range values - remove it from the list")
+            mapping[col] = target
+        return mapping
+
+    @staticmethod
+    def apply(dataframe: DataFrame, columns: Optional[Iterable[str]] = None,
+              policy: Optional[str] = None) -> DataFrame:
+        """
+        Áp policy cho các cột `%-` (tất cả, hoặc chỉ `columns`).
+
+        Returns:
+            DataFrame mới (astype) hoặc chính dataframe nếu không có gì để đổi
+        """
+        return DtypePolicy.astype(dataframe, DtypePolicy.target_dtypes(dataframe, columns, policy))
+
+    @staticmethod
+    def astype(dataframe: DataFrame, mapping: Dict[str, object]) -> DataFrame:
+        """
+        dataframe.astype(mapping), giữ thứ tự cột.
+
+        astype(dict) của pandas đi từng cột (~10ms / 80 cột) → gom theo dtype,
+        mỗi nhóm 1 lần astype trên block, rồi 1 concat.
+        """
+        if not mapping:
+            return dataframe
+        if len(mapping) <= 8:
+            # Ít cột (vd: vài cột int64 của incremental engine) → gán từng cột rẻ hơn concat
+            result = dataframe.copy(deep=False)
+            for col, dtype in mapping.items():
+                result[col] = dataframe[col].astype(dtype)
+            return result
+        groups: Dict[object, List[str]] = {}
+        for col, dtype in mapping.items():
+            groups.setdefault(dtype, []).append(col)
+        parts = [dataframe.drop(columns=list(mapping))]
+        parts += [dataframe[cols].astype(dtype) for dtype, cols in groups.items()]
+        return pd.concat(parts, axis=1)[dataframe.columns]
+
+    @staticmethod
+    def regime(values: np.ndarray, policy: Optional[str] = None):
+        """market_regime: category (int8 codes, vẫn so sánh == 'TREND' được) với 'compact', ngược lại strings"""
+        if (policy or DtypePolicy._policy) == 'compact':
+            return pd.Categorical(values, categories=REGIMES)
+        return values
+
+    # ============================================================
+    # MEMORY REPORT
+    # ============================================================
+
+    @staticmethod
+    def memory_report(dataframe: DataFrame, columns: Optional[List[str]] = None) -> DataFrame:
+        """Bytes theo dtype (deep=True → tính cả strings) của `columns` hoặc toàn bộ frame"""
+        frame = dataframe if columns is None else dataframe[columns]
+        usage = frame.memory_usage(index=False, deep=True)
+        dtypes = frame.dtypes.astype(str)
+        report = DataFrame({'dtype': dtypes, 'bytes': usage}).groupby('dtype')['bytes'].agg(['count', 'sum'])
+        report['mb'] = report['sum'] / 1e6
+        return report.rename(columns={'count': 'columns', 'sum': 'bytes'}).sort_values('bytes', ascending=False)
+
+
+# ============================================================
+# MEMORY REPORT (float64 vs float32 vs compact)
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    # Cùng class với các modules import (chạy `-m` → file này là __main__)
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.smc_indicators import SMCIndicators
+    from indicators.wave_indicators import WaveIndicators
+
+    rng = np.random.default_rng(42)
+    n = 100_000
+    close = 40000 * np.exp(np.cumsum(rng.normal(0.0001, 0.002, n)))
+    open_ = close * (1 + rng.uniform(-0.001, 0.001, n))
+    ohlcv = DataFrame({
+        'date': pd.date_range(start='2025-01-01', periods=n, freq='5min', tz='UTC'),
+        'open': open_,
+        'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n)),
+        'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n)),
+        'close': close,
+        'volume': rng.uniform(100, 1000, n),
+    })
+
+    def build(policy: str) -> DataFrame:
+        DtypePolicy.set_policy(policy)
+        df = FeatureEngineering.add_all_features(ohlcv.copy())
+        df = SMCIndicators.add_all_indicators(df)
+        df = WaveIndicators.add_all_features(df)
+        return ChartPatterns.add_all_patterns(df)
+
+    logging.disable(logging.INFO)
+    frames = {}
+    for policy in POLICIES:
+        start = time.perf_counter()
+        frames[policy] = build(policy)
+        print(f"  {policy:<8} features built in {time.perf_counter() - start:.1f}s")
+    DtypePolicy.set_policy('float64')
+
+    baseline = frames['float64']
+    feature_cols = [c for c in baseline.columns if c.startswith('%-')]
+    assert list(frames['compact'].columns) == list(baseline.columns)
+
+    print("\n" + "=" * 60)
+    print(f"DTYPE POLICY - PARITY ({len(feature_cols)} `%-` columns, {n:,} rows)")
+    print("=" * 60)
+    for policy in ('float32', 'compact'):
+        frame = frames[policy]
+        for col in feature_cols:
+            expected = baseline[col].to_numpy()
+            actual = frame[col].to_numpy()
+            if frame[col].dtype == np.int8:
+                np.testing.assert_array_equal(actual, expected, err_msg=col)
+            else:
+                np.testing.assert_allclose(actual, expected.astype(np.float32), rtol=0, atol=0, err_msg=col)
+        other = [c for c in baseline.columns if not c.startswith('%-')]
+        pd.testing.assert_frame_equal(frame[other], baseline[other])
+        print(f"  ✅ {policy}: int8 columns exact, float32 = float64 rounded, non-`%-` columns untouched")
+
+    # Schema tĩnh: frame ngắn (ít events, nhiều cột toàn 0) cho cùng dtypes như frame dài
+    for policy in ('float32', 'compact'):
+        DtypePolicy.set_policy(policy)
+        short = ChartPatterns.add_all_patterns(WaveIndicators.add_all_features(SMCIndicators.add_all_indicators(
+            FeatureEngineering.add_all_features(ohlcv.iloc[:500].copy()))))
+        DtypePolicy.set_policy('float64')
+        pd.testing.assert_series_equal(short[feature_cols].dtypes, frames[policy][feature_cols].dtypes)
+        int8 = sorted(c for c in feature_cols if frames[policy][c].dtype == np.int8)
+        assert int8 == (sorted(INT8_COLUMNS & set(feature_cols)) if policy == 'compact' else []), int8
+    print(f"  ✅ dtypes by column name: 500-row frame == {n:,}-row frame (float32, compact)")
+
+    regime = np.array(['TREND', 'VOLATILE', 'SIDEWAY'] * (n // 3))
+    for policy in POLICIES:
+        values = pd.Series(DtypePolicy.regime(regime, policy))
+        assert (values == 'TREND').sum() == (regime == 'TREND').sum()
+
+    print("\n" + "=" * 60)
+    print("DTYPE POLICY - MEMORY REPORT (`%-` columns)")
+    print("=" * 60)
+    base_mb = baseline[feature_cols].memory_usage(index=False, deep=True).sum() / 1e6
+    for policy in POLICIES:
+        report = DtypePolicy.memory_report(frames[policy], feature_cols)
+        total = report['mb'].sum()
+        detail = ', '.join(f"{dtype} ×{int(row.columns)}" for dtype, row in report.iterrows())
+        print(f"  {policy:<8} {total:7.1f} MB ({total / base_mb:5.1%}) | {detail}")
+
+    # FreqAI: 3 timeframes × (pair + 1 corr pair) × (1 + include_shifted_candles=2)
+    regime_mb = {p: pd.Series(DtypePolicy.regime(regime, p)).memory_usage(index=False, deep=True) / 1e6
+                 for p in POLICIES}
+    print(f"\n  market_regime: strings {regime_mb['float64']:.1f} MB → category {regime_mb['compact']:.1f} MB")
+
+    print("\n  FreqAI training frame (3 TF × 2 pairs × (1 + 2 shifted candles), shift upcasts int8 → float64):")
+    for policy in POLICIES:
+        features = frames[policy][feature_cols]
+        original = features.memory_usage(index=False, deep=True).sum()
+        shifted = features.shift(1).memory_usage(index=False, deep=True).sum()
+        total = 3 * 2 * (original + 2 * shifted) / 1e9
+        print(f"  {policy:<8} ~{total:5.2f} GB")
@@ -0,0 +1,178 @@
+"""
+Event Sampling - CUSUM filter thu nhỏ training set của FreqAI
+=============================================================
+Mỗi nến 5m đều vào model, và phần lớn các nến liên tiếp gần như giống nhau
+(features trượt 1 nến, label 20 nến tương lai chồng lấn 19/20) → XGBoost / LightGBM
+train trên cửa sổ 45 ngày (× 96 models walk-forward) tốn thời gian cho rows trùng lặp.
+
+Symmetric CUSUM filter (López de Prado) trên log returns chỉ giữ nến mà giá đã đi
+đủ xa kể từ event trước:
+    s+ = max(0, s+ + r),  s- = min(0, s- + r)
+    event + reset khi s+ > h hoặc s- < -h,  h = multiplier × %-atr_pct (ATR 14 / close)
+→ ngưỡng tự co giãn theo volatility: thị trường đi ngang ít events, biến động nhiều events.
+
+Nến không phải event → label (`&*`) = NaN. FreqAI bỏ mọi row có label NaN khi train
+(giống `horizon` nến cuối), predict vẫn chạy trên mọi nến → không cần model custom.
+(Model built-in của FreqAI không nhận sample weight theo row từ strategy, chỉ có
+weight_factor theo thời gian → "zero weight" = bỏ row.)
+
+Config (feature_flags.cusum_sampling):
+    false → tắt | true → multiplier 1.0 | số → multiplier (vd 0.5 = nhiều events hơn)
+
+Report (thời gian train + số rows, full vs sampled):
+    python -m indicators.event_sampling --rows 51840 --multipliers 0.5 1 2
+
+Author: AI Trading System
+"""
+
+import logging
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    from indicators.indicator_cache import IndicatorCache
+    from indicators.kernels import Kernels
+except ImportError:
+    from .indicator_cache import IndicatorCache
+    from .kernels import Kernels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MULTIPLIER = 1.0
+ATR_PERIOD = 14  # như %-atr_pct của FeatureEngineering._add_volatility_features
+
+
+class EventSampling:
+    """CUSUM event filter cho training rows (label NaN ngoài events)"""
+
+    @staticmethod
+    def multiplier_from_flags(feature_flags: dict) -> Optional[float]:
+        """feature_flags.cusum_sampling: false → None (tắt), true → DEFAULT_MULTIPLIER, số → số đó"""
+        value = feature_flags.get('cusum_sampling', False)
+        if value is True:
+            return DEFAULT_MULTIPLIER
+        if not value:
+            return None
+        return float(value)
+
+    @staticmethod
+    def cusum_mask(close: np.ndarray, atr_pct: np.ndarray, multiplier: float = DEFAULT_MULTIPLIER) -> np.ndarray:
+        """
+        True tại các nến event của symmetric CUSUM trên log returns.
+
+        Args:
+            close: giá đóng cửa
+            atr_pct: ATR / close theo nến (NaN ở warmup → không có event)
+            multiplier: h = multiplier × atr_pct
+        """
+        close = np.asarray(close, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = np.diff(np.log(close), prepend=np.nan)
+        return Kernels.cusum_events(returns, multiplier * np.asarray(atr_pct, dtype=float))
+
+    @staticmethod
+    def apply(dataframe: DataFrame, multiplier: float = DEFAULT_MULTIPLIER, pair: str = '') -> DataFrame:
+        """
+        Gán NaN cho mọi cột label (`&*`) ở nến không phải event → FreqAI bỏ khi train.
+
+        Gọi cuối set_freqai_targets (sau khi đã tạo labels).
+        """
+        labels = [col for col in dataframe.columns if col.startswith('&')]
+        if not labels or dataframe.empty:
+            return dataframe
+
+        atr = IndicatorCache.talib(dataframe, 'ATR', 'high', 'low', 'close', timeperiod=ATR_PERIOD)
+        close = dataframe['close'].to_numpy(dtype=float)
+        events = EventSampling.cusum_mask(close, np.asarray(atr, dtype=float) / close, multiplier)
+
+        labeled = dataframe[labels].notna().all(axis=1).to_numpy()
+        for col in labels:
+            dataframe[col] = dataframe[col].where(events)
+
+        kept = int((labeled & events).sum())
+        total = int(labeled.sum())
+        logger.info(
+            f"CUSUM sampling {pair}: {kept:,} / {total:,} labeled rows kept "
+            f"({kept / max(total, 1):.1%}, h = {multiplier:g} × atr_pct)"
+        )
+        return dataframe
+
+
+# ============================================================
+# REPORT: training time + rows, full vs sampled
+# ============================================================
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    # Cùng class với các modules import (chạy `-m` → file này là __main__)
+    from indicators.benchmark import synthetic_ohlcv
+    from indicators.event_sampling import EventSampling
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.kernels import _cusum_events_numpy
+
+    parser = argparse.ArgumentParser(description="CUSUM event sampling: training rows + fit time report")
+    parser.add_argument('--rows', type=int, default=45 * 288 * 4, help="5m candles (mặc định 4 × cửa sổ 45 ngày)")
+    parser.add_argument('--multipliers', type=float, nargs='+', default=[0.5, 1.0, 2.0])
+    parser.add_argument('--horizon', type=int, default=20)
+    parser.add_argument('--models', type=int, default=96, help="số models walk-forward để ngoại suy")
+    args = parser.parse_args()
+
+    frame = synthetic_ohlcv(args.rows)
+    close = frame['close'].to_numpy()
+
+    # Parity: Kernels backend hiện tại == loop tham chiếu, NaN warmup không tạo event
+    atr_pct = (IndicatorCache.talib(frame, 'ATR', 'high', 'low', 'close', timeperiod=ATR_PERIOD) / frame['close']).to_numpy()
+    mask = EventSampling.cusum_mask(close, atr_pct)
+    returns = np.diff(np.log(close), prepend=np.nan)
+    np.testing.assert_array_equal(mask, _cusum_events_numpy(returns, atr_pct))
+    assert not mask[:ATR_PERIOD].any()
+    labeled = frame.assign(**{'&-price_change_pct': frame['close'].shift(-args.horizon) / frame['close'] - 1})
+    sampled = EventSampling.apply(labeled.copy(), 1.0)
+    assert sampled['&-price_change_pct'].notna().sum() == (mask & labeled['&-price_change_pct'].notna()).sum()
+    print(f"✅ CUSUM parity OK ({Kernels.backend()} backend, {len(frame):,} rows)")
+
+    try:
+        from xgboost import XGBRegressor as Model
+    except ImportError:
+        try:
+            from lightgbm import LGBMRegressor as Model
+        except ImportError:
+            Model = None
+
+    features = FeatureEngineering.add_all_features(frame.copy())
+    feature_columns = [col for col in features.columns if col.startswith('%-')]
+    target = (features['close'].shift(-args.horizon) / features['close'] - 1).to_numpy()
+    X = features[feature_columns].astype('float32')
+    valid = X.notna().all(axis=1).to_numpy() & ~np.isnan(target)
+    split = int(len(frame) * 0.67)   # như data_split_parameters.test_size = 0.33
+    test = valid & (np.arange(len(frame)) >= split)
+
+    print("=" * 72)
+    print(f"EVENT SAMPLING REPORT - {len(frame):,} rows × {len(feature_columns)} features, "
+          f"model={Model.__name__ if Model else 'n/a'}")
+    print("=" * 72)
+    print(f"  {'sampling':<12} {'train rows':>12} {'share':>7} {'fit s':>8} {'test corr':>10} "
+          f"{'×' + str(args.models) + ' models':>14}")
+
+    baseline = None
+    for multiplier in [None, *args.multipliers]:
+        keep = valid & (np.arange(len(frame)) < split)
+        if multiplier is not None:
+            keep &= EventSampling.cusum_mask(close, atr_pct, multiplier)
+        name = 'full' if multiplier is None else f"h={multiplier:g}×atr"
+        rows = int(keep.sum())
+        fit_s, corr = float('nan'), float('nan')
+        if Model is not None:
+            model = Model(n_estimators=200, max_depth=6, learning_rate=0.05, n_jobs=-1, verbosity=0) \
+                if Model.__name__ == 'XGBRegressor' else Model(n_estimators=200, learning_rate=0.05, verbose=-1)
+            started = time.perf_counter()
+            model.fit(X[keep], target[keep])
+            fit_s = time.perf_counter() - started
+            corr = float(np.corrcoef(model.predict(X[test]), target[test])[0, 1])
+        baseline = baseline or (rows, fit_s)
+        print(f"  {name:<12} {rows:>12,} {rows / baseline[0]:>6.1%} {fit_s:>8.2f} {corr:>10.3f} "
+              f"{fit_s * args.models / 60:>11.1f} min")
@@ -0,0 +1,293 @@
+"""
+Fear & Greed Provider - Chuỗi lịch sử theo ngày, refresh nền, lưu file local
+============================================================================
+Trước đây DataEnhancement.get_fear_greed_index gọi `requests.get` (timeout 10s)
+ngay trong feature_engineering_expand_all mỗi lần cache hết hạn, và gán 1 giá
+trị HIỆN TẠI cho toàn bộ lịch sử (backtest/train học trên giá trị của hôm nay).
+
+FearGreedProvider:
+- Chuỗi daily (date UTC, value 0-100, classification) lưu tại
+  user_data/data/fear_greed.csv → đọc 1 lần, dùng được offline
+- Refresh trong daemon thread khi chuỗi cũ (chưa có ngày hôm nay) → hot path
+  KHÔNG BAO GIỜ chờ mạng; lần tải đầu (file chưa có) làm blocking ở bot_start
+- features(dates): merge_asof (backward) theo date của nến → mỗi nến nhận giá trị
+  của ngày đã công bố gần nhất (không nhìn trước), nến trước ngày đầu tiên = 50
+- offline=True: không gọi API, chỉ dùng file (fixture) - thiếu file → neutral 50
+
+Usage:
+    provider = FearGreedProvider.configure(offline=False)   # bot_start
+    provider.refresh(blocking=True)                          # tải lần đầu / cập nhật
+    values = provider.features(dataframe['date'])            # Series int theo nến
+
+CLI:
+    python -m indicators.fear_greed --update          # tải toàn bộ lịch sử → fear_greed.csv
+    python -m indicators.fear_greed --show
+    python -m indicators.fear_greed --selftest        # offline, fixture tạm
+
+Author: AI Trading System
+"""
+
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_PATH = STRATEGIES_DIR.parent / "data" / "fear_greed.csv"
+
+API_URL = "https://api.alternative.me/fng/"
+TIMEOUT = 10             # giây / request (chỉ trong thread nền hoặc bot_start)
+RETRY_INTERVAL = 3600    # giây giữa 2 lần thử refresh
+NEUTRAL = 50
+
+COLUMNS = ['date', 'value', 'classification']
+DATE_DTYPE = 'datetime64[ns, UTC]'  # cùng resolution 2 phía merge_asof
+
+
+class FearGreedProvider:
+    """Chuỗi Fear & Greed daily: file local + refresh nền từ alternative.me"""
+
+    _default: Optional['FearGreedProvider'] = None
+
+    def __init__(self, path: Optional[Path] = DEFAULT_PATH, offline: bool = False,
+                 retry_interval: float = RETRY_INTERVAL, timeout: float = TIMEOUT):
+        self.path = Path(path) if path else None
+        self.offline = offline
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self._series: Optional[DataFrame] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_attempt = float('-inf')
+
+    # ============================================================
+    # DEFAULT INSTANCE (DataEnhancement dùng)
+    # ============================================================
+
+    @staticmethod
+    def default() -> 'FearGreedProvider':
+        if FearGreedProvider._default is None:
+            FearGreedProvider._default = FearGreedProvider()
+        return FearGreedProvider._default
+
+    @staticmethod
+    def configure(path: Optional[Path] = DEFAULT_PATH, offline: bool = False) -> 'FearGreedProvider':
+        """Thay provider mặc định (bot_start: feature_flags.fear_greed_offline)"""
+        FearGreedProvider._default = FearGreedProvider(path, offline=offline)
+        return FearGreedProvider._default
+
+    # ============================================================
+    # SERIES
+    # ============================================================
+
+    def series(self) -> DataFrame:
+        """Chuỗi daily đã sort (có thể rỗng). Cũ → refresh nền, không chờ"""
+        if self._series is None:
+            with self._lock:
+                if self._series is None:
+                    self._series = self._load()
+        if self.is_stale():
+            self.refresh(blocking=False)
+        return self._series
+
+    def is_stale(self) -> bool:
+        """Chưa có giá trị của hôm nay (UTC) và đã qua retry_interval từ lần thử trước"""
+        if self.offline or time.monotonic() - self._last_attempt < self.retry_interval:
+            return False
+        series = self._series
+        today = pd.Timestamp.now(tz='UTC').normalize()
+        return series is None or series.empty or series['date'].iloc[-1] < today
+
+    def latest(self) -> Dict[str, Any]:
+        """Giá trị mới nhất {'value', 'classification', 'timestamp'} (neutral nếu chưa có dữ liệu)"""
+        series = self.series()
+        if series.empty:
+            return {'value': NEUTRAL, 'classification': 'Neutral', 'timestamp': None}
+        last = series.iloc[-1]
+        return {'value': int(last['value']), 'classification': last['classification'],
+                'timestamp': last['date'].to_pydatetime()}
+
+    def features(self, dates: pd.Series) -> pd.Series:
+        """
+        Giá trị F&G cho từng nến: ngày đã công bố gần nhất <= date của nến
+        (merge_asof backward, vectorized). Không có dữ liệu → NEUTRAL.
+        """
+        series = self.series()
+        if series.empty or len(dates) == 0:
+            return pd.Series(NEUTRAL, index=dates.index, dtype='int64')
+        candles = pd.to_datetime(dates, utc=True).astype(DATE_DTYPE)
+        left = DataFrame({'date': candles.reset_index(drop=True), 'position': np.arange(len(candles))})
+        if not candles.is_monotonic_increasing:
+            left = left.sort_values('date', kind='stable')
+        merged = pd.merge_asof(left, series[['date', 'value']], on='date', direction='backward')
+        values = np.empty(len(candles), dtype='int64')
+        values[merged['position'].to_numpy()] = merged['value'].fillna(NEUTRAL).to_numpy(dtype='int64')
+        return pd.Series(values, index=dates.index)
+
+    # ============================================================
+    # REFRESH (thread nền)
+    # ============================================================
+
+    def refresh(self, blocking: bool = False) -> bool:
+        """
+        Tải các ngày mới từ API, gộp + ghi file.
+
+        blocking=False: chạy trong daemon thread (bỏ qua nếu đang có thread chạy).
+        Returns: True nếu đã cập nhật (blocking) / đã khởi động thread.
+        """
+        if self.offline:
+            return False
+        self._last_attempt = time.monotonic()
+        if blocking:
+            return self._refresh()
+        if self._thread is not None and self._thread.is_alive():
+            return False
+        self._thread = threading.Thread(target=self._refresh, name='fear-greed-refresh', daemon=True)
+        self._thread.start()
+        return True
+
+    def _refresh(self) -> bool:
+        import requests
+
+        current = self._series if self._series is not None else self._load()
+        # limit=0 → toàn bộ lịch sử; đã có dữ liệu → chỉ các ngày còn thiếu (+ buffer)
+        limit = 0
+        if not current.empty:
+            missing = (pd.Timestamp.now(tz='UTC').normalize() - current['date'].iloc[-1]).days
+            limit = max(missing + 2, 2)
+        try:
+            response = requests.get(API_URL, params={'limit': limit, 'format': 'json'}, timeout=self.timeout)
+            response.raise_for_status()
+            fetched = FearGreedProvider._parse(response.json().get('data', []))
+        except Exception as e:
+            logger.warning(f"Fear & Greed refresh failed: {e}")
+            return False
+        if fetched.empty:
+            return False
+
+        merged = (pd.concat([current, fetched], ignore_index=True)
+                  .drop_duplicates('date', keep='last')
+                  .sort_values('date', ignore_index=True))
+        with self._lock:
+            self._series = merged
+        self._save(merged)
+        last = merged.iloc[-1]
+        logger.info(f"Fear & Greed: {len(merged)} days, latest {last['date']:%Y-%m-%d} = "
+                    f"{last['value']} ({last['classification']})")
+        return True
+
+    @staticmethod
+    def _parse(rows: list) -> DataFrame:
+        """API rows {'value': '25', 'value_classification': 'Fear', 'timestamp': '1700000000'}"""
+        if not rows:
+            return DataFrame(columns=COLUMNS)
+        frame = DataFrame(rows)
+        return FearGreedProvider._normalize(DataFrame({
+            'date': pd.to_datetime(frame['timestamp'].astype('int64'), unit='s', utc=True),
+            'value': frame['value'],
+            'classification': frame['value_classification'],
+        }))
+
+    @staticmethod
+    def _normalize(frame: DataFrame) -> DataFrame:
+        frame = frame.dropna(subset=['date', 'value'])
+        return DataFrame({
+            'date': pd.to_datetime(frame['date'], utc=True).dt.normalize().astype(DATE_DTYPE),
+            'value': frame['value'].astype('int64'),
+            'classification': frame['classification'].fillna('').astype(str),
+        }).drop_duplicates('date', keep='last').sort_values('date', ignore_index=True)
+
+    # ============================================================
+    # FILE
+    # ============================================================
+
+    def _load(self) -> DataFrame:
+        if self.path is None or not self.path.exists():
+            if self.offline:
+                logger.warning(f"Fear & Greed offline but {self.path} not found - using neutral {NEUTRAL}")
+            return DataFrame({'date': pd.Series(dtype=DATE_DTYPE),
+                              'value': pd.Series(dtype='int64'), 'classification': pd.Series(dtype=str)})
+        try:
+            return FearGreedProvider._normalize(pd.read_csv(self.path))
+        except Exception as e:  # file hỏng → coi như chưa có
+            logger.warning(f"Fear & Greed file unreadable ({self.path}): {e}")
+            return DataFrame(columns=COLUMNS)
+
+    def _save(self, series: DataFrame) -> None:
+        if self.path is None:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            out = series.assign(date=series['date'].dt.strftime('%Y-%m-%d'))
+            out.to_csv(tmp, index=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Fear & Greed save failed ({self.path}): {e}")
+
+
+# ============================================================
+# CLI
+# ============================================================
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    parser = argparse.ArgumentParser(description="Fear & Greed history (alternative.me)")
+    parser.add_argument("--path", type=Path, default=DEFAULT_PATH, help="CSV file (date,value,classification)")
+    parser.add_argument("--update", action="store_true", help="Download missing days (full history if no file)")
+    parser.add_argument("--show", action="store_true", help="Show coverage + latest values")
+    parser.add_argument("--selftest", action="store_true", help="Offline fixture: asof join, no network")
+    args = parser.parse_args()
+
+    if args.update:
+        provider = FearGreedProvider(args.path)
+        ok = provider.refresh(blocking=True)
+        print(f"{'✅' if ok else '❌'} {args.path}: {len(provider.series())} days")
+
+    if args.show:
+        series = FearGreedProvider(args.path, offline=True).series()
+        if series.empty:
+            print(f"❌ {args.path}: no data (run --update)")
+        else:
+            print(f"📈 {args.path}: {len(series)} days, "
+                  f"{series['date'].iloc[0]:%Y-%m-%d} → {series['date'].iloc[-1]:%Y-%m-%d}")
+            print(series.tail(10).to_string(index=False))
+
+    if args.selftest:
+        with tempfile.TemporaryDirectory() as tmp:
+            fixture = Path(tmp) / "fear_greed.csv"
+            DataFrame({
+                'date': ['2024-01-01', '2024-01-02', '2024-01-04'],
+                'value': [20, 55, 90],
+                'classification': ['Extreme Fear', 'Greed', 'Extreme Greed'],
+            }).to_csv(fixture, index=False)
+            provider = FearGreedProvider(fixture, offline=True)
+
+            dates = pd.Series(pd.date_range('2023-12-31 23:00', '2024-01-05', freq='1h', tz='UTC'))
+            started = time.perf_counter()
+            values = provider.features(dates)
+            elapsed = (time.perf_counter() - started) * 1000
+            by_day = values.groupby(dates.dt.strftime('%Y-%m-%d')).agg(['min', 'max'])
+            assert values.iloc[0] == NEUTRAL                       # trước ngày đầu tiên
+            assert (by_day.loc['2024-01-01'] == 20).all()
+            assert (by_day.loc['2024-01-03'] == 55).all()          # ngày thiếu → giá trị gần nhất trước đó
+            assert (by_day.loc['2024-01-04'] == 90).all()
+            shuffled = dates.sample(frac=1, random_state=0)
+            assert (provider.features(shuffled) == values.loc[shuffled.index]).all()  # thứ tự bất kỳ
+            assert provider.latest()['value'] == 90
+            assert not provider.refresh() and provider._thread is None  # offline → không gọi mạng
+
+            big = pd.Series(pd.date_range('2018-01-01', periods=1_000_000, freq='5min', tz='UTC'))
+            started = time.perf_counter()
+            provider.features(big)
+            print(f"✅ asof join correct | {len(dates)} candles {elapsed:.2f} ms, "
+                  f"1M candles {(time.perf_counter() - started) * 1000:.1f} ms | offline, no network")
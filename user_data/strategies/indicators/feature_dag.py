@@ -0,0 +1,306 @@
+"""
+Feature DAG - Chạy song song các nhóm feature độc lập trên thread pool
+=====================================================================
+FeatureEngineering.add_all_features gọi 11 nhóm `_add_*` tuần tự, trong khi
+chỉ có 2 phụ thuộc thật:
+- _add_market_regime_features đọc %-atr_pct (_add_volatility_features)
+- _add_confluence_features đọc %-dist_to_ema_*, %-adx, %-rsi_normalized, %-mfi_normalized,
+  %-cmf, %-obv_slope, %-volume_trend, %-ker_10
+
+TA-Lib / NumPy / phần lớn rolling của pandas nhả GIL → các nhóm độc lập chạy
+song song được bằng threads (không tốn pickle như process pool).
+
+Mỗi nhóm khai báo là 1 FeatureNode(func, inputs, outputs):
+- inputs: key `%-` đọc từ nhóm khác → dependency = node sinh ra key đó
+- outputs: key nhóm ghi vào `features`
+
+Kết quả giống hệt chạy tuần tự:
+- mỗi node ghi vào dict riêng (chỉ thấy outputs của các dependencies)
+- merge theo thứ tự khai báo → cùng columns, cùng thứ tự
+
+Usage (feature_flags.feature_dag_threads: false | true | số threads):
+    FeatureDAG.set_workers(FeatureDAG.from_flags(feature_flags))   # bot_start
+    FeatureDAG.run(FEATURE_NODES, features, dataframe)
+    FeatureDAG.last_report()   # wall / busy / % thời gian có ≥ 2 nhóm chạy song song
+
+Author: AI Trading System
+"""
+
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+try:
+    from indicators.feature_pruning import FeatureAllowlist, FeaturePruning, _recorder
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .feature_pruning import FeatureAllowlist, FeaturePruning, _recorder
+    from .feature_profiler import FeatureProfiler
+
+logger = logging.getLogger(__name__)
+
+# true → số threads mặc định (TA-Lib/NumPy hiếm khi scale quá 4 threads với GIL)
+DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+
+class FeatureNode(NamedTuple):
+    """1 nhóm feature `func(*args, features)`"""
+    func: Callable
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+
+    @property
+    def name(self) -> str:
+        return self.func.__qualname__
+
+
+class FeatureDAG:
+    """Scheduler dependency-aware cho các FeatureNode (threads dùng chung 1 pool)"""
+
+    _workers = 0
+    _executor: Optional[ThreadPoolExecutor] = None
+    _lock = threading.Lock()
+    _validated: Dict[int, Tuple[Tuple[int, ...], ...]] = {}
+    _last_report: Optional[dict] = None
+
+    # ============================================================
+    # CONFIG
+    # ============================================================
+
+    @staticmethod
+    def from_flags(feature_flags: dict) -> int:
+        """feature_flags.feature_dag_threads: false/0 → tuần tự, true → DEFAULT_WORKERS, hoặc số threads"""
+        value = feature_flags.get('feature_dag_threads', False)
+        if value is True:
+            return DEFAULT_WORKERS
+        if value is False or value is None:
+            return 0
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"feature_dag_threads must be a bool or a non-negative int, got {value!r}")
+        return value
+
+    @staticmethod
+    def set_workers(workers: int) -> int:
+        """0/1 → tuần tự (như cũ). Đổi số threads → tạo lại pool"""
+        if workers < 0:
+            raise ValueError(f"workers must be >= 0, got {workers}")
+        with FeatureDAG._lock:
+            if workers != FeatureDAG._workers:
+                if FeatureDAG._executor is not None:
+                    FeatureDAG._executor.shutdown(wait=True)
+                    FeatureDAG._executor = None
+                logger.info(f"Feature DAG workers: {workers or 'sequential'}")
+            FeatureDAG._workers = workers
+        return workers
+
+    @staticmethod
+    def workers() -> int:
+        return FeatureDAG._workers
+
+    @staticmethod
+    def _pool() -> ThreadPoolExecutor:
+        with FeatureDAG._lock:
+            if FeatureDAG._executor is None:
+                FeatureDAG._executor = ThreadPoolExecutor(
+                    max_workers=FeatureDAG._workers, thread_name_prefix='feature-dag'
+                )
+            return FeatureDAG._executor
+
+    # ============================================================
+    # GRAPH
+    # ============================================================
+
+    @staticmethod
+    def dependencies(nodes: Sequence[FeatureNode]) -> Tuple[Tuple[int, ...], ...]:
+        """
+        deps[i] = index các node sinh ra inputs của node i.
+
+        Raises:
+            ValueError: output trùng giữa 2 node, hoặc input do node khai báo SAU sinh ra
+                        (thứ tự khai báo phải là thứ tự tuần tự hợp lệ)
+        """
+        key = id(nodes)
+        cached = FeatureDAG._validated.get(key)
+        if cached is not None:
+            return cached
+        producer: Dict[str, int] = {}
+        for i, node in enumerate(nodes):
+            for out in node.outputs:
+                if out in producer:
+                    raise ValueError(f"'{out}' produced by both {nodes[producer[out]].name} and {node.name}")
+                producer[out] = i
+        deps = []
+        for i, node in enumerate(nodes):
+            node_deps = sorted({producer[k] for k in node.inputs if k in producer})
+            if node_deps and node_deps[-1] >= i:
+                raise ValueError(f"{node.name} reads '{nodes[node_deps[-1]].name}' outputs declared after it")
+            deps.append(tuple(node_deps))
+        FeatureDAG._validated[key] = tuple(deps)
+        return FeatureDAG._validated[key]
+
+    # ============================================================
+    # RUN
+    # ============================================================
+
+    @staticmethod
+    def run(nodes: Sequence[FeatureNode], features: dict, *args) -> None:
+        """
+        Gọi `node.func(*args, features)` cho mọi node, độc lập → song song.
+
+        Tuần tự (qua FeaturePruning.run_groups) khi workers ≤ 1 hoặc đang discovery.
+        Node nằm trong allowlist.skip_groups (feature_pruning) được bỏ qua.
+        """
+        deps = FeatureDAG.dependencies(nodes)
+        if FeatureDAG._workers <= 1 or _recorder.get() is not None:
+            FeaturePruning.run_groups(tuple(node.func for node in nodes), features, *args)
+            return
+
+        allowlist = FeatureAllowlist.current()
+        active = [i for i, node in enumerate(nodes)
+                  if allowlist is None or node.name not in allowlist.skip_groups]
+        results: Dict[int, dict] = {}
+        timings: Dict[int, Tuple[float, float]] = {}
+        waiting = {i: set(deps[i]) & set(active) for i in active}
+        dependents: Dict[int, List[int]] = {i: [] for i in active}
+        for i in active:
+            for dep in waiting[i]:
+                dependents[dep].append(i)
+
+        def closure(i: int) -> List[int]:
+            """Mọi dependency (bắc cầu) của node i, theo thứ tự khai báo"""
+            seen, stack = set(), list(waiting_initial[i])
+            while stack:
+                dep = stack.pop()
+                if dep not in seen:
+                    seen.add(dep)
+                    stack.extend(waiting_initial[dep])
+            return sorted(seen)
+
+        def task(i: int, view: dict) -> Tuple[dict, float, float]:
+            started = time.perf_counter()
+            local = dict(view)
+            FeatureProfiler.run_group(nodes[i].func, local, *args)
+            return {k: v for k, v in local.items() if k not in view}, started, time.perf_counter()
+
+        waiting_initial = {i: frozenset(waiting[i]) for i in active}
+        pool = FeatureDAG._pool()
+        wall_start = time.perf_counter()
+
+        def submit(i: int):
+            view = dict(features)
+            for dep in closure(i):
+                view.update(results[dep])
+            # copy_context: IndicatorCache / allowlist scope đi theo vào thread
+            return pool.submit(contextvars.copy_context().run, task, i, view)
+
+        running = {submit(i): i for i in active if not waiting[i]}
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = running.pop(future)
+                results[i], started, finished = future.result()
+                timings[i] = (started, finished)
+                for child in dependents[i]:
+                    waiting[child].discard(i)
+                    if not waiting[child]:
+                        running[submit(child)] = child
+        wall = time.perf_counter() - wall_start
+
+        # Merge theo thứ tự khai báo → cùng columns, cùng thứ tự với chạy tuần tự
+        for i in active:
+            features.update(results[i])
+
+        FeatureDAG._last_report = FeatureDAG._report(
+            {nodes[i].name: (start - wall_start, end - wall_start) for i, (start, end) in timings.items()}, wall
+        )
+
+    @staticmethod
+    def _report(intervals: Dict[str, Tuple[float, float]], wall: float) -> dict:
+        """busy = tổng thời gian các node, overlap = thời gian có ≥ 2 node chạy cùng lúc"""
+        events = sorted([(start, 1) for start, _ in intervals.values()] +
+                        [(end, -1) for _, end in intervals.values()])
+        overlap, active, previous = 0.0, 0, 0.0
+        for moment, delta in events:
+            if active >= 2:
+                overlap += moment - previous
+            active += delta
+            previous = moment
+        busy = sum(end - start for start, end in intervals.values())
+        return {
+            'wall_ms': wall * 1000,
+            'busy_ms': busy * 1000,
+            'parallel_ms': overlap * 1000,
+            'parallel_fraction': overlap / wall if wall > 0 else 0.0,
+            'concurrency': busy / wall if wall > 0 else 0.0,
+            'nodes': {name: (start * 1000, end * 1000) for name, (start, end) in intervals.items()},
+        }
+
+    @staticmethod
+    def last_report() -> Optional[dict]:
+        """Report của lần chạy song song gần nhất (None nếu chưa chạy)"""
+        return FeatureDAG._last_report
+
+
+# ============================================================
+# PARITY + BENCHMARK (sequential vs thread pool)
+# ============================================================
+if __name__ == "__main__":
+    import numpy as np
+    import pandas as pd
+
+    # Cùng class với các modules import (chạy `-m` → file này là __main__)
+    from indicators.feature_dag import FeatureDAG
+    from indicators.feature_engineering import FEATURE_NODES, FeatureEngineering
+    from indicators.indicator_cache import IndicatorCache
+
+    logging.disable(logging.INFO)
+
+    # Khai báo inputs/outputs phải khớp với những gì các nhóm thật sự đọc/ghi
+    groups = FeaturePruning.discover()
+    for node in FEATURE_NODES:
+        entry = groups[node.name]
+        assert list(node.outputs) == entry['outputs'], f"{node.name}: outputs {entry['outputs']}"
+        undeclared = set(entry['reads']) - set(node.inputs)
+        assert not undeclared, f"{node.name}: undeclared inputs {sorted(undeclared)}"
+    print(f"✅ {len(FEATURE_NODES)} nodes: declared inputs/outputs match discovery")
+
+    ohlcv = FeaturePruning._synthetic_ohlcv(100_000, seed=11)
+
+    def build(workers: int, cached: bool = True):
+        FeatureDAG.set_workers(workers)
+        df = ohlcv.copy()
+        started = time.perf_counter()
+        if cached:
+            with IndicatorCache(df).activate():
+                result = FeatureEngineering.add_all_features(df)
+        else:
+            result = FeatureEngineering.add_all_features(df)
+        return time.perf_counter() - started, result
+
+    print("\n" + "=" * 60)
+    print(f"FEATURE DAG - FeatureEngineering.add_all_features ({len(ohlcv):,} rows)")
+    print("=" * 60)
+    build(0)  # warm-up (imports, numba cache)
+    baseline_time, baseline = min((build(0) for _ in range(3)), key=lambda item: item[0])
+    print(f"  sequential      {baseline_time * 1000:8.1f} ms")
+    for workers in (2, 4, 8):
+        elapsed, result = min((build(workers) for _ in range(3)), key=lambda item: item[0])
+        assert list(result.columns) == list(baseline.columns), "column order differs"
+        pd.testing.assert_frame_equal(result, baseline)
+        report = FeatureDAG.last_report()
+        print(f"  {workers} threads       {elapsed * 1000:8.1f} ms ({baseline_time / elapsed:.2f}x) | "
+              f"groups {report['wall_ms']:.0f} ms wall, {report['parallel_fraction']:.0%} in parallel, "
+              f"concurrency {report['concurrency']:.2f}")
+    FeatureDAG.set_workers(0)
+
+    print("\n  Timeline (4 threads, ms):")
+    FeatureDAG.set_workers(4)
+    build(4)
+    for name, (start, end) in sorted(FeatureDAG.last_report()['nodes'].items(), key=lambda item: item[1][0]):
+        print(f"    {name.split('.')[-1]:<32} {start:7.1f} → {end:7.1f}")
+    FeatureDAG.set_workers(0)
+    print("\n✅ identical columns, order and values for every worker count")
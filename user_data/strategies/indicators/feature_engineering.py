@@ -21,6 +21,23 @@ from pandas import DataFrame
 from typing import Optional
 import logging
 
+try:
+    from indicators.indicator_cache import IndicatorCache
+    from indicators.feature_store import FeatureStore
+    from indicators.kernels import Kernels
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.feature_dag import FeatureDAG, FeatureNode
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .indicator_cache import IndicatorCache
+    from .feature_store import FeatureStore
+    from .kernels import Kernels
+    from .dtype_policy import DtypePolicy
+    from .feature_pruning import FeaturePruning
+    from .feature_dag import FeatureDAG, FeatureNode
+    from .feature_profiler import FeatureProfiler
+
 # Import VSA Indicators module (từ báo cáo nghiên cứu SMC/Wyckoff/VSA)
 try:
     from indicators.vsa_indicators import VSAIndicators
@@ -82,7 +99,7 @@ class FeatureEngineering:
     def _add_ema_features(dataframe: DataFrame, features: dict, periods: list = [10, 20, 50, 200]) -> None:
         """Calculate EMA features into dict"""
         for period in periods:
-            ema = ta.EMA(dataframe['close'], timeperiod=period)
+            ema = IndicatorCache.talib(dataframe, 'EMA', 'close', timeperiod=period)
             if isinstance(ema, np.ndarray):
                 ema = pd.Series(ema, index=dataframe.index)
             
@@ -94,8 +111,8 @@ class FeatureEngineering:
         
         # EMA Cross
         if 20 in periods and 50 in periods:
-            ema_20 = ta.EMA(dataframe['close'], timeperiod=20)
-            ema_50 = ta.EMA(dataframe['close'], timeperiod=50)
+            ema_20 = IndicatorCache.talib(dataframe, 'EMA', 'close', timeperiod=20)
+            ema_50 = IndicatorCache.talib(dataframe, 'EMA', 'close', timeperiod=50)
             if isinstance(ema_20, np.ndarray): ema_20 = pd.Series(ema_20, index=dataframe.index)
             if isinstance(ema_50, np.ndarray): ema_50 = pd.Series(ema_50, index=dataframe.index)
             
@@ -105,12 +122,12 @@ class FeatureEngineering:
     def _add_trend_strength(dataframe: DataFrame, features: dict) -> None:
         """Calculate Trend Strength features into dict"""
         # ADX
-        adx = ta.ADX(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+        adx = IndicatorCache.talib(dataframe, 'ADX', 'high', 'low', 'close', timeperiod=14)
         features['%-adx'] = adx / 100
         
         # DI Difference
-        plus_di = ta.PLUS_DI(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
-        minus_di = ta.MINUS_DI(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+        plus_di = IndicatorCache.talib(dataframe, 'PLUS_DI', 'high', 'low', 'close', timeperiod=14)
+        minus_di = IndicatorCache.talib(dataframe, 'MINUS_DI', 'high', 'low', 'close', timeperiod=14)
         
         if isinstance(plus_di, np.ndarray): plus_di = pd.Series(plus_di, index=dataframe.index)
         if isinstance(minus_di, np.ndarray): minus_di = pd.Series(minus_di, index=dataframe.index)
@@ -125,7 +142,7 @@ class FeatureEngineering:
     def _add_momentum_oscillators(dataframe: DataFrame, features: dict) -> None:
         """Calculate Momentum Oscillators into dict"""
         # RSI
-        rsi = ta.RSI(dataframe['close'], timeperiod=14)
+        rsi = IndicatorCache.talib(dataframe, 'RSI', 'close', timeperiod=14)
         if isinstance(rsi, np.ndarray): rsi = pd.Series(rsi, index=dataframe.index)
         
         features['%-rsi_normalized'] = (rsi - 50) / 50
@@ -154,14 +171,14 @@ class FeatureEngineering:
     def _add_volatility_features(dataframe: DataFrame, features: dict) -> None:
         """Calculate Volatility features into dict"""
         # ATR
-        atr = ta.ATR(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+        atr = IndicatorCache.talib(dataframe, 'ATR', 'high', 'low', 'close', timeperiod=14)
         if isinstance(atr, np.ndarray): atr = pd.Series(atr, index=dataframe.index)
         
         features['%-atr_pct'] = atr / dataframe['close']
         features['%-atr_change'] = atr.pct_change(5)
         
         # Bollinger Bands
-        bb = pta.bbands(dataframe['close'], length=20, std=2)
+        bb = IndicatorCache.pta(dataframe, 'bbands', 'close', length=20, std=2)
         if bb is not None and len(bb.columns) >= 3:
             bb_cols = bb.columns.tolist()
             upper_col = [c for c in bb_cols if 'BBU' in c][0] if any('BBU' in c for c in bb_cols) else None
@@ -202,11 +219,11 @@ class FeatureEngineering:
     def _add_volume_features(dataframe: DataFrame, features: dict) -> None:
         """Calculate Volume features into dict"""
         # MFI
-        mfi = ta.MFI(dataframe['high'], dataframe['low'], dataframe['close'], dataframe['volume'], timeperiod=14)
+        mfi = IndicatorCache.talib(dataframe, 'MFI', 'high', 'low', 'close', 'volume', timeperiod=14)
         features['%-mfi_normalized'] = (mfi - 50) / 50
         
         # OBV
-        obv = ta.OBV(dataframe['close'], dataframe['volume'])
+        obv = IndicatorCache.talib(dataframe, 'OBV', 'close', 'volume')
         if isinstance(obv, np.ndarray): obv = pd.Series(obv, index=dataframe.index)
         
         obv_std = obv.rolling(20).std()
@@ -216,7 +233,7 @@ class FeatureEngineering:
         features['%-obv_slope'] = obv_ema.diff(3) / (obv_ema.abs() + 1e-10)
         
         # Volume Ratio
-        vol_sma = dataframe['volume'].rolling(20).mean()
+        vol_sma = IndicatorCache.rolling(dataframe, 'volume', 20, 'mean')
         features['%-volume_ratio'] = dataframe['volume'] / (vol_sma + 1e-10)
         
         # Volume Trend
@@ -252,7 +269,7 @@ class FeatureEngineering:
         features['%-shadow_to_body'] = (upper_shadow + lower_shadow) / (body + 1e-10)
         
         direction = np.sign(dataframe['close'] - dataframe['open'])
-        streak = direction.groupby((direction != direction.shift()).cumsum()).cumcount() + 1
+        streak = Kernels.run_length(direction)  # = groupby(run id).cumcount() + 1
         features['%-candle_streak'] = (streak * direction) / 10
     
     # ============================================================
@@ -262,8 +279,8 @@ class FeatureEngineering:
     @staticmethod
     def _add_sr_features(dataframe: DataFrame, features: dict, lookback: int = 50) -> None:
         """Calculate S/R features into dict"""
-        rolling_high = dataframe['high'].rolling(lookback).max()
-        rolling_low = dataframe['low'].rolling(lookback).min()
+        rolling_high = IndicatorCache.rolling(dataframe, 'high', lookback, 'max')
+        rolling_low = IndicatorCache.rolling(dataframe, 'low', lookback, 'min')
         
         features['%-dist_to_high'] = (rolling_high - dataframe['close']) / dataframe['close']
         features['%-dist_to_low'] = (dataframe['close'] - rolling_low) / dataframe['close']
@@ -293,7 +310,7 @@ class FeatureEngineering:
         if '%-atr_pct' in features:
             atr_pct = features['%-atr_pct']
         else:
-            atr = ta.ATR(dataframe['high'], dataframe['low'], dataframe['close'], timeperiod=14)
+            atr = IndicatorCache.talib(dataframe, 'ATR', 'high', 'low', 'close', timeperiod=14)
             atr_pct = pd.Series(atr, index=dataframe.index) / dataframe['close']
             
         atr_mean = atr_pct.rolling(100).mean()
@@ -308,18 +325,17 @@ class FeatureEngineering:
         )
         
         # Choppiness
-        high_low_diff = dataframe['high'] - dataframe['low']
-        sum_high_low = high_low_diff.rolling(14).sum()
-        highest_high = dataframe['high'].rolling(14).max()
-        lowest_low = dataframe['low'].rolling(14).min()
+        sum_high_low = IndicatorCache.rolling(dataframe, 'hl_range', 14, 'sum')
+        highest_high = IndicatorCache.rolling(dataframe, 'high', 14, 'max')
+        lowest_low = IndicatorCache.rolling(dataframe, 'low', 14, 'min')
         true_range = highest_high - lowest_low
         
         choppiness = 100 * np.log10(sum_high_low / (true_range + 1e-10)) / np.log10(14)
         features['%-choppiness'] = ((choppiness - 50) / 50).clip(-1, 1)
         
         # Range Expansion
-        price_range = dataframe['high'] - dataframe['low']
-        avg_range = price_range.rolling(20).mean()
+        price_range = IndicatorCache.source(dataframe, 'hl_range')
+        avg_range = IndicatorCache.rolling(dataframe, 'hl_range', 20, 'mean')
         features['%-range_expansion'] = (price_range - avg_range) / (avg_range + 1e-10)
     
     # ============================================================
@@ -357,9 +373,9 @@ class FeatureEngineering:
         # High Volume + Small Spread = Churning (Potential Reversal) -> Negative
         # High Volume + Large Spread = Valid Move -> Positive
         
-        vol_ma = dataframe['volume'].rolling(20).mean()
-        spread = dataframe['high'] - dataframe['low']
-        spread_ma = spread.rolling(20).mean()
+        vol_ma = IndicatorCache.rolling(dataframe, 'volume', 20, 'mean')
+        spread = IndicatorCache.source(dataframe, 'hl_range')
+        spread_ma = IndicatorCache.rolling(dataframe, 'hl_range', 20, 'mean')
         
         # Normalized Volume & Spread
         rel_vol = dataframe['volume'] / (vol_ma + 1e-10)
@@ -407,7 +423,7 @@ class FeatureEngineering:
         # === WYCKOFF & VSA ADVANCED ===
         # Wyckoff Volume Effort (Volume / Price Range)
         # Low Effort (High Vol, Low Range) = Accumulation/Distribution
-        price_range = dataframe['high'] - dataframe['low']
+        price_range = IndicatorCache.source(dataframe, 'hl_range')
         effort = dataframe['volume'] / (price_range + 1e-10)
         # Normalize log-effort
         log_effort = np.log1p(effort)
@@ -425,6 +441,8 @@ class FeatureEngineering:
     # ============================================================
     
     @staticmethod
+    @FeatureProfiler.profiled
+    @FeatureStore.materialized('feature_engineering')
     def add_all_features(dataframe: DataFrame, config: dict = None) -> DataFrame:
         """
         Add ALL properly engineered features to dataframe.
@@ -439,34 +457,9 @@ class FeatureEngineering:
         # Collect all features in a dictionary
         features = {}
         
-        # 1. Core
-        FeatureEngineering._add_log_returns(dataframe, features)
-        FeatureEngineering._add_price_momentum(dataframe, features)
-        
-        # 2. Trend
-        FeatureEngineering._add_ema_features(dataframe, features)
-        FeatureEngineering._add_trend_strength(dataframe, features)
-        
-        # 3. Momentum
-        FeatureEngineering._add_momentum_oscillators(dataframe, features)
-        
-        # 4. Volatility
-        FeatureEngineering._add_volatility_features(dataframe, features)
-        
-        # 5. Volume
-        FeatureEngineering._add_volume_features(dataframe, features)
-        
-        # 6. Candle Patterns
-        FeatureEngineering._add_candle_features(dataframe, features)
-        
-        # 7. Support/Resistance
-        FeatureEngineering._add_sr_features(dataframe, features)
-        
-        # 8. Market Regime
-        FeatureEngineering._add_market_regime_features(dataframe, features)
-        
-        # 9. Confluence (depends on previous features)
-        FeatureEngineering._add_confluence_features(dataframe, features)
+        # Nhóm độc lập chạy song song (feature_flags.feature_dag_threads), xem FEATURE_NODES.
+        # Nhóm nằm trong allowlist.skip_groups (feature_flags.feature_pruning) được bỏ qua
+        FeatureDAG.run(FEATURE_NODES, features, dataframe)
         
         # 10. VSA (if available)
         if VSA_AVAILABLE:
@@ -474,12 +467,14 @@ class FeatureEngineering:
             # Ideally we should refactor VSA too, but let's stick to scope
             pass 
         
-        # Create DataFrame from features dict
+        # Create DataFrame from features dict (bỏ cột bị prune)
+        features = FeaturePruning.select(features)
         if features:
             features_df = pd.DataFrame(features, index=dataframe.index)
             
             # Handle NaN values (ffill then 0)
             features_df = features_df.ffill().fillna(0)
+            features_df = DtypePolicy.apply(features_df)
             
             # Single concatenation
             dataframe = pd.concat([dataframe, features_df], axis=1)
@@ -489,15 +484,93 @@ class FeatureEngineering:
         # VSA is added separately if needed (legacy support)
         # Check vsa_indicators flag from config
         if VSA_AVAILABLE:
-            vsa_enabled = True
-            if config:
-                vsa_enabled = config.get('freqai', {}).get('feature_flags', {}).get('vsa_indicators', True)
-            if vsa_enabled:
+            if FeatureEngineering.vsa_enabled(config):
                 dataframe = VSAIndicators.add_all_indicators(dataframe)
             else:
                 logger.info("VSA Indicators disabled via feature_flags")
         
         return dataframe
+    
+    @staticmethod
+    def vsa_enabled(config: dict = None) -> bool:
+        """Check VSA module availability + feature_flags.vsa_indicators (default True)"""
+        if not VSA_AVAILABLE:
+            return False
+        if config:
+            return config.get('freqai', {}).get('feature_flags', {}).get('vsa_indicators', True)
+        return True
+
+
+# ============================================================
+# FEATURE DAG - Nhóm feature + inputs/outputs (thứ tự khai báo = thứ tự columns)
+# ============================================================
+_EMA_PERIODS = (10, 20, 50, 200)
+
+FEATURE_NODES = (
+    # 1. Core
+    FeatureNode(
+        FeatureEngineering._add_log_returns,
+        outputs=('%-log_return_1', '%-log_return_5', '%-log_return_10', '%-log_return_20',
+                 '%-log_volume_change'),
+    ),
+    FeatureNode(
+        FeatureEngineering._add_price_momentum,
+        outputs=('%-roc_5', '%-roc_10', '%-roc_20', '%-momentum_5'),
+    ),
+    # 2. Trend
+    FeatureNode(
+        FeatureEngineering._add_ema_features,
+        outputs=tuple(key for period in _EMA_PERIODS
+                      for key in (f'%-dist_to_ema_{period}', f'%-ema_slope_{period}')) + ('%-ema_20_50_diff',),
+    ),
+    FeatureNode(
+        FeatureEngineering._add_trend_strength,
+        outputs=('%-adx', '%-di_diff'),
+    ),
+    # 3. Momentum
+    FeatureNode(
+        FeatureEngineering._add_momentum_oscillators,
+        outputs=('%-rsi_normalized', '%-rsi_slope', '%-willr_normalized', '%-stochrsi', '%-cci_normalized'),
+    ),
+    # 4. Volatility
+    FeatureNode(
+        FeatureEngineering._add_volatility_features,
+        outputs=('%-atr_pct', '%-atr_change', '%-bb_width', '%-bb_position',
+                 '%-dist_to_bb_upper', '%-dist_to_bb_lower', '%-true_range_pct'),
+    ),
+    # 5. Volume
+    FeatureNode(
+        FeatureEngineering._add_volume_features,
+        outputs=('%-mfi_normalized', '%-obv_change', '%-obv_slope', '%-volume_ratio',
+                 '%-volume_trend', '%-cmf', '%-dist_to_vwap'),
+    ),
+    # 6. Candle Patterns
+    FeatureNode(
+        FeatureEngineering._add_candle_features,
+        outputs=('%-body_size', '%-candle_direction', '%-upper_shadow', '%-lower_shadow',
+                 '%-shadow_to_body', '%-candle_streak'),
+    ),
+    # 7. Support/Resistance
+    FeatureNode(
+        FeatureEngineering._add_sr_features,
+        outputs=('%-dist_to_high', '%-dist_to_low', '%-range_position', '%-is_new_high', '%-is_new_low'),
+    ),
+    # 8. Market Regime (dùng lại ATR% của nhóm volatility)
+    FeatureNode(
+        FeatureEngineering._add_market_regime_features,
+        inputs=('%-atr_pct',),
+        outputs=('%-ker_10', '%-ker_20', '%-volatility_zscore', '%-volatility_regime',
+                 '%-choppiness', '%-range_expansion'),
+    ),
+    # 9. Confluence (depends on previous features)
+    FeatureNode(
+        FeatureEngineering._add_confluence_features,
+        inputs=('%-dist_to_ema_10', '%-dist_to_ema_20', '%-dist_to_ema_50', '%-adx', '%-ker_10',
+                '%-rsi_normalized', '%-mfi_normalized', '%-cmf', '%-obv_slope', '%-volume_trend'),
+        outputs=('%-trend_confluence', '%-momentum_confluence', '%-vsa_score', '%-money_pressure',
+                 '%-overall_score', '%-wyckoff_volume_effort', '%-vsa_divergence', '%-bearish_score'),
+    ),
+)
 
 
 # ============================================================
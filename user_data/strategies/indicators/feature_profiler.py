@@ -0,0 +1,317 @@
+"""
+Feature Profiler - Thời gian / CPU / bộ nhớ của từng nhóm feature (opt-in)
+=========================================================================
+Nến live chậm → không biết module nào gây ra. FeatureProfiler đo:
+- mọi nhóm `_add_*` / `_calc_*` (qua FeaturePruning.run_groups và FeatureDAG)
+- mọi entry point `add_all_*` (decorator `FeatureProfiler.profiled`)
+
+Mỗi record: pair, timeframe, kind (entry | group), name, wall_ms, cpu_ms (CPU của
+thread), rows, columns (số cột mới) và - mode "memory" - alloc_bytes (net, còn giữ
+sau khi nhóm xong) + peak_bytes (đỉnh trong lúc chạy) qua tracemalloc.
+
+Registry: deque `max_records` records gần nhất trong process (summary() gom theo
+pair/tf/name). Ghi định kỳ (mỗi `dump_interval` giây) các records mới ra JSON-lines.
+
+Tắt (mặc định) → mỗi nhóm chỉ tốn 1 lần ContextVar.get() (không bọc, không timer).
+
+Lưu ý: tracemalloc làm chậm ~2-3x và đếm allocations của cả process → khi
+feature_dag_threads > 1, bytes của các nhóm chạy song song bị lẫn vào nhau.
+
+Usage (feature_flags.feature_profiling: false | true | "memory"):
+    profiler = FeatureProfiler(trace_memory=True)
+    with profiler.activate('BTC/USDT:USDT', '5m'):
+        dataframe = FeatureEngineering.add_all_features(dataframe)
+    profiler.summary()      # DataFrame: count / mean / max theo (pair, tf, name)
+    profiler.flush()        # ghi records chưa dump ra user_data/logs/feature_profile.jsonl
+
+CLI:
+    python -m indicators.feature_profiler --report ../logs/feature_profile.jsonl [--pair BTC/USDT:USDT]
+
+Author: AI Trading System
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_DUMP_PATH = STRATEGIES_DIR.parent / "logs" / "feature_profile.jsonl"
+
+MAX_RECORDS = 20_000
+DUMP_INTERVAL = 60.0  # giây
+
+# (profiler, pair, timeframe) đang active
+_active_scope: ContextVar[Optional[Tuple['FeatureProfiler', str, str]]] = ContextVar(
+    'feature_profiler', default=None
+)
+
+# Stack đo tracemalloc lồng nhau (entry → group): [carried_peak] của từng tầng
+_memory_stack: ContextVar[Tuple[list, ...]] = ContextVar('feature_profiler_memory', default=())
+
+
+class FeatureProfiler:
+    """Registry records (rolling) + dump JSON-lines định kỳ"""
+
+    def __init__(self, trace_memory: bool = False, max_records: int = MAX_RECORDS,
+                 dump_path: Optional[Path] = DEFAULT_DUMP_PATH, dump_interval: float = DUMP_INTERVAL):
+        self.trace_memory = trace_memory
+        self.records: deque = deque(maxlen=max_records)
+        self.dump_path = Path(dump_path) if dump_path else None
+        self.dump_interval = dump_interval
+        self._pending: List[dict] = []
+        self._last_dump = time.monotonic()
+        self._lock = threading.Lock()
+
+    # ============================================================
+    # CONFIG
+    # ============================================================
+
+    @staticmethod
+    def from_flags(feature_flags: dict) -> Optional['FeatureProfiler']:
+        """feature_flags.feature_profiling: false → None, true → timing, "memory" → + tracemalloc"""
+        value = feature_flags.get('feature_profiling', False)
+        if value is False or value is None:
+            return None
+        if value is True:
+            return FeatureProfiler()
+        if value == 'memory':
+            return FeatureProfiler(trace_memory=True)
+        raise ValueError(f"feature_profiling must be false, true or 'memory', got {value!r}")
+
+    # ============================================================
+    # SCOPE
+    # ============================================================
+
+    @contextmanager
+    def activate(self, pair: str, timeframe: str) -> Iterator['FeatureProfiler']:
+        """Đo mọi nhóm / entry point gọi trong block `with`"""
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        token = _active_scope.set((self, pair, timeframe))
+        try:
+            yield self
+        finally:
+            _active_scope.reset(token)
+            if started_tracing:
+                tracemalloc.stop()
+            self._maybe_dump()
+
+    # ============================================================
+    # MEASURE
+    # ============================================================
+
+    @staticmethod
+    def run_group(group: Callable, features: dict, *args) -> None:
+        """`group(*args, features)`, đo nếu có profiler active (columns = số key mới)"""
+        scope = _active_scope.get()
+        if scope is None:
+            group(*args, features)
+            return
+        profiler, pair, timeframe = scope
+        before = len(features)
+        rows = len(args[0]) if args and hasattr(args[0], '__len__') else 0
+        with profiler._measure(pair, timeframe, 'group', group.__qualname__, rows) as record:
+            group(*args, features)
+        record['columns'] = len(features) - before
+
+    @staticmethod
+    def profiled(func: Callable) -> Callable:
+        """
+        Decorator cho entry point `add_all_*(dataframe, ...) -> DataFrame` (hàm hoặc method).
+        columns = số cột của kết quả trừ số cột đầu vào.
+        """
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            scope = _active_scope.get()
+            if scope is None:
+                return func(*args, **kwargs)
+            profiler, pair, timeframe = scope
+            frame = next((a for a in args if isinstance(a, DataFrame)), None)
+            before = len(frame.columns) if frame is not None else 0  # snapshot: nhiều hàm ghi in-place
+            with profiler._measure(pair, timeframe, 'entry', func.__qualname__,
+                                   len(frame) if frame is not None else 0) as record:
+                result = func(*args, **kwargs)
+            if isinstance(result, DataFrame):
+                record['columns'] = len(result.columns) - before
+            return result
+        return wrapper
+
+    @contextmanager
+    def _measure(self, pair: str, timeframe: str, kind: str, name: str, rows: int) -> Iterator[dict]:
+        record = {'pair': pair, 'timeframe': timeframe, 'kind': kind, 'name': name, 'rows': rows, 'columns': 0}
+        tracing = self.trace_memory and tracemalloc.is_tracing()
+        if tracing:
+            current, running_peak = tracemalloc.get_traced_memory()
+            frame = [0]
+            stack = _memory_stack.get()
+            token = _memory_stack.set(stack + (frame,))
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield record
+        finally:
+            record['wall_ms'] = (time.perf_counter() - wall) * 1000
+            record['cpu_ms'] = (time.thread_time() - cpu) * 1000
+            if tracing:
+                after, peak = tracemalloc.get_traced_memory()
+                peak = max(peak, frame[0])
+                _memory_stack.reset(token)
+                if stack:
+                    # reset_peak() xóa đỉnh của tầng ngoài → trả lại qua carried_peak
+                    stack[-1][0] = max(stack[-1][0], running_peak, peak)
+                record['alloc_bytes'] = after - current
+                record['peak_bytes'] = peak - current
+            record['ts'] = datetime.now().isoformat(timespec='milliseconds')
+            self._add(record)
+
+    def _add(self, record: dict) -> None:
+        with self._lock:
+            self.records.append(record)
+            if self.dump_path is not None:
+                self._pending.append(record)
+
+    # ============================================================
+    # REGISTRY / DUMP
+    # ============================================================
+
+    def _maybe_dump(self) -> None:
+        if self.dump_path is not None and time.monotonic() - self._last_dump >= self.dump_interval:
+            self.flush()
+
+    def flush(self) -> int:
+        """Ghi records chưa dump (append JSON-lines), trả về số records đã ghi"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_dump = time.monotonic()
+        if not pending or self.dump_path is None:
+            return 0
+        try:
+            self.dump_path.parent.mkdir(parents=True, exist_ok=True)
+            with self.dump_path.open('a') as f:
+                for record in pending:
+                    f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"Feature profile dump failed ({self.dump_path}): {e}")
+            return 0
+        return len(pending)
+
+    def summary(self, pair: Optional[str] = None, timeframe: Optional[str] = None) -> DataFrame:
+        """count / mean / max wall, cpu, bytes theo (pair, timeframe, kind, name) - chậm nhất trước"""
+        with self._lock:
+            records = list(self.records)
+        return FeatureProfiler.summarize(records, pair, timeframe)
+
+    @staticmethod
+    def summarize(records: List[dict], pair: Optional[str] = None, timeframe: Optional[str] = None) -> DataFrame:
+        frame = DataFrame(records)
+        if frame.empty:
+            return frame
+        if pair:
+            frame = frame[frame['pair'] == pair]
+        if timeframe:
+            frame = frame[frame['timeframe'] == timeframe]
+        metrics: Dict[str, Any] = {
+            'count': ('wall_ms', 'size'), 'wall_ms_mean': ('wall_ms', 'mean'), 'wall_ms_max': ('wall_ms', 'max'),
+            'cpu_ms_mean': ('cpu_ms', 'mean'), 'columns': ('columns', 'max'),
+        }
+        if 'peak_bytes' in frame.columns:
+            metrics.update(alloc_bytes_mean=('alloc_bytes', 'mean'), peak_bytes_max=('peak_bytes', 'max'))
+        summary = frame.groupby(['pair', 'timeframe', 'kind', 'name']).agg(**metrics)
+        return summary.sort_values('wall_ms_mean', ascending=False)
+
+    @staticmethod
+    def load(path: Path) -> List[dict]:
+        """Đọc file JSON-lines đã dump (bỏ qua dòng hỏng / ghi dở)"""
+        records = []
+        with Path(path).open() as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return records
+
+
+# ============================================================
+# CLI: report từ file dump + selftest overhead
+# ============================================================
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Feature group profiling report")
+    parser.add_argument("--report", type=Path, nargs="?", const=DEFAULT_DUMP_PATH,
+                        help="Summarize a JSON-lines dump (default: user_data/logs/feature_profile.jsonl)")
+    parser.add_argument("--pair", help="Report: only this pair")
+    parser.add_argument("--timeframe", help="Report: only this timeframe")
+    parser.add_argument("--top", type=int, default=30, help="Report: rows to show")
+    parser.add_argument("--selftest", action="store_true", help="Overhead disabled vs enabled + record sanity")
+    args = parser.parse_args()
+
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', 20)
+
+    if args.report:
+        records = FeatureProfiler.load(args.report)
+        print(f"\n⏱️ {args.report}: {len(records)} records")
+        print(FeatureProfiler.summarize(records, args.pair, args.timeframe).head(args.top).round(2).to_string())
+
+    if args.selftest:
+        # Cùng class/ContextVar với các modules (chạy `-m` → file này là __main__)
+        from indicators.benchmark import synthetic_ohlcv
+        from indicators.feature_engineering import FeatureEngineering
+        from indicators.feature_profiler import FeatureProfiler
+        from indicators.smc_indicators import SMCIndicators
+
+        logging.disable(logging.INFO)
+        ohlcv = synthetic_ohlcv(20_000)
+
+        def pipeline() -> DataFrame:
+            return SMCIndicators.add_all_indicators(FeatureEngineering.add_all_features(ohlcv.copy()))
+
+        def best(fn: Callable, repeat: int = 5) -> float:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn()
+                timings.append(time.perf_counter() - started)
+            return min(timings) * 1000
+
+        expected = pipeline()
+        disabled = best(pipeline)
+        timing = FeatureProfiler(dump_path=None)
+        with timing.activate('BTC/USDT:USDT', '5m'):
+            pd.testing.assert_frame_equal(pipeline(), expected)
+            enabled = best(pipeline)
+        memory = FeatureProfiler(trace_memory=True, dump_path=None)
+        with memory.activate('BTC/USDT:USDT', '5m'):
+            pipeline()
+
+        summary = memory.summary()
+        entries = summary.xs('entry', level='kind').droplevel(['pair', 'timeframe'])
+        groups = summary.xs('group', level='kind')
+        # VSA chạy lồng trong FeatureEngineering → chỉ cộng 2 entry ngoài cùng
+        outer = entries.loc[['FeatureEngineering.add_all_features', 'SMCIndicators.add_all_indicators'], 'columns']
+        assert outer.sum() == len(expected.columns) - len(ohlcv.columns), outer
+        assert (groups['peak_bytes_max'] >= 0).all()
+        print("=" * 60)
+        print("FEATURE PROFILER - SELFTEST (20k rows, FE + SMC)")
+        print("=" * 60)
+        print(f"  disabled {disabled:8.1f} ms | timing {enabled:8.1f} ms ({enabled / disabled - 1:+.1%})")
+        print(f"  {len(entries)} entry points, {len(groups)} groups, {len(memory.records)} records (memory mode)\n")
+        print(summary.head(12).round(1).to_string())
+        print("\n✅ identical output, columns add up, memory fields present")
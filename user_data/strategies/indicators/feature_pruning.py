@@ -0,0 +1,590 @@
+"""
+Feature Pruning - Bỏ qua các nhóm feature mà model không dùng tới
+=================================================================
+300+ cột `%-` được tính mỗi nến cho mọi timeframe, nhưng nhiều cột gần như
+không đóng góp gì (moon phases, %-fib_ext_up_* / %-fib_ext_down_*, %-fib_near_*...).
+
+Quy trình:
+1. Train model đầy đủ (identifier A).
+2. Build allowlist từ feature importances của model A → ghi vào thư mục
+   model của identifier MỚI B (versioned cùng model B):
+       user_data/models/<B>/feature_allowlist.json
+3. Train + chạy live với identifier B, feature_flags.feature_pruning = true:
+   - Nhóm `_calc_*` / `_add_*` có TẤT CẢ outputs bị prune → không tính
+   - Cột bị prune của nhóm vẫn phải tính → bỏ khỏi frame trước concat
+
+Dependencies giữa các nhóm (vd: _add_confluence_features đọc %-dist_to_ema_*,
+%-adx, %-rsi_normalized... của nhóm khác; _calc_ob_fib_confluence đọc
+%-testing_bull_ob) được ghi lại lúc build bằng cách chạy các modules trên
+frame giả lập và theo dõi các key mà mỗi nhóm đọc từ `features`
+→ nhóm producer của feature đang giữ luôn được tính (giá trị không đổi).
+
+Cột strategy đọc trực tiếp (STRATEGY_COLUMNS: %-ker_10, %-momentum_confluence...)
+luôn được giữ.
+
+⚠️ Model đã train với 1 allowlist chỉ predict được với CHÍNH allowlist đó
+   → allowlist mới = identifier mới (CLI từ chối ghi đè khi identifier đã có model).
+
+CLI:
+    python -m indicators.feature_pruning --build --source-identifier freqai-xgboost-v2 \\
+        --identifier freqai-xgboost-v2-pruned --coverage 0.99
+    python -m indicators.feature_pruning --show --identifier freqai-xgboost-v2-pruned
+    python -m indicators.feature_pruning --selftest        # discovery + parity + benchmark
+
+Author: AI Trading System
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+try:
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .feature_profiler import FeatureProfiler
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_MODELS_DIR = STRATEGIES_DIR.parent / "models"
+
+ALLOWLIST_FILE = "feature_allowlist.json"
+ALLOWLIST_VERSION = 1
+
+# Coverage mặc định: giữ các feature chiếm 99% tổng importance
+DEFAULT_COVERAGE = 0.99
+
+# Cột populate_entry_trend / populate_exit_trend / SignalMatrix đọc trực tiếp
+STRATEGY_COLUMNS = (
+    '%-ker_10', '%-momentum_confluence', '%-money_pressure', '%-trend_confluence',
+    '%-dist_to_ema_200', '%-fvg_bull', '%-fvg_bear', '%-order_block_bull', '%-order_block_bear',
+    '%-testing_bull_ob', '%-testing_bear_ob',
+    '%-ob_fib_bull_confluence', '%-ob_fib_bear_confluence',
+)
+
+# FreqAI đổi tên: <base>[_<period>|_gen][_shift-<n>]_<PAIR>_<tf>
+_SUB_TRAIN = re.compile(r"^sub-train-(?P<coin>.+)_(?P<timestamp>\d+)$")
+
+_active_allowlist: ContextVar[Optional['FeatureAllowlist']] = ContextVar('feature_allowlist', default=None)
+
+# Discovery (build allowlist): {group: {'outputs': [...], 'reads': set()}}
+_recorder: ContextVar[Optional[Dict[str, dict]]] = ContextVar('feature_pruning_recorder', default=None)
+
+
+class _TrackingDict(dict):
+    """dict ghi lại các key được đọc (get / [] / in) - chỉ dùng khi discovery"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads: Set[str] = set()
+
+    def __getitem__(self, key):
+        self.reads.add(key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        self.reads.add(key)
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        self.reads.add(key)
+        return super().__contains__(key)
+
+
+class FeatureAllowlist:
+    """
+    Allowlist của 1 identifier: features giữ lại, cột bị prune, nhóm được bỏ qua.
+
+    Chỉ bỏ những gì đã biết lúc build (pruned / skip_groups) → feature mới thêm
+    vào code sau đó vẫn được tính bình thường.
+    """
+
+    def __init__(self, features: Iterable[str], pruned: Iterable[str], skip_groups: Iterable[str],
+                 meta: Optional[dict] = None):
+        self.features = sorted(set(features))
+        self.pruned = frozenset(pruned)
+        self.skip_groups = frozenset(skip_groups)
+        self.meta = dict(meta or {})
+        payload = json.dumps([self.features, sorted(self.pruned), sorted(self.skip_groups)])
+        self.digest = hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+    @staticmethod
+    def current() -> Optional['FeatureAllowlist']:
+        return _active_allowlist.get()
+
+    @contextmanager
+    def activate(self) -> Iterator['FeatureAllowlist']:
+        token = _active_allowlist.set(self)
+        try:
+            yield self
+        finally:
+            _active_allowlist.reset(token)
+
+    def to_dict(self) -> dict:
+        return {
+            'version': ALLOWLIST_VERSION,
+            'digest': self.digest,
+            **self.meta,
+            'features': self.features,
+            'pruned': sorted(self.pruned),
+            'skip_groups': sorted(self.skip_groups),
+        }
+
+    def save(self, path: Path) -> Path:
+        """Ghi atomic (file tạm + os.replace)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.to_dict(), indent=2))
+        os.replace(tmp, path)
+        return path
+
+    @staticmethod
+    def load(path: Path) -> 'FeatureAllowlist':
+        data = json.loads(Path(path).read_text())
+        if data.get('version') != ALLOWLIST_VERSION:
+            raise ValueError(f"Unsupported feature allowlist version {data.get('version')} ({path})")
+        meta = {k: v for k, v in data.items()
+                if k not in ('version', 'digest', 'features', 'pruned', 'skip_groups')}
+        allowlist = FeatureAllowlist(data['features'], data['pruned'], data['skip_groups'], meta)
+        if allowlist.digest != data.get('digest'):
+            raise ValueError(f"Feature allowlist digest mismatch ({path}) - file edited by hand?")
+        return allowlist
+
+
+class FeaturePruning:
+    """Chạy các nhóm feature theo allowlist đang active + build allowlist từ importances"""
+
+    # path → (mtime, allowlist): đọc lại khi file đổi
+    _loaded: Dict[Path, Tuple[float, FeatureAllowlist]] = {}
+    _warned: Set[Path] = set()
+
+    # ============================================================
+    # ALLOWLIST CỦA IDENTIFIER ĐANG CHẠY
+    # ============================================================
+
+    @staticmethod
+    def for_config(config: dict) -> Optional[FeatureAllowlist]:
+        """
+        Allowlist của freqai.identifier khi feature_flags.feature_pruning bật.
+
+        Chưa có file (vd: identifier đang train lần đầu, chưa build) → None + warning 1 lần.
+        """
+        freqai = config.get('freqai', {})
+        if not freqai.get('feature_flags', {}).get('feature_pruning', False):
+            return None
+        models_dir = Path(config['user_data_dir']) / "models" if config.get('user_data_dir') else None
+        path = FeaturePruning.allowlist_path(freqai.get('identifier', ''), models_dir)
+        if not path.exists():
+            if path not in FeaturePruning._warned:
+                FeaturePruning._warned.add(path)
+                logger.warning(f"feature_pruning enabled but {path} not found - computing all features")
+            return None
+        mtime = path.stat().st_mtime
+        cached = FeaturePruning._loaded.get(path)
+        if cached is None or cached[0] != mtime:
+            allowlist = FeatureAllowlist.load(path)
+            FeaturePruning._loaded[path] = (mtime, allowlist)
+            logger.info(f"Feature allowlist loaded: {FeaturePruning.summary(allowlist)}")
+            return allowlist
+        return cached[1]
+
+    @staticmethod
+    def scope(config: dict):
+        """Context active allowlist của config (nullcontext nếu tắt / chưa build)"""
+        allowlist = FeaturePruning.for_config(config)
+        return allowlist.activate() if allowlist is not None else nullcontext()
+
+    # ============================================================
+    # RUNTIME (gọi từ FeatureEngineering / SMC / Wave / VSA)
+    # ============================================================
+
+    @staticmethod
+    def run_groups(groups: Sequence[Callable], features: dict, *args) -> None:
+        """
+        Gọi `group(*args, features)` cho từng nhóm, bỏ qua nhóm nằm trong skip_groups.
+
+        Không có allowlist active và không discovery → giống hệt gọi tuần tự.
+        """
+        allowlist = _active_allowlist.get()
+        recorder = _recorder.get()
+        for group in groups:
+            name = group.__qualname__
+            if allowlist is not None and name in allowlist.skip_groups:
+                continue
+            if recorder is None:
+                FeatureProfiler.run_group(group, features, *args)
+                continue
+            tracked = _TrackingDict(features)
+            before = set(tracked)
+            group(*args, tracked)
+            entry = recorder.setdefault(name, {'outputs': [], 'reads': set()})
+            entry['outputs'] += [k for k in tracked if k not in before and k not in entry['outputs']]
+            entry['reads'] |= {k for k in tracked.reads if k not in entry['outputs']}
+            features.update(tracked)
+
+    @staticmethod
+    def select(features: dict) -> dict:
+        """Bỏ các cột bị prune trước khi dựng features DataFrame"""
+        allowlist = _active_allowlist.get()
+        if allowlist is None or not allowlist.pruned:
+            return features
+        return {k: v for k, v in features.items() if k not in allowlist.pruned}
+
+    # ============================================================
+    # DISCOVERY (nhóm → outputs, reads)
+    # ============================================================
+
+    @staticmethod
+    def discover(rows: int = 3000) -> Dict[str, dict]:
+        """
+        Chạy FeatureEngineering (+VSA), SMC, Wave trên OHLCV giả lập, ghi lại
+        outputs và các key đọc từ nhóm khác của từng nhóm.
+        """
+        try:
+            from indicators.feature_engineering import FeatureEngineering
+            from indicators.smc_indicators import SMCIndicators
+            from indicators.wave_indicators import WaveIndicators
+        except ImportError:
+            from .feature_engineering import FeatureEngineering
+            from .smc_indicators import SMCIndicators
+            from .wave_indicators import WaveIndicators
+
+        ohlcv = FeaturePruning._synthetic_ohlcv(rows)
+        recorder: Dict[str, dict] = {}
+        token = _recorder.set(recorder)
+        allowlist_token = _active_allowlist.set(None)
+        try:
+            FeatureEngineering.add_all_features(ohlcv.copy())
+            SMCIndicators.add_all_indicators(ohlcv.copy())
+            WaveIndicators.add_all_features(ohlcv.copy())
+        finally:
+            _active_allowlist.reset(allowlist_token)
+            _recorder.reset(token)
+
+        producers = {out: name for name, entry in recorder.items() for out in entry['outputs']}
+        for name, entry in recorder.items():
+            entry['requires'] = sorted({producers[k] for k in entry['reads']
+                                        if k in producers and producers[k] != name})
+        return recorder
+
+    @staticmethod
+    def _synthetic_ohlcv(rows: int, seed: int = 7):
+        import pandas as pd
+        rng = np.random.default_rng(seed)
+        close = 40000 * np.exp(np.cumsum(rng.normal(0.0001, 0.002, rows)))
+        open_ = close * (1 + rng.uniform(-0.001, 0.001, rows))
+        return pd.DataFrame({
+            'date': pd.date_range(start='2025-01-01', periods=rows, freq='5min', tz='UTC'),
+            'open': open_,
+            'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, rows)),
+            'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, rows)),
+            'close': close,
+            'volume': rng.uniform(100, 1000, rows),
+        })
+
+    # ============================================================
+    # IMPORTANCES (model FreqAI đã train)
+    # ============================================================
+
+    @staticmethod
+    def base_name(feature: str, known: Sequence[str]) -> Optional[str]:
+        """
+        '%-fib_ext_up_1272_gen_shift-1_BTC/USDT:USDT_1h' → '%-fib_ext_up_1272'.
+
+        Khớp prefix dài nhất trong `known` (ranh giới '_') → không nhầm %-ker_1 / %-ker_10.
+        """
+        best = None
+        for name in known:
+            if (feature == name or feature.startswith(name + '_')) and (best is None or len(name) > len(best)):
+                best = name
+        return best
+
+    @staticmethod
+    def latest_models(model_dir: Path) -> List[Path]:
+        """sub-train-<COIN>_<timestamp> mới nhất của mỗi coin"""
+        latest: Dict[str, Path] = {}
+        for path in Path(model_dir).glob("sub-train-*"):
+            match = _SUB_TRAIN.match(path.name)
+            if not match or not path.is_dir():
+                continue
+            coin = match.group('coin')
+            if coin not in latest or int(match.group('timestamp')) > int(_SUB_TRAIN.match(latest[coin].name).group('timestamp')):
+                latest[coin] = path
+        return [latest[coin] for coin in sorted(latest)]
+
+    @staticmethod
+    def _model_importances(model) -> Optional[np.ndarray]:
+        """feature_importances_ (XGBoost/LightGBM/sklearn), CatBoost, hoặc trung bình MultiOutput"""
+        if hasattr(model, 'feature_importances_'):
+            return np.asarray(model.feature_importances_, dtype=float)
+        if hasattr(model, 'get_feature_importance'):
+            return np.asarray(model.get_feature_importance(), dtype=float)
+        estimators = getattr(model, 'estimators_', None)
+        if estimators:
+            parts = [FeaturePruning._model_importances(est) for est in estimators]
+            if all(part is not None for part in parts):
+                return np.mean([part / max(part.sum(), 1e-12) for part in parts], axis=0)
+        return None
+
+    @staticmethod
+    def read_importances(sub_train: Path) -> Dict[str, float]:
+        """{feature: importance chuẩn hoá (tổng = 1)} của 1 model trong sub-train-*"""
+        import joblib  # có sẵn cùng FreqAI (scikit-learn)
+
+        metadata_files = sorted(Path(sub_train).glob("*_metadata.json"))
+        model_files = sorted(Path(sub_train).glob("*_model.joblib"))
+        if not metadata_files or not model_files:
+            raise FileNotFoundError(f"No *_metadata.json / *_model.joblib in {sub_train}")
+        feature_list = json.loads(metadata_files[-1].read_text())['training_features_list']
+        importances = FeaturePruning._model_importances(joblib.load(model_files[-1]))
+        if importances is None:
+            raise ValueError(f"Model in {sub_train} exposes no feature importances")
+        if len(importances) != len(feature_list):
+            raise ValueError(f"{sub_train.name}: {len(importances)} importances for "
+                             f"{len(feature_list)} features (PCA / feature selection enabled?)")
+        total = max(float(importances.sum()), 1e-12)
+        return {name: float(value) / total for name, value in zip(feature_list, importances)}
+
+    # ============================================================
+    # BUILD
+    # ============================================================
+
+    @staticmethod
+    def build(importances: Sequence[Dict[str, float]], coverage: float = DEFAULT_COVERAGE,
+              groups: Optional[Dict[str, dict]] = None, meta: Optional[dict] = None) -> FeatureAllowlist:
+        """
+        Allowlist từ importances của 1 hoặc nhiều model (mỗi pair 1 model).
+
+        - Importance của base name = tổng mọi biến thể (timeframe, shift, period, pair),
+          trung bình qua các model
+        - Giữ các base name lớn nhất tới khi đạt `coverage` tổng importance
+        - + STRATEGY_COLUMNS, + closure dependencies của các nhóm được giữ
+        """
+        if not 0 < coverage <= 1:
+            raise ValueError(f"coverage must be in (0, 1], got {coverage}")
+        if not importances:
+            raise ValueError("No model importances to build the allowlist from")
+        groups = groups if groups is not None else FeaturePruning.discover()
+        known = [out for entry in groups.values() for out in entry['outputs']]
+        producer = {out: name for name, entry in groups.items() for out in entry['outputs']}
+
+        shares: Dict[str, float] = {}
+        mapped = 0
+        for model in importances:
+            for feature, value in model.items():
+                base = FeaturePruning.base_name(feature, known)
+                if base is None:
+                    continue  # ChartPatterns / DataEnhancement / raw: không prune
+                mapped += 1
+                shares[base] = shares.get(base, 0.0) + value / len(importances)
+        if not mapped:
+            raise ValueError("No model feature maps to a prunable group output")
+
+        total = sum(shares.values())
+        keep: Set[str] = set()
+        cumulative = 0.0
+        for base, share in sorted(shares.items(), key=lambda item: -item[1]):
+            if share <= 0 or (total > 0 and cumulative >= coverage * total):
+                break
+            keep.add(base)
+            cumulative += share
+        keep |= {col for col in STRATEGY_COLUMNS if col in producer}
+
+        # Nhóm phải chạy = nhóm có output được giữ + producers mà chúng đọc (đệ quy)
+        run = {producer[col] for col in keep}
+        pending = list(run)
+        while pending:
+            for dependency in groups[pending.pop()]['requires']:
+                if dependency not in run:
+                    run.add(dependency)
+                    pending.append(dependency)
+
+        skip_groups = [name for name in groups if name not in run]
+        pruned = [out for out in known if out not in keep]
+        meta = dict(meta or {})
+        meta.update({
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'coverage': coverage,
+            'models': len(importances),
+        })
+        return FeatureAllowlist(keep, pruned, skip_groups, meta)
+
+    @staticmethod
+    def allowlist_path(identifier: str, models_dir: Optional[Path] = None) -> Path:
+        return Path(models_dir or DEFAULT_MODELS_DIR) / identifier / ALLOWLIST_FILE
+
+    @staticmethod
+    def build_from_models(source_identifier: str, identifier: str, coverage: float = DEFAULT_COVERAGE,
+                          models_dir: Optional[Path] = None, force: bool = False) -> Path:
+        """Đọc model mới nhất mỗi pair của `source_identifier` → ghi allowlist cho `identifier`"""
+        models_dir = Path(models_dir or DEFAULT_MODELS_DIR)
+        target = FeaturePruning.allowlist_path(identifier, models_dir)
+        if FeaturePruning.latest_models(target.parent) and not force:
+            raise RuntimeError(
+                f"'{identifier}' already has trained models - they expect the current feature set. "
+                f"Use a new identifier (or --force and retrain)."
+            )
+        sources = FeaturePruning.latest_models(models_dir / source_identifier)
+        if not sources:
+            raise FileNotFoundError(f"No trained models in {models_dir / source_identifier}")
+
+        try:
+            from indicators.feature_store import FeatureStore
+        except ImportError:
+            from .feature_store import FeatureStore
+        allowlist = FeaturePruning.build(
+            [FeaturePruning.read_importances(path) for path in sources], coverage,
+            meta={
+                'source_identifier': source_identifier,
+                'source_models': [path.name for path in sources],
+                'code_version': FeatureStore.code_version(),
+            },
+        )
+        return allowlist.save(target)
+
+    @staticmethod
+    def summary(allowlist: FeatureAllowlist) -> str:
+        meta = allowlist.meta
+        return (f"digest={allowlist.digest} | {len(allowlist.features)} kept, {len(allowlist.pruned)} pruned, "
+                f"{len(allowlist.skip_groups)} groups skipped | source={meta.get('source_identifier', '?')} "
+                f"({meta.get('models', '?')} models, coverage {meta.get('coverage', '?')}) | "
+                f"created {meta.get('created', '?')}")
+
+
+# ============================================================
+# CLI + SELFTEST (discovery, parity, benchmark)
+# ============================================================
+if __name__ == "__main__":
+    import argparse
+    import sys
+    import time
+
+    # Cùng class/ContextVar với các modules import (chạy `-m` → file này là __main__)
+    from indicators.feature_pruning import FeatureAllowlist, FeaturePruning, STRATEGY_COLUMNS
+
+    parser = argparse.ArgumentParser(description="Importance-driven feature pruning")
+    parser.add_argument('--build', action='store_true', help="build allowlist from a trained identifier")
+    parser.add_argument('--show', action='store_true', help="print the allowlist of --identifier")
+    parser.add_argument('--selftest', action='store_true')
+    parser.add_argument('--identifier', help="identifier that will train/run with the allowlist")
+    parser.add_argument('--source-identifier', help="trained identifier to read importances from")
+    parser.add_argument('--coverage', type=float, default=DEFAULT_COVERAGE)
+    parser.add_argument('--models-dir', type=Path, default=DEFAULT_MODELS_DIR)
+    parser.add_argument('--force', action='store_true', help="overwrite even if --identifier has models")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.build:
+        if not args.identifier or not args.source_identifier:
+            parser.error("--build requires --identifier and --source-identifier")
+        path = FeaturePruning.build_from_models(args.source_identifier, args.identifier, args.coverage,
+                                                args.models_dir, args.force)
+        print(f"✅ {path}\n   {FeaturePruning.summary(FeatureAllowlist.load(path))}")
+        sys.exit(0)
+
+    if args.show:
+        if not args.identifier:
+            parser.error("--show requires --identifier")
+        allowlist = FeatureAllowlist.load(FeaturePruning.allowlist_path(args.identifier, args.models_dir))
+        print(FeaturePruning.summary(allowlist))
+        print(f"\nSkipped groups ({len(allowlist.skip_groups)}):")
+        for name in sorted(allowlist.skip_groups):
+            print(f"  - {name}")
+        print(f"\nPruned columns ({len(allowlist.pruned)}):")
+        for name in sorted(allowlist.pruned):
+            print(f"  - {name}")
+        sys.exit(0)
+
+    if not args.selftest:
+        parser.print_help()
+        sys.exit(0)
+
+    import pandas as pd
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.smc_indicators import SMCIndicators
+    from indicators.wave_indicators import WaveIndicators
+
+    logging.disable(logging.INFO)
+
+    print("=" * 60)
+    print("FEATURE PRUNING - DISCOVERY")
+    print("=" * 60)
+    groups = FeaturePruning.discover()
+    for name, entry in groups.items():
+        requires = f" ← {', '.join(entry['requires'])}" if entry['requires'] else ""
+        print(f"  {name:<52} {len(entry['outputs']):3d} outputs{requires}")
+    assert 'FeatureEngineering._add_ema_features' in groups['FeatureEngineering._add_confluence_features']['requires']
+    assert 'SMCIndicators._calc_order_blocks' in groups['SMCIndicators._calc_ob_fib_confluence']['requires']
+
+    # Importances giả lập kiểu FreqAI: moon phases / fib extensions / fib_near = 0,
+    # inputs của confluence = 0 (phải vẫn được tính vì confluence được giữ)
+    rng = np.random.default_rng(1)
+    zero = ('%-moon', '%-fib_ext_', '%-fib_near_', '%-dist_to_ema_', '%-rsi_normalized')
+    models = []
+    for pair in ('BTC/USDT:USDT', 'ETH/USDT:USDT'):
+        importances = {}
+        for entry in groups.values():
+            for out in entry['outputs']:
+                for suffix in ('_gen', '_gen_shift-1'):
+                    for tf in ('5m', '1h'):
+                        value = 0.0 if out.startswith(zero) else rng.uniform(0.1, 1.0)
+                        importances[f"{out}{suffix}_{pair}_{tf}"] = value
+        importances[f"%-pattern_net_score_{pair}_5m"] = 1.0  # ChartPatterns: không prunable
+        models.append(importances)
+
+    allowlist = FeaturePruning.build(models, coverage=1.0, groups=groups)
+    print(f"\n  {FeaturePruning.summary(allowlist)}")
+    for group in ('SMCIndicators._calc_moon_phases', 'WaveIndicators._calc_fibonacci_extensions'):
+        assert group in allowlist.skip_groups, group
+    assert 'FeatureEngineering._add_ema_features' not in allowlist.skip_groups  # dependency of confluence
+    assert all(col not in allowlist.pruned for col in STRATEGY_COLUMNS)
+    assert '%-fib_near_500' in allowlist.pruned and '%-fib_position' in allowlist.features
+
+    # Round-trip + digest
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = allowlist.save(Path(tmp) / ALLOWLIST_FILE)
+        assert FeatureAllowlist.load(path).digest == allowlist.digest
+
+    print("\n" + "=" * 60)
+    print("FEATURE PRUNING - PARITY + BENCHMARK")
+    print("=" * 60)
+    ohlcv = FeaturePruning._synthetic_ohlcv(50_000, seed=3)
+
+    def build_all() -> pd.DataFrame:
+        df = FeatureEngineering.add_all_features(ohlcv.copy())
+        df = SMCIndicators.add_all_indicators(df)
+        return WaveIndicators.add_all_features(df)
+
+    def timed(repeats: int = 3):
+        best, frame = float('inf'), None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            frame = build_all()
+            best = min(best, time.perf_counter() - start)
+        return best, frame
+
+    full_time, full = timed()
+    full_cols = [c for c in full.columns if c.startswith('%-')]
+    print(f"  full              {full_time * 1000:8.1f} ms, {len(full_cols)} `%-` columns")
+
+    # coverage thấp hơn → nhiều nhóm bị skip hơn (importances ngẫu nhiên)
+    for label, candidate in (('coverage 1.0', allowlist),
+                             ('coverage 0.6', FeaturePruning.build(models, coverage=0.6, groups=groups))):
+        with candidate.activate():
+            pruned_time, pruned = timed()
+        pruned_cols = [c for c in pruned.columns if c.startswith('%-')]
+        assert set(pruned_cols) == set(full_cols) - candidate.pruned, "unexpected columns"
+        pd.testing.assert_frame_equal(pruned[pruned_cols], full[pruned_cols])
+        print(f"  ✅ {label:<15} {pruned_time * 1000:8.1f} ms ({full_time / pruned_time:.2f}x), "
+              f"{len(pruned_cols)} columns kept (identical values), {len(candidate.skip_groups)} groups skipped")
@@ -0,0 +1,533 @@
+"""
+Feature Store - Cache features đã tính xuống đĩa (Feather, columnar)
+====================================================================
+Backtest / hyperopt / `make train` tính lại mọi `%-` feature từ OHLCV thô
+mỗi lần chạy, kể cả khi dữ liệu lẫn code indicators không đổi.
+
+FeatureStore lưu các cột MỚI mà mỗi nhóm feature thêm vào frame:
+    user_data/feature_store/<PAIR>/<tf>/<group>-<start>-<end>-<key>.feather (+ .json metadata)
+
+Key = sha1(pair, timeframe, hash OHLCV đầu vào, tên cột đầu vào, arguments,
+           FeatureFlags version + feature_flags, hash source code indicators/*.py,
+           digest của feature allowlist nếu feature_pruning active)
+→ đổi dữ liệu, flags hoặc code indicators = key mới (entry cũ bị prune dần).
+
+Nhóm được cache (decorator `FeatureStore.materialized`):
+- feature_engineering: FeatureEngineering.add_all_features
+- smc: SMCIndicators.add_all_indicators
+- wave: WaveIndicators.add_all_features
+- chart_patterns: ChartPatterns.add_all_patterns
+
+Không có store active → gọi thẳng hàm gốc (không overhead).
+
+Usage (strategy, feature_flags.feature_store):
+    with store.activate(pair, timeframe, config):
+        dataframe = SMCIndicators.add_all_indicators(dataframe)   # hit → đọc file
+
+CLI:
+    python -m indicators.feature_store --list
+    python -m indicators.feature_store --prune --max-size-mb 1024 --older-than-days 30
+    python -m indicators.feature_store --prune --stale          # entries của code/flags cũ
+    python -m indicators.feature_store --warm --config ../config.json --timeframes 5m 1h
+    python -m indicators.feature_store --selftest               # parity + eviction test
+
+Author: AI Trading System
+"""
+
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    from indicators.feature_pruning import FeatureAllowlist
+except ImportError:
+    from .feature_pruning import FeatureAllowlist
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+DEFAULT_ROOT = STRATEGIES_DIR.parent / "feature_store"
+
+# Cột đầu vào dùng để hash dữ liệu
+INPUT_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+# (store, pair, timeframe, flags_version) đang active
+_active_scope: ContextVar[Optional[Tuple['FeatureStore', str, str, str]]] = ContextVar(
+    'feature_store', default=None
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _code_version() -> str:
+    """Hash source code indicators/*.py + feature_registry.py (1 lần mỗi process)"""
+    digest = hashlib.sha1()
+    files = sorted((STRATEGIES_DIR / "indicators").glob("*.py")) + [STRATEGIES_DIR / "feature_registry.py"]
+    for path in files:
+        if path.exists():
+            digest.update(path.name.encode())
+            digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class FeatureStore:
+    """
+    Persistent feature cache theo (pair, timeframe, data, flags, code).
+
+    Eviction: LRU theo mtime (hit → touch) khi tổng dung lượng > max_size_mb.
+    Ghi atomic (file tạm + os.replace) → an toàn khi hyperopt chạy nhiều process.
+    """
+
+    MAX_SIZE_MB = 2048
+
+    def __init__(self, root: Optional[Path] = None, max_size_mb: float = MAX_SIZE_MB):
+        self.root = Path(root) if root else DEFAULT_ROOT
+        self.max_size_mb = max_size_mb
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    # ============================================================
+    # KEYS
+    # ============================================================
+
+    @staticmethod
+    def code_version() -> str:
+        return _code_version()
+
+    @staticmethod
+    def flags_version(config: Optional[dict]) -> str:
+        """FeatureFlags version/preset + toàn bộ feature_flags (gồm flags chưa đăng ký như smc_indicators)"""
+        freqai = (config or {}).get('freqai', {})
+        try:
+            from feature_registry import FeatureFlags
+            version = FeatureFlags(config or {}).get_version()
+        except ImportError:
+            version = freqai.get('feature_version', 'default')
+        payload = json.dumps(
+            {'version': version, 'flags': freqai.get('feature_flags', {})},
+            sort_keys=True, default=str
+        )
+        return f"{version}:{hashlib.sha1(payload.encode()).hexdigest()[:12]}"
+
+    @staticmethod
+    def data_hash(dataframe: DataFrame) -> str:
+        """Hash OHLCV + date + index (pandas hash_pandas_object, vectorized)"""
+        columns = [c for c in INPUT_COLUMNS if c in dataframe.columns]
+        hashed = pd.util.hash_pandas_object(dataframe[columns], index=True).values
+        return hashlib.sha1(hashed.tobytes()).hexdigest()
+
+    @staticmethod
+    def _data_range(dataframe: DataFrame) -> Tuple[str, str]:
+        """Khoảng thời gian của frame cho tên file (date column hoặc index)"""
+        if len(dataframe) == 0:
+            return 'empty', 'empty'
+        values = dataframe['date'] if 'date' in dataframe.columns else dataframe.index.to_series()
+        edges = []
+        for value in (values.iloc[0], values.iloc[-1]):
+            edges.append(value.strftime('%Y%m%d%H%M') if hasattr(value, 'strftime') else str(value))
+        return edges[0], edges[1]
+
+    @staticmethod
+    def _pair_slug(pair: str) -> str:
+        return pair.replace('/', '_').replace(':', '_')
+
+    def _entry_path(self, group: str, pair: str, timeframe: str, dataframe: DataFrame,
+                    call_key: str, flags_version: str) -> Path:
+        key_payload = json.dumps([
+            pair, timeframe, group, FeatureStore.data_hash(dataframe), list(map(str, dataframe.columns)),
+            call_key, flags_version, FeatureStore.code_version(),
+        ])
+        key = hashlib.sha1(key_payload.encode()).hexdigest()[:16]
+        start, end = FeatureStore._data_range(dataframe)
+        return self.root / FeatureStore._pair_slug(pair) / timeframe / f"{group}-{start}-{end}-{key}.feather"
+
+    # ============================================================
+    # SCOPE
+    # ============================================================
+
+    @contextmanager
+    def activate(self, pair: str, timeframe: str, config: Optional[dict] = None) -> Iterator['FeatureStore']:
+        """Bật store cho mọi nhóm feature `materialized` gọi trong block `with`"""
+        token = _active_scope.set((self, pair, timeframe, FeatureStore.flags_version(config)))
+        try:
+            yield self
+        finally:
+            _active_scope.reset(token)
+
+    @staticmethod
+    def materialized(group: str, ignore: Tuple[str, ...] = ('config',)) -> Callable:
+        """
+        Decorator cho hàm `(dataframe, ...) -> DataFrame` chỉ THÊM cột.
+
+        Arguments (trừ `ignore` - config đã nằm trong flags_version) thuộc key.
+        """
+        def decorator(func: Callable) -> Callable:
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(dataframe: DataFrame, *args, **kwargs) -> DataFrame:
+                scope = _active_scope.get()
+                if scope is None:
+                    return func(dataframe, *args, **kwargs)
+
+                store, pair, timeframe, flags_version = scope
+                bound = signature.bind(dataframe, *args, **kwargs)
+                bound.apply_defaults()
+                call_key = repr(sorted(
+                    (name, value) for name, value in list(bound.arguments.items())[1:]
+                    if name not in ignore
+                ))
+                allowlist = FeatureAllowlist.current()
+                if allowlist is not None:
+                    # feature_pruning: nhóm bị skip / cột bị prune → entry riêng
+                    call_key += f"|allowlist={allowlist.digest}"
+                path = store._entry_path(group, pair, timeframe, dataframe, call_key, flags_version)
+                return store._load_or_compute(path, dataframe, lambda: func(dataframe, *args, **kwargs),
+                                              group, pair, timeframe, flags_version)
+            return wrapper
+        return decorator
+
+    # ============================================================
+    # READ / WRITE
+    # ============================================================
+
+    def _load_or_compute(self, path: Path, dataframe: DataFrame, compute: Callable[[], DataFrame],
+                         group: str, pair: str, timeframe: str, flags_version: str) -> DataFrame:
+        stored = self._read(path, len(dataframe))
+        if stored is not None:
+            self.hits += 1
+            stored.index = dataframe.index
+            logger.debug(f"Feature store hit: {path.name}")
+            return pd.concat([dataframe, stored], axis=1)
+
+        self.misses += 1
+        input_columns = set(dataframe.columns)  # snapshot - nhiều hàm thêm cột in-place
+        result = compute()
+        new_columns = [c for c in result.columns if c not in input_columns]
+        start, end = FeatureStore._data_range(dataframe)
+        try:
+            self._write(path, result[new_columns], {
+                'pair': pair, 'timeframe': timeframe, 'group': group,
+                'rows': len(result), 'columns': len(new_columns),
+                'start': start, 'end': end,
+                'flags_version': flags_version, 'code_version': FeatureStore.code_version(),
+                'created': datetime.now().isoformat(timespec='seconds'),
+            })
+            self.evict()
+        except OSError as e:
+            logger.warning(f"Feature store write failed ({path.name}): {e}")
+        return result
+
+    @staticmethod
+    def _read(path: Path, rows: int) -> Optional[DataFrame]:
+        if not path.exists():
+            return None
+        try:
+            stored = pd.read_feather(path)
+        except Exception as e:  # file hỏng / ghi dở → tính lại
+            logger.warning(f"Feature store entry unreadable ({path.name}): {e}")
+            return None
+        if len(stored) != rows:
+            return None
+        os.utime(path)  # LRU: entry vừa dùng
+        return stored
+
+    @staticmethod
+    def _write(path: Path, features: DataFrame, meta: Dict[str, Any]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        features.reset_index(drop=True).to_feather(tmp)
+        os.replace(tmp, path)
+        path.with_suffix('.json').write_text(json.dumps(meta, indent=2))
+
+    # ============================================================
+    # MAINTENANCE
+    # ============================================================
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """Tất cả entries (metadata + size + last_used), mới dùng nhất trước"""
+        entries = []
+        if not self.root.exists():
+            return entries
+        for path in self.root.rglob("*.feather"):
+            stat = path.stat()
+            meta_path = path.with_suffix('.json')
+            try:
+                meta = json.loads(meta_path.read_text()) if meta_path.exists() else {}
+            except ValueError:
+                meta = {}
+            entries.append({
+                **meta, 'path': path, 'size_mb': stat.st_size / 1024 ** 2, 'last_used': stat.st_mtime,
+            })
+        return sorted(entries, key=lambda e: e['last_used'], reverse=True)
+
+    @staticmethod
+    def _remove(entry: Dict[str, Any]) -> None:
+        path: Path = entry['path']
+        for file in (path, path.with_suffix('.json')):
+            try:
+                file.unlink()
+            except FileNotFoundError:
+                pass
+
+    def prune(self, max_size_mb: Optional[float] = None, older_than_days: Optional[float] = None,
+              stale: bool = False, clear: bool = False) -> int:
+        """
+        Xoá entries:
+        - clear: tất cả
+        - stale: code_version khác code hiện tại
+        - older_than_days: không dùng trong N ngày
+        - max_size_mb: LRU tới khi tổng dung lượng <= max_size_mb
+
+        Returns:
+            Số entries đã xoá
+        """
+        removed = 0
+        kept = []
+        cutoff = time.time() - older_than_days * 86400 if older_than_days is not None else None
+        for entry in self.entries():
+            if (clear
+                    or (stale and entry.get('code_version') != FeatureStore.code_version())
+                    or (cutoff is not None and entry['last_used'] < cutoff)):
+                FeatureStore._remove(entry)
+                removed += 1
+            else:
+                kept.append(entry)
+
+        if max_size_mb is not None:
+            total = sum(e['size_mb'] for e in kept)
+            for entry in reversed(kept):  # ít dùng nhất trước
+                if total <= max_size_mb:
+                    break
+                FeatureStore._remove(entry)
+                total -= entry['size_mb']
+                removed += 1
+        return removed
+
+    def evict(self) -> int:
+        """LRU eviction theo max_size_mb (gọi sau mỗi lần ghi)"""
+        removed = self.prune(max_size_mb=self.max_size_mb)
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+# ============================================================
+# CLI: list / prune / warm
+# ============================================================
+
+def _load_ohlcv(datadir: Path, pair: str, timeframe: str, trading_mode: str) -> Optional[DataFrame]:
+    """Đọc OHLCV feather của freqtrade (futures: BTC_USDT_USDT-5m-futures.feather)"""
+    slug = FeatureStore._pair_slug(pair)
+    candidates = [f"{slug}-{timeframe}-futures.feather", f"{slug}-{timeframe}.feather"]
+    if trading_mode != 'futures':
+        candidates.reverse()
+    for name in candidates:
+        path = datadir / name
+        if path.exists():
+            return pd.read_feather(path)
+    return None
+
+
+def _warm(store: FeatureStore, config: dict, pairs: List[str], timeframes: List[str],
+          timerange: Optional[str]) -> None:
+    """
+    Tính trước các nhóm feature theo cùng feature_flags với strategy.
+
+    Chỉ có ích khi strategy xử lý ĐÚNG frame này (cùng pair/tf/khoảng dữ liệu) -
+    vd backtest lặp lại với cùng --timerange.
+    """
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_dag import FeatureDAG
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.smc_indicators import SMCIndicators
+    from indicators.wave_indicators import WaveIndicators
+
+    flags = config.get('freqai', {}).get('feature_flags', {})
+    DtypePolicy.set_policy(DtypePolicy.from_flags(flags))  # giống bot_start → cùng dtypes với strategy
+    FeatureDAG.set_workers(FeatureDAG.from_flags(flags))
+    exchange = config.get('exchange', {}).get('name', 'binance')
+    trading_mode = config.get('trading_mode', 'spot')
+    datadir = Path(config.get('datadir', STRATEGIES_DIR.parent / "data" / exchange))
+    if trading_mode == 'futures' and (datadir / 'futures').exists():
+        datadir = datadir / 'futures'
+
+    for pair in pairs:
+        for timeframe in timeframes:
+            ohlcv = _load_ohlcv(datadir, pair, timeframe, trading_mode)
+            if ohlcv is None:
+                print(f"  ⚠️ {pair} {timeframe}: no data in {datadir}")
+                continue
+            if timerange:
+                start, _, end = timerange.partition('-')
+                dates = pd.to_datetime(ohlcv['date'], utc=True)
+                mask = pd.Series(True, index=ohlcv.index)
+                if start:
+                    mask &= dates >= pd.Timestamp(start, tz='UTC')
+                if end:
+                    mask &= dates < pd.Timestamp(end, tz='UTC')
+                ohlcv = ohlcv[mask].reset_index(drop=True)
+
+            started = time.perf_counter()
+            with store.activate(pair, timeframe, config), FeaturePruning.scope(config):
+                dataframe = FeatureEngineering.add_all_features(ohlcv.copy(), config=config)
+                if flags.get('smc_indicators', True):
+                    dataframe = SMCIndicators.add_all_indicators(dataframe)
+                if flags.get('wave_indicators', True):
+                    dataframe = WaveIndicators.add_all_features(dataframe)
+                if flags.get('chart_patterns', True):
+                    ChartPatterns.add_all_patterns(
+                        ohlcv.copy(), full_history=flags.get('chart_patterns_full_history', False)
+                    )
+            print(f"  ✅ {pair} {timeframe}: {len(ohlcv):,} rows in {time.perf_counter() - started:.1f}s")
+
+
+def _selftest() -> None:
+    """Parity (miss → hit cho kết quả y hệt), key invalidation, eviction + timing"""
+    import tempfile
+
+    import numpy as np
+
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.feature_store import FeatureStore
+    from indicators.smc_indicators import SMCIndicators
+    from indicators.wave_indicators import WaveIndicators
+
+    np.random.seed(42)
+    n = 20_000
+    price = 40000 * np.exp(np.cumsum(np.random.normal(0.0001, 0.002, n)))
+    ohlcv = DataFrame({
+        'date': pd.date_range(start='2025-01-01', periods=n, freq='5min', tz='UTC'),
+        'open': price * (1 + np.random.uniform(-0.001, 0.001, n)),
+        'high': price * (1 + np.random.uniform(0, 0.003, n)),
+        'low': price * (1 - np.random.uniform(0, 0.003, n)),
+        'close': price,
+        'volume': np.random.uniform(100, 1000, n),
+    })
+    ohlcv['high'] = ohlcv[['open', 'close', 'high']].max(axis=1)
+    ohlcv['low'] = ohlcv[['open', 'close', 'low']].min(axis=1)
+    config = {'freqai': {'feature_flags': {'feature_store': True}}}
+
+    def pipeline(df: DataFrame) -> Tuple[DataFrame, DataFrame]:
+        basic = FeatureEngineering.add_all_features(df.copy(), config=config)
+        basic = SMCIndicators.add_all_indicators(basic)
+        basic = WaveIndicators.add_all_features(basic)
+        patterns = ChartPatterns.add_all_patterns(df.copy(), full_history=True)
+        return basic, patterns
+
+    print("=" * 60)
+    print("FEATURE STORE - SELFTEST")
+    print("=" * 60)
+
+    started = time.perf_counter()
+    expected = pipeline(ohlcv)
+    uncached = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as root:
+        store = FeatureStore(root)
+        timings = []
+        for _ in range(2):
+            started = time.perf_counter()
+            with store.activate('BTC/USDT:USDT', '5m', config):
+                actual = pipeline(ohlcv)
+            timings.append(time.perf_counter() - started)
+            for got, want in zip(actual, expected):
+                pd.testing.assert_frame_equal(got, want, check_exact=True)
+        assert store.stats()['misses'] == 4 and store.stats()['hits'] == 4, store.stats()
+        print(f"  ✅ identical output | uncached {uncached:.2f}s → miss+write {timings[0]:.2f}s "
+              f"→ hit {timings[1]:.2f}s ({uncached / timings[1]:.1f}x)")
+
+        # Key: đổi dữ liệu / flags / arguments → miss
+        changed = ohlcv.copy()
+        changed.loc[n - 1, 'close'] *= 1.001
+        with store.activate('BTC/USDT:USDT', '5m', config):
+            SMCIndicators.add_all_indicators(changed)
+        with store.activate('BTC/USDT:USDT', '5m', {'freqai': {'feature_flags': {'smc_indicators': True}}}):
+            SMCIndicators.add_all_indicators(ohlcv.copy())
+        with store.activate('BTC/USDT:USDT', '5m', config):
+            ChartPatterns.add_all_patterns(ohlcv.copy(), full_history=False)
+        assert store.stats()['misses'] == 7, store.stats()
+        print(f"  ✅ data / flags / argument changes invalidate ({len(store.entries())} entries)")
+
+        # Eviction: LRU giữ entry vừa dùng
+        with store.activate('BTC/USDT:USDT', '5m', config):
+            WaveIndicators.add_all_features(ohlcv.copy())
+        newest = store.entries()[0]
+        assert newest['group'] == 'wave'
+        removed = store.prune(max_size_mb=newest['size_mb'] + 1e-6)
+        assert [e['path'] for e in store.entries()] == [newest['path']], "LRU evicted the wrong entry"
+        print(f"  ✅ LRU prune removed {removed} entries, kept most recently used")
+
+        assert store.prune(clear=True) == 1 and not store.entries()
+        print("  ✅ prune --all")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Feature Store maintenance")
+    parser.add_argument("--root", type=Path, default=DEFAULT_ROOT, help="Feature store directory")
+    parser.add_argument("--list", "-l", action="store_true", help="List cached entries")
+    parser.add_argument("--prune", "-p", action="store_true", help="Evict entries (see filters below)")
+    parser.add_argument("--max-size-mb", type=float, help="Prune: LRU evict until total size <= N MB")
+    parser.add_argument("--older-than-days", type=float, help="Prune: entries unused for N days")
+    parser.add_argument("--stale", action="store_true", help="Prune: entries from other indicator code versions")
+    parser.add_argument("--all", action="store_true", help="Prune: everything")
+    parser.add_argument("--warm", "-w", action="store_true", help="Precompute features from local OHLCV data")
+    parser.add_argument("--config", type=Path, default=STRATEGIES_DIR.parent / "config.json")
+    parser.add_argument("--pairs", nargs="+", help="Warm: pairs (default: config pair_whitelist)")
+    parser.add_argument("--timeframes", nargs="+", help="Warm: timeframes (default: include_timeframes)")
+    parser.add_argument("--timerange", help="Warm: YYYYMMDD-YYYYMMDD slice of the data")
+    parser.add_argument("--selftest", action="store_true", help="Parity + eviction test in a temp directory")
+    args = parser.parse_args()
+
+    # Cùng class/scope với các modules (chạy `-m` → file này là __main__)
+    from indicators.feature_store import FeatureStore
+
+    store = FeatureStore(args.root)
+
+    if args.list:
+        entries = store.entries()
+        print(f"\n📦 Feature store: {store.root} ({len(entries)} entries, "
+              f"{sum(e['size_mb'] for e in entries):.1f} MB, code {FeatureStore.code_version()})")
+        for e in entries:
+            stale = "" if e.get('code_version') == FeatureStore.code_version() else "  [stale]"
+            print(f"  {e.get('pair', '?'):<16} {e.get('timeframe', '?'):<4} {e.get('group', '?'):<20} "
+                  f"{e.get('start', '?')}→{e.get('end', '?')} {e.get('rows', 0):>8,} rows "
+                  f"{e['size_mb']:7.1f} MB  used {datetime.fromtimestamp(e['last_used']):%Y-%m-%d %H:%M}{stale}")
+    elif args.prune:
+        if not any([args.all, args.stale, args.max_size_mb is not None, args.older_than_days is not None]):
+            parser.error("--prune needs --all, --stale, --max-size-mb or --older-than-days")
+        removed = store.prune(max_size_mb=args.max_size_mb, older_than_days=args.older_than_days,
+                              stale=args.stale, clear=args.all)
+        print(f"🗑️ Removed {removed} entries from {store.root}")
+    elif args.selftest:
+        _selftest()
+    elif args.warm:
+        with open(args.config) as f:
+            config = json.load(f)
+        pairs = args.pairs or config.get('exchange', {}).get('pair_whitelist', [])
+        timeframes = args.timeframes or config.get('freqai', {}).get(
+            'feature_parameters', {}).get('include_timeframes', [config.get('timeframe', '5m')])
+        print(f"🔥 Warming {store.root}: {pairs} × {timeframes}")
+        _warm(store, config, pairs, timeframes, args.timerange)
+        print(f"   {store.stats()}")
+    else:
+        parser.print_help()
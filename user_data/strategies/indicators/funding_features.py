@@ -0,0 +1,238 @@
+"""
+Funding Features - Funding rate + mark price thật từ file 8h local
+==================================================================
+user_data/data/binance/futures/ đã có `<PAIR>-8h-funding_rate.feather` và
+`<PAIR>-8h-mark.feather` (freqtrade download-data --trading-mode futures), nhưng
+strategy chỉ dùng proxy từ giá (DataEnhancement.add_funding_rate_proxy).
+
+FundingFeatures:
+- Đọc mỗi file 1 lần / process (pyarrow memory_map, chỉ các cột cần), tự đọc lại khi
+  file đổi mtime. Bảng 8h đã dẫn xuất (funding, z-score) cache theo pair
+- Căn về nến 5m / 1h / 4h bằng np.searchsorted trên timestamps đã sort (asof backward,
+  không merge mỗi lần gọi) theo THỜI ĐIỂM ĐÓNG của nến → không nhìn trước:
+    * funding event tại t: biết từ t
+    * nến mark 8h mở tại t: close chỉ biết từ t + 8h
+
+Features:
+- %-funding_rate:    funding rate gần nhất đã chốt
+- %-funding_zscore:  z-score của funding trên 21 events (7 ngày), clip [-3, 3]
+- %-mark_premium:    (giá futures / mark price - 1) tại lần chốt mark 8h gần nhất
+                     (close của nến futures đóng cùng lúc với nến mark)
+
+Không có file (spot / pair chưa download) → features = 0 + warning 1 lần / pair.
+
+Usage (strategy expand_basic, feature_flags.funding_features):
+    dataframe = FundingFeatures.add_all_features(dataframe, pair, timeframe, config)
+
+Author: AI Trading System
+"""
+
+import logging
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .dtype_policy import DtypePolicy
+    from .feature_profiler import FeatureProfiler
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES_DIR = Path(__file__).resolve().parent.parent
+
+FUNDING_INTERVAL = pd.Timedelta(hours=8)
+ZSCORE_EVENTS = 21  # 7 ngày funding 8h
+
+FEATURE_COLUMNS = ('%-funding_rate', '%-funding_zscore', '%-mark_premium')
+
+# path → (mtime, {column: ndarray}) - đọc 1 lần / process
+_files: Dict[Path, Tuple[float, Dict[str, np.ndarray]]] = {}
+
+
+class FundingTable(NamedTuple):
+    """Dữ liệu 8h của 1 pair, timestamps (ns, UTC) đã sort"""
+    funding_time: np.ndarray      # thời điểm chốt funding
+    funding_rate: np.ndarray
+    funding_zscore: np.ndarray
+    mark_known: np.ndarray        # thời điểm close của nến mark (open + 8h)
+    mark_close: np.ndarray
+
+
+class FundingFeatures:
+    """Funding / mark features từ file feather 8h local"""
+
+    # (datadir, pair) → (mtimes, FundingTable | None)
+    _tables: Dict[Tuple[Path, str], Tuple[tuple, Optional[FundingTable]]] = {}
+    _warned: Set[str] = set()
+
+    # ============================================================
+    # FILES
+    # ============================================================
+
+    @staticmethod
+    def datadir(config: Optional[dict] = None) -> Path:
+        """Giống FeatureStore._warm: config.datadir hoặc user_data/data/<exchange>[/futures]"""
+        config = config or {}
+        exchange = config.get('exchange', {}).get('name', 'binance')
+        datadir = Path(config.get('datadir', STRATEGIES_DIR.parent / "data" / exchange))
+        if (datadir / 'futures').exists():
+            datadir = datadir / 'futures'
+        return datadir
+
+    @staticmethod
+    def _path(datadir: Path, pair: str, kind: str) -> Optional[Path]:
+        """'BTC/USDT:USDT' → BTC_USDT_USDT-8h-<kind>.feather (fallback tên cũ BTC_USDT_-8h-<kind>)"""
+        base, _, settle = pair.partition(':')
+        slug = base.replace('/', '_')
+        for name in (f"{slug}_{settle}", f"{slug}_"):
+            path = datadir / f"{name}-8h-{kind}.feather"
+            if path.exists():
+                return path
+        return None
+
+    @staticmethod
+    def _read(path: Path, columns: Tuple[str, ...]) -> Dict[str, np.ndarray]:
+        """Memory-map file feather 1 lần / process (đọc lại khi mtime đổi)"""
+        mtime = path.stat().st_mtime
+        cached = _files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, columns=['date', *columns], memory_map=True)
+        data = {'date': FundingFeatures._to_ns(table.column('date').to_pandas())}
+        for column in columns:
+            data[column] = table.column(column).to_numpy().astype('float64')
+        _files[path] = (mtime, data)
+        return data
+
+    @staticmethod
+    def _to_ns(dates) -> np.ndarray:
+        """datetime (naive = UTC hoặc tz-aware) → int64 ns UTC"""
+        values = pd.to_datetime(pd.Series(dates), utc=True).dt.tz_convert(None)
+        return values.to_numpy(dtype='datetime64[ns]').view('int64')
+
+    @staticmethod
+    def table(pair: str, config: Optional[dict] = None) -> Optional[FundingTable]:
+        """Bảng 8h của pair (cache theo pair + mtime files), None nếu thiếu file"""
+        datadir = FundingFeatures.datadir(config)
+        funding_path = FundingFeatures._path(datadir, pair, 'funding_rate')
+        mark_path = FundingFeatures._path(datadir, pair, 'mark')
+        mtimes = tuple(p.stat().st_mtime if p else None for p in (funding_path, mark_path))
+        key = (datadir, pair)
+        cached = FundingFeatures._tables.get(key)
+        if cached is not None and cached[0] == mtimes:
+            return cached[1]
+
+        table = None
+        if funding_path is None or mark_path is None:
+            if pair not in FundingFeatures._warned:
+                FundingFeatures._warned.add(pair)
+                logger.warning(f"Funding features: no 8h funding_rate/mark files for {pair} in {datadir} - using 0")
+        else:
+            funding = FundingFeatures._read(funding_path, ('open',))
+            mark = FundingFeatures._read(mark_path, ('close',))
+            funding_order = np.argsort(funding['date'], kind='stable')
+            mark_order = np.argsort(mark['date'], kind='stable')
+            rate = funding['open'][funding_order]
+            rolling = pd.Series(rate).rolling(ZSCORE_EVENTS, min_periods=3)
+            zscore = ((pd.Series(rate) - rolling.mean()) / (rolling.std() + 1e-12)).clip(-3, 3)
+            table = FundingTable(
+                funding_time=funding['date'][funding_order],
+                funding_rate=rate,
+                funding_zscore=zscore.fillna(0).to_numpy(),
+                mark_known=mark['date'][mark_order] + FUNDING_INTERVAL.value,
+                mark_close=mark['close'][mark_order],
+            )
+        FundingFeatures._tables[key] = (mtimes, table)
+        return table
+
+    # ============================================================
+    # ALIGN (sorted-search asof)
+    # ============================================================
+
+    @staticmethod
+    def _asof(times: np.ndarray, at: np.ndarray) -> np.ndarray:
+        """Index phần tử cuối cùng có times <= at (-1 nếu chưa có)"""
+        return np.searchsorted(times, at, side='right') - 1
+
+    @staticmethod
+    def _timeframe_delta(timeframe: str) -> pd.Timedelta:
+        """'5m' / '1h' / '4h' / '1d' → Timedelta"""
+        units = {'m': 'min', 'h': 'h', 'd': 'D', 'w': 'W'}
+        return pd.Timedelta(int(timeframe[:-1]), unit=units[timeframe[-1]])
+
+    @staticmethod
+    @FeatureProfiler.profiled
+    def add_all_features(dataframe: DataFrame, pair: str, timeframe: str,
+                         config: Optional[dict] = None) -> DataFrame:
+        """
+        Thêm %-funding_rate, %-funding_zscore, %-mark_premium theo thời điểm đóng nến.
+        """
+        n = len(dataframe)
+        features = {name: np.zeros(n) for name in FEATURE_COLUMNS}
+        table = FundingFeatures.table(pair, config)
+        if table is not None and n:
+            open_time = FundingFeatures._to_ns(dataframe['date'])
+            close_time = open_time + FundingFeatures._timeframe_delta(timeframe).value
+
+            idx = FundingFeatures._asof(table.funding_time, close_time)
+            known = idx >= 0
+            features['%-funding_rate'][known] = table.funding_rate[idx[known]]
+            features['%-funding_zscore'][known] = table.funding_zscore[idx[known]]
+
+            # Premium tại mỗi lần chốt mark: close của nến futures đóng đúng lúc đó
+            # (hoặc gần nhất trước đó, trong cùng khoảng 8h)
+            candle = FundingFeatures._asof(close_time, table.mark_known)
+            synced = (candle >= 0) & (table.mark_known - close_time[np.maximum(candle, 0)] < FUNDING_INTERVAL.value)
+            close = dataframe['close'].to_numpy(dtype='float64')
+            premium = np.zeros(len(table.mark_known))
+            premium[synced] = close[candle[synced]] / table.mark_close[synced] - 1
+            idx = FundingFeatures._asof(table.mark_known, close_time)
+            known = idx >= 0
+            features['%-mark_premium'][known] = premium[idx[known]].clip(-0.05, 0.05)
+
+        features_df = DtypePolicy.apply(DataFrame(features, index=dataframe.index))
+        return pd.concat([dataframe, features_df], axis=1)
+
+
+# ============================================================
+# TEST (file local thật nếu có)
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    # Cùng class với các modules import (chạy `-m` → file này là __main__)
+    from indicators.feature_store import _load_ohlcv
+    from indicators.funding_features import FundingFeatures
+
+    datadir = FundingFeatures.datadir()
+    print("=" * 60)
+    print(f"FUNDING FEATURES - {datadir}")
+    print("=" * 60)
+    for pair in ('BTC/USDT:USDT', 'ETH/USDT:USDT'):
+        table = FundingFeatures.table(pair)
+        if table is None:
+            print(f"  ⚠️ {pair}: no 8h files")
+            continue
+        for timeframe in ('15m', '1h', '4h'):
+            ohlcv = _load_ohlcv(datadir, pair, timeframe, 'futures')
+            if ohlcv is None:
+                continue
+            started = time.perf_counter()
+            result = FundingFeatures.add_all_features(ohlcv, pair, timeframe)
+            elapsed = (time.perf_counter() - started) * 1000
+
+            # Không nhìn trước: giá trị của nến = funding cuối cùng có time <= close của nến
+            close_time = FundingFeatures._to_ns(ohlcv['date']) + FundingFeatures._timeframe_delta(timeframe).value
+            row = len(ohlcv) // 2
+            expected = table.funding_rate[table.funding_time <= close_time[row]][-1]
+            assert np.isclose(result['%-funding_rate'].iloc[row], expected, rtol=1e-6)
+            stats = result[list(FEATURE_COLUMNS)].describe().loc[['mean', 'std']]
+            print(f"  ✅ {pair} {timeframe}: {len(ohlcv):,} rows in {elapsed:.1f} ms\n{stats.round(5).to_string()}")
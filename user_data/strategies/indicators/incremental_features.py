@@ -0,0 +1,908 @@
+"""
+Incremental Feature Engine - O(1) mỗi nến cho Live Trading
+===========================================================
+Với process_only_new_candles = True, mỗi nến 5m mới FreqAI vẫn gọi
+FeatureEngineering.add_all_features trên TOÀN BỘ dataframe, cho mọi pair
+và mọi timeframe trong include_timeframes.
+
+Module này giữ state theo (pair, timeframe) và chỉ tính row mới:
+- EMA accumulators (TA-Lib EMA 10/20/50/200)
+- Wilder smoothing state (RSI, ATR, +DI/-DI/ADX)
+- OBV + pandas ewm(span=10) state (OBV EMA, Volume EMA)
+- Candle streak counter
+- Ring buffers (WINDOW nến) cho OHLCV và các series đệ quy cần diff/rolling
+
+Các nhóm chỉ dùng rolling window (log returns, ROC, Williams %R, CCI, BB,
+MFI, CMF, S/R, market regime, confluence, VSA) được tính bằng numpy trên
+ring buffer cho riêng nến mới - không gọi pandas/TA-Lib trên toàn bộ lịch sử.
+
+⚠️ Công thức ở đây là bản scalar của FeatureEngineering._add_* và
+VSAIndicators._calc_*. Sửa feature ở batch path → phải sửa ở đây, và chạy
+parity test (so với batch path, np.allclose rtol=1e-9):
+    make parity-incremental
+
+Sai khác duy nhất với batch path là sai số làm tròn của running-sum
+(pandas rolling mean/std, TA-Lib SMA/BBANDS/MFI) vốn tích luỹ trên toàn bộ
+lịch sử ở batch path.
+
+FreqAI live truyền cửa sổ trượt độ dài cố định: batch path neo OBV và seed
+EMA / Wilder tại nến đầu cửa sổ → khi nến đầu đổi, recursive states được seed
+lại trên cửa sổ (TA-Lib + replay Wilder, ~4 ms / 1000 nến, vẫn < batch path).
+Nến mới == batch path trên cùng cửa sổ; các row cũ giữ giá trị lúc được tính.
+
+Usage (strategy):
+    engine = IncrementalFeatureEngine()
+    dataframe = engine.add_all_features(dataframe, metadata, config=self.config)
+
+Author: AI Trading System
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import talib.abstract as ta
+from pandas import DataFrame
+
+try:
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .dtype_policy import DtypePolicy
+    from .feature_engineering import FeatureEngineering
+    from .feature_profiler import FeatureProfiler
+
+logger = logging.getLogger(__name__)
+
+# Ring buffer size: >= rolling(100) của %-volatility_zscore + các shift/diff
+WINDOW = 150
+
+# Lịch sử tối thiểu để bootstrap: warm-up của EMA200 / ADX phải nằm ngoài ring buffer
+MIN_HISTORY = 400
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+def _is_zero(value: float) -> bool:
+    """TA_IS_ZERO macro của TA-Lib"""
+    return -0.00000001 < value < 0.00000001
+
+
+def _true_range(high: float, low: float, prev_close: float) -> float:
+    """TRUE_RANGE macro của TA-Lib (cùng thứ tự phép tính)"""
+    greatest = high - low
+    val = abs(high - prev_close)
+    if val > greatest:
+        greatest = val
+    val = abs(low - prev_close)
+    if val > greatest:
+        greatest = val
+    return greatest
+
+
+def _last(values) -> float:
+    """Giá trị cuối của Series / ndarray / scalar"""
+    if np.ndim(values) == 0:
+        return float(values)
+    return float(np.asarray(values)[-1])
+
+
+def _date_keys(dataframe: DataFrame) -> np.ndarray:
+    """Cột 'date' → int64 (ns) để so sánh/searchsorted nhanh"""
+    return dataframe['date'].to_numpy(dtype='datetime64[ns]').view('int64')
+
+
+def _stochrsi_k(rsi: np.ndarray, length: int = 14, k: int = 3) -> float:
+    """pandas_ta.stochrsi %K tại nến cuối (stoch của RSI → SMA(k))"""
+    windows = np.lib.stride_tricks.sliding_window_view(rsi[-(length + k - 1):], length)
+    lowest = windows.min(axis=1)
+    value_range = windows.max(axis=1) - lowest
+    if (value_range == 0).any():
+        value_range = value_range + np.finfo(float).eps
+    stoch = 100 * (rsi[-k:] - lowest)
+    stoch /= value_range
+    return stoch.sum() / k
+
+
+# ============================================================
+# RING BUFFER
+# ============================================================
+
+class _RingBuffer:
+    """
+    Fixed-size ring buffer với view liên tục O(1).
+
+    Mỗi giá trị được ghi 2 lần (pos và pos + size) nên
+    buffer[pos:pos + size] luôn là cửa sổ theo thứ tự cũ → mới.
+    """
+
+    def __init__(self, size: int):
+        self._buf = np.full(2 * size, np.nan)
+        self._size = size
+        self._pos = 0
+
+    def fill(self, values: np.ndarray) -> None:
+        """Khởi tạo từ lịch sử (lấy size phần tử cuối)"""
+        for value in values[-self._size:]:
+            self.append(value)
+
+    def append(self, value) -> None:
+        self._buf[self._pos] = value
+        self._buf[self._pos + self._size] = value
+        self._pos = (self._pos + 1) % self._size
+
+    def view(self) -> np.ndarray:
+        return self._buf[self._pos:self._pos + self._size]
+
+
+# ============================================================
+# RECURSIVE INDICATOR STATES (bit-exact với TA-Lib / pandas)
+# ============================================================
+
+class _EmaState:
+    """TA-Lib EMA: prevMA = ((x - prevMA) * k) + prevMA"""
+
+    def __init__(self, period: int, value: float):
+        self.k = 2.0 / (period + 1)
+        self.value = value
+
+    def update(self, x: float) -> float:
+        self.value = ((x - self.value) * self.k) + self.value
+        return self.value
+
+
+class _EwmState:
+    """pandas Series.ewm(span=..., adjust=True).mean() (không có NaN)"""
+
+    def __init__(self, span: int, values: np.ndarray, last_value: float):
+        alpha = 2.0 / (span + 1)
+        self.factor = 1.0 - alpha
+        # old_wt chỉ phụ thuộc số quan sát → replay lại đúng thứ tự phép tính
+        old_wt = 1.0
+        for _ in range(len(values) - 1):
+            old_wt *= self.factor
+            old_wt += 1.0
+        self.old_wt = old_wt
+        self.weighted = last_value
+
+    def update(self, cur: float) -> float:
+        self.old_wt *= self.factor
+        if self.weighted != cur:
+            self.weighted = self.old_wt * self.weighted + 1.0 * cur
+            self.weighted /= (self.old_wt + 1.0)
+        self.old_wt += 1.0
+        return self.weighted
+
+
+class _RsiState:
+    """TA-Lib RSI (Wilder smoothing): giữ avg gain / avg loss"""
+
+    def __init__(self, close: np.ndarray, period: int = 14):
+        self.period = period
+        prev = close[0]
+        gain = loss = 0.0
+        for x in close[1:period + 1]:
+            diff = x - prev
+            prev = x
+            if diff < 0:
+                loss -= diff
+            else:
+                gain += diff
+        self.prev = prev
+        self.loss = loss / period
+        self.gain = gain / period
+        for x in close[period + 1:]:
+            self.update(x)
+
+    def update(self, x: float) -> float:
+        diff = x - self.prev
+        self.prev = x
+        self.loss *= (self.period - 1)
+        self.gain *= (self.period - 1)
+        if diff < 0:
+            self.loss -= diff
+        else:
+            self.gain += diff
+        self.loss /= self.period
+        self.gain /= self.period
+        total = self.gain + self.loss
+        return 100.0 * (self.gain / total) if not _is_zero(total) else 0.0
+
+
+class _AtrState:
+    """TA-Lib ATR: prevATR = (prevATR * (n-1) + TR) / n"""
+
+    def __init__(self, value: float, prev_close: float, period: int = 14):
+        self.period = period
+        self.value = value
+        self.prev_close = prev_close
+
+    def update(self, high: float, low: float, close: float) -> float:
+        tr = _true_range(high, low, self.prev_close)
+        self.prev_close = close
+        self.value *= self.period - 1
+        self.value += tr
+        self.value /= self.period
+        return self.value
+
+
+class _DmiState:
+    """TA-Lib ADX / PLUS_DI / MINUS_DI: chung 1 Wilder state cho +DM, -DM, TR"""
+
+    def __init__(self, high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = 14):
+        self.period = period
+        self.prev_high, self.prev_low, self.prev_close = high[0], low[0], close[0]
+        self.plus_dm = self.minus_dm = self.tr = 0.0
+
+        # 1. Tổng (period - 1) giá trị đầu
+        for i in range(1, period):
+            diff_p, diff_m = self._deltas(high[i], low[i])
+            if diff_m > 0 and diff_p < diff_m:
+                self.minus_dm += diff_m
+            elif diff_p > 0 and diff_p > diff_m:
+                self.plus_dm += diff_p
+            self.tr += _true_range(self.prev_high, self.prev_low, self.prev_close)
+            self.prev_close = close[i]
+
+        # 2. ADX đầu tiên = trung bình DX của period nến tiếp theo
+        sum_dx = 0.0
+        for i in range(period, 2 * period):
+            plus_di, minus_di = self._smooth(high[i], low[i], close[i])
+            total = minus_di + plus_di
+            if not _is_zero(self.tr) and not _is_zero(total):
+                sum_dx += 100.0 * (abs(minus_di - plus_di) / total)
+        self.adx = sum_dx / period
+
+        # 3. Replay phần còn lại
+        for i in range(2 * period, len(close)):
+            self.update(high[i], low[i], close[i])
+
+    def _deltas(self, high: float, low: float) -> Tuple[float, float]:
+        diff_p = high - self.prev_high
+        self.prev_high = high
+        diff_m = self.prev_low - low
+        self.prev_low = low
+        return diff_p, diff_m
+
+    def _smooth(self, high: float, low: float, close: float) -> Tuple[float, float]:
+        diff_p, diff_m = self._deltas(high, low)
+        self.minus_dm -= self.minus_dm / self.period
+        self.plus_dm -= self.plus_dm / self.period
+        if diff_m > 0 and diff_p < diff_m:
+            self.minus_dm += diff_m
+        elif diff_p > 0 and diff_p > diff_m:
+            self.plus_dm += diff_p
+        self.tr = self.tr - (self.tr / self.period) + _true_range(self.prev_high, self.prev_low, self.prev_close)
+        self.prev_close = close
+        if _is_zero(self.tr):
+            return 0.0, 0.0
+        return 100.0 * (self.plus_dm / self.tr), 100.0 * (self.minus_dm / self.tr)
+
+    def update(self, high: float, low: float, close: float) -> Tuple[float, float, float]:
+        """Returns (plus_di, minus_di, adx)"""
+        plus_di, minus_di = self._smooth(high, low, close)
+        total = minus_di + plus_di
+        if not _is_zero(self.tr) and not _is_zero(total):
+            dx = 100.0 * (abs(minus_di - plus_di) / total)
+            self.adx = ((self.adx * (self.period - 1)) + dx) / self.period
+        return plus_di, minus_di, self.adx
+
+
+class _ObvState:
+    """TA-Lib OBV"""
+
+    def __init__(self, value: float, prev_close: float):
+        self.value = value
+        self.prev_close = prev_close
+
+    def update(self, close: float, volume: float) -> float:
+        if close > self.prev_close:
+            self.value += volume
+        elif close < self.prev_close:
+            self.value -= volume
+        self.prev_close = close
+        return self.value
+
+
+# ============================================================
+# PER-PAIR STATE
+# ============================================================
+
+class _PairState:
+    """State của 1 (pair, timeframe): recursive indicators + ring buffers + feature history"""
+
+    EMA_PERIODS = (10, 20, 50, 200)
+
+    def __init__(self, dataframe: DataFrame, result: DataFrame, vsa_enabled: bool):
+        n_orig = len(dataframe.columns)
+        self.columns: List[str] = list(result.columns[n_orig:])
+        self.int_dtypes = {c: dt for c, dt in result[self.columns].dtypes.items() if dt != np.float64}
+
+        o, h, l, c, v = (dataframe[col].to_numpy(dtype=float) for col in OHLCV)
+
+        # --- Ring buffers (OHLCV) ---
+        self._ohlcv = [_RingBuffer(WINDOW) for _ in OHLCV]
+        for ring, values in zip(self._ohlcv, (o, h, l, c, v)):
+            ring.fill(values)
+
+        # --- Tách VSA columns (không ffill) khỏi FeatureEngineering columns ---
+        vsa_names = set(self._vsa_row(*self._views())) if vsa_enabled else set()
+        self.fe_columns = [col for col in self.columns if col not in vsa_names]
+        self.vsa_columns = [col for col in self.columns if col in vsa_names]
+        self._fe_index = {name: j for j, name in enumerate(self.fe_columns)}
+        self._last_filled = result[self.fe_columns].iloc[-1].to_numpy(dtype=float)
+
+        self._seed_recursive(dataframe)
+
+        # --- Feature history (để trả về full dataframe) ---
+        self._dates = _date_keys(dataframe).copy()
+        self._values = result[self.columns].to_numpy(dtype=float)
+        self._size = len(self._dates)
+        self._last_ohlcv = np.array([o[-1], h[-1], l[-1], c[-1], v[-1]])
+        self._verified = False
+
+    # ------------------------------------------------------------
+
+    def _seed_recursive(self, dataframe: DataFrame) -> None:
+        """
+        Khởi tạo recursive states (EMA, Wilder, OBV, ewm, streak) + ring buffers của chúng
+        từ dataframe - neo tại nến ĐẦU của dataframe như batch path.
+
+        Gọi lúc bootstrap và mỗi khi nến đầu của frame đổi (FreqAI live truyền cửa sổ
+        trượt độ dài cố định → batch path neo lại OBV / seed lại EMA tại đầu cửa sổ).
+        """
+        o, h, l, c, v = (dataframe[col].to_numpy(dtype=float) for col in OHLCV)
+
+        # --- Recursive states ---
+        close = dataframe['close']
+        self._ema = {p: _EmaState(p, _last(ta.EMA(close, timeperiod=p))) for p in self.EMA_PERIODS}
+        self._dmi = _DmiState(h, l, c)
+        self._rsi = _RsiState(c)
+        atr = np.asarray(ta.ATR(dataframe['high'], dataframe['low'], close, timeperiod=14), dtype=float)
+        self._atr = _AtrState(atr[-1], c[-1])
+        obv = pd.Series(np.asarray(ta.OBV(close, dataframe['volume']), dtype=float))
+        self._obv = _ObvState(obv.iloc[-1], c[-1])
+        obv_ema = obv.ewm(span=10).mean()
+        vol_ema = dataframe['volume'].ewm(span=10).mean()
+        self._obv_ewm = _EwmState(10, obv.values, obv_ema.iloc[-1])
+        self._vol_ewm = _EwmState(10, v, vol_ema.iloc[-1])
+
+        direction = np.sign(c - o)
+        run = 1
+        while run < len(direction) and direction[-run - 1] == direction[-1]:
+            run += 1
+        self._direction, self._streak = direction[-1], run
+
+        # --- Ring buffers (series đệ quy cần diff/rolling) ---
+        self._rsi_tail = _RingBuffer(WINDOW)
+        self._rsi_tail.fill(np.asarray(ta.RSI(close, timeperiod=14), dtype=float))
+        self._atr_tail = _RingBuffer(WINDOW)
+        self._atr_tail.fill(atr)
+        self._atr_pct_tail = _RingBuffer(WINDOW)
+        self._atr_pct_tail.fill(atr / c)
+        self._obv_tail = _RingBuffer(WINDOW)
+        self._obv_tail.fill(obv.values)
+        self._obv_ema_tail = _RingBuffer(WINDOW)
+        self._obv_ema_tail.fill(obv_ema.values)
+        self._vol_ema_tail = _RingBuffer(WINDOW)
+        self._vol_ema_tail.fill(vol_ema.values)
+        self._anchor = _date_keys(dataframe)[0]
+
+    def _views(self) -> Tuple[np.ndarray, ...]:
+        """(open, high, low, close, volume) - WINDOW nến gần nhất, nến hiện tại ở cuối"""
+        return tuple(ring.view() for ring in self._ohlcv)
+
+    def _recursive_row(self, o: float, h: float, l: float, c: float, v: float) -> dict:
+        """Features phụ thuộc toàn bộ lịch sử - cập nhật từ state"""
+        row = {}
+
+        # EMA features (_add_ema_features)
+        emas = {}
+        for period, state in self._ema.items():
+            prev = state.value
+            ema = state.update(c)
+            emas[period] = ema
+            row[f'%-dist_to_ema_{period}'] = (c - ema) / (ema + 1e-10)
+            row[f'%-ema_slope_{period}'] = (ema - prev) / (ema + 1e-10)
+        row['%-ema_20_50_diff'] = (emas[20] - emas[50]) / (emas[50] + 1e-10)
+
+        # Trend strength (_add_trend_strength)
+        plus_di, minus_di, adx = self._dmi.update(h, l, c)
+        row['%-adx'] = adx / 100
+        row['%-di_diff'] = (plus_di - minus_di) / (plus_di + minus_di + 1e-10)
+
+        # RSI / StochRSI
+        rsi = self._rsi.update(c)
+        self._rsi_tail.append(rsi)
+        rsi_tail = self._rsi_tail.view()
+        row['%-rsi_normalized'] = (rsi - 50) / 50
+        row['%-rsi_slope'] = (rsi - rsi_tail[-4]) / 100
+        row['%-stochrsi'] = (_stochrsi_k(rsi_tail) - 50) / 50
+
+        # ATR
+        atr = self._atr.update(h, l, c)
+        self._atr_tail.append(atr)
+        self._atr_pct_tail.append(atr / c)
+        row['%-atr_pct'] = atr / c
+        row['%-atr_change'] = atr / self._atr_tail.view()[-6] - 1
+
+        # OBV / Volume EMA
+        obv = self._obv.update(c, v)
+        self._obv_tail.append(obv)
+        obv_tail = self._obv_tail.view()
+        row['%-obv_change'] = (obv - obv_tail[-6]) / (obv_tail[-20:].std(ddof=1) + 1e-10)
+
+        obv_ema = self._obv_ewm.update(obv)
+        self._obv_ema_tail.append(obv_ema)
+        row['%-obv_slope'] = (obv_ema - self._obv_ema_tail.view()[-4]) / (abs(obv_ema) + 1e-10)
+
+        vol_ema = self._vol_ewm.update(v)
+        self._vol_ema_tail.append(vol_ema)
+        row['%-volume_trend'] = (vol_ema - self._vol_ema_tail.view()[-6]) / (vol_ema + 1e-10)
+
+        # Candle streak
+        direction = np.sign(c - o)
+        if direction == self._direction:
+            self._streak += 1
+        else:
+            self._direction, self._streak = direction, 1
+        row['%-candle_streak'] = (self._streak * direction) / 10
+
+        return row
+
+    @staticmethod
+    def _windowed_row(row: dict, o_, h_, l_, c_, v_) -> None:
+        """Features chỉ dùng rolling window - cùng công thức với các _add_* của FeatureEngineering"""
+        o, h, l, c, v = o_[-1], h_[-1], l_[-1], c_[-1], v_[-1]
+
+        # 1. Log returns / Price momentum
+        for period in (1, 5, 10, 20):
+            row[f'%-log_return_{period}'] = np.log(c / c_[-1 - period])
+        row['%-log_volume_change'] = np.log((v + 1) / (v_[-2] + 1))
+        for period in (5, 10, 20):
+            prev = c_[-1 - period]
+            row[f'%-roc_{period}'] = (c - prev) / prev if prev != 0 else 0.0
+        row['%-momentum_5'] = (c - c_[-6]) / (c_[-6] + 1e-10)
+
+        # 3. Williams %R (14) / CCI (20) - TA-Lib
+        highest, lowest = h_[-14:].max(), l_[-14:].min()
+        diff = (highest - lowest) / -100.0
+        willr = (highest - c) / diff if diff != 0 else 0.0
+        row['%-willr_normalized'] = (willr + 50) / 50
+
+        typical = (h_[-20:] + l_[-20:] + c_[-20:]) / 3
+        average = typical.mean()
+        deviation = np.abs(typical - average).sum()
+        delta = typical[-1] - average
+        cci = delta / (0.015 * (deviation / 20)) if delta != 0 and deviation != 0 else 0.0
+        row['%-cci_normalized'] = cci / 200
+
+        # 4. Bollinger Bands (20, 2) / True Range
+        middle = c_[-20:].mean()
+        std = c_[-20:].std()
+        upper, lower = middle + 2 * std, middle - 2 * std
+        row['%-bb_width'] = (upper - lower) / middle
+        row['%-bb_position'] = (c - lower) / (upper - lower + 1e-10)
+        row['%-dist_to_bb_upper'] = (upper - c) / c
+        row['%-dist_to_bb_lower'] = (c - lower) / c
+        row['%-true_range_pct'] = _true_range(h, l, c_[-2]) / c
+
+        # 5. Volume: MFI (14) - TA-Lib
+        typical_mfi = (h_[-15:] + l_[-15:] + c_[-15:]) / 3
+        money_flow = typical_mfi[1:] * v_[-14:]
+        change = np.diff(typical_mfi)
+        pos_flow, neg_flow = money_flow[change > 0].sum(), money_flow[change < 0].sum()
+        total = pos_flow + neg_flow
+        mfi = 100.0 * (pos_flow / total) if total >= 1.0 else 0.0
+        row['%-mfi_normalized'] = (mfi - 50) / 50
+
+        volume = v_[-20:]
+        row['%-volume_ratio'] = v / (volume.mean() + 1e-10)
+
+        # CMF (20) - pandas_ta (non_zero_range cho nến high == low)
+        spread = h_[-20:] - l_[-20:]
+        ad = 2 * c_[-20:] - (h_[-20:] + l_[-20:])
+        ad *= volume / np.where(spread == 0, np.finfo(float).eps, spread)
+        row['%-cmf'] = ad.sum() / volume.sum()
+
+        vwap_approx = (typical * volume).sum() / (volume.sum() + 1e-10)
+        row['%-dist_to_vwap'] = (c - vwap_approx) / (vwap_approx + 1e-10)
+
+        # 6. Candle features (streak nằm trong _recursive_row)
+        body = abs(c - o)
+        row['%-body_size'] = body / c
+        row['%-candle_direction'] = np.sign(c - o)
+        upper_shadow = h - max(c, o)
+        lower_shadow = min(c, o) - l
+        row['%-upper_shadow'] = upper_shadow / c
+        row['%-lower_shadow'] = lower_shadow / c
+        row['%-shadow_to_body'] = (upper_shadow + lower_shadow) / (body + 1e-10)
+
+        # 7. Support / Resistance (50)
+        rolling_high, rolling_low = h_[-50:].max(), l_[-50:].min()
+        row['%-dist_to_high'] = (rolling_high - c) / c
+        row['%-dist_to_low'] = (c - rolling_low) / c
+        row['%-range_position'] = (c - rolling_low) / (rolling_high - rolling_low + 1e-10)
+        row['%-is_new_high'] = float(h >= rolling_high)
+        row['%-is_new_low'] = float(l <= rolling_low)
+
+    def _regime_row(self, row: dict, o_, h_, l_, c_, v_) -> None:
+        """Market regime - cùng công thức với _add_market_regime_features"""
+        c = c_[-1]
+        for period in (10, 20):
+            change = abs(c - c_[-1 - period])
+            volatility = np.abs(np.diff(c_[-1 - period:])).sum()
+            row[f'%-ker_{period}'] = np.clip(change / (volatility + 1e-10), 0, 1)
+
+        atr_pct = self._atr_pct_tail.view()[-100:]
+        zscore = (atr_pct[-1] - atr_pct.mean()) / (atr_pct.std(ddof=1) + 1e-10)
+        row['%-volatility_zscore'] = np.clip(zscore, -3, 3)
+        row['%-volatility_regime'] = -1.0 if zscore < -1 else (1.0 if zscore > 1 else 0.0)
+
+        high_low = h_[-14:] - l_[-14:]
+        true_range = h_[-14:].max() - l_[-14:].min()
+        choppiness = 100 * np.log10(high_low.sum() / (true_range + 1e-10)) / np.log10(14)
+        row['%-choppiness'] = np.clip((choppiness - 50) / 50, -1, 1)
+
+        price_range = h_[-20:] - l_[-20:]
+        avg_range = price_range.mean()
+        row['%-range_expansion'] = (price_range[-1] - avg_range) / (avg_range + 1e-10)
+
+    @staticmethod
+    def _confluence_row(row: dict, o_, h_, l_, c_, v_) -> None:
+        """Confluence - cùng công thức với _add_confluence_features (đọc raw features của row)"""
+        trend_score = (
+            float(row['%-dist_to_ema_10'] > 0) +
+            float(row['%-dist_to_ema_20'] > 0) +
+            float(row['%-dist_to_ema_50'] > 0) +
+            float(row['%-adx'] > 0.25) +
+            float(row['%-ker_10'] > 0.5)
+        ) / 5
+        row['%-trend_confluence'] = trend_score
+
+        momentum_score = (
+            float(row['%-rsi_normalized'] > 0) +
+            float(row['%-mfi_normalized'] > 0) +
+            float(row['%-cmf'] > 0) +
+            float(row['%-obv_slope'] > 0)
+        ) / 4
+        row['%-momentum_confluence'] = momentum_score
+
+        volume = v_[-20:]
+        spread = h_[-20:] - l_[-20:]
+        rel_vol = volume[-1] / (volume.mean() + 1e-10)
+        rel_spread = spread[-1] / (spread.mean() + 1e-10)
+
+        vsa_score = 0.0
+        if rel_vol > 1.5 and rel_spread > 1.5:
+            vsa_score = 1.0
+        if rel_vol > 1.5 and rel_spread < 0.8:
+            vsa_score = -1.0
+        if rel_vol < 0.8 and rel_spread > 1.5:
+            vsa_score = -0.5
+        row['%-vsa_score'] = vsa_score
+
+        pressure = (
+            np.clip(row['%-obv_slope'], -0.1, 0.1) * 10 +
+            row['%-cmf'] +
+            np.clip(row['%-volume_trend'], -0.5, 0.5) * 2 +
+            vsa_score * 0.5
+        ) / 3.5
+        row['%-money_pressure'] = np.clip(pressure, -1, 1)
+
+        row['%-overall_score'] = (
+            trend_score * 0.4 +
+            momentum_score * 0.35 +
+            (pressure + 1) / 2 * 0.25
+        )
+
+        log_effort = np.log1p(volume / (spread + 1e-10))
+        row['%-wyckoff_volume_effort'] = (log_effort[-1] - log_effort.mean()) / (log_effort.std(ddof=1) + 1e-10)
+
+        # Rolling corr như pandas: (E[xy] - E[x]E[y]) * n/(n-1) / sqrt(var_x * var_y)
+        close = c_[-20:]
+        n = len(close)
+        numerator = ((close * volume).mean() - close.mean() * volume.mean()) * (n / (n - 1))
+        denominator = (close.var(ddof=1) * volume.var(ddof=1)) ** 0.5
+        corr = numerator / denominator
+        row['%-vsa_divergence'] = 0.0 if np.isnan(corr) else corr
+
+        row['%-bearish_score'] = 1 - row['%-overall_score']
+
+    @staticmethod
+    def _vsa_row(o_, h_, l_, c_, v_) -> dict:
+        """VSA (period 20) - cùng công thức với VSAIndicators._calc_*"""
+        o, h, l, c, v = o_[-1], h_[-1], l_[-1], c_[-1], v_[-1]
+        row = {}
+
+        spread = h_[-20:] - l_[-20:]
+        avg_spread = spread.mean()
+        current_spread = spread[-1]
+        close_position = (c - l) / (current_spread + 1e-10)
+        row['%-vsa_spread_ratio'] = current_spread / (avg_spread + 1e-10)
+        row['%-vsa_body_spread_ratio'] = abs(c - o) / (current_spread + 1e-10)
+        row['%-vsa_close_position'] = close_position
+
+        price_change = np.abs(c_[-20:] - c_[-21:-1])
+        avg_vol = v_[-20:].mean()
+        vol_ratio = v / (avg_vol + 1e-10)
+        price_ratio = price_change[-1] / (price_change.mean() + 1e-10)
+        row['%-vsa_effort_result'] = vol_ratio / (price_ratio + 1e-10)
+        row['%-vsa_anomaly'] = float(vol_ratio > 2.0 and price_ratio < 0.8)
+
+        vol_zscore = (v - avg_vol) / (v_[-20:].std(ddof=1) + 1e-10)
+        row['%-vsa_volume_zscore'] = np.clip(vol_zscore, -3, 3)
+        is_bearish, is_bullish = c < o, c > o
+        climax = vol_zscore > 2.5 and current_spread > 1.5 * avg_spread
+        row['%-vsa_selling_climax'] = float(climax and is_bearish and close_position > 0.6)
+        row['%-vsa_buying_climax'] = float(climax and is_bullish and close_position < 0.4)
+
+        absorption = v > 1.5 * avg_vol and current_spread < 0.7 * avg_spread
+        row['%-vsa_absorption'] = float(absorption)
+        row['%-vsa_bullish_absorption'] = float(absorption and is_bearish)
+        row['%-vsa_bearish_absorption'] = float(absorption and is_bullish)
+
+        quiet = v < 0.7 * avg_vol and current_spread < 0.8 * avg_spread
+        row['%-vsa_no_demand'] = float(is_bullish and quiet)
+        row['%-vsa_no_supply'] = float(is_bearish and quiet)
+
+        row['%-vsa_stopping_volume'] = float(v > 2.0 * avg_vol and close_position > 0.75 and l < l_[-2])
+        return row
+
+    def _step(self, o: float, h: float, l: float, c: float, v: float) -> np.ndarray:
+        """Append 1 nến mới → 1 row features (đã ffill), theo thứ tự self.columns"""
+        for ring, value in zip(self._ohlcv, (o, h, l, c, v)):
+            ring.append(value)
+        views = self._views()
+
+        with np.errstate(all='ignore'):
+            row = self._recursive_row(o, h, l, c, v)
+            self._windowed_row(row, *views)
+            self._regime_row(row, *views)
+            self._confluence_row(row, *views)
+            vsa = self._vsa_row(*views) if self.vsa_columns else {}
+
+        if not self._verified:
+            missing = set(self.fe_columns) - set(row)
+            if missing:
+                raise RuntimeError(f"Incremental engine thiếu features: {sorted(missing)}")
+            self._verified = True
+
+        # ffill().fillna(0) như batch path (VSA không ffill)
+        raw = np.array([row[name] for name in self.fe_columns], dtype=float)
+        filled = np.where(np.isnan(raw), self._last_filled, raw)
+        self._last_filled = filled
+
+        if not self.vsa_columns:
+            return filled
+        return np.concatenate([filled, [vsa[name] for name in self.vsa_columns]])
+
+    def _append_history(self, date: int, values: np.ndarray) -> None:
+        if self._size == len(self._dates):
+            capacity = max(2 * self._size, 16)
+            self._dates = np.resize(self._dates, capacity)
+            self._values = np.resize(self._values, (capacity, self._values.shape[1]))
+        self._dates[self._size] = date
+        self._values[self._size] = values
+        self._size += 1
+
+    def extend(self, dataframe: DataFrame) -> Optional[DataFrame]:
+        """
+        Tính features cho các nến mới của dataframe.
+
+        Returns:
+            DataFrame features (index = dataframe.index), hoặc None nếu dataframe
+            không nối tiếp state (gap, nến bị sửa, quá nhiều nến mới) → caller chạy batch.
+        """
+        dates = _date_keys(dataframe)
+        if len(dates) == 0:
+            return None
+
+        last_date = self._dates[self._size - 1]
+        pos = int(np.searchsorted(dates, last_date))
+        if pos >= len(dates) or dates[pos] != last_date:
+            return None
+        if len(dates) - pos - 1 > WINDOW:
+            return None
+
+        ohlcv = dataframe[OHLCV].to_numpy(dtype=float)
+        if not np.array_equal(ohlcv[pos], self._last_ohlcv):
+            return None
+
+        start = int(np.searchsorted(self._dates[:self._size], dates[0]))
+        if self._size - start != pos + 1 or not np.array_equal(self._dates[start:self._size], dates[:pos + 1]):
+            return None
+
+        # Cửa sổ trượt: batch path neo lại tại nến đầu mới → seed lại trên phần đã biết của frame
+        if dates[0] != self._anchor:
+            self._seed_recursive(dataframe.iloc[:pos + 1])
+
+        for i in range(pos + 1, len(dates)):
+            self._append_history(dates[i], self._step(*ohlcv[i]))
+        self._last_ohlcv = ohlcv[-1].copy()
+
+        # Giới hạn bộ nhớ: chỉ giữ lịch sử bằng độ dài dataframe hiện tại
+        if start > len(dates):
+            self._dates = self._dates[start:self._size].copy()
+            self._values = self._values[start:self._size].copy()
+            self._size -= start
+            start = 0
+
+        features = DataFrame(self._values[start:self._size], index=dataframe.index, columns=self.columns)
+        # Dtypes của batch path (DtypePolicy quyết định theo tên cột → không đổi giữa các nến)
+        return DtypePolicy.astype(features, self.int_dtypes)
+
+
+# ============================================================
+# ENGINE
+# ============================================================
+
+class IncrementalFeatureEngine:
+    """
+    Stateful wrapper quanh FeatureEngineering.add_all_features.
+
+    - Lần đầu mỗi (pair, timeframe): chạy batch path + bootstrap state
+    - Các lần sau: chỉ tính nến mới từ state (O(1) theo độ dài lịch sử)
+    - Bất kỳ bất thường nào (gap, nến bị sửa, lịch sử ngắn) → fallback batch path
+    """
+
+    def __init__(self):
+        self._states: Dict[Tuple[str, str], _PairState] = {}
+        self._disabled: set = set()
+        self.stats = {'incremental': 0, 'batch': 0}
+
+    def reset(self, pair: Optional[str] = None) -> None:
+        """Xoá state + cờ disabled sau lỗi extend (toàn bộ hoặc của 1 pair) → bootstrap lại"""
+        if pair is None:
+            self._states.clear()
+            self._disabled.clear()
+        else:
+            self._states = {k: s for k, s in self._states.items() if k[0] != pair}
+            self._disabled = {k for k in self._disabled if k[0] != pair}
+
+    @FeatureProfiler.profiled
+    def add_all_features(self, dataframe: DataFrame, metadata: dict, config: dict = None) -> DataFrame:
+        """
+        Drop-in thay cho FeatureEngineering.add_all_features (cùng columns, cùng thứ tự).
+
+        Args:
+            dataframe: OHLCV DataFrame (có cột 'date')
+            metadata: FreqAI metadata ({'pair': ..., 'tf': ...})
+            config: Strategy config (feature_flags)
+        """
+        key = (metadata.get('pair'), metadata.get('tf'))
+        state = self._states.get(key)
+
+        if state is not None:
+            start = time.perf_counter()
+            try:
+                features = state.extend(dataframe)
+            except Exception as e:
+                logger.warning(f"Incremental features failed for {key}: {e} - fallback batch")
+                self._disabled.add(key)
+                features = None
+            if features is not None:
+                self.stats['incremental'] += 1
+                logger.debug(f"Incremental features {key}: {(time.perf_counter() - start) * 1000:.1f} ms")
+                return pd.concat([dataframe, features], axis=1)
+
+        result = FeatureEngineering.add_all_features(dataframe, config=config)
+        self.stats['batch'] += 1
+
+        self._states.pop(key, None)
+        if key not in self._disabled and len(dataframe) >= MIN_HISTORY:
+            self._states[key] = _PairState(dataframe, result, FeatureEngineering.vsa_enabled(config))
+
+        return result
+
+
+# ============================================================
+# PARITY TEST
+# ============================================================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    np.random.seed(42)
+    n = 3000
+    n_boot = 2000
+    dates = pd.date_range(start='2025-01-01', periods=n, freq='5min', tz='UTC')
+
+    returns = np.random.normal(0.0001, 0.002, n)
+    price = 40000 * np.exp(np.cumsum(returns))
+    sample_data = pd.DataFrame({
+        'date': dates,
+        'open': price * (1 + np.random.uniform(-0.001, 0.001, n)),
+        'high': price * (1 + np.random.uniform(0, 0.003, n)),
+        'low': price * (1 - np.random.uniform(0, 0.003, n)),
+        'close': price,
+        'volume': np.abs(np.random.uniform(100, 1000, n) * (1 + 0.5 * np.random.randn(n)))
+    })
+    sample_data['high'] = sample_data[['open', 'close', 'high']].max(axis=1)
+    sample_data['low'] = sample_data[['open', 'close', 'low']].min(axis=1)
+
+    # Batch path trên toàn bộ dữ liệu
+    start = time.perf_counter()
+    batch = FeatureEngineering.add_all_features(sample_data.copy())
+    batch_ms = (time.perf_counter() - start) * 1000
+
+    # Incremental: bootstrap n_boot nến, sau đó stream từng nến
+    engine = IncrementalFeatureEngine()
+    metadata = {'pair': 'BTC/USDT:USDT', 'tf': '5m'}
+    engine.add_all_features(sample_data.iloc[:n_boot].copy(), metadata)
+
+    start = time.perf_counter()
+    for i in range(n_boot + 1, n + 1):
+        incremental = engine.add_all_features(sample_data.iloc[:i].copy(), metadata)
+    step_ms = (time.perf_counter() - start) * 1000 / (n - n_boot)
+
+    print("=" * 60)
+    print("INCREMENTAL FEATURE ENGINE - PARITY TEST")
+    print("=" * 60)
+    print(f"Stats: {engine.stats}")
+
+    assert list(incremental.columns) == list(batch.columns), "Column order mismatch"
+    assert (incremental.dtypes == batch.dtypes).all(), "Dtype mismatch"
+
+    cols = [c for c in batch.columns if c.startswith('%-')]
+    expected = batch[cols].iloc[n_boot:].to_numpy(dtype=float)
+    actual = incremental[cols].iloc[n_boot:].to_numpy(dtype=float)
+
+    failed = []
+    for j, col in enumerate(cols):
+        if not np.allclose(actual[:, j], expected[:, j], rtol=1e-9, atol=1e-12, equal_nan=True):
+            diff = np.nanmax(np.abs(actual[:, j] - expected[:, j]))
+            failed.append((col, diff))
+
+    for col, diff in failed:
+        print(f"  ❌ {col}: max abs diff = {diff:.3e}")
+    print(f"\nParity: {len(cols) - len(failed)}/{len(cols)} features match")
+    print(f"Batch path ({n} rows):  {batch_ms:.1f} ms")
+    print(f"Incremental per candle: {step_ms:.2f} ms")
+
+    assert not failed, "Incremental output differs from batch path"
+    print("✅ Incremental path matches batch path")
+
+    # Cửa sổ trượt độ dài cố định (như FreqAI live): nến cuối == batch path trên CÙNG cửa sổ
+    # (batch neo lại OBV / seed lại EMA, Wilder tại nến đầu cửa sổ). Bước 2 nến → nhiều nến mới 1 lần.
+    length, steps = 1000, 40
+    sliding = IncrementalFeatureEngine()
+    sliding.add_all_features(sample_data.iloc[:length].copy(), metadata)
+    slide_failed, slide_ms, end = {}, [], length
+    for step in range(steps):
+        end += 2 if step % 10 == 9 else 1
+        window = sample_data.iloc[end - length:end].copy()
+        start = time.perf_counter()
+        live = sliding.add_all_features(window, metadata)
+        slide_ms.append((time.perf_counter() - start) * 1000)
+        reference = FeatureEngineering.add_all_features(window.copy())
+        for col in cols:
+            a, b = live[col].iloc[-1], reference[col].iloc[-1]
+            if not np.allclose(a, b, rtol=1e-9, atol=1e-12, equal_nan=True):
+                slide_failed[col] = max(slide_failed.get(col, 0.0), abs(a - b))
+    assert sliding.stats == {'incremental': steps, 'batch': 1}, sliding.stats
+
+    for col, diff in slide_failed.items():
+        print(f"  ❌ sliding {col}: max abs diff = {diff:.3e}")
+    print(f"Sliding window ({length} rows): {len(cols) - len(slide_failed)}/{len(cols)} features match "
+          f"on the last row, {np.median(slide_ms):.2f} ms / candle")
+    assert not slide_failed, "Incremental output differs from batch path on sliding windows"
+    print("✅ Incremental path matches batch path on fixed-length sliding windows")
+
+    # extend lỗi → key bị disabled (batch path), reset(pair) → bootstrap + incremental lại
+    def broken_extend(dataframe):
+        raise RuntimeError("simulated extend failure")
+
+    engine._states[('BTC/USDT:USDT', '5m')].extend = broken_extend
+    engine.add_all_features(sample_data.iloc[:n].copy(), metadata)
+    assert ('BTC/USDT:USDT', '5m') in engine._disabled and not engine._states
+    engine.reset('ETH/USDT:USDT')
+    assert ('BTC/USDT:USDT', '5m') in engine._disabled, "reset of another pair must keep the flag"
+    engine.reset('BTC/USDT:USDT')
+    engine.add_all_features(sample_data.iloc[:n - 1].copy(), metadata)
+    before = engine.stats['incremental']
+    engine.add_all_features(sample_data.iloc[:n].copy(), metadata)
+    assert engine.stats['incremental'] == before + 1, "reset must re-enable the incremental path"
+    print("✅ reset(pair) re-enables incremental path after a failed extend")
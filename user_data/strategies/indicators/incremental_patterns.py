@@ -0,0 +1,535 @@
+"""
+Incremental Chart Patterns - Swing / pattern detector theo từng nến cho Live
+============================================================================
+Live/dry_run: mỗi nến 5m mới ChartPatterns.add_all_patterns chạy lại swing
+extrema, mọi detector và summarize_patterns trên TOÀN BỘ dataframe.
+
+Module này giữ state theo (pair, timeframe):
+- Chuỗi swing đã xác nhận (chỉ phần còn cần: 3 swing cuối mỗi phía + window)
+- Patterns đang "sống" trong window 100 nến (legacy) → hết hạn khi swing đầu
+  của pattern ra khỏi window: xoá ô đã đánh dấu + tính lại summary của row đó
+- Ring buffers high/low/close + cumsum close (cho mean_close như rolling_trendlines)
+
+Mỗi nến mới:
+- Xác nhận tối đa 1 swing high + 1 swing low (extrema tại nến - order, như
+  argrelextrema(np.greater_equal / np.less_equal, order=5))
+- Swing high mới → chỉ kiểm tra Double Top + Head & Shoulders mà nó hoàn tất;
+  swing low mới → Double Bottom + Inverse H&S
+- Wedge / Triangle / Flag + summary: scalar trên ring buffer cho nến mới
+
+⚠️ Công thức là bản scalar của ChartPatterns.detect_* / summarize_patterns. Sửa
+batch path → sửa ở đây và chạy parity test (np.allclose rtol=1e-9):
+    make parity-incremental-patterns
+
+Giống IncrementalFeatureEngine: sai khác duy nhất là làm tròn của rolling mean
+(flag) và các nến đầu frame khi freqtrade cắt bớt lịch sử (state giữ giá trị đã
+stream, batch path tính lại warm-up).
+
+Usage (strategy expand_all):
+    detector = IncrementalPatternDetector()
+    dataframe = detector.add_all_patterns(dataframe, metadata, full_history=False)
+
+Author: AI Trading System
+"""
+
+import bisect
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_profiler import FeatureProfiler
+    from indicators.incremental_features import MIN_HISTORY, _date_keys, _RingBuffer
+except ImportError:
+    from .chart_patterns import ChartPatterns
+    from .dtype_policy import DtypePolicy
+    from .feature_profiler import FeatureProfiler
+    from .incremental_features import MIN_HISTORY, _date_keys, _RingBuffer
+
+logger = logging.getLogger(__name__)
+
+# Tham số mặc định của ChartPatterns.add_all_patterns
+ORDER = 5
+TOLERANCE = 0.02
+SWING_LOOKBACK = 100
+TREND_LOOKBACK = 50
+POLE_LOOKBACK, FLAG_LOOKBACK = 20, 15
+
+# Ring buffer: >= TREND_LOOKBACK + 1 (window + nến hiện tại) và cumsum cần thêm 1
+WINDOW = 64
+
+# Số nến mới tối đa mỗi lần gọi trước khi fallback batch
+MAX_NEW_CANDLES = 150
+
+# Output của add_all_patterns, đúng thứ tự cột
+PATTERN_COLUMNS = [
+    'swing_high', 'swing_low',
+    '%-double_top', '%-double_top_neckline', '%-double_bottom', '%-double_bottom_neckline',
+    '%-head_shoulders', '%-head_shoulders_inv',
+    '%-rising_wedge', '%-falling_wedge',
+    '%-ascending_triangle', '%-descending_triangle', '%-symmetrical_triangle',
+    '%-bull_flag', '%-bear_flag',
+    '%-pattern_bull_score', '%-pattern_bear_score', '%-pattern_net_score',
+    '%-pattern_strength', '%-has_pattern',
+]
+COLUMN_INDEX = {name: j for j, name in enumerate(PATTERN_COLUMNS)}
+
+# Cùng thứ tự cộng như summarize_patterns
+BULLISH_WEIGHTS = (('%-double_bottom', 1.0), ('%-head_shoulders_inv', 1.5), ('%-falling_wedge', 0.8),
+                   ('%-ascending_triangle', 0.7), ('%-bull_flag', 0.6))
+BEARISH_WEIGHTS = (('%-double_top', 1.0), ('%-head_shoulders', 1.5), ('%-rising_wedge', 0.8),
+                   ('%-descending_triangle', 0.7), ('%-bear_flag', 0.6))
+MAX_SCORE = sum(weight for _, weight in BULLISH_WEIGHTS)
+
+
+class _Event:
+    """1 pattern đã đánh dấu tại `row` (vị trí tuyệt đối), bắt đầu từ swing `first`"""
+
+    __slots__ = ('kind', 'row', 'first', 'cells', 'applied')
+
+    def __init__(self, kind: str, row: int, first: int, cells: Dict[str, float], applied: bool = False):
+        self.kind = kind
+        self.row = row
+        self.first = first
+        self.cells = cells
+        self.applied = applied
+
+
+# ============================================================
+# PER-PAIR STATE
+# ============================================================
+
+class _PatternState:
+    """State của 1 (pair, timeframe): swings + patterns đang sống + ring buffers + history"""
+
+    def __init__(self, dataframe: DataFrame, result: DataFrame, full_history: bool):
+        self.lookback = None if full_history else SWING_LOOKBACK
+        high, low, close = (dataframe[col].to_numpy(dtype=float) for col in ('high', 'low', 'close'))
+        n = len(dataframe)
+
+        self._high, self._low, self._close, self._csum = (_RingBuffer(WINDOW) for _ in range(4))
+        self._high.fill(high)
+        self._low.fill(low)
+        self._close.fill(close)
+        self._csum.fill(np.cumsum(close))
+
+        self._x = np.arange(TREND_LOOKBACK, dtype=float) - (TREND_LOOKBACK - 1) / 2
+        self._sxx = self._x @ self._x
+
+        # Swings đã xác nhận: (vị trí nến xác nhận, giá) - cùng SwingEvents của batch path
+        swings = ChartPatterns.swing_events(dataframe, ORDER)
+        self._highs: List[Tuple[int, float]] = list(zip(swings.high_idx.tolist(), swings.high_price.tolist()))
+        self._lows: List[Tuple[int, float]] = list(zip(swings.low_idx.tolist(), swings.low_price.tolist()))
+        self._total = {'high': len(self._highs), 'low': len(self._lows)}
+
+        # History (float64, như batch trước DtypePolicy)
+        self._dates = _date_keys(dataframe).copy()
+        self._values = result[PATTERN_COLUMNS].to_numpy(dtype=float)
+        self._size = n
+        self._last_bar = np.array([high[-1], low[-1], close[-1]])
+
+        # Patterns có thể còn đổi trạng thái (hết hạn / gate của inverse H&S)
+        self._pending: List[_Event] = []
+        window_start = self._window_start()
+        gate = self._hs_gate(window_start)
+        for side, swings_list in (('high', self._highs), ('low', self._lows)):
+            for k in range(len(swings_list)):
+                if swings_list[k][0] < window_start:
+                    continue
+                for event in self._events(side, k, close[swings_list[k][0]]):
+                    if event.first >= window_start and (self.lookback or (event.kind == 'hs_inv' and not gate)):
+                        event.applied = event.kind != 'hs_inv' or gate
+                        self._pending.append(event)
+        self._prune()
+
+    # ============================================================
+    # SWINGS + SWING PATTERNS
+    # ============================================================
+
+    def _window_start(self) -> int:
+        """Vị trí tuyệt đối của nến đầu window swing (0 = toàn bộ lịch sử)"""
+        return 0 if self.lookback is None else self._size - self.lookback
+
+    def _count(self, side: str, window_start: int) -> int:
+        if self.lookback is None:
+            return self._total[side]
+        swings = self._highs if side == 'high' else self._lows
+        return len(swings) - bisect.bisect_left(swings, (window_start, -np.inf))
+
+    def _hs_gate(self, window_start: int) -> bool:
+        """detect_head_and_shoulders chỉ chạy khi window có >= 3 highs và >= 2 lows (cả bản inverse)"""
+        return self._count('high', window_start) >= 3 and self._count('low', window_start) >= 2
+
+    @staticmethod
+    def _between(swings: List[Tuple[int, float]], left: int, right: int) -> List[float]:
+        """Giá các swing có left < idx < right"""
+        start = bisect.bisect_right(swings, (left, np.inf))
+        stop = bisect.bisect_left(swings, (right, -np.inf))
+        return [price for _, price in swings[start:stop]]
+
+    def _events(self, side: str, k: int, close: float) -> List[_Event]:
+        """
+        Patterns mà swing thứ k của `side` hoàn tất (như detect_double_* / detect_head_and_shoulders).
+        close: close tại nến xác nhận swing (neckline → tỷ lệ)
+        """
+        if side == 'high':
+            same, other, reducer = self._highs, self._lows, min
+        else:
+            same, other, reducer = self._lows, self._highs, max
+        row, price2 = same[k]
+        events = []
+
+        if k >= 1:
+            first, price1 = same[k - 1]
+            middle = self._between(other, first, row)
+            if middle and not abs(price1 - price2) / price1 > TOLERANCE:
+                neckline = reducer(middle)
+                depth = (price1 - neckline) if side == 'high' else (neckline - price1)
+                confidence = float(np.minimum(1.0, depth / price1 * 10))
+                name = 'double_top' if side == 'high' else 'double_bottom'
+                events.append(_Event(name, row, first, {
+                    f'%-{name}': confidence, f'%-{name}_neckline': neckline / close,
+                }))
+
+        if k >= 2:
+            (first, ls_price), (head_row, head_price) = same[k - 2], same[k - 1]
+            rs_price = price2
+            if side == 'high':
+                shape = head_price > ls_price and head_price > rs_price
+            else:
+                shape = head_price < ls_price and head_price < rs_price
+            left = self._between(other, first, head_row)
+            right = self._between(other, head_row, row)
+            if shape and left and right and not abs(ls_price - rs_price) / ls_price > TOLERANCE:
+                neckline_avg = (reducer(left) + reducer(right)) / 2
+                if side == 'high':
+                    confidence = float(np.minimum(1.0, (head_price - neckline_avg) / head_price * 10))
+                    events.append(_Event('hs', row, first, {'%-head_shoulders': confidence}))
+                else:
+                    confidence = float(np.minimum(1.0, (neckline_avg - head_price) / neckline_avg * 10))
+                    events.append(_Event('hs_inv', row, first, {'%-head_shoulders_inv': confidence}))
+        return events
+
+    def _prune(self) -> None:
+        """Chỉ giữ swings còn cần: 3 swing cuối mỗi phía (+ xen giữa) và window"""
+        keep_from = self._window_start() if self.lookback else np.inf
+        for swings in (self._highs, self._lows):
+            if len(swings) >= 3:
+                keep_from = min(keep_from, swings[-3][0])
+            elif swings:
+                keep_from = min(keep_from, swings[0][0])
+        for swings in (self._highs, self._lows):
+            cut = bisect.bisect_left(swings, (keep_from, -np.inf))
+            if cut:
+                del swings[:cut]
+
+    def _set_event(self, event: _Event, active: bool, dirty: set) -> None:
+        if event.applied == active:
+            return
+        for name, value in event.cells.items():
+            self._values[event.row, COLUMN_INDEX[name]] = value if active else 0.0
+        event.applied = active
+        dirty.add(event.row)
+
+    # ============================================================
+    # ROLLING PATTERNS + SUMMARY (nến hiện tại)
+    # ============================================================
+
+    def _rolling_row(self, row: np.ndarray) -> None:
+        """detect_wedge / detect_triangle / detect_flag tại nến hiện tại (window không gồm nến hiện tại)"""
+        high, low, close, csum = self._high.view(), self._low.view(), self._close.view(), self._csum.view()
+
+        # rolling_trendlines: window = TREND_LOOKBACK nến trước nến hiện tại
+        high_slope = np.dot(high[-TREND_LOOKBACK - 1:-1], self._x) / self._sxx
+        low_slope = np.dot(low[-TREND_LOOKBACK - 1:-1], self._x) / self._sxx
+        mean_close = (csum[-2] - csum[-TREND_LOOKBACK - 2]) / TREND_LOOKBACK
+        high_pct = high_slope / mean_close
+        low_pct = low_slope / mean_close
+
+        if high_pct > 0 and low_pct > 0 and low_pct > high_pct:
+            row[COLUMN_INDEX['%-rising_wedge']] = np.minimum(1.0, np.abs((low_pct - high_pct) / high_pct))
+        if high_pct < 0 and low_pct < 0 and high_pct < low_pct:
+            row[COLUMN_INDEX['%-falling_wedge']] = np.minimum(1.0, np.abs((low_pct - high_pct) / low_pct))
+
+        if np.abs(high_pct) < 0.0001 and low_pct > 0.0005:
+            row[COLUMN_INDEX['%-ascending_triangle']] = np.minimum(1.0, low_pct * 1000)
+        if high_pct < -0.0005 and np.abs(low_pct) < 0.0001:
+            row[COLUMN_INDEX['%-descending_triangle']] = np.minimum(1.0, np.abs(high_pct) * 1000)
+        abs_high, abs_low = np.abs(high_pct), np.abs(low_pct)
+        convergence = np.minimum(abs_high, abs_low) / np.maximum(abs_high, abs_low)
+        if high_pct < 0 and low_pct > 0 and convergence > 0.5:
+            row[COLUMN_INDEX['%-symmetrical_triangle']] = convergence
+
+        # detect_flag: pole = [i - 35, i - 15), flag = [i - 15, i)
+        total = POLE_LOOKBACK + FLAG_LOOKBACK
+        pole_first = close[-total - 1]
+        pole_move = (close[-FLAG_LOOKBACK - 2] - pole_first) / pole_first
+        flag_first = close[-FLAG_LOOKBACK - 1]
+        flag_move = (close[-2] - flag_first) / flag_first
+        flag_range = ((high[-FLAG_LOOKBACK - 1:-1].max() - low[-FLAG_LOOKBACK - 1:-1].min())
+                      / close[-FLAG_LOOKBACK - 1:-1].mean())
+        if (pole_move > 0.03 and flag_move < 0 and np.abs(flag_move) < pole_move * 0.5
+                and flag_range < pole_move * 0.3):
+            row[COLUMN_INDEX['%-bull_flag']] = np.minimum(1.0, pole_move * 10)
+        if (pole_move < -0.03 and flag_move > 0 and flag_move < np.abs(pole_move) * 0.5
+                and flag_range < np.abs(pole_move) * 0.3):
+            row[COLUMN_INDEX['%-bear_flag']] = np.minimum(1.0, np.abs(pole_move) * 10)
+
+    def _summarize(self, i: int) -> None:
+        """summarize_patterns cho 1 row của history"""
+        values = self._values[i]
+        bull = 0.0
+        for name, weight in BULLISH_WEIGHTS:
+            bull += np.clip(values[COLUMN_INDEX[name]], 0, 1) * weight
+        bear = 0.0
+        for name, weight in BEARISH_WEIGHTS:
+            bear += np.clip(values[COLUMN_INDEX[name]], 0, 1) * weight
+        bull_score, bear_score = bull / MAX_SCORE, bear / MAX_SCORE
+        strength = max(bull_score, bear_score)
+        values[COLUMN_INDEX['%-pattern_bull_score']] = bull_score
+        values[COLUMN_INDEX['%-pattern_bear_score']] = bear_score
+        values[COLUMN_INDEX['%-pattern_net_score']] = bull_score - bear_score
+        values[COLUMN_INDEX['%-pattern_strength']] = strength
+        values[COLUMN_INDEX['%-has_pattern']] = float(strength > 0.1)
+
+    # ============================================================
+    # STEP
+    # ============================================================
+
+    def _append_history(self, date: int) -> int:
+        if self._size == len(self._dates):
+            capacity = max(2 * self._size, 16)
+            self._dates = np.resize(self._dates, capacity)
+            self._values = np.resize(self._values, (capacity, self._values.shape[1]))
+        i = self._size
+        self._dates[i] = date
+        self._values[i] = 0.0
+        self._size += 1
+        return i
+
+    def _step(self, date: int, high: float, low: float, close: float) -> None:
+        """Append 1 nến mới: tối đa 1 swing mỗi phía, patterns nó hoàn tất, rolling patterns, summary"""
+        self._high.append(high)
+        self._low.append(low)
+        self._close.append(close)
+        self._csum.append(self._csum.view()[-1] + close)
+        i = self._append_history(date)
+        row = self._values[i]
+        dirty = {i}
+
+        with np.errstate(all='ignore'):
+            self._rolling_row(row)
+
+        # Swing tại nến i - ORDER: >= / <= ORDER nến mỗi bên
+        window_start = self._window_start()
+        new_events = []
+        for side, ring, swings, column in (('high', self._high, self._highs, 'swing_high'),
+                                           ('low', self._low, self._lows, 'swing_low')):
+            values = ring.view()[-2 * ORDER - 1:]
+            middle = values[ORDER]
+            if (np.all(middle >= values) if side == 'high' else np.all(middle <= values)):
+                swings.append((i, float(middle)))
+                self._total[side] += 1
+                row[COLUMN_INDEX[column]] = middle
+                new_events += self._events(side, len(swings) - 1, close)
+
+        # Patterns mới + hết hạn / gate (inverse H&S) của patterns đang sống
+        gate = self._hs_gate(window_start)
+        for event in new_events:
+            if event.first >= window_start:
+                self._pending.append(event)
+        still_pending = []
+        for event in self._pending:
+            alive = event.first >= window_start
+            self._set_event(event, alive and (event.kind != 'hs_inv' or gate), dirty)
+            if alive and (self.lookback or (event.kind == 'hs_inv' and not gate)):
+                still_pending.append(event)
+        self._pending = still_pending
+
+        for j in dirty:
+            self._summarize(j)
+        self._prune()
+
+    def extend(self, dataframe: DataFrame) -> Optional[DataFrame]:
+        """
+        Patterns cho các nến mới của dataframe.
+
+        Returns:
+            DataFrame PATTERN_COLUMNS (index = dataframe.index), hoặc None nếu dataframe
+            không nối tiếp state (gap, nến bị sửa, quá nhiều nến mới) → caller chạy batch.
+        """
+        dates = _date_keys(dataframe)
+        if len(dates) == 0:
+            return None
+
+        last_date = self._dates[self._size - 1]
+        pos = int(np.searchsorted(dates, last_date))
+        if pos >= len(dates) or dates[pos] != last_date or len(dates) - pos - 1 > MAX_NEW_CANDLES:
+            return None
+
+        bars = dataframe[['high', 'low', 'close']].to_numpy(dtype=float)
+        if not np.array_equal(bars[pos], self._last_bar):
+            return None
+
+        start = int(np.searchsorted(self._dates[:self._size], dates[0]))
+        if self._size - start != pos + 1 or not np.array_equal(self._dates[start:self._size], dates[:pos + 1]):
+            return None
+
+        for i in range(pos + 1, len(dates)):
+            self._step(dates[i], *bars[i])
+        self._last_bar = bars[-1].copy()
+
+        # Giới hạn bộ nhớ: giữ lịch sử bằng độ dài dataframe + window swing
+        trim = start - (self.lookback or 0)
+        if trim > len(dates):
+            self._dates = self._dates[trim:self._size].copy()
+            self._values = self._values[trim:self._size].copy()
+            self._size -= trim
+            start -= trim
+            self._shift(trim)
+
+        return DataFrame(self._values[start:self._size], index=dataframe.index, columns=PATTERN_COLUMNS)
+
+    def _shift(self, offset: int) -> None:
+        """Dời vị trí tuyệt đối sau khi cắt history"""
+        self._highs[:] = [(idx - offset, price) for idx, price in self._highs]
+        self._lows[:] = [(idx - offset, price) for idx, price in self._lows]
+        for event in self._pending:
+            event.row -= offset
+            event.first -= offset
+
+
+# ============================================================
+# DETECTOR
+# ============================================================
+
+class IncrementalPatternDetector:
+    """
+    Stateful wrapper quanh ChartPatterns.add_all_patterns.
+
+    - Lần đầu mỗi (pair, timeframe): chạy batch path + bootstrap state
+    - Các lần sau: chỉ xử lý nến mới (không phụ thuộc độ dài lịch sử)
+    - Bất thường (gap, nến bị sửa, đổi full_history, lịch sử ngắn) → fallback batch path
+    """
+
+    def __init__(self):
+        self._states: Dict[Tuple[str, str], _PatternState] = {}
+        self._disabled: set = set()
+        self.stats = {'incremental': 0, 'batch': 0}
+
+    def reset(self, pair: Optional[str] = None) -> None:
+        """Xoá state + cờ disabled sau lỗi extend (toàn bộ hoặc của 1 pair) → bootstrap lại"""
+        if pair is None:
+            self._states.clear()
+            self._disabled.clear()
+        else:
+            self._states = {k: s for k, s in self._states.items() if k[0] != pair}
+            self._disabled = {k for k in self._disabled if k[0] != pair}
+
+    @FeatureProfiler.profiled
+    def add_all_patterns(self, dataframe: DataFrame, metadata: dict, full_history: bool = False) -> DataFrame:
+        """
+        Drop-in thay cho ChartPatterns.add_all_patterns (cùng columns, cùng thứ tự, cùng dtypes).
+
+        Args:
+            dataframe: OHLCV DataFrame (có cột 'date')
+            metadata: FreqAI metadata ({'pair': ..., 'tf': ...})
+            full_history: như ChartPatterns.add_all_patterns
+        """
+        key = (metadata.get('pair'), metadata.get('tf'))
+        state = self._states.get(key)
+
+        if state is not None and (state.lookback is None) == full_history:
+            start = time.perf_counter()
+            try:
+                patterns = state.extend(dataframe)
+            except Exception as e:
+                logger.warning(f"Incremental patterns failed for {key}: {e} - fallback batch")
+                self._disabled.add(key)
+                patterns = None
+            if patterns is not None:
+                self.stats['incremental'] += 1
+                logger.debug(f"Incremental patterns {key}: {(time.perf_counter() - start) * 1000:.1f} ms")
+                new_columns = [c for c in PATTERN_COLUMNS if c not in dataframe.columns]
+                if len(new_columns) == len(PATTERN_COLUMNS):
+                    result = pd.concat([dataframe, patterns], axis=1)
+                else:
+                    result = dataframe.copy()
+                    result[PATTERN_COLUMNS] = patterns
+                return DtypePolicy.apply(result, new_columns)
+
+        result = ChartPatterns.add_all_patterns(dataframe, full_history=full_history)
+        self.stats['batch'] += 1
+
+        self._states.pop(key, None)
+        if (key not in self._disabled and len(dataframe) >= MIN_HISTORY
+                and all(c in result.columns for c in PATTERN_COLUMNS)):
+            self._states[key] = _PatternState(dataframe, result, full_history)
+
+        return result
+
+
+# ============================================================
+# PARITY TEST
+# ============================================================
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+
+    # Cùng classes với các modules import (chạy `-m` → file này là __main__)
+    from indicators.incremental_patterns import IncrementalPatternDetector, PATTERN_COLUMNS
+
+    rng = np.random.default_rng(7)
+    n = 3000
+    n_boot = 2000
+    dates = pd.date_range(start='2025-01-01', periods=n, freq='5min', tz='UTC')
+    price = 40000 * np.exp(np.cumsum(rng.normal(0.0, 0.003, n)))
+    sample_data = pd.DataFrame({
+        'date': dates,
+        'open': price * (1 + rng.uniform(-0.001, 0.001, n)),
+        'high': price * (1 + rng.uniform(0, 0.003, n)),
+        'low': price * (1 - rng.uniform(0, 0.003, n)),
+        'close': price,
+        'volume': rng.uniform(100, 1000, n),
+    })
+    sample_data['high'] = sample_data[['open', 'close', 'high']].max(axis=1)
+    sample_data['low'] = sample_data[['open', 'close', 'low']].min(axis=1)
+
+    print("=" * 60)
+    print("INCREMENTAL CHART PATTERNS - PARITY TEST")
+    print("=" * 60)
+    for full_history in (False, True):
+        detector = IncrementalPatternDetector()
+        metadata = {'pair': 'BTC/USDT:USDT', 'tf': '5m'}
+        detector.add_all_patterns(sample_data.iloc[:n_boot].copy(), metadata, full_history)
+
+        failed = []
+        step_ms = []
+        # Batch path trên từng prefix (legacy window 100 nến đổi theo độ dài frame)
+        for i in range(n_boot + 1, n + 1, 7):
+            frame = sample_data.iloc[:i].copy()
+            start = time.perf_counter()
+            streamed = detector.add_all_patterns(frame.copy(), metadata, full_history)
+            step_ms.append((time.perf_counter() - start) * 1000)
+            batch = ChartPatterns.add_all_patterns(frame.copy(), full_history=full_history)
+            assert list(streamed.columns) == list(batch.columns), "Column order mismatch"
+            for col in PATTERN_COLUMNS:
+                if not np.allclose(streamed[col].to_numpy(dtype=float), batch[col].to_numpy(dtype=float),
+                                   rtol=1e-9, atol=1e-12, equal_nan=True):
+                    failed.append((i, col))
+
+        marked = int((batch[['%-double_top', '%-double_bottom', '%-head_shoulders',
+                             '%-head_shoulders_inv']] != 0).to_numpy().sum())
+        mode = 'full_history' if full_history else 'window 100'
+        print(f"  {mode}: stats {detector.stats}, swing patterns marked {marked}, "
+              f"{np.median(step_ms):.2f} ms/call (median)")
+        for i, col in failed[:10]:
+            print(f"  ❌ rows={i}: {col}")
+        assert not failed, "Incremental patterns differ from batch path"
+        assert detector.stats['batch'] == 1, "Unexpected batch fallback"
+    print("✅ Incremental patterns match batch path")
@@ -0,0 +1,458 @@
+"""
+Kernels - Vòng lặp tuần tự (Numba JIT / NumPy fallback)
+=======================================================
+Các phép tính bản chất tuần tự, không diễn đạt gọn bằng pandas:
+- run_length: độ dài chuỗi giá trị bằng nhau liên tiếp (candle streak)
+- ffill: forward-fill NaN (Order Block zones)
+- swing_extrema: local extrema kiểu scipy argrelextrema (Chart Patterns swings)
+- trend_scan: OLS slope + t-stat trên window tương lai (Trend Scanning labels)
+- cusum_events: symmetric CUSUM filter có reset (Event Sampling cho training set)
+
+Backend:
+- 'numba': @njit(cache=True), compile 1 lần/máy (cache trong __pycache__)
+- 'numpy': vectorized NumPy / pandas / scipy (luôn có)
+- 'auto' (mặc định): numba nếu đã cài, ngược lại numpy
+
+Cả 2 backend cho cùng output (trend_scan: sai khác làm tròn ~1e-12).
+
+Usage:
+    Kernels.set_backend('numpy')          # feature_flags.numba_kernels = false
+    streak = Kernels.run_length(direction)
+
+Author: AI Trading System
+"""
+
+import logging
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import argrelextrema
+
+logger = logging.getLogger(__name__)
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+BACKENDS = ('auto', 'numba', 'numpy')
+
+# Số window xử lý mỗi lần trong trend_scan NumPy (chunk × window floats)
+TREND_SCAN_CHUNK = 65536
+
+
+# ============================================================
+# NUMPY BACKEND
+# ============================================================
+
+def _run_length_numpy(values: np.ndarray) -> np.ndarray:
+    """1, 2, 3... trong mỗi chuỗi bằng nhau; NaN luôn bắt đầu chuỗi mới (nan != nan)"""
+    n = len(values)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    positions = np.arange(n)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = values[1:] != values[:-1]
+    run_start = np.maximum.accumulate(np.where(starts, positions, 0))
+    return positions - run_start + 1
+
+
+def _ffill_numpy(values: np.ndarray) -> np.ndarray:
+    """Forward-fill NaN - pandas Series.ffill (C loop, nhanh hơn trick maximum.accumulate)"""
+    return pd.Series(values).ffill().to_numpy()
+
+
+def _swing_extrema_numpy(values: np.ndarray, order: int, is_high: bool) -> np.ndarray:
+    """Vị trí local extrema: >= (high) / <= (low) `order` nến mỗi bên, mode='clip' như argrelextrema"""
+    return argrelextrema(values, np.greater_equal if is_high else np.less_equal, order=order)[0]
+
+
+def _trend_scan_numpy(close: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """slope, std_err cho mỗi window close[i:i + window], i < n - window (như scipy linregress)"""
+    n_windows = len(close) - window
+    slope = np.zeros(n_windows)
+    std_err = np.zeros(n_windows)
+
+    x_centered = np.arange(window, dtype=float) - (window - 1) / 2
+    ssxm = (x_centered @ x_centered) / window
+    dof = window - 2
+    windows = sliding_window_view(close, window)[:n_windows]
+
+    for start in range(0, n_windows, TREND_SCAN_CHUNK):
+        end = min(start + TREND_SCAN_CHUNK, n_windows)
+        y_centered = windows[start:end] - windows[start:end].mean(axis=1, keepdims=True)
+
+        # np.cov(x, y, bias=1) - như linregress
+        ssxym = (y_centered @ x_centered) / window
+        ssym = np.einsum('ij,ij->i', y_centered, y_centered) / window
+        slope[start:end] = ssxym / ssxm
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = np.clip(ssxym / np.sqrt(ssxm * ssym), -1.0, 1.0)
+            r = np.where(ssym == 0, 0.0, r)
+            std_err[start:end] = np.sqrt((1 - r ** 2) * ssym / ssxm / dof)
+
+    return slope, std_err
+
+
+def _cusum_events_numpy(returns: np.ndarray, threshold: np.ndarray) -> np.ndarray:
+    """
+    Symmetric CUSUM (López de Prado): s+ = max(0, s+ + r), s- = min(0, s- + r),
+    event + reset khi s- < -h hoặc s+ > h. NaN (return / threshold) → bỏ qua nến.
+    Reset phụ thuộc trạng thái trước → không vectorize được, loop trên Python floats.
+    """
+    events = np.zeros(len(returns), dtype=bool)
+    s_pos = s_neg = 0.0
+    for i, (r, h) in enumerate(zip(returns.tolist(), threshold.tolist())):
+        if r != r or h != h:
+            continue
+        s_pos = max(0.0, s_pos + r)
+        s_neg = min(0.0, s_neg + r)
+        if s_neg < -h:
+            s_neg = 0.0
+            events[i] = True
+        elif s_pos > h:
+            s_pos = 0.0
+            events[i] = True
+    return events
+
+
+_NUMPY_KERNELS: Dict[str, Callable] = {
+    'run_length': _run_length_numpy,
+    'ffill': _ffill_numpy,
+    'swing_extrema': _swing_extrema_numpy,
+    'trend_scan': _trend_scan_numpy,
+    'cusum_events': _cusum_events_numpy,
+}
+
+
+# ============================================================
+# NUMBA BACKEND
+# ============================================================
+
+_NUMBA_KERNELS: Dict[str, Callable] = {}
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True)
+    def _run_length_numba(values):
+        n = len(values)
+        out = np.empty(n, dtype=np.int64)
+        for i in range(n):
+            # values[i] != values[i - 1] → True cả khi NaN (giống bản NumPy)
+            if i > 0 and values[i] == values[i - 1]:
+                out[i] = out[i - 1] + 1
+            else:
+                out[i] = 1
+        return out
+
+    @njit(cache=True)
+    def _ffill_numba(values):
+        out = np.empty_like(values)
+        last = np.nan
+        for i in range(len(values)):
+            if not np.isnan(values[i]):
+                last = values[i]
+            out[i] = last
+        return out
+
+    @njit(cache=True)
+    def _swing_extrema_numba_impl(values, order, is_high):
+        n = len(values)
+        found = np.zeros(n, dtype=np.bool_)
+        for i in range(n):
+            ok = True
+            for shift in range(1, order + 1):
+                # mode='clip': neighbor ngoài biên → chính nến biên
+                after = values[min(i + shift, n - 1)]
+                before = values[max(i - shift, 0)]
+                if is_high:
+                    ok = values[i] >= after and values[i] >= before
+                else:
+                    ok = values[i] <= after and values[i] <= before
+                if not ok:
+                    break
+            found[i] = ok
+        return np.flatnonzero(found)
+
+    def _swing_extrema_numba(values: np.ndarray, order: int, is_high: bool) -> np.ndarray:
+        if order < 1:
+            raise ValueError('Order must be an int >= 1')
+        return _swing_extrema_numba_impl(values, order, is_high)
+
+    @njit(cache=True)
+    def _trend_scan_numba(close, window):
+        n_windows = len(close) - window
+        slope = np.zeros(n_windows)
+        std_err = np.zeros(n_windows)
+
+        x_mean = (window - 1) / 2.0
+        ssxm = 0.0
+        for j in range(window):
+            ssxm += (j - x_mean) ** 2
+        ssxm /= window
+        dof = window - 2
+
+        for i in range(n_windows):
+            mean = 0.0
+            for j in range(window):
+                mean += close[i + j]
+            mean /= window
+            ssxym = 0.0
+            ssym = 0.0
+            for j in range(window):
+                y = close[i + j] - mean
+                ssxym += (j - x_mean) * y
+                ssym += y * y
+            ssxym /= window
+            ssym /= window
+            slope[i] = ssxym / ssxm
+
+            if ssym == 0:
+                r = 0.0
+            else:
+                r = min(max(ssxym / np.sqrt(ssxm * ssym), -1.0), 1.0)
+            std_err[i] = np.sqrt((1 - r * r) * ssym / ssxm / dof)
+        return slope, std_err
+
+    @njit(cache=True)
+    def _cusum_events_numba(returns, threshold):
+        events = np.zeros(len(returns), dtype=np.bool_)
+        s_pos = 0.0
+        s_neg = 0.0
+        for i in range(len(returns)):
+            r = returns[i]
+            h = threshold[i]
+            if np.isnan(r) or np.isnan(h):
+                continue
+            s_pos = max(0.0, s_pos + r)
+            s_neg = min(0.0, s_neg + r)
+            if s_neg < -h:
+                s_neg = 0.0
+                events[i] = True
+            elif s_pos > h:
+                s_pos = 0.0
+                events[i] = True
+        return events
+
+    _NUMBA_KERNELS = {
+        'run_length': _run_length_numba,
+        'ffill': _ffill_numba,
+        'swing_extrema': _swing_extrema_numba,
+        'trend_scan': _trend_scan_numba,
+        'cusum_events': _cusum_events_numba,
+    }
+
+
+# ============================================================
+# DISPATCH
+# ============================================================
+
+class Kernels:
+    """Kernel dispatcher: cùng API cho cả 2 backend"""
+
+    _backend = 'numba' if NUMBA_AVAILABLE else 'numpy'
+
+    @staticmethod
+    def set_backend(name: str = 'auto') -> str:
+        """
+        Chọn backend ('auto' / 'numba' / 'numpy').
+
+        'numba' khi chưa cài numba → fallback numpy (log warning).
+
+        Returns:
+            Backend thực sự được dùng
+        """
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown kernel backend '{name}' (expected one of {BACKENDS})")
+        if name == 'numba' and not NUMBA_AVAILABLE:
+            logger.warning("Numba not installed - kernels fall back to NumPy")
+        resolved = 'numba' if name in ('auto', 'numba') and NUMBA_AVAILABLE else 'numpy'
+        if resolved != Kernels._backend:
+            logger.info(f"Kernel backend: {resolved}")
+        Kernels._backend = resolved
+        return resolved
+
+    @staticmethod
+    def backend() -> str:
+        return Kernels._backend
+
+    @staticmethod
+    def _get(name: str) -> Callable:
+        return (_NUMBA_KERNELS if Kernels._backend == 'numba' else _NUMPY_KERNELS)[name]
+
+    @staticmethod
+    def run_length(values) -> np.ndarray:
+        """Vị trí trong chuỗi giá trị bằng nhau liên tiếp (1-based, int64)"""
+        return Kernels._get('run_length')(np.ascontiguousarray(values, dtype=float))
+
+    @staticmethod
+    def ffill(values) -> np.ndarray:
+        """Forward-fill NaN (giá trị hợp lệ gần nhất trước đó)"""
+        return Kernels._get('ffill')(np.ascontiguousarray(values, dtype=float))
+
+    @staticmethod
+    def swing_extrema(values, order: int = 5, is_high: bool = True) -> np.ndarray:
+        """
+        Vị trí local extrema (như argrelextrema(values, np.greater_equal / np.less_equal, order)).
+
+        Args:
+            values: highs (is_high=True) hoặc lows (is_high=False)
+            order: Số nến so sánh mỗi bên
+        """
+        return Kernels._get('swing_extrema')(np.ascontiguousarray(values, dtype=float), order, is_high)
+
+    @staticmethod
+    def trend_scan(close, window: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        OLS của close[i:i + window] theo x = 0..window-1 cho i < n - window.
+
+        Returns:
+            (slope, std_err) - độ dài max(n - window, 0), như scipy.stats.linregress
+        """
+        close = np.ascontiguousarray(close, dtype=float)
+        if len(close) <= window:
+            return np.zeros(0), np.zeros(0)
+        return Kernels._get('trend_scan')(close, window)
+
+    @staticmethod
+    def cusum_events(returns, threshold) -> np.ndarray:
+        """
+        Symmetric CUSUM filter: True tại nến tổng tích lũy |returns| vượt threshold (rồi reset).
+
+        Args:
+            returns: log returns theo nến
+            threshold: scalar hoặc array cùng độ dài (ngưỡng theo từng nến)
+        """
+        returns = np.ascontiguousarray(returns, dtype=float)
+        threshold = np.ascontiguousarray(np.broadcast_to(threshold, returns.shape), dtype=float)
+        return Kernels._get('cusum_events')(returns, threshold)
+
+
+# ============================================================
+# PARITY TEST + SPEEDUP REPORT
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    # Cùng dispatcher với các modules import (chạy `-m` → file này là __main__)
+    from indicators.kernels import Kernels, NUMBA_AVAILABLE, _NUMBA_KERNELS, _NUMPY_KERNELS, _cusum_events_numpy
+    from indicators.chart_patterns import ChartPatterns
+    from indicators.feature_engineering import FeatureEngineering
+    from indicators.labeling import _trend_scanning_reference
+    from indicators.smc_indicators import SMCIndicators
+
+    rng = np.random.default_rng(42)
+
+    def make_ohlcv(n: int) -> pd.DataFrame:
+        close = 40000 * np.exp(np.cumsum(rng.normal(0.0001, 0.002, n)))
+        close[100:140] = close[100]  # flat segment: streak dài, std_err = 0
+        open_ = np.where(rng.random(n) < 0.05, close, close * (1 + rng.uniform(-0.001, 0.001, n)))
+        df = pd.DataFrame({
+            'date': pd.date_range(start='2025-01-01', periods=n, freq='5min'),
+            'open': open_,
+            'high': np.maximum(open_, close) * (1 + rng.uniform(0, 0.003, n)),
+            'low': np.minimum(open_, close) * (1 - rng.uniform(0, 0.003, n)),
+            'close': close,
+            'volume': rng.uniform(100, 1000, n),
+        })
+        df.loc[rng.random(n) < 0.001, ['open', 'close']] = np.nan  # NaN: chuỗi mới / giữ giá trị cũ
+        return df
+
+    def references(df: pd.DataFrame) -> Dict[str, Callable]:
+        """Cài đặt gốc (pandas / scipy) của từng kernel"""
+        direction = np.sign(df['close'] - df['open'])
+        sparse = np.where(rng.random(len(df)) < 0.02, df['high'].to_numpy(), np.nan)
+        return {
+            'run_length': (
+                lambda: Kernels.run_length(direction),
+                lambda: (direction.groupby((direction != direction.shift()).cumsum()).cumcount() + 1).to_numpy()),
+            'ffill': (
+                lambda: Kernels.ffill(sparse),
+                lambda: pd.Series(sparse).ffill().to_numpy()),
+            'swing_extrema': (
+                lambda: Kernels.swing_extrema(df['high'].to_numpy(), 5, True),
+                lambda: argrelextrema(df['high'].to_numpy(), np.greater_equal, order=5)[0]),
+        }
+
+    backends = ['numpy'] + (['numba'] if NUMBA_AVAILABLE else [])
+    print("=" * 60)
+    print(f"KERNELS - PARITY ({' + '.join(backends)} vs pandas/scipy)")
+    print("=" * 60)
+
+    sample = make_ohlcv(20_000)
+    for backend in backends:
+        Kernels.set_backend(backend)
+        for name, (kernel, reference) in references(sample).items():
+            np.testing.assert_array_equal(kernel(), reference(), err_msg=f"{backend}: {name}")
+        lows = sample['low'].to_numpy()
+        np.testing.assert_array_equal(Kernels.swing_extrema(lows, 3, False),
+                                      argrelextrema(lows, np.less_equal, order=3)[0])
+
+        close = sample['close'].ffill().to_numpy()[:5000]
+        slope, std_err = Kernels.trend_scan(close, 20)
+        expected_pct, expected_t = _trend_scanning_reference(close, 20)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_stat = np.where(std_err > 0, slope / std_err, 0.0)
+        assert np.allclose(t_stat, expected_t[:len(t_stat)], rtol=1e-7, atol=1e-9), f"{backend}: trend_scan"
+        returns = np.diff(np.log(sample['close'].to_numpy()), prepend=np.nan)
+        threshold = 2 * (sample['high'] - sample['low']).to_numpy() / sample['close'].to_numpy()
+        np.testing.assert_array_equal(Kernels.cusum_events(returns, threshold),
+                                      _cusum_events_numpy(returns, threshold), err_msg=f"{backend}: cusum_events")
+        print(f"  ✅ {backend}: run_length, ffill, swing_extrema, cusum_events identical | trend_scan t-stat rtol 1e-7")
+
+    # End-to-end: features giống nhau với cả 2 backend
+    if NUMBA_AVAILABLE:
+        outputs = {}
+        for backend in backends:
+            Kernels.set_backend(backend)
+            df = FeatureEngineering.add_all_features(sample.copy())
+            df = SMCIndicators.add_all_indicators(df)
+            outputs[backend] = ChartPatterns.add_all_patterns(df)
+        pd.testing.assert_frame_equal(outputs['numba'], outputs['numpy'], check_exact=True)
+        print(f"  ✅ FeatureEngineering + SMC + ChartPatterns: identical ({outputs['numba'].shape[1]} columns)")
+
+    print("\n" + "=" * 60)
+    print("KERNELS - SPEEDUP REPORT (1,000,000 rows)")
+    print("=" * 60)
+
+    def best_of(fn: Callable, repeat: int = 3) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    large = make_ohlcv(1_000_000)
+    close = large['close'].ffill().to_numpy()
+
+    def report(name: str, label: str, reference_s: float, kernel: Callable, note: str = '') -> None:
+        """1 dòng: cài đặt gốc | mỗi backend (ms, speedup so với cài đặt gốc)"""
+        row = [f"  {name:<14} {label} {reference_s * 1000:9.1f} ms"]
+        for backend in backends:
+            Kernels.set_backend(backend)
+            kernel()  # JIT compile / cache load
+            elapsed = best_of(kernel)
+            row.append(f"{backend} {elapsed * 1000:7.1f} ms ({reference_s / elapsed:6.1f}x)")
+        print(" | ".join(row) + note)
+
+    for name, (kernel, reference) in references(large).items():
+        report(name, f"{'pandas/scipy':<15}", best_of(reference), kernel)
+
+    # trend_scan gốc = loop scipy.stats.linregress (labeling._trend_scanning_reference):
+    # ~1M lần gọi linregress → đo trên 20k rows, ngoại suy tuyến tính lên 1M
+    sample_rows = 20_000
+    loop_s = best_of(lambda: _trend_scanning_reference(close[:sample_rows], 20), repeat=1)
+    report('trend_scan', f"{'linregress loop':<15}", loop_s * len(close) / sample_rows,
+           lambda: Kernels.trend_scan(close, 20), f" (window=20, loop extrapolated from {sample_rows:,} rows)")
+
+    # cusum_events gốc = loop Python (_cusum_events_numpy, cũng là backend numpy)
+    returns = np.diff(np.log(close), prepend=np.nan)
+    threshold = (large['high'] - large['low']).to_numpy() / close
+    report('cusum_events', f"{'python loop':<15}", best_of(lambda: _cusum_events_numpy(returns, threshold)),
+           lambda: Kernels.cusum_events(returns, threshold))
+    Kernels.set_backend('auto')
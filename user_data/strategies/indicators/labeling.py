@@ -0,0 +1,449 @@
+"""
+Labeling Module - Target Labels cho FreqAI
+==========================================
+Vectorized labeling methods (không loop Python theo từng row).
+
+1. Trend Scanning (t-statistic của OLS slope trên `window` nến TƯƠNG LAI)
+   - Closed-form OLS từng window qua Kernels.trend_scan (Numba loop / NumPy chunked)
+   - Cùng công thức với scipy.stats.linregress (slope, stderr)
+
+2. Multi-horizon Trend Scanning (feature_flags.trend_scanning_horizons)
+   - k horizons (vd: 10..60) trong 1 pass: Σy, Σj·y, Σy² prefix sums dùng chung
+     → slope + t-stat của mọi (nến, horizon) là phép trừ prefix sums, O(n·k)
+   - Giữ horizon có |t| lớn nhất (như trend scanning gốc của López de Prado)
+
+3. Triple Barrier (feature_flags.triple_barrier_labels)
+   - Barrier dưới: công thức custom_stoploss (ATR × multiplier, kẹp [1%, min(15%, risk/leverage)])
+     + trailing p_trail_start / p_trail_offset; barrier trên: min(ATR take-profit, minimal_roi theo
+     thời gian); barrier dọc: `horizon` nến
+   - First passage vectorized trên sliding_window_view của high/low theo chunk (không loop row)
+
+⚠️ Labels nhìn về tương lai → CHỈ dùng trong set_freqai_targets.
+
+Author: AI Trading System
+"""
+
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    from indicators.kernels import Kernels
+except ImportError:
+    from .kernels import Kernels
+
+logger = logging.getLogger(__name__)
+
+# feature_flags.trend_scanning_horizons = true
+DEFAULT_HORIZONS = (10, 15, 20, 30, 40, 60)
+
+# Số row mỗi chunk của triple barrier (ma trận chunk × horizon)
+TRIPLE_BARRIER_CHUNK = 16384
+
+# Số nến bắt đầu window mỗi chunk: prefix sums tính lại từ close đầu chunk
+# (giá ~1e4-1e5 → Σy² toàn lịch sử mất hết chữ số của phương sai window).
+# Sai số của Σj·y - i·Σy tăng ~ chunk² và bị khuếch đại qua 1 - r² khi |r| → 1:
+# 8192 → t lệch ~1.5e-6 (tương đối) so với linregress, 1024 → ~4e-9 (chậm hơn ~40%)
+TREND_SCAN_MULTI_CHUNK = 1024
+
+
+class Labeling:
+    """Vectorized label generators cho set_freqai_targets"""
+
+    @staticmethod
+    def trend_scanning(close: np.ndarray, window: int = 20,
+                       t_threshold: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Trend Scanning labels (vectorized).
+
+        Với mỗi nến i: OLS close[i:i + window] theo x = 0..window-1
+        - slope, std_err như scipy.stats.linregress
+        - t_stat = slope / std_err (0 nếu std_err = 0)
+        - price_change_pct = slope * window / close[i] nếu |t| >= t_threshold, ngược lại 0
+
+        `window` nến cuối không đủ dữ liệu tương lai → 0 (giống loop cũ).
+
+        Args:
+            close: Close prices
+            window: Số nến tương lai để fit regression (>= 3)
+            t_threshold: Ngưỡng |t| để coi là trend có ý nghĩa thống kê
+
+        Returns:
+            (price_change_pct, t_stat) - 2 arrays cùng độ dài với close
+        """
+        close = np.asarray(close, dtype=float)
+        n = len(close)
+        price_change_pct = np.zeros(n)
+        t_stats = np.zeros(n)
+
+        if n - window <= 0 or window < 3:
+            # window <= 2: linregress trả std_err = 0 → t = 0
+            return price_change_pct, t_stats
+
+        # OLS từng window: Numba loop hoặc NumPy sliding_window_view theo chunk (Kernels backend)
+        slope, std_err = Kernels.trend_scan(close, window)
+        n_windows = len(slope)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_stat = np.where(std_err > 0, slope / std_err, 0.0)
+            price = close[:n_windows]
+            expected_pct_change = np.where(price > 0, slope * window / price, 0.0)
+
+        significant = np.abs(t_stat) >= t_threshold
+        price_change_pct[:n_windows] = np.where(significant, expected_pct_change, 0.0)
+        t_stats[:n_windows] = t_stat
+
+        return price_change_pct, t_stats
+
+    @staticmethod
+    def horizons_from_flags(feature_flags: dict) -> Optional[Tuple[int, ...]]:
+        """feature_flags.trend_scanning_horizons: false → None (window cố định), true → DEFAULT_HORIZONS, list → list"""
+        value = feature_flags.get('trend_scanning_horizons', False)
+        if value is True:
+            return DEFAULT_HORIZONS
+        if not value:
+            return None
+        return tuple(sorted({int(h) for h in value}))
+
+    @staticmethod
+    def trend_scanning_multi(close: np.ndarray, horizons: Sequence[int] = DEFAULT_HORIZONS,
+                             t_threshold: float = 2.0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Trend Scanning trên nhiều horizons (vectorized, O(n·k), không loop Python theo row).
+
+        Với mỗi nến i và horizon h (i < n - h, như trend_scanning): OLS close[i:i + h]
+        theo x = 0..h-1 từ prefix sums của y, j·y, y² (y = close - close đầu chunk):
+            Sxy = Σ(j - i)·y = (Σj·y) - i·Σy,   Sxx = h(h² - 1) / 12
+        Chọn horizon có |t| lớn nhất (hoà → horizon ngắn hơn).
+
+        Args:
+            close: Close prices
+            horizons: Các horizon (>= 3)
+            t_threshold: Ngưỡng |t| của horizon tốt nhất để giữ price_change_pct
+
+        Returns:
+            (price_change_pct, t_stat, horizon) - cùng độ dài với close; horizon = 0
+            khi không horizon nào đủ dữ liệu tương lai
+        """
+        close = np.asarray(close, dtype=float)
+        n = len(close)
+        price_change_pct = np.zeros(n)
+        t_best = np.zeros(n)
+        h_best = np.zeros(n, dtype=np.int64)
+
+        horizons = np.array(sorted({int(h) for h in horizons if int(h) >= 3}), dtype=np.int64)
+        if len(horizons) == 0 or n - horizons[0] <= 0:
+            return price_change_pct, t_best, h_best
+
+        h = horizons.astype(float)[:, None]
+        sx = h * (h - 1) / 2
+        sxx = h * (h * h - 1) / 12
+        h_max = int(horizons[-1])
+        n_rows = n - int(horizons[0])
+
+        for start in range(0, n_rows, TREND_SCAN_MULTI_CHUNK):
+            stop = min(start + TREND_SCAN_MULTI_CHUNK, n_rows)
+            y = close[start:min(stop + h_max, n)] - close[start]
+            j = np.arange(len(y), dtype=float)
+            p_y = np.concatenate([[0.0], np.cumsum(y)])
+            p_jy = np.concatenate([[0.0], np.cumsum(j * y)])
+            p_yy = np.concatenate([[0.0], np.cumsum(y * y)])
+
+            i = np.arange(stop - start)
+            end = i[None, :] + horizons[:, None]           # (k, m), exclusive
+            valid = end + start < n                         # i < n - h
+            end = np.minimum(end, len(y))
+
+            sum_y = p_y[end] - p_y[i]
+            sum_yy = p_yy[end] - p_yy[i]
+            sxy = (p_jy[end] - p_jy[i]) - i * sum_y
+            ssxy = sxy - sx * sum_y / h
+            ssy = sum_yy - sum_y * sum_y / h
+            # Window phẳng: ssy chỉ còn sai số làm tròn → 0 (như linregress: std_err = 0 → t = 0)
+            ssy = np.where(ssy > 1e-12 * sum_yy, ssy, 0.0)
+            slope = ssxy / sxx
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                r = np.clip(ssxy / np.sqrt(sxx * ssy), -1.0, 1.0)
+                r = np.where(ssy == 0, 0.0, r)
+                std_err = np.sqrt((1 - r ** 2) * ssy / sxx / (h - 2))
+                t_stat = np.where(valid & (std_err > 0), slope / std_err, 0.0)
+
+            best = np.argmax(np.abs(t_stat), axis=0)[None, :]
+            rows = slice(start, stop)
+            t_best[rows] = np.take_along_axis(t_stat, best, axis=0)[0]
+            h_best[rows] = np.where(valid[0], horizons[best[0]], 0)
+            best_slope = np.take_along_axis(slope, best, axis=0)[0]
+
+            price = close[rows]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                expected_pct_change = np.where(price > 0, best_slope * h_best[rows] / price, 0.0)
+            significant = np.abs(t_best[rows]) >= t_threshold
+            price_change_pct[rows] = np.where(significant, expected_pct_change, 0.0)
+
+        return price_change_pct, t_best, h_best
+
+    @staticmethod
+    def roi_steps(minimal_roi: Optional[Dict[str, float]], horizon: int, timeframe_minutes: int) -> np.ndarray:
+        """
+        minimal_roi ({phút: ROI}) → ROI áp dụng cho nến thứ s = 1..horizon sau entry
+        (thời gian trade = (s - 1) × timeframe như backtest của freqtrade). inf = không có ROI.
+        """
+        steps = np.full(horizon, np.inf)
+        if not minimal_roi:
+            return steps
+        elapsed = np.arange(horizon) * timeframe_minutes
+        for minutes, roi in sorted((int(k), float(v)) for k, v in minimal_roi.items()):
+            if roi >= 0:
+                steps[elapsed >= minutes] = roi
+            else:
+                steps[elapsed >= minutes] = np.inf
+        return steps
+
+    @staticmethod
+    def triple_barrier(high: np.ndarray, low: np.ndarray, close: np.ndarray, atr: np.ndarray,
+                       horizon: int = 20, atr_multiplier: float = 3.0, stoploss: float = -0.05,
+                       max_risk: float = 0.20, leverage: float = 1.0, profit_ratio: float = 2.0,
+                       minimal_roi: Optional[Dict[str, float]] = None, timeframe_minutes: int = 5,
+                       trail_start: Optional[float] = None, trail_offset: Optional[float] = None,
+                       side: str = 'long') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Triple-barrier labels cho lệnh `side` ('long' / 'short') vào tại close[i] (vectorized first passage).
+
+        Barriers theo profit của stake như freqtrade (giá di chuyển = profit / leverage):
+        - Stop: custom_stoploss trả -ATR × atr_multiplier / open_rate so với GIÁ HIỆN TẠI,
+          kẹp [1%, min(15%, max_risk / leverage)] (ATR lỗi → min(|stoploss|, max_risk / leverage)),
+          freqtrade chỉ kéo stop theo hướng có lợi → stop bám giá tốt nhất của các nến TRƯỚC
+          ngay từ nến đầu: long (1 + peak) × (1 - d) - 1, short (1 - peak) × (1 + d) - 1.
+          Khi peak đạt trail_start → offset trail_offset (chặt hơn). ATR lấy tại nến entry
+        - Chốt lời: min(profit_ratio × stop, minimal_roi tại thời điểm đó)
+        - Dọc: close[i + horizon]
+        Cùng nến chạm cả 2 → stoploss trước (thứ tự kiểm tra của backtest freqtrade).
+
+        Returns:
+            (ret, label, bars) - ret: % profit theo GIÁ của lệnh lúc thoát (short: giá giảm = dương,
+            × leverage → profit của stake), label: 1 (chốt lời) / -1 (stop) / 0 (dọc),
+            bars: số nến tới lúc thoát; NaN ở `horizon` nến cuối (thiếu dữ liệu tương lai)
+        """
+        if side not in ('long', 'short'):
+            raise ValueError(f"Unknown side '{side}' (expected 'long' or 'short')")
+        sign = 1.0 if side == 'long' else -1.0
+        high, low, close, atr = (np.asarray(a, dtype=float) for a in (high, low, close, atr))
+        n = len(close)
+        ret = np.full(n, np.nan)
+        label = np.full(n, np.nan)
+        bars = np.full(n, np.nan)
+        if horizon < 1 or n <= horizon:
+            return ret, label, bars
+
+        # Stoploss của custom_stoploss (profit của stake) → % giá
+        safe = max_risk / leverage
+        with np.errstate(divide='ignore', invalid='ignore'):
+            atr_dist = atr_multiplier * atr / close
+        dist = np.maximum(np.minimum(atr_dist, min(safe, 0.15)), 0.01)
+        dist = np.where((atr > 0) & (close > 0), dist, min(abs(stoploss), safe))
+        stop_dist = dist / leverage
+        take_profit = profit_ratio * dist / leverage if profit_ratio else np.full(n, np.inf)
+        roi = Labeling.roi_steps(minimal_roi, horizon, timeframe_minutes) / leverage
+        trailing = trail_start is not None and trail_offset is not None
+
+        # Nến i + 1 .. i + horizon của mỗi entry i (view, không copy)
+        # favorable: giá có lợi nhất của nến (long: high, short: low), adverse: ngược lại
+        fav_windows = sliding_window_view((high if sign > 0 else low)[1:], horizon)
+        adv_windows = sliding_window_view((low if sign > 0 else high)[1:], horizon)
+        steps = np.arange(horizon)
+
+        for start in range(0, n - horizon, TRIPLE_BARRIER_CHUNK):
+            stop = min(start + TRIPLE_BARRIER_CHUNK, n - horizon)
+            entry = close[start:stop, None]
+            fav = sign * (fav_windows[start:stop] / entry - 1)
+            adv = sign * (adv_windows[start:stop] / entry - 1)
+
+            # Profit tốt nhất của các nến TRƯỚC nến hiện tại (stop cập nhật sau khi nến đóng)
+            peak = np.maximum.accumulate(np.maximum(fav, 0.0), axis=1)
+            peak = np.concatenate([np.zeros((stop - start, 1)), peak[:, :-1]], axis=1)
+            lower = sign * ((1 + sign * peak) * (1 - sign * stop_dist[start:stop, None]) - 1)
+            if trailing:
+                trail = sign * ((1 + sign * peak) * (1 - sign * trail_offset / leverage) - 1)
+                lower = np.where(peak >= trail_start / leverage, np.maximum(lower, trail), lower)
+            upper = np.minimum(take_profit[start:stop, None], roi[None, :])
+
+            hit_up = fav >= upper
+            hit_down = adv <= lower
+            first_up = np.where(hit_up.any(axis=1), hit_up.argmax(axis=1), horizon)
+            first_down = np.where(hit_down.any(axis=1), hit_down.argmax(axis=1), horizon)
+
+            rows = np.arange(stop - start)
+            is_down = (first_down < horizon) & (first_down <= first_up)
+            is_up = (first_up < horizon) & ~is_down
+            vertical = sign * (close[start + horizon:stop + horizon] / close[start:stop] - 1)
+
+            exit_step = np.where(is_down, first_down, np.where(is_up, first_up, horizon - 1))
+            at_exit = np.minimum(exit_step, horizon - 1)
+            ret[start:stop] = np.where(is_down, lower[rows, at_exit],
+                                       np.where(is_up, np.broadcast_to(upper, fav.shape)[rows, at_exit], vertical))
+            label[start:stop] = np.where(is_down, -1.0, np.where(is_up, 1.0, 0.0))
+            bars[start:stop] = steps[at_exit] + 1
+
+        return ret, label, bars
+
+
+def _triple_barrier_reference(high, low, close, atr, horizon=20, atr_multiplier=3.0, stoploss=-0.05,
+                              max_risk=0.20, leverage=1.0, profit_ratio=2.0, minimal_roi=None,
+                              timeframe_minutes=5, trail_start=None, trail_offset=None, side='long'):
+    """Loop từng entry / từng nến theo giá (stop ratchet như freqtrade) - chỉ dùng cho parity test / benchmark"""
+    n = len(close)
+    long = side == 'long'
+    ret, label, bars = np.full(n, np.nan), np.full(n, np.nan), np.full(n, np.nan)
+    roi = Labeling.roi_steps(minimal_roi, horizon, timeframe_minutes) / leverage
+    safe = max_risk / leverage
+    for i in range(n - horizon):
+        if atr[i] > 0 and close[i] > 0:
+            dist = max(min(atr_multiplier * atr[i] / close[i], min(safe, 0.15)), 0.01)
+        else:
+            dist = min(abs(stoploss), safe)
+        take_profit = profit_ratio * dist / leverage if profit_ratio else np.inf
+        best = close[i]                       # giá tốt nhất của các nến đã đóng
+        move = close[i + horizon] / close[i] - 1
+        ret[i], label[i], bars[i] = (move if long else -move), 0.0, horizon
+        for s in range(horizon):
+            # Mức stop (giá) = custom_stoploss tính tại giá tốt nhất, trailing khi đủ profit
+            offset = dist / leverage
+            profit = (best / close[i] - 1) if long else (1 - best / close[i])
+            if trail_start is not None and profit >= trail_start / leverage:
+                offset = min(offset, trail_offset / leverage)
+            stop_price = best * (1 - offset) if long else best * (1 + offset)
+            stop_profit = (stop_price / close[i] - 1) if long else (1 - stop_price / close[i])
+            upper = min(take_profit, roi[s])
+            candle_high, candle_low = high[i + 1 + s], low[i + 1 + s]
+            if (candle_low <= stop_price) if long else (candle_high >= stop_price):
+                ret[i], label[i], bars[i] = stop_profit, -1.0, s + 1
+                break
+            if ((candle_high / close[i] - 1) if long else (1 - candle_low / close[i])) >= upper:
+                ret[i], label[i], bars[i] = upper, 1.0, s + 1
+                break
+            best = max(best, candle_high) if long else min(best, candle_low)
+    return ret, label, bars
+
+
+def _trend_scanning_reference(close: np.ndarray, window: int = 20,
+                              t_threshold: float = 2.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Loop scipy.stats.linregress gốc - chỉ dùng cho parity test / benchmark"""
+    from scipy import stats
+
+    n = len(close)
+    trend_slopes = np.zeros(n)
+    trend_t_stats = np.zeros(n)
+    x = np.arange(window)
+
+    for i in range(n - window):
+        slope, intercept, r_value, p_value, std_err = stats.linregress(x, close[i:i + window])
+        t_stat = slope / std_err if std_err > 0 else 0
+        expected_pct_change = (slope * window) / close[i] if close[i] > 0 else 0
+        trend_slopes[i] = expected_pct_change if abs(t_stat) >= t_threshold else 0
+        trend_t_stats[i] = t_stat
+
+    return trend_slopes, trend_t_stats
+
+
+# ============================================================
+# PARITY TEST + BENCHMARK
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    np.random.seed(42)
+
+    def make_close(n: int) -> np.ndarray:
+        returns = np.random.normal(0.0001, 0.002, n)
+        close = 40000 * np.exp(np.cumsum(returns))
+        close[100:140] = close[100]  # flat segment → std_err = 0
+        return close
+
+    print("=" * 60)
+    print("TREND SCANNING - PARITY TEST")
+    print("=" * 60)
+
+    close = make_close(5000)
+    for window in (3, 5, 20, 50):
+        expected_pct, expected_t = _trend_scanning_reference(close, window)
+        actual_pct, actual_t = Labeling.trend_scanning(close, window)
+        assert np.allclose(actual_t, expected_t, rtol=1e-7, atol=1e-9), f"t_stat mismatch (window={window})"
+        assert np.allclose(actual_pct, expected_pct, rtol=1e-7, atol=1e-12), f"pct mismatch (window={window})"
+        print(f"  ✅ window={window}: max |Δt| = {np.max(np.abs(actual_t - expected_t)):.2e}")
+
+    print("\n" + "=" * 60)
+    print("MULTI-HORIZON TREND SCANNING - PARITY TEST")
+    print("=" * 60)
+
+    # Mỗi horizon riêng lẻ = trend_scanning(window=h); best = argmax |t|
+    horizons = (10, 15, 20, 30, 40, 60)
+    close = make_close(30_000)
+    multi_pct, multi_t, multi_h = Labeling.trend_scanning_multi(close, horizons)
+    single_t = np.vstack([Labeling.trend_scanning(close, h)[1] for h in horizons])
+    best = np.argmax(np.abs(single_t), axis=0)
+    expected_t = single_t[best, np.arange(len(close))]
+    expected_h = np.where(len(close) - np.arange(len(close)) > horizons[0], np.array(horizons)[best], 0)
+    assert np.allclose(multi_t, expected_t, rtol=1e-6, atol=1e-6), "best t_stat mismatch"
+    agree = np.mean(multi_h == expected_h)
+    assert agree > 0.999, f"best horizon agreement {agree:.4%}"
+    print(f"  ✅ {len(horizons)} horizons: max |Δt| = {np.max(np.abs(multi_t - expected_t)):.2e}, "
+          f"horizon agreement {agree:.4%}, significant rows {np.mean(multi_pct != 0):.1%}")
+
+    close = make_close(1_000_000)
+    start = time.perf_counter()
+    Labeling.trend_scanning_multi(close, horizons)
+    print(f"  1,000,000 rows × {len(horizons)} horizons: {time.perf_counter() - start:.2f}s")
+
+    print("\n" + "=" * 60)
+    print("TRIPLE BARRIER - PARITY TEST + BENCHMARK")
+    print("=" * 60)
+
+    def make_bars(n: int):
+        close = make_close(n)
+        high = close * (1 + np.abs(np.random.normal(0, 0.002, n)))
+        low = close * (1 - np.abs(np.random.normal(0, 0.002, n)))
+        atr = np.convolve(high - low, np.ones(14) / 14, mode='full')[:n]
+        atr[:13] = np.nan
+        return high, low, close, atr
+
+    roi_table = {"120": 0.02, "60": 0.04, "30": 0.05, "0": 0.06}
+    params = dict(horizon=36, atr_multiplier=3.0, stoploss=-0.05, max_risk=0.20, leverage=4.0,
+                  minimal_roi=roi_table, trail_start=0.02, trail_offset=0.01)
+    high, low, close, atr = make_bars(20_000)
+    for side in ('long', 'short'):
+        expected = _triple_barrier_reference(high, low, close, atr, side=side, **params)
+        actual = Labeling.triple_barrier(high, low, close, atr, side=side, **params)
+        for name, a, e in zip(('ret', 'label', 'bars'), actual, expected):
+            assert np.allclose(a, e, rtol=1e-12, atol=1e-12, equal_nan=True), f"triple barrier {side} {name} mismatch"
+        counts = {int(k): int(v) for k, v in zip(*np.unique(actual[1][~np.isnan(actual[1])], return_counts=True))}
+        stake = actual[0][~np.isnan(actual[0])] * params['leverage']
+        print(f"  ✅ {side:<5} parity (20,000 rows, horizon 36, trailing + ROI): labels {counts}, "
+              f"stake profit [{stake.min():+.2%}, {stake.max():+.2%}]")
+
+    # 5m × 4 năm ≈ 420k nến
+    high, low, close, atr = make_bars(420_000)
+    start = time.perf_counter()
+    Labeling.triple_barrier(high, low, close, atr, **params)
+    print(f"  420,000 rows (≈ 4 years of 5m): {time.perf_counter() - start:.2f}s")
+
+    print("\n" + "=" * 60)
+    print("TREND SCANNING - BENCHMARK (window=20)")
+    print("=" * 60)
+
+    # Loop scipy tuyến tính theo n → đo trên 20k rows rồi ngoại suy
+    sample = 20_000
+    start = time.perf_counter()
+    _trend_scanning_reference(make_close(sample), 20)
+    loop_per_row = (time.perf_counter() - start) / sample
+
+    for n in (100_000, 1_000_000):
+        close = make_close(n)
+        start = time.perf_counter()
+        Labeling.trend_scanning(close, 20)
+        vectorized = time.perf_counter() - start
+        loop = loop_per_row * n
+        print(f"  {n:>9,} rows: loop ~{loop:8.1f}s (extrapolated from {sample:,}) | "
+              f"vectorized {vectorized:6.3f}s | speedup ~{loop / vectorized:,.0f}x")
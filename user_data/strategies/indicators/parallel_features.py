@@ -0,0 +1,300 @@
+"""
+Parallel Features - Tính trước expand_basic cho mọi (pair, timeframe) trên process pool
+=======================================================================================
+FreqAI gọi feature_engineering_expand_basic lần lượt cho từng (pair | corr pair) ×
+include_timeframes (vd: ETH + BTC corr × 5m/1h/4h = 6 lần / pair). Các lần gọi độc
+lập, CPU-bound (Python loops của SMC/Wave giữ GIL) → thread pool không đủ, dùng processes.
+
+Luồng (backtest / train, feature_flags.parallel_features):
+    populate_indicators(pair)
+      → precompute([FeatureJob(p, tf, ohlcv) for p in pair + corr for tf in include_timeframes])
+         → worker: FeatureEngineering + SMC + Wave (cùng flags/scopes với strategy)
+         → trả về CHỈ các cột mới, đúng thứ tự jobs
+      → freqai.start → expand_basic(pair, tf) → take(): OHLCV khớp → concat, không tính lại
+
+Pickling:
+- Không pickle modules / classes indicators: worker tự import `indicators.*` (spawn copy
+  sys.path của process cha), chỉ nhận OHLCV (6 cột) + config rút gọn (section freqai)
+- State process-level (Kernels backend, DtypePolicy, FeatureDAG) set 1 lần trong initializer
+- ContextVar scopes (IndicatorCache, allowlist, FeatureStore) mở lại trong worker mỗi job
+
+Memory có giới hạn:
+- Tối đa `max_pending` jobs đang chạy / chờ lấy kết quả (mặc định 2 × workers)
+- Kết quả của pair đang xử lý bị xóa khi expand_basic dùng xong; chỉ corr pairs
+  (dùng lại cho mọi pair) được giữ
+
+OHLCV do FreqAI truyền vào khác frame đã tính trước (vd: khoảng train dài hơn) → take()
+trả về None → expand_basic tính như cũ.
+
+Usage:
+    pool = ParallelFeatures(config, workers=ParallelFeatures.from_flags(feature_flags))
+    frames = pool.compute(jobs)                 # List[DataFrame] cột mới, cùng thứ tự jobs
+    pool.precompute(jobs, keep_pairs=corr)      # giữ lại cho take()
+    dataframe = pool.take(dataframe, pair, tf)  # None nếu không có / OHLCV khác
+
+Author: AI Trading System
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+try:
+    from indicators.indicator_cache import IndicatorCache
+except ImportError:
+    from .indicator_cache import IndicatorCache
+
+logger = logging.getLogger(__name__)
+
+# Cột gửi sang worker (giống FeatureStore.INPUT_COLUMNS)
+INPUT_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+# true → chừa 1 core cho process chính (freqtrade / FreqAI training)
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+
+# Config của worker (set trong initializer)
+_worker_config: Optional[dict] = None
+
+
+class FeatureJob(NamedTuple):
+    """1 lần gọi expand_basic: OHLCV của (pair, timeframe)"""
+    pair: str
+    timeframe: str
+    dataframe: DataFrame
+
+
+# ============================================================
+# WORKER (module-level → pickle theo tên)
+# ============================================================
+
+def _init_worker(config: dict) -> None:
+    """Set state process-level giống bot_start"""
+    global _worker_config
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_dag import FeatureDAG
+    from indicators.kernels import Kernels
+
+    _worker_config = config
+    flags = config.get('freqai', {}).get('feature_flags', {})
+    Kernels.set_backend('auto' if flags.get('numba_kernels', True) else 'numpy')
+    DtypePolicy.set_policy(DtypePolicy.from_flags(flags))
+    FeatureDAG.set_workers(0)  # song song ở mức process, không thêm threads
+    logging.getLogger('indicators').setLevel(logging.WARNING)
+
+
+def _run_job(pair: str, timeframe: str, ohlcv: DataFrame) -> DataFrame:
+    """expand_basic (batch) cho 1 frame → chỉ các cột mới"""
+    return ParallelFeatures.basic_features(ohlcv, pair, timeframe, _worker_config)
+
+
+class ParallelFeatures:
+    """Process pool tính trước expand_basic + kết quả chờ FreqAI lấy"""
+
+    def __init__(self, config: dict, workers: int = DEFAULT_WORKERS, max_pending: Optional[int] = None):
+        if workers < 1:
+            raise ValueError(f"workers must be >= 1, got {workers}")
+        self.config = ParallelFeatures.worker_config(config)
+        self.workers = workers
+        self.max_pending = max_pending or 2 * workers
+        self.hits = 0
+        self.misses = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # (pair, timeframe) → (fingerprint OHLCV, cột mới)
+        self._results: Dict[Tuple[str, str], Tuple[tuple, DataFrame]] = {}
+        self._keep: frozenset = frozenset()
+
+    # ============================================================
+    # CONFIG
+    # ============================================================
+
+    @staticmethod
+    def from_flags(feature_flags: dict) -> int:
+        """feature_flags.parallel_features: false/0 → tắt, true → DEFAULT_WORKERS, hoặc số processes"""
+        value = feature_flags.get('parallel_features', False)
+        if value is True:
+            return DEFAULT_WORKERS
+        if value is False or value is None:
+            return 0
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"parallel_features must be a bool or a non-negative int, got {value!r}")
+        return value
+
+    @staticmethod
+    def worker_config(config: dict) -> dict:
+        """Phần config mà các modules indicators đọc (freqai + user_data_dir + datadir), JSON → pickle được"""
+        subset = {'freqai': config.get('freqai', {}), 'exchange': {'name': config.get('exchange', {}).get('name', 'binance')}}
+        for key in ('user_data_dir', 'datadir'):
+            if config.get(key):
+                subset[key] = str(config[key])
+        return json.loads(json.dumps(subset, default=str))
+
+    # ============================================================
+    # FEATURES (chạy trong worker)
+    # ============================================================
+
+    @staticmethod
+    def basic_features(ohlcv: DataFrame, pair: str, timeframe: str, config: dict) -> DataFrame:
+        """
+        FeatureEngineering + SMC + Wave (+ Funding) với cùng flags và scopes như
+        FreqAIStrategy.feature_engineering_expand_basic (batch) → chỉ các cột mới.
+        """
+        from contextlib import nullcontext
+
+        from indicators.feature_engineering import FeatureEngineering
+        from indicators.feature_pruning import FeaturePruning
+        from indicators.feature_store import FeatureStore
+        from indicators.funding_features import FundingFeatures
+        from indicators.smc_indicators import SMCIndicators
+        from indicators.wave_indicators import WaveIndicators
+
+        flags = config.get('freqai', {}).get('feature_flags', {})
+        store_scope = (FeatureStore().activate(pair, timeframe, config)
+                       if flags.get('feature_store', False) else nullcontext())
+        with IndicatorCache(ohlcv).activate(), store_scope, FeaturePruning.scope(config):
+            dataframe = FeatureEngineering.add_all_features(ohlcv.copy(), config=config)
+            if flags.get('smc_indicators', True):
+                dataframe = SMCIndicators.add_all_indicators(dataframe)
+            if flags.get('wave_indicators', True):
+                dataframe = WaveIndicators.add_all_features(dataframe)
+            if flags.get('funding_features', False):
+                dataframe = FundingFeatures.add_all_features(dataframe, pair, timeframe, config)
+        return dataframe[[c for c in dataframe.columns if c not in ohlcv.columns]]
+
+    # ============================================================
+    # POOL
+    # ============================================================
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # spawn: process cha có threads (freqtrade, FeatureDAG, numba) → fork không an toàn
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(self.config,),
+            )
+        return self._executor
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def compute(self, jobs: Iterable[FeatureJob]) -> List[DataFrame]:
+        """
+        Cột mới của từng job, CÙNG THỨ TỰ với jobs.
+
+        Tối đa `max_pending` jobs đã submit mà chưa lấy kết quả → RAM không tăng
+        theo số jobs (kết quả vẫn được giữ trong list trả về).
+        """
+        pool = self._pool()
+        results: List[DataFrame] = []
+        pending: deque = deque()
+        for job in jobs:
+            ohlcv = job.dataframe[[c for c in INPUT_COLUMNS if c in job.dataframe.columns]]
+            pending.append(pool.submit(_run_job, job.pair, job.timeframe, ohlcv))
+            if len(pending) >= self.max_pending:
+                results.append(pending.popleft().result())
+        while pending:
+            results.append(pending.popleft().result())
+        return results
+
+    # ============================================================
+    # PRECOMPUTE → TAKE (strategy)
+    # ============================================================
+
+    def precompute(self, jobs: List[FeatureJob], keep_pairs: Iterable[str] = ()) -> int:
+        """
+        Tính các jobs chưa có kết quả. Kết quả của `keep_pairs` (corr pairs) được giữ
+        sau take(), các pair khác bị xóa khi dùng xong.
+        """
+        self._keep = frozenset(keep_pairs)
+        todo = [job for job in jobs if (job.pair, job.timeframe) not in self._results and len(job.dataframe)]
+        if not todo:
+            return 0
+        started = time.perf_counter()
+        for job, columns in zip(todo, self.compute(todo)):
+            self._results[(job.pair, job.timeframe)] = (IndicatorCache.frame_fingerprint(job.dataframe), columns)
+        logger.info(f"Parallel features: {len(todo)} frames on {self.workers} processes "
+                    f"in {time.perf_counter() - started:.1f}s")
+        return len(todo)
+
+    def take(self, dataframe: DataFrame, pair: str, timeframe: str) -> Optional[DataFrame]:
+        """dataframe + cột đã tính trước, None nếu không có hoặc OHLCV khác frame đã tính"""
+        entry = self._results.get((pair, timeframe))
+        if entry is None or entry[0] != IndicatorCache.frame_fingerprint(dataframe):
+            self.misses += 1
+            return None
+        if pair not in self._keep:
+            del self._results[(pair, timeframe)]
+        self.hits += 1
+        columns = entry[1].copy(deep=False)
+        columns.index = dataframe.index
+        return pd.concat([dataframe, columns], axis=1)
+
+    def stats(self) -> Dict[str, int]:
+        return {'workers': self.workers, 'hits': self.hits, 'misses': self.misses, 'held': len(self._results)}
+
+
+# ============================================================
+# PARITY + BENCHMARK (sequential vs process pool)
+# ============================================================
+if __name__ == "__main__":
+    # Cùng class với các modules import (chạy `-m` → file này là __main__)
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.parallel_features import FeatureJob, ParallelFeatures, _init_worker
+
+    logging.disable(logging.INFO)
+    config = {'freqai': {'feature_flags': {}}}
+    frames = {
+        ('BTC/USDT:USDT', '5m'): FeaturePruning._synthetic_ohlcv(20_000, seed=1),
+        ('ETH/USDT:USDT', '5m'): FeaturePruning._synthetic_ohlcv(20_000, seed=2),
+    }
+    for (pair, _), ohlcv in list(frames.items()):
+        for timeframe, rule in (('1h', '1h'), ('4h', '4h')):
+            frames[(pair, timeframe)] = (
+                ohlcv.resample(rule, on='date')
+                .agg({'open': 'first', 'high': 'max', 'low': 'min', 'close': 'last', 'volume': 'sum'})
+                .dropna().reset_index()
+            )
+    jobs = [FeatureJob(pair, timeframe, df) for (pair, timeframe), df in frames.items()]
+
+    print("=" * 60)
+    print(f"PARALLEL FEATURES - expand_basic over {len(jobs)} (pair, timeframe) jobs")
+    print("=" * 60)
+    _init_worker(ParallelFeatures.worker_config(config))
+    started = time.perf_counter()
+    expected = [ParallelFeatures.basic_features(job.dataframe, job.pair, job.timeframe, config) for job in jobs]
+    sequential = time.perf_counter() - started
+    print(f"  sequential         {sequential:6.2f}s")
+
+    for workers in (2, 4, os.cpu_count() or 1):
+        pool = ParallelFeatures(config, workers=workers)
+        pool.compute(jobs[:1])  # spawn + imports
+        started = time.perf_counter()
+        actual = pool.compute(jobs)
+        elapsed = time.perf_counter() - started
+        for got, want in zip(actual, expected):
+            pd.testing.assert_frame_equal(got, want)
+        print(f"  {workers:>2} processes       {elapsed:6.2f}s ({sequential / elapsed:.2f}x)")
+        pool.shutdown()
+
+    # take(): khớp OHLCV → cột giống hệt, khác frame → None; corr pair được giữ
+    pool = ParallelFeatures(config, workers=2)
+    pool.precompute(jobs, keep_pairs=['BTC/USDT:USDT'])
+    eth = frames[('ETH/USDT:USDT', '5m')]
+    pd.testing.assert_frame_equal(pool.take(eth, 'ETH/USDT:USDT', '5m').iloc[:, len(eth.columns):], expected[1])
+    assert pool.take(eth, 'ETH/USDT:USDT', '5m') is None  # đã dùng → xóa
+    assert pool.take(eth.iloc[1:], 'BTC/USDT:USDT', '5m') is None
+    assert pool.take(frames[('BTC/USDT:USDT', '5m')], 'BTC/USDT:USDT', '5m') is not None
+    assert pool.take(frames[('BTC/USDT:USDT', '5m')], 'BTC/USDT:USDT', '5m') is not None  # corr → giữ
+    pool.shutdown()
+    print(f"\n✅ identical columns for every worker count, take() stats {pool.stats()}")
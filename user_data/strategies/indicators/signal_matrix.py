@@ -0,0 +1,513 @@
+"""
+Signal Matrix - Precomputed entry/exit components cho hyperopt
+==============================================================
+Mỗi epoch hyperopt gọi lại populate_entry_trend / populate_exit_trend trên
+cùng 1 frame: dựng lại mọi boolean component (ai_positive, htf_ob_signal,
+adx_signal, momentum_signal, pressure_signal, ema_filter, exit conditions)
+dù phần lớn KHÔNG phụ thuộc tham số.
+
+SignalMatrix trích các input không phụ thuộc threshold 1 lần thành ma trận
+float64 (n × 11). Mỗi epoch chỉ áp lại:
+- buy_pred_threshold, entry_score_threshold, buy_adx_threshold (entry)
+- sell_pred_threshold, sell_rsi_threshold, buy_rsi_low (exit)
+
+Grid / ablation screening: batch_masks() trả masks của k bộ tham số trong 1 lượt
+broadcast (uint8 hoặc packbits), signal_counts() đếm signal mỗi bộ.
+
+Score tính sẵn cho ai=1 với adx_signal=1 và adx_signal=0 (cùng thứ tự phép cộng
+float như strategy) → so sánh `>= entry_score_threshold` y hệt bit-for-bit.
+
+Author: AI Trading System
+"""
+
+import logging
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import talib.abstract as ta
+from pandas import DataFrame
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_COL = '&-price_change_pct'
+# Target riêng của short (triple barrier) - short dùng -SHORT_PROFIT_COL thay cho PREDICTION_COL
+SHORT_PROFIT_COL = '&-short_profit_pct'
+SIGNAL_COLUMNS = ('enter_long', 'enter_short', 'exit_long', 'exit_short', 'enter_tag', 'exit_tag')
+
+# Cột của matrix
+PRED, SHORT_PRED, ADX, RSI, LONG_SCORE_ADX, LONG_SCORE_NO_ADX, SHORT_SCORE_ADX, SHORT_SCORE_NO_ADX, \
+    HAS_VOLUME, EMA_FILTER, EXIT_LONG_STATIC, EXIT_SHORT_STATIC = range(12)
+
+# batch_masks(): tham số cần có + tham số mỗi signal phụ thuộc (theo thứ tự trong _batch_kernel)
+BATCH_PARAMS = ('buy_pred_threshold', 'sell_pred_threshold', 'entry_score_threshold',
+                'buy_adx_threshold', 'sell_rsi_threshold', 'buy_rsi_low')
+BATCH_INPUTS = {
+    'enter_long': ('buy_pred_threshold', 'entry_score_threshold', 'buy_adx_threshold'),
+    'enter_short': ('buy_pred_threshold', 'entry_score_threshold', 'buy_adx_threshold'),
+    'exit_long': ('sell_pred_threshold', 'sell_rsi_threshold'),
+    'exit_short': ('buy_pred_threshold', 'buy_rsi_low'),
+}
+# Số phần tử (bộ tham số × nến) mỗi lượt broadcast → ~16MB mỗi mask tạm
+BATCH_ELEMENTS = 1 << 24
+# Số bit 1 của mỗi byte (đếm signal trên output packbits)
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# adx_signal: '%-ker_10' > 0.4 (cố định) | 'adx' > buy_adx_threshold (theo epoch) | không có (0)
+ADX_MODE_KER, ADX_MODE_PARAM, ADX_MODE_NONE = 'ker', 'adx', 'none'
+
+
+def _flag(dataframe: DataFrame, column: str, op, value: float) -> np.ndarray:
+    """(dataframe[column] <op> value) dạng 0/1 float, 0 nếu thiếu cột"""
+    if column not in dataframe.columns:
+        return np.zeros(len(dataframe))
+    return op(dataframe[column].to_numpy(dtype=float), value).astype(float)
+
+
+class SignalMatrix:
+    """Threshold-independent inputs của populate_entry_trend / populate_exit_trend"""
+
+    def __init__(self, matrix: np.ndarray, adx_mode: str, has_rsi: bool):
+        self.matrix = matrix
+        self.adx_mode = adx_mode
+        self.has_rsi = has_rsi
+
+    @staticmethod
+    def from_dataframe(dataframe: DataFrame, flags: dict) -> 'SignalMatrix':
+        """Trích components 1 lần (cùng logic với FreqAIStrategy.populate_*_trend)"""
+        n = len(dataframe)
+        gt, lt, eq = np.greater, np.less, np.equal
+        use_htf_ob_confluence = flags.get('htf_ob_confluence', True)
+        use_trend_filter = flags.get('trend_filter', True)
+
+        # HTF Order Block (long / short)
+        htf_ob_bull = np.zeros(n)
+        htf_ob_bear = np.zeros(n)
+        if use_htf_ob_confluence:
+            for tf in ('4h', '1h'):
+                if f'%-testing_bull_ob_{tf}' in dataframe.columns:
+                    htf_ob_bull = _flag(dataframe, f'%-testing_bull_ob_{tf}', gt, 0)
+                    break
+            for tf in ('4h', '1h'):
+                if f'%-testing_bear_ob_{tf}' in dataframe.columns:
+                    htf_ob_bear = _flag(dataframe, f'%-testing_bear_ob_{tf}', gt, 0)
+                    break
+            if '%-ob_fib_bull_confluence' in dataframe.columns:
+                htf_ob_bull = np.maximum(htf_ob_bull, _flag(dataframe, '%-ob_fib_bull_confluence', gt, 0))
+            if '%-ob_fib_bear_confluence' in dataframe.columns:
+                htf_ob_bear = np.maximum(htf_ob_bear, _flag(dataframe, '%-ob_fib_bear_confluence', gt, 0))
+
+        # ADX/Regime
+        adx = np.full(n, np.nan)
+        if '%-ker_10' in dataframe.columns:
+            adx_mode = ADX_MODE_KER
+            adx_static = _flag(dataframe, '%-ker_10', gt, 0.4)
+        elif 'adx' in dataframe.columns:
+            adx_mode = ADX_MODE_PARAM
+            adx = dataframe['adx'].to_numpy(dtype=float)
+            adx_static = np.zeros(n)
+        else:
+            adx_mode = ADX_MODE_NONE
+            adx_static = np.zeros(n)
+
+        momentum_long = _flag(dataframe, '%-momentum_confluence', gt, 0.4)
+        momentum_short = _flag(dataframe, '%-momentum_confluence', lt, 0.6)
+        pressure_long = _flag(dataframe, '%-money_pressure', gt, 0)
+        pressure_short = _flag(dataframe, '%-money_pressure', lt, 0)
+
+        def score(htf: np.ndarray, adx_signal: np.ndarray, momentum: np.ndarray, pressure: np.ndarray) -> np.ndarray:
+            # ai = 1 (rows có ai = 0 không bao giờ entry); giữ thứ tự cộng như strategy
+            return 1.0 * 0.30 + htf * 0.25 + adx_signal * 0.15 + momentum * 0.15 + pressure * 0.15
+
+        ones = np.ones(n)
+        if adx_mode == ADX_MODE_PARAM:
+            adx_hi, adx_lo = ones, np.zeros(n)
+        else:
+            adx_hi = adx_lo = adx_static  # cố định → 2 cột giống nhau
+
+        # EMA 200 trend filter (shorts)
+        ema_filter = np.ones(n)
+        if use_trend_filter:
+            if '%-dist_to_ema_200' in dataframe.columns:
+                ema_filter = _flag(dataframe, '%-dist_to_ema_200', lt, 0)
+            else:
+                ema_200 = np.asarray(ta.EMA(dataframe['close'], timeperiod=200), dtype=float)
+                ema_filter = lt(dataframe['close'].to_numpy(dtype=float), ema_200).astype(float)
+
+        # Exit conditions không phụ thuộc tham số (OR)
+        exit_long_static = np.zeros(n, dtype=bool)
+        exit_long_static |= _flag(dataframe, '%-trend_confluence', lt, 0.4) > 0
+        exit_long_static |= _flag(dataframe, '%-momentum_confluence', lt, 0.3) > 0
+        exit_long_static |= _flag(dataframe, '%-money_pressure', lt, -0.3) > 0
+        exit_long_static |= _flag(dataframe, '%-pattern_net_score', lt, -1) > 0
+        if '%-fvg_bear' in dataframe.columns:
+            exit_long_static |= _flag(dataframe, '%-fvg_bear', eq, 1) > 0
+        else:
+            exit_long_static |= _flag(dataframe, '%-order_block_bear', eq, 1) > 0
+        exit_long_static |= _flag(dataframe, '%-is_extreme_fear', eq, 1) > 0
+
+        exit_short_static = np.zeros(n, dtype=bool)
+        exit_short_static |= _flag(dataframe, '%-trend_confluence', gt, 0.6) > 0
+        exit_short_static |= _flag(dataframe, '%-momentum_confluence', gt, 0.7) > 0
+        exit_short_static |= _flag(dataframe, '%-money_pressure', gt, 0.3) > 0
+        exit_short_static |= _flag(dataframe, '%-pattern_net_score', gt, 1) > 0
+        if '%-fvg_bull' in dataframe.columns:
+            exit_short_static |= _flag(dataframe, '%-fvg_bull', eq, 1) > 0
+        else:
+            exit_short_static |= _flag(dataframe, '%-order_block_bull', eq, 1) > 0
+        exit_short_static |= _flag(dataframe, '%-is_extreme_fear', eq, 1) > 0
+
+        has_rsi = 'rsi' in dataframe.columns
+        prediction = dataframe[PREDICTION_COL].to_numpy(dtype=float)
+        matrix = np.column_stack([
+            prediction,
+            -dataframe[SHORT_PROFIT_COL].to_numpy(dtype=float) if SHORT_PROFIT_COL in dataframe.columns else prediction,
+            adx,
+            dataframe['rsi'].to_numpy(dtype=float) if has_rsi else np.full(n, np.nan),
+            score(htf_ob_bull, adx_hi, momentum_long, pressure_long),
+            score(htf_ob_bull, adx_lo, momentum_long, pressure_long),
+            score(htf_ob_bear, adx_hi, momentum_short, pressure_short),
+            score(htf_ob_bear, adx_lo, momentum_short, pressure_short),
+            (dataframe['volume'].to_numpy(dtype=float) > 0).astype(float),
+            ema_filter,
+            exit_long_static.astype(float),
+            exit_short_static.astype(float),
+        ])
+        # Column-major → mỗi cột liền bộ nhớ khi so sánh theo epoch
+        return SignalMatrix(np.asfortranarray(matrix), adx_mode, has_rsi)
+
+    # ============================================================
+    # PER-EPOCH
+    # ============================================================
+
+    def _adx_signal(self, buy_adx_threshold: float) -> np.ndarray:
+        if self.adx_mode == ADX_MODE_PARAM:
+            return self.matrix[:, ADX] > buy_adx_threshold
+        # ker / none: 2 cột score giống nhau → chọn cột nào cũng được
+        return np.ones(len(self.matrix), dtype=bool)
+
+    def entry_masks(self, buy_pred_threshold: float, entry_score_threshold: float,
+                    buy_adx_threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(enter_long, enter_short) boolean masks"""
+        m = self.matrix
+        adx_signal = self._adx_signal(buy_adx_threshold)
+        has_volume = m[:, HAS_VOLUME] > 0
+
+        long_score = np.where(adx_signal, m[:, LONG_SCORE_ADX], m[:, LONG_SCORE_NO_ADX])
+        enter_long = (m[:, PRED] > buy_pred_threshold) & has_volume & (long_score >= entry_score_threshold)
+
+        short_score = np.where(adx_signal, m[:, SHORT_SCORE_ADX], m[:, SHORT_SCORE_NO_ADX])
+        enter_short = ((m[:, SHORT_PRED] < -buy_pred_threshold) & has_volume & (m[:, EMA_FILTER] > 0)
+                       & (short_score >= entry_score_threshold))
+        return enter_long, enter_short
+
+    def exit_masks(self, sell_pred_threshold: float, buy_pred_threshold: float,
+                   sell_rsi_threshold: float, buy_rsi_low: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(exit_long, exit_short) boolean masks"""
+        m = self.matrix
+        has_volume = m[:, HAS_VOLUME] > 0
+
+        exit_long = (m[:, PRED] < sell_pred_threshold) & has_volume
+        exit_long |= m[:, EXIT_LONG_STATIC] > 0
+        exit_short = (m[:, SHORT_PRED] > buy_pred_threshold) & has_volume
+        exit_short |= m[:, EXIT_SHORT_STATIC] > 0
+        if self.has_rsi:
+            exit_long |= m[:, RSI] > sell_rsi_threshold
+            exit_short |= m[:, RSI] < buy_rsi_low
+        return exit_long, exit_short
+
+    # ============================================================
+    # BATCH (grid / ablation screening)
+    # ============================================================
+
+    def _batch_kernel(self, signal: str, params: np.ndarray) -> np.ndarray:
+        """Masks (u, n) cho u bộ tham số trong 1 lượt broadcast (cột params theo BATCH_INPUTS[signal])"""
+        m = self.matrix
+        pred = m[:, PRED][None, :]
+        short_pred = m[:, SHORT_PRED][None, :]
+        has_volume = (m[:, HAS_VOLUME] > 0)[None, :]
+
+        if signal in ('enter_long', 'enter_short'):
+            buy_pred, score_threshold, adx_threshold = (params[:, i][:, None] for i in range(3))
+            hi, lo = (LONG_SCORE_ADX, LONG_SCORE_NO_ADX) if signal == 'enter_long' \
+                else (SHORT_SCORE_ADX, SHORT_SCORE_NO_ADX)
+            if self.adx_mode == ADX_MODE_PARAM:
+                score_ok = np.where(m[:, ADX][None, :] > adx_threshold,
+                                    m[:, hi][None, :] >= score_threshold,
+                                    m[:, lo][None, :] >= score_threshold)
+            else:
+                score_ok = m[:, hi][None, :] >= score_threshold
+            if signal == 'enter_long':
+                return (pred > buy_pred) & has_volume & score_ok
+            return (short_pred < -buy_pred) & has_volume & (m[:, EMA_FILTER] > 0)[None, :] & score_ok
+
+        pred_threshold, rsi_threshold = params[:, 0][:, None], params[:, 1][:, None]
+        if signal == 'exit_long':
+            masks = ((pred < pred_threshold) & has_volume) | (m[:, EXIT_LONG_STATIC] > 0)[None, :]
+            if self.has_rsi:
+                masks |= m[:, RSI][None, :] > rsi_threshold
+        else:
+            masks = ((short_pred > pred_threshold) & has_volume) | (m[:, EXIT_SHORT_STATIC] > 0)[None, :]
+            if self.has_rsi:
+                masks |= m[:, RSI][None, :] < rsi_threshold
+        return masks
+
+    def batch_masks(self, param_sets, packed: bool = True) -> Dict[str, np.ndarray]:
+        """
+        enter_long / enter_short / exit_long / exit_short cho k bộ tham số.
+
+        - Mỗi signal chỉ phụ thuộc vài tham số (BATCH_INPUTS) → tính trên các tổ hợp
+          unique rồi gather (vd: exit_long không đổi theo entry_score_threshold)
+        - Broadcast theo chunk ≤ BATCH_ELEMENTS phần tử → RAM tạm cố định
+
+        Args:
+            param_sets: DataFrame / dict of arrays / list of dicts, cần đủ BATCH_PARAMS
+                        (cột khác như buy_rsi_high được bỏ qua - không dùng trong signals)
+            packed: True → np.packbits theo hàng: uint8 (k, ceil(n/8));
+                    False → uint8 0/1 (k, n)
+
+        Returns:
+            {signal: array} - hàng i ứng với param_sets[i]; unpack bằng
+            np.unpackbits(arr, axis=1, count=n)
+        """
+        params = pd.DataFrame(param_sets)
+        missing = [name for name in BATCH_PARAMS if name not in params.columns]
+        if missing:
+            raise ValueError(f"param_sets thiếu tham số: {missing}")
+
+        n = len(self.matrix)
+        chunk = max(1, BATCH_ELEMENTS // max(n, 1))
+        result = {}
+        for signal, inputs in BATCH_INPUTS.items():
+            values = params[list(inputs)].to_numpy(dtype=float)
+            # Tham số không ảnh hưởng frame này (không có cột adx / rsi) → không tách tổ hợp
+            for i, name in enumerate(inputs):
+                if ((name == 'buy_adx_threshold' and self.adx_mode != ADX_MODE_PARAM)
+                        or (name in ('sell_rsi_threshold', 'buy_rsi_low') and not self.has_rsi)):
+                    values[:, i] = 0.0
+            unique, inverse = np.unique(values, axis=0, return_inverse=True)
+            width = (n + 7) // 8 if packed else n
+            out = np.empty((len(unique), width), dtype=np.uint8)
+            for start in range(0, len(unique), chunk):
+                masks = self._batch_kernel(signal, unique[start:start + chunk])
+                out[start:start + chunk] = np.packbits(masks, axis=1) if packed else masks
+            result[signal] = out[inverse.reshape(-1)]
+        return result
+
+    @staticmethod
+    def signal_counts(masks: Dict[str, np.ndarray], packed: bool = True) -> DataFrame:
+        """Số nến có signal theo từng bộ tham số (cột = signal) - để lọc grid trước khi backtest"""
+        return DataFrame({
+            signal: _POPCOUNT[arr].sum(axis=1, dtype=np.int64) if packed else arr.sum(axis=1, dtype=np.int64)
+            for signal, arr in masks.items()
+        })
+
+
+class SignalMatrixCache:
+    """
+    SignalMatrix theo (pair, frame fingerprint), giới hạn MAX_ENTRIES.
+
+    Class-level (không theo instance) → sống qua các epoch trong cùng worker process
+    kể cả khi hyperopt pickle lại strategy mỗi batch.
+    """
+
+    MAX_ENTRIES = 64
+    _entries: Dict[Tuple, SignalMatrix] = {}
+
+    @staticmethod
+    def fingerprint(dataframe: DataFrame) -> Tuple:
+        """len + index/date đầu/cuối + tổng prediction + tên cột (bỏ qua cột signal đã ghi)"""
+        n = len(dataframe)
+        if n == 0:
+            return (0,)
+        dates = dataframe['date'] if 'date' in dataframe.columns else dataframe.index.to_series()
+        columns = tuple(c for c in dataframe.columns if c not in SIGNAL_COLUMNS)
+        pred_sum = float(np.nansum(dataframe[PREDICTION_COL].to_numpy(dtype=float)))
+        if SHORT_PROFIT_COL in dataframe.columns:
+            pred_sum = (pred_sum, float(np.nansum(dataframe[SHORT_PROFIT_COL].to_numpy(dtype=float))))
+        return (n, dataframe.index[0], dataframe.index[-1], dates.iloc[0], dates.iloc[-1], pred_sum, columns)
+
+    @staticmethod
+    def get(pair: str, dataframe: DataFrame, flags: dict) -> SignalMatrix:
+        key = (pair, SignalMatrixCache.fingerprint(dataframe),
+               tuple(sorted((k, str(v)) for k, v in flags.items())))
+        entries = SignalMatrixCache._entries
+        matrix = entries.get(key)
+        if matrix is None:
+            matrix = SignalMatrix.from_dataframe(dataframe, flags)
+            if len(entries) >= SignalMatrixCache.MAX_ENTRIES:
+                entries.pop(next(iter(entries)))  # FIFO
+            entries[key] = matrix
+            logger.info(f"Signal matrix built for {pair}: {matrix.matrix.shape} (adx mode: {matrix.adx_mode})")
+        return matrix
+
+    @staticmethod
+    def clear() -> None:
+        SignalMatrixCache._entries.clear()
+
+
+def apply_signal(dataframe: DataFrame, mask: np.ndarray, column: str) -> None:
+    """`dataframe.loc[mask, column] = 1` (giữ nguyên semantics/dtype của strategy)"""
+    if column not in dataframe.columns:
+        # Cột mới: .loc tạo float64 (1.0 / NaN) → gán thẳng, không qua indexer
+        dataframe[column] = np.where(mask, 1.0, np.nan)
+    else:
+        dataframe.loc[pd.Series(mask, index=dataframe.index), column] = 1
+
+
+# ============================================================
+# PARITY TEST + BENCHMARK
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    from FreqAIStrategy import FreqAIStrategy
+    # Cùng cache với strategy (chạy `-m` → file này là __main__, không phải indicators.signal_matrix)
+    from indicators.signal_matrix import SignalMatrixCache
+
+    rng = np.random.default_rng(42)
+
+    def make_frame(n: int) -> DataFrame:
+        close = 40000 * np.exp(np.cumsum(rng.normal(0.0001, 0.002, n)))
+        df = DataFrame({
+            'date': pd.date_range(start='2025-01-01', periods=n, freq='5min'),
+            'close': close,
+            'volume': np.where(rng.random(n) < 0.02, 0.0, rng.uniform(100, 1000, n)),
+            PREDICTION_COL: rng.normal(0, 0.015, n),
+            'adx': rng.uniform(5, 60, n),
+            'rsi': rng.uniform(5, 95, n),
+            '%-ker_10': rng.random(n),
+            '%-momentum_confluence': rng.random(n),
+            '%-money_pressure': rng.uniform(-1, 1, n),
+            '%-trend_confluence': rng.random(n),
+            '%-pattern_net_score': rng.integers(-3, 4, n).astype(float),
+            '%-dist_to_ema_200': rng.normal(0, 0.02, n),
+            '%-is_extreme_fear': (rng.random(n) < 0.01).astype(float),
+        })
+        for col, p in (('%-testing_bull_ob_1h', 0.1), ('%-testing_bear_ob_1h', 0.1),
+                       ('%-ob_fib_bull_confluence', 0.05), ('%-ob_fib_bear_confluence', 0.05),
+                       ('%-fvg_bull', 0.02), ('%-fvg_bear', 0.02),
+                       ('%-order_block_bull', 0.03), ('%-order_block_bear', 0.03)):
+            df[col] = (rng.random(n) < p).astype(float)
+        df.loc[rng.random(n) < 0.01, PREDICTION_COL] = np.nan
+        return df
+
+    def make_strategy(flags: dict) -> FreqAIStrategy:
+        strategy = object.__new__(FreqAIStrategy)
+        strategy.config = {'freqai': {'enabled': True, 'feature_flags': dict(flags)}}
+        strategy.dp = None
+        return strategy
+
+    params = {
+        'buy_pred_threshold': lambda: round(rng.uniform(0.005, 0.03), 3),
+        'sell_pred_threshold': lambda: round(rng.uniform(-0.03, -0.005), 3),
+        'entry_score_threshold': lambda: round(rng.uniform(0.3, 0.6), 2),
+        'buy_adx_threshold': lambda: int(rng.integers(20, 51)),
+        'sell_rsi_threshold': lambda: int(rng.integers(20, 81)),
+        'buy_rsi_low': lambda: int(rng.integers(20, 41)),
+    }
+
+    def run_epoch(strategy: FreqAIStrategy, df: DataFrame) -> DataFrame:
+        df = strategy.populate_entry_trend(df, {'pair': 'BTC/USDT:USDT'})
+        return strategy.populate_exit_trend(df, {'pair': 'BTC/USDT:USDT'})
+
+    logging.disable(logging.INFO)  # strategy logger.info mỗi epoch
+
+    print("=" * 60)
+    print("SIGNAL MATRIX - PARITY (flag on vs off, random hyperopt params)")
+    print("=" * 60)
+
+    base = make_frame(20_000)
+    variants = {
+        'default (ker_10)': (base, {}),
+        'adx mode': (base.drop(columns=['%-ker_10']), {}),
+        'no ker/adx/rsi': (base.drop(columns=['%-ker_10', 'adx', 'rsi']), {}),
+        'no fvg, 4h ob': (base.drop(columns=['%-fvg_bull', '%-fvg_bear'])
+                          .rename(columns={'%-testing_bull_ob_1h': '%-testing_bull_ob_4h'}), {}),
+        'EMA200 fallback': (base.drop(columns=['%-dist_to_ema_200']), {}),
+        'flags off': (base, {'htf_ob_confluence': False, 'trend_filter': False}),
+        'short target': (base.assign(**{SHORT_PROFIT_COL: rng.normal(0, 0.015, len(base))}), {}),
+    }
+    signal_columns = list(SIGNAL_COLUMNS[:4])
+    for name, (frame, flags) in variants.items():
+        legacy = make_strategy(flags)
+        fast = make_strategy({**flags, 'signal_matrix': True})
+        for _ in range(25):
+            for param, sample in params.items():
+                getattr(FreqAIStrategy, param).value = sample()
+            expected = run_epoch(legacy, frame.copy())
+            actual = run_epoch(fast, frame.copy())
+            pd.testing.assert_frame_equal(actual[signal_columns], expected[signal_columns])
+        assert len(SignalMatrixCache._entries) <= SignalMatrixCache.MAX_ENTRIES
+        print(f"  ✅ {name}: 25 param sets identical")
+
+    print("\n" + "=" * 60)
+    print("SIGNAL MATRIX - BENCHMARK (entry + exit per epoch)")
+    print("=" * 60)
+
+    for n in (100_000, 500_000):
+        frame = make_frame(n)
+        timings = {}
+        for label, flags in (('legacy', {}), ('signal_matrix', {'signal_matrix': True})):
+            strategy = make_strategy(flags)
+            SignalMatrixCache.clear()
+            epochs = 20
+            copies = [frame.copy() for _ in range(epochs + 1)]  # copy không tính vào thời gian
+            start = time.perf_counter()
+            run_epoch(strategy, copies.pop())  # epoch đầu: dựng matrix
+            first = time.perf_counter() - start
+            start = time.perf_counter()
+            for df in copies:
+                run_epoch(strategy, df)
+            timings[label] = ((time.perf_counter() - start) / epochs, first)
+        (legacy_epoch, _), (fast_epoch, build) = timings['legacy'], timings['signal_matrix']
+        print(f"  {n:>7,} rows: legacy {legacy_epoch * 1000:6.1f} ms/epoch | signal_matrix "
+              f"{fast_epoch * 1000:6.1f} ms/epoch (first epoch {build * 1000:.0f} ms) | "
+              f"{legacy_epoch / fast_epoch:.1f}x")
+
+    print("\n" + "=" * 60)
+    print("SIGNAL MATRIX - BATCH PARITY (batch_masks vs entry/exit_masks)")
+    print("=" * 60)
+
+    def random_grid(k: int) -> DataFrame:
+        # Grid thật có nhiều giá trị lặp (Int/Decimal parameters) → test cả phần dedupe
+        return DataFrame({name: [sample() for _ in range(k)] for name, sample in params.items()})
+
+    for name, (frame, flags) in variants.items():
+        matrix = SignalMatrix.from_dataframe(frame, flags)
+        grid = random_grid(40)
+        unpacked = matrix.batch_masks(grid, packed=False)
+        packed = matrix.batch_masks(grid)
+        n = len(frame)
+        for i, row in enumerate(grid.itertuples(index=False)):
+            enter_long, enter_short = matrix.entry_masks(
+                row.buy_pred_threshold, row.entry_score_threshold, row.buy_adx_threshold)
+            exit_long, exit_short = matrix.exit_masks(
+                row.sell_pred_threshold, row.buy_pred_threshold, row.sell_rsi_threshold, row.buy_rsi_low)
+            for signal, expected in (('enter_long', enter_long), ('enter_short', enter_short),
+                                     ('exit_long', exit_long), ('exit_short', exit_short)):
+                assert np.array_equal(unpacked[signal][i], expected.astype(np.uint8)), f"{name}: {signal}[{i}]"
+                assert np.array_equal(np.unpackbits(packed[signal][i], count=n), expected), f"{name}: {signal}[{i}] packed"
+        counts = SignalMatrix.signal_counts(packed)
+        assert counts.equals(SignalMatrix.signal_counts(unpacked, packed=False))
+        print(f"  ✅ {name}: 40 param sets identical (packed + uint8)")
+
+    try:
+        matrix.batch_masks(grid.drop(columns=['buy_rsi_low']))
+        raise AssertionError("missing parameter not rejected")
+    except ValueError:
+        pass
+
+    print("\n" + "=" * 60)
+    print("SIGNAL MATRIX - BATCH THROUGHPUT (4 signals, packed)")
+    print("=" * 60)
+
+    for n, k in ((100_000, 2_000), (500_000, 1_000)):
+        matrix = SignalMatrix.from_dataframe(make_frame(n), {})
+        grid = random_grid(k)
+        start = time.perf_counter()
+        masks = matrix.batch_masks(grid)
+        elapsed = time.perf_counter() - start
+        size_mb = sum(arr.nbytes for arr in masks.values()) / 1e6
+        print(f"  {n:>7,} rows × {k:,} param sets: {elapsed:6.2f}s | {k / elapsed:,.0f} sets/s | "
+              f"output {size_mb:.0f} MB")
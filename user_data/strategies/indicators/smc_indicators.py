@@ -18,6 +18,21 @@ import pandas_ta as ta
 from pandas import DataFrame
 import logging
 
+try:
+    from indicators.indicator_cache import IndicatorCache
+    from indicators.feature_store import FeatureStore
+    from indicators.kernels import Kernels
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .indicator_cache import IndicatorCache
+    from .feature_store import FeatureStore
+    from .kernels import Kernels
+    from .dtype_policy import DtypePolicy
+    from .feature_pruning import FeaturePruning
+    from .feature_profiler import FeatureProfiler
+
 logger = logging.getLogger(__name__)
 
 
@@ -29,6 +44,8 @@ class SMCIndicators:
     """
 
     @staticmethod
+    @FeatureProfiler.profiled
+    @FeatureStore.materialized('smc')
     def add_all_indicators(dataframe: DataFrame) -> DataFrame:
         """
         Main method to add all SMC indicators to the dataframe.
@@ -40,29 +57,33 @@ class SMCIndicators:
         # Collect all features in dict to avoid fragmentation
         features = {}
         
-        SMCIndicators._calc_sonic_r(dataframe, features)
-        SMCIndicators._calc_institutional_emas(dataframe, features)
-        SMCIndicators._calc_fair_value_gaps(dataframe, features)
-        SMCIndicators._calc_smc_structure(dataframe, features)
-        SMCIndicators._calc_moon_phases(dataframe, features)
-        
-        # NEW: Order Block, Wyckoff, CHoCH, Liquidity (từ báo cáo nghiên cứu)
-        SMCIndicators._calc_order_blocks(dataframe, features)
-        SMCIndicators._calc_wyckoff_patterns(dataframe, features)
-        SMCIndicators._calc_choch(dataframe, features)
-        SMCIndicators._calc_liquidity_pools(dataframe, features)
-        
-        # NEW: OB + Fib Confluence and Structure Change (từ implementation plan)
-        SMCIndicators._calc_ob_fib_confluence(dataframe, features)
-        SMCIndicators._calc_structure_change(dataframe, features)
+        FeaturePruning.run_groups((
+            SMCIndicators._calc_sonic_r,
+            SMCIndicators._calc_institutional_emas,
+            SMCIndicators._calc_fair_value_gaps,
+            SMCIndicators._calc_smc_structure,
+            SMCIndicators._calc_moon_phases,
+            
+            # NEW: Order Block, Wyckoff, CHoCH, Liquidity (từ báo cáo nghiên cứu)
+            SMCIndicators._calc_order_blocks,
+            SMCIndicators._calc_wyckoff_patterns,
+            SMCIndicators._calc_choch,
+            SMCIndicators._calc_liquidity_pools,
+            
+            # NEW: OB + Fib Confluence and Structure Change (từ implementation plan)
+            SMCIndicators._calc_ob_fib_confluence,
+            SMCIndicators._calc_structure_change,
+        ), features, dataframe)
         
         # Single concat - much faster than individual inserts
+        features = FeaturePruning.select(features)
         if features:
             features_df = pd.DataFrame(features, index=dataframe.index)
             # CRITICAL FIX: Fill NaNs (e.g. initial period before first OB is found)
             # FreqAI drops rows with NaNs, so we must fill them.
             # 0 is acceptable because we have other flags (like %-testing_ob) to clarify context.
             features_df = features_df.ffill().fillna(0)
+            features_df = DtypePolicy.apply(features_df)
             dataframe = pd.concat([dataframe, features_df], axis=1)
         
         logger.info("SMC Indicators added successfully")
@@ -157,8 +178,8 @@ class SMCIndicators:
     @staticmethod
     def _calc_smc_structure(dataframe: DataFrame, features: dict, length: int = 50) -> None:
         """Calculate SMC Structure features into dict"""
-        swing_high = dataframe['high'].rolling(window=length).max()
-        swing_low = dataframe['low'].rolling(window=length).min()
+        swing_high = IndicatorCache.rolling(dataframe, 'high', length, 'max')
+        swing_low = IndicatorCache.rolling(dataframe, 'low', length, 'min')
         
         features['%-dist_to_swing_high'] = (dataframe['close'] - swing_high) / dataframe['close']
         features['%-dist_to_swing_low'] = (dataframe['close'] - swing_low) / dataframe['close']
@@ -262,11 +283,11 @@ class SMCIndicators:
         ob_bear_high = np.where(bearish_ob, dataframe['high'].shift(3), np.nan)
         ob_bear_low = np.where(bearish_ob, dataframe['low'].shift(3), np.nan)
         
-        # Forward fill để giữ OB zone gần nhất
-        ob_bull_high = pd.Series(ob_bull_high, index=dataframe.index).ffill()
-        ob_bull_low = pd.Series(ob_bull_low, index=dataframe.index).ffill()
-        ob_bear_high = pd.Series(ob_bear_high, index=dataframe.index).ffill()
-        ob_bear_low = pd.Series(ob_bear_low, index=dataframe.index).ffill()
+        # Forward fill để giữ OB zone gần nhất (Kernels: Numba / NumPy)
+        ob_bull_high = pd.Series(Kernels.ffill(ob_bull_high), index=dataframe.index)
+        ob_bull_low = pd.Series(Kernels.ffill(ob_bull_low), index=dataframe.index)
+        ob_bear_high = pd.Series(Kernels.ffill(ob_bear_high), index=dataframe.index)
+        ob_bear_low = pd.Series(Kernels.ffill(ob_bear_low), index=dataframe.index)
         
         # Distance to nearest Bullish OB (normalized)
         features['%-dist_to_bull_ob'] = (dataframe['close'] - ob_bull_high) / (dataframe['close'] + 1e-10)
@@ -306,10 +327,10 @@ class SMCIndicators:
         - Volume thấp hoặc rất cao
         """
         # Xác định Trading Range
-        rolling_high = dataframe['high'].rolling(range_lookback).max().shift(1)
-        rolling_low = dataframe['low'].rolling(range_lookback).min().shift(1)
+        rolling_high = IndicatorCache.rolling(dataframe, 'high', range_lookback, 'max').shift(1)
+        rolling_low = IndicatorCache.rolling(dataframe, 'low', range_lookback, 'min').shift(1)
         
-        avg_vol = dataframe['volume'].rolling(20).mean()
+        avg_vol = IndicatorCache.rolling(dataframe, 'volume', 20, 'mean')
         
         # === SPRING (Bear Trap) ===
         # Điều kiện 1: Low hiện tại phá đáy cũ
@@ -381,8 +402,8 @@ class SMCIndicators:
         3. CHoCH Bear: Trong uptrend, phá vỡ HL gần nhất
         """
         # Tìm swing points
-        swing_high = dataframe['high'].rolling(length).max()
-        swing_low = dataframe['low'].rolling(length).min()
+        swing_high = IndicatorCache.rolling(dataframe, 'high', length, 'max')
+        swing_low = IndicatorCache.rolling(dataframe, 'low', length, 'min')
         
         # Previous swing points (shifted)
         prev_swing_high = swing_high.shift(length // 2)
@@ -423,8 +444,8 @@ class SMCIndicators:
         
         Smart Money thường "săn" các vùng này trước khi đảo chiều.
         """
-        swing_high = dataframe['high'].rolling(lookback).max()
-        swing_low = dataframe['low'].rolling(lookback).min()
+        swing_high = IndicatorCache.rolling(dataframe, 'high', lookback, 'max')
+        swing_low = IndicatorCache.rolling(dataframe, 'low', lookback, 'min')
         
         # Check if current high is near swing high (within tolerance)
         near_swing_high = (dataframe['high'] - swing_high).abs() / (swing_high + 1e-10) < tolerance
@@ -502,8 +523,8 @@ class SMCIndicators:
         """
         # Tính Fib position nếu chưa có (fallback)
         lookback = 50
-        swing_high = dataframe['high'].rolling(lookback).max()
-        swing_low = dataframe['low'].rolling(lookback).min()
+        swing_high = IndicatorCache.rolling(dataframe, 'high', lookback, 'max')
+        swing_low = IndicatorCache.rolling(dataframe, 'low', lookback, 'min')
         price_range = swing_high - swing_low
         
         fib_pos = (dataframe['close'] - swing_low) / (price_range + 1e-10)
@@ -556,8 +577,8 @@ class SMCIndicators:
         3. Nếu đổi hướng → Structure Change
         """
         # Swing points
-        swing_high = dataframe['high'].rolling(length).max()
-        swing_low = dataframe['low'].rolling(length).min()
+        swing_high = IndicatorCache.rolling(dataframe, 'high', length, 'max')
+        swing_low = IndicatorCache.rolling(dataframe, 'low', length, 'min')
         
         # Compare với nửa period trước
         half = length // 2
@@ -20,6 +20,17 @@ import pandas as pd
 from pandas import DataFrame
 import logging
 
+try:
+    from indicators.indicator_cache import IndicatorCache
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .indicator_cache import IndicatorCache
+    from .dtype_policy import DtypePolicy
+    from .feature_pruning import FeaturePruning
+    from .feature_profiler import FeatureProfiler
+
 logger = logging.getLogger(__name__)
 
 
@@ -31,6 +42,7 @@ class VSAIndicators:
     """
 
     @staticmethod
+    @FeatureProfiler.profiled
     def add_all_indicators(dataframe: DataFrame) -> DataFrame:
         """
         Main method - Thêm tất cả VSA indicators.
@@ -45,16 +57,19 @@ class VSAIndicators:
         
         features = {}
         
-        VSAIndicators._calc_spread_analysis(dataframe, features)
-        VSAIndicators._calc_effort_vs_result(dataframe, features)
-        VSAIndicators._calc_climactic_volume(dataframe, features)
-        VSAIndicators._calc_absorption(dataframe, features)
-        VSAIndicators._calc_no_demand_supply(dataframe, features)
-        VSAIndicators._calc_stopping_volume(dataframe, features)
+        FeaturePruning.run_groups((
+            VSAIndicators._calc_spread_analysis,
+            VSAIndicators._calc_effort_vs_result,
+            VSAIndicators._calc_climactic_volume,
+            VSAIndicators._calc_absorption,
+            VSAIndicators._calc_no_demand_supply,
+            VSAIndicators._calc_stopping_volume,
+        ), features, dataframe)
         
         # Single concat for performance
+        features = FeaturePruning.select(features)
         if features:
-            features_df = pd.DataFrame(features, index=dataframe.index)
+            features_df = DtypePolicy.apply(pd.DataFrame(features, index=dataframe.index))
             dataframe = pd.concat([dataframe, features_df], axis=1)
         
         logger.info("VSA Indicators added successfully")
@@ -68,8 +83,8 @@ class VSAIndicators:
         Spread = High - Low
         So sánh với trung bình để phát hiện nến bất thường.
         """
-        spread = dataframe['high'] - dataframe['low']
-        avg_spread = spread.rolling(period).mean()
+        spread = IndicatorCache.source(dataframe, 'hl_range')
+        avg_spread = IndicatorCache.rolling(dataframe, 'hl_range', period, 'mean')
         
         # Spread ratio (so với trung bình)
         # > 1.5: Wide spread (biên độ rộng)
@@ -98,7 +113,7 @@ class VSAIndicators:
         price_change = (dataframe['close'] - dataframe['close'].shift(1)).abs()
         avg_price_change = price_change.rolling(period).mean()
         
-        vol_ratio = dataframe['volume'] / (dataframe['volume'].rolling(period).mean() + 1e-10)
+        vol_ratio = dataframe['volume'] / (IndicatorCache.rolling(dataframe, 'volume', period, 'mean') + 1e-10)
         price_ratio = price_change / (avg_price_change + 1e-10)
         
         # Effort vs Result Ratio
@@ -121,11 +136,11 @@ class VSAIndicators:
         Selling Climax: Volume cực cao + Giá giảm mạnh + Rút chân (Đáy tiềm năng)
         Buying Climax: Volume cực cao + Giá tăng mạnh + Rút đầu (Đỉnh tiềm năng)
         """
-        avg_vol = dataframe['volume'].rolling(period).mean()
+        avg_vol = IndicatorCache.rolling(dataframe, 'volume', period, 'mean')
         std_vol = dataframe['volume'].rolling(period).std()
         
-        spread = dataframe['high'] - dataframe['low']
-        avg_spread = spread.rolling(period).mean()
+        spread = IndicatorCache.source(dataframe, 'hl_range')
+        avg_spread = IndicatorCache.rolling(dataframe, 'hl_range', period, 'mean')
         
         # Volume Z-score
         vol_zscore = (dataframe['volume'] - avg_vol) / (std_vol + 1e-10)
@@ -167,9 +182,9 @@ class VSAIndicators:
         Bearish Absorption: Giá không giảm dù có volume bán lớn (Đáy)
         Bullish Absorption: Giá không tăng dù có volume mua lớn (Đỉnh)
         """
-        avg_vol = dataframe['volume'].rolling(period).mean()
-        spread = dataframe['high'] - dataframe['low']
-        avg_spread = spread.rolling(period).mean()
+        avg_vol = IndicatorCache.rolling(dataframe, 'volume', period, 'mean')
+        spread = IndicatorCache.source(dataframe, 'hl_range')
+        avg_spread = IndicatorCache.rolling(dataframe, 'hl_range', period, 'mean')
         
         # High volume (> 1.5x) + Narrow spread (< 0.7x)
         high_vol = dataframe['volume'] > 1.5 * avg_vol
@@ -207,9 +222,9 @@ class VSAIndicators:
         - No Supply trong uptrend = An toàn mua tiếp
         - No Demand trong downtrend = An toàn bán tiếp
         """
-        avg_vol = dataframe['volume'].rolling(period).mean()
-        spread = dataframe['high'] - dataframe['low']
-        avg_spread = spread.rolling(period).mean()
+        avg_vol = IndicatorCache.rolling(dataframe, 'volume', period, 'mean')
+        spread = IndicatorCache.source(dataframe, 'hl_range')
+        avg_spread = IndicatorCache.rolling(dataframe, 'hl_range', period, 'mean')
         
         # Low volume (< 0.7x average)
         low_vol = dataframe['volume'] < 0.7 * avg_vol
@@ -242,8 +257,8 @@ class VSAIndicators:
         
         Đây là dấu hiệu Smart Money bắt đầu mua vào (Accumulation).
         """
-        avg_vol = dataframe['volume'].rolling(period).mean()
-        spread = dataframe['high'] - dataframe['low']
+        avg_vol = IndicatorCache.rolling(dataframe, 'volume', period, 'mean')
+        spread = IndicatorCache.source(dataframe, 'hl_range')
         
         # High volume (> 2x)
         high_vol = dataframe['volume'] > 2.0 * avg_vol
@@ -0,0 +1,400 @@
+"""
+Warm Start - Retrain tiếp từ trees của model trước (LightGBM / XGBoost)
+======================================================================
+live_retrain_hours = 24, train_period_days = 45 → mỗi lần retrain build lại model
+từ đầu dù 44/45 ngày dữ liệu không đổi. Warm start boost tiếp trên dữ liệu mới
+từ trees của model trước của CÙNG pair:
+- Tối đa `max_added_trees` trees mỗi lần (n_estimators khi warm, early stopping giữ nguyên)
+- Warm fit dùng lại feature_pipeline / label_pipeline ĐÃ FIT của model trước (không fit
+  lại MinMaxScaler(-1, 1) / VarianceThreshold / SVM / DI) → trees cũ nhận input cùng scale
+  như lúc được build, trees mới học tiếp trên cùng không gian đó
+- Full rebuild sau mỗi `full_rebuild_every` lần warm (tổng trees bị chặn, scaler / model
+  không kẹt mãi ở regime cũ), hoặc khi chưa có model / pipelines trước, feature set đổi
+- Log thời gian mỗi lần retrain + tiết kiệm so với lần full rebuild gần nhất
+
+State (số lần warm, trees, thời gian full fit) gắn vào chính model (dict picklable)
+→ lưu / load cùng model của FreqAI, không có file riêng.
+
+Dùng qua user_data/freqaimodels:
+    --freqaimodel WarmStartLightGBMRegressor   (config-lightgbm.json)
+    --freqaimodel WarmStartXGBoostRegressor    (config.json)
+
+Config (freqai.warm_start, tùy chọn):
+    {"max_added_trees": 200, "full_rebuild_every": 7}
+
+Author: AI Trading System
+"""
+
+import logging
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ADDED_TREES = 200
+DEFAULT_FULL_REBUILD_EVERY = 7   # 7 × 24h → full rebuild hàng tuần
+
+STATE_ATTRIBUTE = 'warm_start_state'
+
+# Keys của dd.meta_data_dictionary[pair] (freqtrade.freqai.data_drawer FEATURE_PIPELINE / LABEL_PIPELINE)
+FEATURE_PIPELINE = 'feature_pipeline'
+LABEL_PIPELINE = 'label_pipeline'
+
+
+class WarmStart:
+    """Quyết định warm / full cho mỗi lần fit và ghi state vào model"""
+
+    def __init__(self, max_added_trees: int = DEFAULT_MAX_ADDED_TREES,
+                 full_rebuild_every: int = DEFAULT_FULL_REBUILD_EVERY):
+        self.max_added_trees = int(max_added_trees)
+        self.full_rebuild_every = int(full_rebuild_every)
+
+    @classmethod
+    def from_config(cls, freqai_info: dict) -> 'WarmStart':
+        """freqai.warm_start → WarmStart (thiếu key → mặc định)"""
+        section = freqai_info.get('warm_start', {}) or {}
+        return cls(
+            max_added_trees=section.get('max_added_trees', DEFAULT_MAX_ADDED_TREES),
+            full_rebuild_every=section.get('full_rebuild_every', DEFAULT_FULL_REBUILD_EVERY),
+        )
+
+    # ============================================================
+    # MODEL INTROSPECTION (sklearn API của LightGBM / XGBoost)
+    # ============================================================
+
+    @staticmethod
+    def state(model: Any) -> Dict[str, Any]:
+        return dict(getattr(model, STATE_ATTRIBUTE, None) or {})
+
+    @staticmethod
+    def num_trees(model: Any) -> int:
+        """Tổng số boosting rounds của model đã fit (0 nếu không đọc được)"""
+        if hasattr(model, 'booster_'):                      # LightGBM
+            return int(model.booster_.current_iteration())
+        if hasattr(model, 'get_booster'):                   # XGBoost
+            return int(model.get_booster().num_boosted_rounds())
+        return 0
+
+    @staticmethod
+    def feature_names(model: Any) -> Optional[Tuple[str, ...]]:
+        """Tên features lúc fit (model không có state warm start, vd model cũ của FreqAI)"""
+        names = getattr(model, 'feature_names_in_', None)
+        if names is None:
+            names = getattr(model, 'feature_name_', None)
+        return tuple(str(name) for name in names) if names is not None else None
+
+    # ============================================================
+    # PLAN + RECORD
+    # ============================================================
+
+    def plan(self, previous: Any, features: Sequence[str],
+             training_parameters: dict) -> Tuple[Optional[Any], dict, str]:
+        """
+        Returns:
+            (init_model | None, training parameters cho lần fit này, lý do)
+        """
+        if self.max_added_trees <= 0:
+            return None, training_parameters, 'warm start disabled'
+        if previous is None:
+            return None, training_parameters, 'no previous model'
+        known = self.state(previous).get('features') or self.feature_names(previous)
+        if known != tuple(str(name) for name in features):
+            return None, training_parameters, 'feature set changed'
+        warm_fits = self.state(previous).get('warm_fits', 0)
+        if warm_fits >= self.full_rebuild_every:
+            return None, training_parameters, f'periodic rebuild after {warm_fits} warm fits'
+        params = dict(training_parameters)
+        params['n_estimators'] = min(self.max_added_trees, params.get('n_estimators', self.max_added_trees))
+        return previous, params, f'warm fit {warm_fits + 1}/{self.full_rebuild_every}'
+
+    def record(self, pair: str, model: Any, previous: Optional[Any], init_model: Optional[Any],
+               seconds: float, reason: str, features: Sequence[str], rows: int) -> None:
+        """Gắn state vào model mới + log thời gian / tiết kiệm"""
+        state = self.state(previous) if init_model is not None else {}
+        trees = self.num_trees(model)
+        if init_model is not None:
+            added = trees - self.num_trees(init_model)
+            state['warm_fits'] = state.get('warm_fits', 0) + 1
+            full_seconds = state.get('full_seconds')
+            saving = (f"saved {1 - seconds / full_seconds:.0%} vs full rebuild {full_seconds:.1f}s"
+                      if full_seconds else "no full-rebuild timing yet")
+            logger.info(
+                f"Warm-start {pair}: +{added} trees ({trees} total) on {rows:,} rows "
+                f"in {seconds:.1f}s, {saving} [{reason}]"
+            )
+        else:
+            state = {'warm_fits': 0, 'full_seconds': seconds, 'full_trees': trees}
+            logger.info(f"Warm-start {pair}: full rebuild, {trees} trees on {rows:,} rows in {seconds:.1f}s [{reason}]")
+        state['features'] = tuple(str(name) for name in features)
+        setattr(model, STATE_ATTRIBUTE, state)
+
+
+# ============================================================
+# FREQAI INTEGRATION (user_data/freqaimodels)
+# ============================================================
+
+class FrozenPipeline:
+    """
+    Pipeline datasieve đã fit của model trước, fit_transform = transform.
+
+    BaseRegressionModel.train luôn gọi fit_transform trên pipeline từ define_*_pipeline;
+    wrapper này giữ nguyên scaler / VarianceThreshold / SVM / DI đã fit. Step `noise`
+    chỉ cộng noise trong fit_transform → cộng lại ở đây như pipeline gốc.
+    """
+
+    def __init__(self, pipeline: Any):
+        self.pipeline = pipeline
+
+    def fit(self, X, y=None, sample_weight=None) -> 'FrozenPipeline':
+        return self
+
+    def fit_transform(self, X, y=None, sample_weight=None):
+        X, y, sample_weight = self.pipeline.transform(X, y, sample_weight)
+        if 'noise' in self.pipeline:
+            noise = self.pipeline['noise']
+            X = X + np.random.normal(noise.mu, noise.sigma, X.shape)
+        return X, y, sample_weight
+
+    def __getattr__(self, name: str) -> Any:
+        if name == 'pipeline':
+            raise AttributeError(name)
+        return getattr(self.pipeline, name)
+
+
+class WarmStartMixin:
+    """
+    Warm start cho regressors của FreqAI, đặt trước model built-in trong MRO:
+        class WarmStartLightGBMRegressor(WarmStartMixin, LightGBMRegressor)
+
+    train → plan (model + pipelines trước của pair) → define_*_pipeline trả
+    FrozenPipeline khi warm → get_init_model trả model trước → fit chạy với
+    n_estimators = max_added_trees rồi ghi state. save_data lưu pipeline gốc.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.warm_start = WarmStart.from_config(self.freqai_info)
+        self._warm: Optional[Dict[str, Any]] = None
+
+    def train(self, unfiltered_df, pair: str, dk, **kwargs) -> Any:
+        previous = self.dd.model_dictionary.get(pair)
+        meta = self.dd.meta_data_dictionary.get(pair, {})
+        pipelines = (meta.get(FEATURE_PIPELINE), meta.get(LABEL_PIPELINE))
+        features = list(dk.training_features_list)
+
+        init_model, params, reason = self.warm_start.plan(previous, features, self.model_training_parameters)
+        if init_model is not None and any(pipeline is None for pipeline in pipelines):
+            init_model, params, reason = None, self.model_training_parameters, 'no fitted pipelines to reuse'
+
+        self._warm = {'previous': previous, 'init_model': init_model, 'params': params, 'reason': reason,
+                      'features': features, 'pipelines': pipelines if init_model is not None else None}
+        try:
+            model = super().train(unfiltered_df, pair, dk, **kwargs)
+        finally:
+            self._warm = None
+        if init_model is not None:
+            # save_data / predict dùng pipeline gốc, không phải wrapper
+            dk.feature_pipeline, dk.label_pipeline = pipelines
+        return model
+
+    def define_data_pipeline(self, threads: int = -1) -> Any:
+        if self._warm and self._warm['pipelines']:
+            return FrozenPipeline(self._warm['pipelines'][0])
+        return super().define_data_pipeline(threads)
+
+    def define_label_pipeline(self, threads: int = -1) -> Any:
+        if self._warm and self._warm['pipelines']:
+            return FrozenPipeline(self._warm['pipelines'][1])
+        return super().define_label_pipeline(threads)
+
+    def get_init_model(self, pair: str) -> Any:
+        # LightGBMRegressor.fit → init_model, XGBoostRegressor.fit → xgb_model
+        if self._warm is None:
+            return super().get_init_model(pair)
+        return self._warm['init_model']
+
+    def fit(self, data_dictionary: dict, dk, **kwargs) -> Any:
+        warm = self._warm
+        if warm is None:   # fit gọi ngoài train → model built-in
+            return super().fit(data_dictionary, dk, **kwargs)
+
+        full_parameters = self.model_training_parameters
+        self.model_training_parameters = warm['params']
+        started = time.perf_counter()
+        try:
+            model = super().fit(data_dictionary, dk, **kwargs)
+        finally:
+            self.model_training_parameters = full_parameters
+        self.warm_start.record(dk.pair, model, warm['previous'], warm['init_model'], time.perf_counter() - started,
+                               warm['reason'], warm['features'], len(data_dictionary['train_features']))
+        return model
+
+
+# ============================================================
+# TEST: warm vs full fit time trên dữ liệu trượt 1 ngày
+# ============================================================
+if __name__ == "__main__":
+    import time
+
+    import numpy as np
+    import pandas as pd
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    rng = np.random.default_rng(7)
+    day, days = 288, 46
+    X_all = pd.DataFrame(rng.normal(size=(day * days, 40)), columns=[f'%-f{i}' for i in range(40)])
+    y_all = X_all['%-f0'] * 0.5 + np.sin(X_all['%-f1']) + rng.normal(0, 0.5, len(X_all))
+    old, new = slice(0, day * 45), slice(day, day * 46)   # cửa sổ 45 ngày trượt 1 ngày
+
+    backends = []
+    try:
+        from lightgbm import LGBMRegressor
+        backends.append(('LightGBM', LGBMRegressor, {'n_estimators': 1000, 'learning_rate': 0.03,
+                                                      'num_leaves': 128, 'verbose': -1}))
+    except ImportError:
+        pass
+    try:
+        from xgboost import XGBRegressor
+        backends.append(('XGBoost', XGBRegressor, {'n_estimators': 1000, 'learning_rate': 0.03,
+                                                    'max_depth': 6, 'verbosity': 0}))
+    except ImportError:
+        pass
+    if not backends:
+        print("⚠️ lightgbm / xgboost not installed - nothing to compare")
+
+    warm_start = WarmStart(max_added_trees=200, full_rebuild_every=2)
+    for name, Model, params in backends:
+        def fit(window, previous):
+            init_model, fit_params, reason = warm_start.plan(previous, X_all.columns, params)
+            model = Model(**fit_params)
+            started = time.perf_counter()
+            if init_model is None:
+                model.fit(X_all[window], y_all[window])
+            elif name == 'LightGBM':
+                model.fit(X_all[window], y_all[window], init_model=init_model)
+            else:
+                model.fit(X_all[window], y_all[window], xgb_model=init_model)
+            elapsed = time.perf_counter() - started
+            warm_start.record(name, model, previous, init_model, elapsed, reason, X_all.columns, len(X_all[window]))
+            return model, init_model is not None
+
+        first, _ = fit(old, None)
+        second, warm = fit(new, first)
+        assert warm and WarmStart.num_trees(second) == WarmStart.num_trees(first) + 200
+        third, warm = fit(new, second)
+        fourth, warm_after_cap = fit(new, third)
+        assert warm and not warm_after_cap, "full_rebuild_every=2 → sau 2 lần warm phải full rebuild"
+        assert WarmStart.num_trees(fourth) == params['n_estimators']
+
+        # Feature set đổi → full rebuild
+        _, _, reason = warm_start.plan(second, list(X_all.columns[:-1]), params)
+        assert reason == 'feature set changed'
+        print(f"✅ {name}: warm +200 trees, periodic rebuild, feature-change rebuild OK")
+
+    # ============================================================
+    # TEST qua FreqAI: train → save_data → warm train trên cửa sổ trượt (scale features đổi)
+    # ============================================================
+    try:
+        import sys
+        import tempfile
+        from pathlib import Path
+
+        from freqtrade.enums import RunMode
+        from freqtrade.freqai.data_kitchen import FreqaiDataKitchen
+    except ImportError:
+        print("⚠️ freqtrade not installed - skip FreqAI pipeline test")
+        raise SystemExit(0)
+
+    sys.path.append(str(Path(__file__).resolve().parents[2] / 'freqaimodels'))
+    models = []
+    if any(name == 'LightGBM' for name, _, _ in backends):
+        from WarmStartLightGBMRegressor import WarmStartLightGBMRegressor
+        models.append((WarmStartLightGBMRegressor, {'n_estimators': 300, 'learning_rate': 0.05, 'verbose': -1}))
+    if any(name == 'XGBoost' for name, _, _ in backends):
+        from WarmStartXGBoostRegressor import WarmStartXGBoostRegressor
+        models.append((WarmStartXGBoostRegressor, {'n_estimators': 300, 'learning_rate': 0.05, 'max_depth': 6}))
+
+    pair, rows, shift = 'BTC/USDT', day * 10, day * 2
+    # Features có trend → cửa sổ sau có min/max khác → MinMaxScaler fit lại sẽ đổi scale
+    frame = pd.DataFrame({f'%-f{i}': np.cumsum(rng.normal(0.02 * (i + 1), 1, rows + shift)) for i in range(6)})
+    frame['&-target'] = 0.01 * frame['%-f0'] - 0.02 * frame['%-f3'] + rng.normal(0, 0.05, len(frame))
+    frame['date'] = pd.date_range('2024-01-01', periods=len(frame), freq='5min', tz='UTC')
+    windows = [frame.iloc[:rows].reset_index(drop=True), frame.iloc[shift:].reset_index(drop=True)]
+
+    for Model, params in models:
+        config = {
+            'freqai': {
+                'enabled': True, 'identifier': 'warm-start-selftest', 'train_period_days': 10,
+                'backtest_period_days': 2, 'live_retrain_hours': 24,
+                'feature_parameters': {'include_timeframes': ['5m'], 'include_corr_pairlist': [],
+                                       'label_period_candles': 20, 'include_shifted_candles': 0,
+                                       'indicator_periods_candles': [10], 'shuffle_after_split': False,
+                                       'reverse_train_test_order': False, 'buffer_train_data_candles': 0},
+                'data_split_parameters': {'test_size': 0.1, 'shuffle': False},
+                'model_training_parameters': params,
+                'warm_start': {'max_added_trees': 50, 'full_rebuild_every': 1},
+            },
+            'user_data_dir': Path(tempfile.mkdtemp()), 'timeframe': '5m', 'runmode': RunMode.BACKTEST,
+            'timerange': '20240101-20240301', 'stake_currency': 'USDT', 'dry_run': True,
+            'exchange': {'name': 'binance', 'pair_whitelist': [pair]}, 'max_open_trades': 1,
+        }
+        freqai = Model(config=config)
+        freqai.dd.get_pair_dict_info(pair)
+
+        def train(window, timestamp, drop=()):
+            """Một lần retrain như IFreqaiModel: dk mới → find features/labels → train → save_data"""
+            dk = FreqaiDataKitchen(config, live=True, pair=pair)
+            dk.set_paths(pair, timestamp)
+            dk.set_new_model_names(pair, timestamp)
+            data = window.drop(columns=list(drop))
+            dk.find_features(data)
+            dk.find_labels(data)
+            model = freqai.train(data, pair, dk)
+            freqai.dd.save_data(model, pair, dk)
+            meta = freqai.dd.meta_data_dictionary[pair]
+            return model, dk, meta['feature_pipeline'], meta['label_pipeline']
+
+        first, _, features_a, labels_a = train(windows[0], 1704067200)
+        second, dk, features_b, labels_b = train(windows[1], 1704240000)
+        name = Model.__name__
+
+        # Warm fit: pipelines của model trước được giữ nguyên (cùng object, cùng scaler đã fit)
+        assert features_b is features_a and labels_b is labels_a, f"{name}: warm fit must reuse fitted pipelines"
+        assert isinstance(features_b, type(freqai.define_data_pipeline())), "save_data must store the plain pipeline"
+        assert WarmStart.num_trees(second) == WarmStart.num_trees(first) + 50
+        assert WarmStart.state(second)['warm_fits'] == 1
+
+        # Trees cũ trong model warm cho cùng output như model trước trên input đã transform
+        X_b, _, _ = features_a.transform(windows[1][dk.training_features_list])
+        n_old = WarmStart.num_trees(first)
+        if hasattr(second, 'booster_'):
+            old_part = second.predict(X_b, num_iteration=n_old)
+        else:
+            old_part = second.predict(X_b, iteration_range=(0, n_old))
+        np.testing.assert_allclose(old_part, first.predict(X_b), rtol=1e-6, atol=1e-9)
+
+        # Nếu fit lại scaler trên cửa sổ mới (hành vi FreqAI gốc) trees cũ nhận input lệch scale
+        refit = freqai.define_data_pipeline()
+        X_refit, _, _ = refit.fit_transform(windows[1][dk.training_features_list])
+        drift = float(np.abs(X_refit.to_numpy() - X_b.to_numpy()).max())
+        assert drift > 0.05, "synthetic windows should move the scaler"
+
+        # predict end-to-end qua pipeline gốc
+        freqai.model = second
+        predictions, _ = freqai.predict(windows[1], dk)
+        corr = float(np.corrcoef(predictions['&-target'], windows[1]['&-target'])[0, 1])
+        assert corr > 0.9, corr
+
+        # full_rebuild_every=1 → lần sau full rebuild, pipelines fit lại
+        third, _, features_c, _ = train(windows[1], 1704412800)
+        assert features_c is not features_a and WarmStart.num_trees(third) == params['n_estimators']
+        # Feature set đổi → full rebuild
+        fourth, _, features_d, _ = train(windows[1], 1704585600)
+        fifth, _, features_e, _ = train(windows[1], 1704758400, drop=('%-f5',))
+        assert features_e is not features_d and WarmStart.num_trees(fifth) == params['n_estimators']
+        print(f"✅ {name} via FreqAI train/save_data: warm fit reuses pipelines "
+              f"(refit scaler would shift inputs by up to {drift:.2f}), old trees unchanged, "
+              f"predict corr {corr:.3f}, periodic + feature-change rebuild OK")
@@ -16,6 +16,19 @@ import pandas as pd
 import pandas_ta as ta
 from typing import Tuple, Optional
 
+try:
+    from indicators.indicator_cache import IndicatorCache
+    from indicators.feature_store import FeatureStore
+    from indicators.dtype_policy import DtypePolicy
+    from indicators.feature_pruning import FeaturePruning
+    from indicators.feature_profiler import FeatureProfiler
+except ImportError:
+    from .indicator_cache import IndicatorCache
+    from .feature_store import FeatureStore
+    from .dtype_policy import DtypePolicy
+    from .feature_pruning import FeaturePruning
+    from .feature_profiler import FeatureProfiler
+
 
 def safe_atr(high, low, close, length=14) -> pd.Series:
     """Safely calculate ATR, returning NaN series if insufficient data"""
@@ -57,26 +70,48 @@ class WaveIndicators:
     FIB_EXTENSION = [1.0, 1.272, 1.618, 2.0, 2.618]
     
     @staticmethod
+    @FeatureProfiler.profiled
+    @FeatureStore.materialized('wave')
     def add_all_features(df: pd.DataFrame, prefix: str = "") -> pd.DataFrame:
         """Add all wave-related features to dataframe using optimized single concat"""
         # Collect all features in a dict first to avoid fragmentation
         features = {}
         
-        WaveIndicators._calc_fibonacci_retracement(df, prefix, features)
-        WaveIndicators._calc_fibonacci_extensions(df, prefix, features)
-        WaveIndicators._calc_awesome_oscillator(df, prefix, features)
-        WaveIndicators._calc_wave_momentum(df, prefix, features)
-        WaveIndicators._calc_swing_structure(df, prefix, features)
+        FeaturePruning.run_groups((
+            WaveIndicators._calc_fibonacci_retracement,
+            WaveIndicators._calc_fibonacci_extensions,
+            WaveIndicators._calc_awesome_oscillator,
+            WaveIndicators._calc_wave_momentum,
+            WaveIndicators._calc_swing_structure,
+        ), features, df, prefix)
         
         # Single concat - much faster than individual inserts
+        features = FeaturePruning.select(features)
         if features:
             features_df = pd.DataFrame(features, index=df.index)
             # Fill NaN values
             features_df = features_df.ffill().fillna(0)
+            features_df = DtypePolicy.apply(features_df)
             df = pd.concat([df, features_df], axis=1)
         
         return df
     
+    @staticmethod
+    def _atr(df: pd.DataFrame, length: int = 14) -> pd.Series:
+        """safe_atr dùng chung qua IndicatorCache (AO, wave momentum, swing structure)"""
+        return IndicatorCache.compute(
+            df, ('safe_atr', length),
+            lambda: safe_atr(df['high'], df['low'], df['close'], length=length)
+        )
+    
+    @staticmethod
+    def _ao(df: pd.DataFrame) -> pd.Series:
+        """Awesome Oscillator = SMA5 - SMA34 của median price"""
+        return IndicatorCache.compute(
+            df, ('awesome_oscillator',),
+            lambda: IndicatorCache.rolling(df, 'hl2', 5, 'mean') - IndicatorCache.rolling(df, 'hl2', 34, 'mean')
+        )
+    
     @staticmethod
     def find_swing_points(df: pd.DataFrame, lookback: int = 20) -> Tuple[pd.Series, pd.Series]:
         """
@@ -97,8 +132,8 @@ class WaveIndicators:
     @staticmethod
     def _calc_fibonacci_retracement(df: pd.DataFrame, prefix: str, features: dict, lookback: int = 50) -> None:
         """Calculate Fibonacci retracement features into dict"""
-        high = df['high'].rolling(lookback).max()
-        low = df['low'].rolling(lookback).min()
+        high = IndicatorCache.rolling(df, 'high', lookback, 'max')
+        low = IndicatorCache.rolling(df, 'low', lookback, 'min')
         close = df['close']
         
         price_range = high - low
@@ -128,8 +163,8 @@ class WaveIndicators:
     @staticmethod
     def _calc_fibonacci_extensions(df: pd.DataFrame, prefix: str, features: dict, lookback: int = 50) -> None:
         """Calculate Fibonacci extension features into dict"""
-        high = df['high'].rolling(lookback).max()
-        low = df['low'].rolling(lookback).min()
+        high = IndicatorCache.rolling(df, 'high', lookback, 'max')
+        low = IndicatorCache.rolling(df, 'low', lookback, 'min')
         close = df['close']
         
         price_range = high - low
@@ -148,10 +183,8 @@ class WaveIndicators:
     @staticmethod
     def _calc_awesome_oscillator(df: pd.DataFrame, prefix: str, features: dict) -> None:
         """Calculate Awesome Oscillator features into dict"""
-        median_price = (df['high'] + df['low']) / 2
-        ao = median_price.rolling(5).mean() - median_price.rolling(34).mean()
-        
-        atr = safe_atr(df['high'], df['low'], df['close'], length=14)
+        ao = WaveIndicators._ao(df)
+        atr = WaveIndicators._atr(df, length=14)
         
         features[f'{prefix}%-wave_ao'] = ao / atr
         features[f'{prefix}%-wave_ao_hist'] = ao.diff() / atr
@@ -177,8 +210,7 @@ class WaveIndicators:
         high = df['high']
         low = df['low']
         
-        median_price = (high + low) / 2
-        ao = median_price.rolling(5).mean() - median_price.rolling(34).mean()
+        ao = WaveIndicators._ao(df)
         
         price_higher = close > close.rolling(10).max().shift(1)
         price_lower = close < close.rolling(10).min().shift(1)
@@ -190,13 +222,13 @@ class WaveIndicators:
         features[f'{prefix}%-wave_bearish_div'] = bearish_div
         features[f'{prefix}%-wave_bullish_div'] = bullish_div
         
-        adx = ta.adx(high, low, close, length=14)
+        adx = IndicatorCache.pta(df, 'adx', 'high', 'low', 'close', length=14)
         if adx is not None and 'ADX_14' in adx.columns:
             features[f'{prefix}%-wave_strength'] = adx['ADX_14'] / 100
         else:
             features[f'{prefix}%-wave_strength'] = pd.Series(0.5, index=df.index)
         
-        atr = safe_atr(high, low, close, length=14)
+        atr = WaveIndicators._atr(df, length=14)
         ema20 = safe_ema(close, length=20)
         extension = (close - ema20) / atr
         extension = extension.fillna(0)
@@ -211,8 +243,8 @@ class WaveIndicators:
         low = df['low']
         close = df['close']
         
-        swing_high = high.rolling(lookback).max()
-        swing_low = low.rolling(lookback).min()
+        swing_high = IndicatorCache.rolling(df, 'high', lookback, 'max')
+        swing_low = IndicatorCache.rolling(df, 'low', lookback, 'min')
         
         hh = swing_high > swing_high.shift(lookback)
         ll = swing_low < swing_low.shift(lookback)
@@ -230,7 +262,7 @@ class WaveIndicators:
         
         features[f'{prefix}%-wave_swing_position'] = (close - swing_low) / swing_range
         
-        atr = safe_atr(high, low, close, length=14)
+        atr = WaveIndicators._atr(df, length=14)
         features[f'{prefix}%-wave_swing_size'] = swing_range / atr
         
         momentum = close.pct_change(5)